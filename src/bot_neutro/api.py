@@ -1,86 +1,171 @@
+import asyncio
 import logging
-import os
+import signal
+import time
+from contextlib import asynccontextmanager
 from uuid import uuid4
 from typing import Dict, Optional
 
 from fastapi import FastAPI, File, Form, Header, Request, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, PlainTextResponse
+from fastapi.responses import JSONResponse, Response
+from fastapi.routing import APIRoute
+from starlette.concurrency import run_in_threadpool
 
 from . import __version__
 from .audio_storage import get_default_audio_session_repository
 from .audio_pipeline import AudioPipeline, AudioRequestContext, AudioResponseContext, PipelineError
+from .audio_scheduler import SchedulerTimeout, scheduler_from_settings
+from .auth import AUTHENTICATOR, Principal, configure_auth
 from .middleware import (
+    AuthMiddleware,
     CorrelationIdMiddleware,
+    DefaultOutcomeMiddleware,
     JSONLoggingMiddleware,
     RateLimitMiddleware,
     RequestLatencyMiddleware,
+    TracedMiddleware,
+    TracingMiddleware,
 )
+from .log_pipeline import configure_logging
+from .middleware.outcome import with_outcome as _with_outcome
 from .llm_tiers import (
     TierInvalidError,
     effective_tier,
     is_forbidden,
     normalize_requested_tier,
-    resolve_authorized_tier,
 )
+from .metrics_exposition import (
+    OPENMETRICS_CONTENT_TYPE,
+    PROMETHEUS_CONTENT_TYPE,
+    ExpositionRenderer,
+    accepts_gzip,
+    encode_payload,
+    wants_openmetrics,
+)
+from .debug import register_debug_routes, require_admin
+from .latency_sketch import (
+    LATENCY_SKETCHES,
+    load_multiprocess as load_multiprocess_sketches,
+    summarize as summarize_sketches,
+    summary_samples as sketch_summary_samples,
+)
+from .metrics_multiprocess import aggregate as aggregate_multiprocess_metrics
 from .metrics_runtime import METRICS
 from .providers.factory import build_llm_provider, build_stt_provider, build_tts_provider
-from .security_ids import derive_api_key_id
-
-
-METRICS_PAYLOAD = """# HELP sensei_request_latency_seconds Request latency
-# TYPE sensei_request_latency_seconds histogram
-# HELP sensei_rate_limit_hits_total Total requests rejected by rate limit
-# TYPE sensei_rate_limit_hits_total counter
-# HELP errors_total Total errors seen by route
-# TYPE errors_total counter
-# HELP llm_tier_denied_total Total denied LLM tier requests
-# TYPE llm_tier_denied_total counter
-# HELP mem_reads_total Memory reads
-# TYPE mem_reads_total counter
-# HELP mem_writes_total Memory writes
-# TYPE mem_writes_total counter
-# HELP audio_sessions_purged_total Audio sessions purged from storage
-# TYPE audio_sessions_purged_total counter
-# HELP audio_sessions_current Current audio sessions stored
-# TYPE audio_sessions_current gauge
-# HELP sensei_requests_total Total requests by route
-# TYPE sensei_requests_total counter
-"""
-
-
-def _parse_stats_max_sessions() -> int:
-    raw = os.getenv("AUDIO_STATS_MAX_SESSIONS", "20000")
-    try:
-        value = int(raw)
-    except ValueError:
-        return 20000
-    if value < 0:
-        return 0
-    return value
+from .providers.interfaces import DEFAULT_LOCALE
+from .providers.tts_formats import UnsupportedTTSFormat, negotiate_tts_format
+from .quota import QUOTAS, configure_quotas, quota_summary
+from .runtime_monitor import LoopLagMonitor, readiness_failures
+from .settings import Settings, SettingsHolder
+from .slow_requests import configure_slow_requests
+from .tracing import TRACER, configure_tracing, current_span
+
 
 
-STATS_MAX_SESSIONS = _parse_stats_max_sessions()
 
+SERVER_TIMING_STAGES = ("upload", "queue", "stt", "llm", "tts", "storage", "total")
 
-def _with_outcome(response, outcome: str = "ok", detail: str | None = None) -> None:
-    response.headers.setdefault("X-Outcome", outcome)
-    if detail:
-        response.headers["X-Outcome-Detail"] = detail
+
+def _principal(request: Request, api_key: str) -> Principal:
+    """Principal resolved by `AuthMiddleware` (o resuelto aquí si no corrió)."""
+
+    principal = getattr(request.state, "principal", None)
+    return principal if principal is not None else AUTHENTICATOR.resolve(api_key)
+
+
+def _server_timing(stage_ms: Dict[str, float]) -> str:
+    return ", ".join(
+        f"{stage};dur={stage_ms[stage]:.3f}" for stage in SERVER_TIMING_STAGES if stage in stage_ms
+    )
 
 
 logger = logging.getLogger("bot_neutro")
 
 
-def create_app() -> FastAPI:
-    app = FastAPI(title="bot-neutro", version=__version__)
-    app.state.audio_session_repo = get_default_audio_session_repository()
+class _InstrumentedRoute(APIRoute):
+    """Child span and in-flight gauge per route, covering body/multipart parsing.
+
+    También marca `state.route_started` para medir el parseo del upload.
+    """
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        route = self.path
+        span_name = f"route {route}"
+
+        async def instrumented_handler(request: Request):
+            request.state.route_started = time.perf_counter()
+            METRICS.add_request_in_flight(route, 1)
+            try:
+                with TRACER.span(span_name):
+                    return await handler(request)
+            finally:
+                METRICS.add_request_in_flight(route, -1)
+
+        return instrumented_handler
+
+
+def _install_reload_signal(app: FastAPI) -> bool:
+    """`SIGHUP` → `settings.reload()` (solo en el main thread con loop Unix)."""
+
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, app.state.settings.reload)
+    except (AttributeError, NotImplementedError, RuntimeError, ValueError):
+        return False
+    return True
+
+
+@asynccontextmanager
+async def _lifespan(app: FastAPI):
+    monitor = app.state.loop_monitor
+    monitor.start()
+    QUOTAS.start()
+    await run_in_threadpool(app.state.audio_pipeline.warm_up)
+    reload_signal = _install_reload_signal(app)
+    try:
+        yield
+    finally:
+        if reload_signal:
+            asyncio.get_running_loop().remove_signal_handler(signal.SIGHUP)
+        await monitor.stop()
+        await QUOTAS.stop()
+        LATENCY_SKETCHES.disable_multiprocess()
+
+
+def create_app(settings: Optional[Settings] = None) -> FastAPI:
+    app_settings = SettingsHolder(settings)
+    current = app_settings.current
+    configure_logging(current.logging)
+    configure_tracing(current.tracing)
+    configure_slow_requests(current.slow_requests)
+    configure_auth(current.auth)
+    configure_quotas(current.quota)
+    app = FastAPI(title="bot-neutro", version=__version__, lifespan=_lifespan)
+    app.router.route_class = _InstrumentedRoute
+    app.state.settings = app_settings
+    app.state.loop_monitor = LoopLagMonitor()
+    LATENCY_SKETCHES.configure(current.metrics.latency_top_k_tenants, current.metrics.latency_window_seconds)
+    multiproc_dir = current.metrics.multiprocess_dir
+    if multiproc_dir:
+        METRICS.enable_multiprocess(multiproc_dir)
+        LATENCY_SKETCHES.enable_multiprocess(multiproc_dir)
+
+    async def _latency_sketch_map():
+        if METRICS.multiprocess_dir:
+            return await run_in_threadpool(
+                load_multiprocess_sketches, METRICS.multiprocess_dir, LATENCY_SKETCHES
+            )
+        return LATENCY_SKETCHES.merged()
+    app.state.audio_session_repo = get_default_audio_session_repository(current.storage)
     app.state.audio_pipeline = AudioPipeline(
         session_repo=app.state.audio_session_repo,
-        stt_provider=build_stt_provider(),
-        tts_provider=build_tts_provider(),
-        llm_provider=build_llm_provider(),
+        stt_provider=build_stt_provider(current.providers),
+        tts_provider=build_tts_provider(current.providers),
+        llm_provider=build_llm_provider(current.providers),
     )
+    app.state.metrics_renderer = ExpositionRenderer()
+    app.state.audio_scheduler = scheduler_from_settings(current.scheduler)
 
     origins = [
         "http://localhost:5173",
@@ -93,18 +178,20 @@ def create_app() -> FastAPI:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["Server-Timing"],
     )
 
-    app.add_middleware(RequestLatencyMiddleware)
-    app.add_middleware(CorrelationIdMiddleware)
-    app.add_middleware(RateLimitMiddleware)
-    app.add_middleware(JSONLoggingMiddleware)
-
-    @app.middleware("http")
-    async def set_default_outcome(request: Request, call_next):
-        response = await call_next(request)
-        response.headers.setdefault("X-Outcome", "ok")
-        return response
+    for middleware_class in (
+        RequestLatencyMiddleware,
+        CorrelationIdMiddleware,
+        RateLimitMiddleware,
+        AuthMiddleware,
+        JSONLoggingMiddleware,
+        DefaultOutcomeMiddleware,
+    ):
+        options = {"settings": app_settings} if middleware_class is RateLimitMiddleware else {}
+        app.add_middleware(TracedMiddleware, wrapped=middleware_class, **options)
+    app.add_middleware(TracingMiddleware)
 
     @app.get("/healthz")
     async def healthcheck(request: Request):
@@ -116,6 +203,11 @@ def create_app() -> FastAPI:
     @app.get("/readyz")
     async def readiness(request: Request):
         METRICS.inc_request("/readyz")
+        failures = readiness_failures(request.app.state.loop_monitor, request.app.state.settings.current.readiness)
+        if failures:
+            response = JSONResponse({"status": "not_ready", "reasons": failures}, status_code=503)
+            _with_outcome(response, outcome="error", detail="runtime.not_ready")
+            return response
         response = JSONResponse({"status": "ok"})
         _with_outcome(response)
         return response
@@ -130,52 +222,53 @@ def create_app() -> FastAPI:
     @app.get("/metrics")
     async def metrics(request: Request):
         METRICS.inc_request("/metrics")
-        snapshot = METRICS.snapshot()
-        dynamic_lines = []
-
-        for route, latency in snapshot["latency"].items():
-            for bound in snapshot["latency_bucket_bounds"]:
-                bound_label = "+Inf" if bound == float("inf") else str(bound)
-                value = latency["buckets"].get(bound, 0)
-                dynamic_lines.append(
-                    f'sensei_request_latency_seconds_bucket{{route="{route}",le="{bound_label}"}} {value}'
-                )
-            dynamic_lines.append(
-                f'sensei_request_latency_seconds_count{{route="{route}"}} {latency["count"]}'
+        openmetrics = wants_openmetrics(request.headers.get("accept"))
+        http_settings = request.app.state.settings.current.http
+        use_gzip = http_settings.metrics_gzip_enabled and accepts_gzip(request.headers.get("accept-encoding"))
+        if METRICS.multiprocess_dir:
+            samples = await run_in_threadpool(
+                aggregate_multiprocess_metrics, METRICS.multiprocess_dir
             )
-            dynamic_lines.append(
-                f'sensei_request_latency_seconds_sum{{route="{route}"}} {latency["sum"]}'
-            )
-
-        dynamic_lines.append(
-            f'sensei_rate_limit_hits_total {snapshot["rate_limit_hits_total"]}'
-        )
-        dynamic_lines.append(f'mem_reads_total {snapshot["mem_reads_total"]}')
-        dynamic_lines.append(f'mem_writes_total {snapshot["mem_writes_total"]}')
-        dynamic_lines.append(
-            f'audio_sessions_purged_total {snapshot["audio_sessions_purged_total"]}'
+        else:
+            samples = METRICS.collect()
+        if http_settings.metrics_latency_summaries:
+            samples = samples + sketch_summary_samples(await _latency_sketch_map())
+        payload = request.app.state.metrics_renderer.render(
+            samples, openmetrics=openmetrics, exemplars=METRICS.exemplars()
         )
-        dynamic_lines.append(
-            f'audio_sessions_current {snapshot["audio_sessions_current"]}'
+        response = Response(
+            encode_payload(payload, use_gzip),
+            media_type=OPENMETRICS_CONTENT_TYPE if openmetrics else PROMETHEUS_CONTENT_TYPE,
         )
+        if use_gzip:
+            response.headers["Content-Encoding"] = "gzip"
+        response.headers["Vary"] = "Accept, Accept-Encoding"
+        _with_outcome(response)
+        return response
 
-        for route, value in snapshot["requests_total"].items():
-            dynamic_lines.append(f'sensei_requests_total{{route="{route}"}} {value}')
-
-        for route, value in snapshot["errors_total"].items():
-            dynamic_lines.append(f'errors_total{{route="{route}"}} {value}')
-
-        for item in snapshot.get("llm_tier_denied_total", []):
-            dynamic_lines.append(
-                "llm_tier_denied_total"
-                f'{{route="{item["route"]}",requested_tier="{item["requested_tier"]}",'
-                f'authorized_tier="{item["authorized_tier"]}"}} {item["value"]}'
-            )
-
-        payload = METRICS_PAYLOAD + "\n".join(dynamic_lines)
-        response = PlainTextResponse(
-            payload,
-            media_type="text/plain; version=0.0.4; charset=utf-8",
+    @app.get("/metrics/latency")
+    async def metrics_latency(
+        request: Request,
+        route: Optional[str] = None,
+        stage: Optional[str] = None,
+        api_key_id: Optional[str] = None,
+    ):
+        """p50/p95/p99 por ruta, etapa y tenant (top-K) desde sketches DDSketch; solo admin."""
+
+        METRICS.inc_request("/metrics/latency")
+        denied = require_admin(request)
+        if denied is not None:
+            return denied
+        summary = summarize_sketches(
+            await _latency_sketch_map(), route=route, stage=stage, api_key_id=api_key_id
+        )
+        response = JSONResponse(
+            {
+                "window_seconds": LATENCY_SKETCHES.window_seconds,
+                "relative_accuracy": LATENCY_SKETCHES.relative_accuracy,
+                "top_k_tenants": LATENCY_SKETCHES.top_k_tenants,
+                **summary,
+            }
         )
         _with_outcome(response)
         return response
@@ -198,10 +291,12 @@ def create_app() -> FastAPI:
 
         METRICS.inc_request("/audio/stats")
 
-        api_key_id = derive_api_key_id(x_api_key)
+        principal = _principal(request, x_api_key)
+        api_key_id = principal.api_key_id
+        stats_max_sessions = request.app.state.settings.current.http.stats_max_sessions
         sessions = request.app.state.audio_session_repo.list_by_api_key(
             api_key_id,
-            limit=STATS_MAX_SESSIONS,
+            limit=stats_max_sessions,
             offset=0,
             api_key_id_autenticada=api_key_id,
         )
@@ -219,7 +314,7 @@ def create_app() -> FastAPI:
             "api_key_id": api_key_id,
             "totals": {
                 "sessions_current": len(sessions),
-                "limit_applied": STATS_MAX_SESSIONS,
+                "limit_applied": stats_max_sessions,
                 "sessions_purged_total": snapshot.get("audio_sessions_purged_total", 0),
             },
             "by_provider": {
@@ -227,6 +322,7 @@ def create_app() -> FastAPI:
                 "llm": by_llm,
                 "tts": by_tts,
             },
+            "quota": quota_summary(api_key_id, principal.limits),
         }
 
         response = JSONResponse(payload)
@@ -252,15 +348,24 @@ def create_app() -> FastAPI:
     async def audio_endpoint(
         request: Request,
         audio_file: UploadFile = File(..., description="Audio en formato soportado"),
-        locale: str = Form("es-CO"),
+        locale: str = Form(DEFAULT_LOCALE),
         user_external_id: Optional[str] = Form(None),
+        tts_format: Optional[str] = Form(None),
         x_munay_llm_tier: Optional[str] = Header(
             default=None, alias="x-munay-llm-tier"
         ),
     ):
+        route_span = current_span()
+        if route_span is not None:
+            # FastAPI ya parseó el multipart antes de llamar al endpoint.
+            TRACER.record_span("audio.parse_multipart", route_span.start_ns, time.time_ns())
         METRICS.inc_request("/audio")
 
-        corr_id = request.headers.get("X-Correlation-Id") or str(uuid4())
+        corr_id = (
+            request.headers.get("X-Correlation-Id")
+            or getattr(request.state, "correlation_id", None)
+            or str(uuid4())
+        )
         api_key = request.headers.get("X-API-Key")
         if not api_key:
             METRICS.inc_error("/audio")
@@ -268,7 +373,9 @@ def create_app() -> FastAPI:
             _with_outcome(response, outcome="error", detail="auth.unauthorized")
             response.headers.setdefault("X-Correlation-Id", corr_id)
             return response
-        api_key_id = derive_api_key_id(api_key)
+        principal = _principal(request, api_key)
+        api_key_id = principal.api_key_id
+        request.state.api_key_id = api_key_id
         munay_context = request.headers.get("x-munay-context")
 
         try:
@@ -280,7 +387,7 @@ def create_app() -> FastAPI:
             response.headers.setdefault("X-Correlation-Id", corr_id)
             return response
 
-        authorized_tier = resolve_authorized_tier(api_key)
+        authorized_tier = principal.tier
 
         if is_forbidden(requested_tier, authorized_tier):
             METRICS.inc_error("/audio")
@@ -313,7 +420,39 @@ def create_app() -> FastAPI:
             response.headers.setdefault("X-Correlation-Id", corr_id)
             return response
 
+        http_settings = request.app.state.settings.current.http
+        try:
+            output_format = negotiate_tts_format(
+                tts_format,
+                request.headers.get("accept"),
+                default=http_settings.tts_format_default,
+                allowed=http_settings.tts_formats,
+            )
+        except UnsupportedTTSFormat:
+            METRICS.inc_error("/audio")
+            response = JSONResponse(
+                {"detail": "unsupported tts_format", "supported": list(http_settings.tts_formats)},
+                status_code=406,
+            )
+            _with_outcome(response, outcome="error", detail="audio.tts_format_unsupported")
+            response.headers.setdefault("X-Correlation-Id", corr_id)
+            return response
+
+        # Cuota antes de leer el audio y de cualquier proveedor: O(1), sin gasto de STT.
+        quota_reason = QUOTAS.check(api_key_id, principal.limits, audio_file.size or 0)
+        if quota_reason is not None:
+            METRICS.inc_error("/audio")
+            if quota_reason == "max_audio_bytes":
+                response = JSONResponse({"detail": "audio file too large for plan"}, status_code=413)
+                _with_outcome(response, outcome="error", detail="audio.file_too_large")
+            else:
+                response = JSONResponse({"detail": f"quota exceeded: {quota_reason}"}, status_code=429)
+                _with_outcome(response, outcome="error", detail="audio.quota_exceeded")
+            response.headers.setdefault("X-Correlation-Id", corr_id)
+            return response
+
         audio_bytes = await audio_file.read()
+        request.state.audio_bytes = len(audio_bytes)
         if not audio_bytes:
             METRICS.inc_error("/audio")
             response = JSONResponse({"detail": "empty audio"}, status_code=400)
@@ -321,6 +460,7 @@ def create_app() -> FastAPI:
             response.headers.setdefault("X-Correlation-Id", corr_id)
             return response
 
+        upload_ms = (time.perf_counter() - request.state.route_started) * 1000
         mime_type = audio_file.content_type or ""
         client_meta: Dict[str, str] = {}
 
@@ -340,11 +480,31 @@ def create_app() -> FastAPI:
             "locale": locale,
             "user_external_id": user_external_id,
             "client_meta": client_meta or None,
+            "tts_format": output_format,
         }
 
         ctx["llm_tier"] = llm_tier
 
-        result: AudioResponseContext | PipelineError = request.app.state.audio_pipeline.process(ctx)
+        # El pipeline llama a proveedores bloqueantes: corre en el thread pool, no en el loop.
+        # El scheduler acota los slots por tenant y los reparte entre tiers.
+        settings = request.app.state.settings.current
+        scheduler = request.app.state.audio_scheduler
+        scheduler.apply(settings.scheduler)
+        METRICS.add_audio_bytes_in_memory(len(audio_bytes))
+        try:
+            async with scheduler.slot(api_key_id, principal.tier, principal.limits.max_in_flight) as waited:
+                result: AudioResponseContext | PipelineError = await run_in_threadpool(
+                    request.app.state.audio_pipeline.process, ctx
+                )
+        except SchedulerTimeout:
+            METRICS.inc_error("/audio")
+            response = JSONResponse({"detail": "audio pipeline overloaded"}, status_code=503)
+            _with_outcome(response, outcome="error", detail="audio.overloaded")
+            response.headers["Retry-After"] = "1"
+            response.headers.setdefault("X-Correlation-Id", corr_id)
+            return response
+        finally:
+            METRICS.add_audio_bytes_in_memory(-len(audio_bytes))
 
         if "code" in result:
             status_code, detail_value = ERROR_STATUS_MAPPING.get(
@@ -356,15 +516,28 @@ def create_app() -> FastAPI:
             )
             _with_outcome(response, outcome="error", detail=detail_value)
         else:
+            stage_ms = {"upload": round(upload_ms, 3), "queue": round(waited * 1000, 3), **result["stage_ms"]}
+            stage_ms["total"] = round((time.perf_counter() - request.state.route_started) * 1000, 3)
+            request.state.stage_ms = stage_ms
+            QUOTAS.record(api_key_id, result["usage"]["input_seconds"], result["usage"]["output_seconds"])
+            request.state.providers = {
+                "stt": result["usage"]["provider_stt"],
+                "llm": result["usage"]["provider_llm"],
+                "tts": result["usage"]["provider_tts"],
+            }
             body = {
                 "session_id": result.get("session_id"),
                 "corr_id": result.get("corr_id") or corr_id,
                 "transcript": result["transcript"],
                 "reply_text": result["reply_text"],
                 "tts_url": result.get("tts_url"),
+                "tts_format": output_format.name,
+                "tts_mime_type": result.get("tts_mime_type"),
                 "usage": {
                     "input_seconds": result["usage"]["input_seconds"],
                     "output_seconds": result["usage"]["output_seconds"],
+                    "output_bytes": result["usage"]["output_bytes"],
+                    "llm_cache_hit": result["usage"]["llm_cache_hit"],
                     "stt_ms": result["usage"]["stt_ms"],
                     "llm_ms": result["usage"]["llm_ms"],
                     "tts_ms": result["usage"]["tts_ms"],
@@ -377,10 +550,15 @@ def create_app() -> FastAPI:
             }
             response = JSONResponse(body, status_code=200)
             _with_outcome(response, outcome="success", detail="audio_processed")
+            response.headers["Vary"] = "Accept"
+            if settings.http.server_timing_enabled:
+                response.headers["Server-Timing"] = _server_timing(stage_ms)
 
         response.headers.setdefault("X-Correlation-Id", corr_id)
         return response
 
+    register_debug_routes(app, current.debug)
+
     return app
 
 
@@ -1,20 +1,39 @@
+import time
 import uuid
 from datetime import datetime
-from typing import Dict, Optional, TypedDict, Union
+from typing import Dict, Iterator, Optional, TypedDict, Union
 
 from .audio_storage import (
     AudioSession,
     FileAudioSessionRepository,
     get_default_audio_session_repository,
 )
+from .latency_sketch import LATENCY_SKETCHES, LatencySketches
+from .metrics_runtime import METRICS
+from .tracing import TRACER
+from .providers.audio_duration import wav_duration_seconds
 from .providers.interfaces import (
     LLMProvider,
+    LLMResult,
     STTProvider,
     STTResult,
     TTSProvider,
     TTSResult,
 )
 from .providers.stub import StubLLMProvider, StubSTTProvider, StubTTSProvider
+from .providers.tts_formats import TTSOutputFormat
+
+
+# Tamaño de los chunks que se empujan al STT (`transcribe_stream`).
+STT_CHUNK_BYTES = 32 * 1024
+
+
+def iter_audio_chunks(audio_bytes: bytes, chunk_size: int = STT_CHUNK_BYTES) -> Iterator[memoryview]:
+    """Zero-copy slices of the upload, in order."""
+
+    view = memoryview(audio_bytes)
+    for start in range(0, len(view), chunk_size):
+        yield view[start : start + chunk_size]
 
 
 class AudioRequestContext(TypedDict, total=False):
@@ -28,6 +47,7 @@ class AudioRequestContext(TypedDict, total=False):
     user_external_id: Optional[str]
     client_meta: Optional[Dict[str, str]]
     client_metadata: Optional[Dict[str, str]]
+    tts_format: Optional[TTSOutputFormat]
 
 
 class UsageMetrics(TypedDict):
@@ -40,16 +60,20 @@ class UsageMetrics(TypedDict):
     provider_tts: str
     input_seconds: float
     output_seconds: float
+    output_bytes: int
+    llm_cache_hit: bool
 
 
 class AudioResponseContext(TypedDict):
     transcript: str
     reply_text: str
     tts_url: Optional[str]
+    tts_mime_type: Optional[str]
     usage: UsageMetrics
     session_id: Optional[str]
     corr_id: Optional[str]
     meta: Optional[Dict[str, str]]
+    stage_ms: Dict[str, float]
 
 
 class PipelineError(TypedDict):
@@ -58,6 +82,15 @@ class PipelineError(TypedDict):
     details: Optional[Dict[str, str]]
 
 
+def _latency_ms(result: object, provider: object) -> int:
+    """Latency reported on the result; providers that don't set it expose `latency_ms`."""
+
+    latency_ms = getattr(result, "latency_ms", None)
+    if latency_ms is None:
+        latency_ms = getattr(provider, "latency_ms", 0)
+    return int(latency_ms)
+
+
 class AudioPipeline:
     def __init__(
         self,
@@ -65,11 +98,28 @@ class AudioPipeline:
         stt_provider: STTProvider,
         tts_provider: TTSProvider,
         llm_provider: LLMProvider,
+        latency_sketches: LatencySketches | None = None,
     ) -> None:
         self._repository = session_repo
         self._stt_provider = stt_provider
         self._tts_provider = tts_provider
         self._llm_provider = llm_provider
+        self._latency_sketches = latency_sketches or LATENCY_SKETCHES
+
+    def warm_up(self) -> None:
+        """Warm every provider (bloqueante: se corre en el thread pool al arrancar)."""
+
+        for provider in (self._stt_provider, self._llm_provider, self._tts_provider):
+            warm_up = getattr(provider, "warm_up", None)
+            if warm_up is not None:
+                warm_up()
+
+    def _observe_stage(
+        self, stage: str, started: float, api_key_id: Optional[str], stage_ms: Dict[str, float]
+    ) -> None:
+        elapsed = time.perf_counter() - started
+        self._latency_sketches.observe("/audio", stage, elapsed, api_key_id)
+        stage_ms[stage] = round(elapsed * 1000, 3)
 
     def _error(self, code: str, message: str, details: Optional[Dict[str, str]] = None) -> PipelineError:
         return PipelineError(code=code, message=message, details=details)
@@ -77,17 +127,25 @@ class AudioPipeline:
     def _build_usage(
         self,
         stt_result: STTResult,
+        llm_result: LLMResult,
         tts_result: TTSResult,
+        audio_bytes: bytes,
     ) -> UsageMetrics:
-        stt_ms = int(getattr(self._stt_provider, "latency_ms", 0))
-        llm_ms = int(getattr(self._llm_provider, "latency_ms", 0))
-        tts_ms = int(getattr(self._tts_provider, "latency_ms", 0))
-
-        input_seconds = float(getattr(self._stt_provider, "input_seconds", 0.0))
-        output_seconds = float(getattr(self._tts_provider, "output_seconds", 0.0))
+        stt_ms = _latency_ms(stt_result, self._stt_provider)
+        llm_ms = _latency_ms(llm_result, self._llm_provider)
+        tts_ms = _latency_ms(tts_result, self._tts_provider)
+
+        # Segundos de *este* request: los reporta el provider o se leen del header WAV.
+        input_seconds = stt_result.input_seconds
+        if input_seconds is None:
+            input_seconds = wav_duration_seconds(audio_bytes) or 0.0
+        output_seconds = tts_result.output_seconds
+        if output_seconds is None:
+            output_seconds = wav_duration_seconds(tts_result.audio_bytes or b"") or 0.0
+        output_bytes = len(tts_result.audio_bytes or b"")
 
         provider_stt = getattr(stt_result, "provider_id", getattr(self._stt_provider, "provider_id", "stt"))
-        provider_llm = getattr(self._llm_provider, "provider_id", "llm")
+        provider_llm = llm_result.provider_id
         provider_tts = getattr(tts_result, "provider_id", getattr(self._tts_provider, "provider_id", "tts"))
 
         total_ms = stt_ms + llm_ms + tts_ms
@@ -100,8 +158,10 @@ class AudioPipeline:
             provider_stt=provider_stt,
             provider_llm=provider_llm,
             provider_tts=provider_tts,
-            input_seconds=input_seconds,
-            output_seconds=output_seconds,
+            input_seconds=float(input_seconds),
+            output_seconds=float(output_seconds),
+            output_bytes=output_bytes,
+            llm_cache_hit=llm_result.cache_hit,
         )
 
     def process(self, ctx: AudioRequestContext) -> Union[AudioResponseContext, PipelineError]:
@@ -133,13 +193,18 @@ class AudioPipeline:
             munay_context = metadata.get("munay_context")
 
         corr_id = ctx.get("corr_id", str(uuid.uuid4()))
+        stage_ms: Dict[str, float] = {}
 
+        started = time.perf_counter()
         try:
-            stt_result = self._stt_provider.transcribe(audio_bytes, locale)
+            with TRACER.span("pipeline.stt"):
+                stt_result = self._stt_provider.transcribe_stream(iter_audio_chunks(audio_bytes), locale)
         except TimeoutError as exc:  # pragma: no cover - defensive branch
             return self._error(code="provider_timeout", message=str(exc))
         except Exception as exc:  # pragma: no cover - defensive branch
             return self._error(code="stt_error", message=str(exc))
+        finally:
+            self._observe_stage("stt", started, api_key_id, stage_ms)
 
         llm_tier = ctx.get("llm_tier", "freemium")
 
@@ -149,21 +214,38 @@ class AudioPipeline:
             "user_external_id": ctx.get("user_external_id") or munay_user_id,
         }
 
+        started = time.perf_counter()
         try:
-            reply_text = self._llm_provider.generate_reply(stt_result.text, llm_context)
+            with TRACER.span("pipeline.llm"):
+                llm_result = self._llm_provider.generate(stt_result.text, llm_context)
         except TimeoutError as exc:  # pragma: no cover - defensive branch
             return self._error(code="provider_timeout", message=str(exc))
         except Exception as exc:  # pragma: no cover - defensive branch
             return self._error(code="llm_error", message=str(exc))
+        finally:
+            self._observe_stage("llm", started, api_key_id, stage_ms)
+
+        reply_text = llm_result.text
 
+        started = time.perf_counter()
         try:
-            tts_result = self._tts_provider.synthesize(reply_text, locale, voice=None)
+            with TRACER.span("pipeline.tts"):
+                tts_result = self._tts_provider.synthesize(
+                    reply_text, locale, voice=None, output_format=ctx.get("tts_format")
+                )
         except TimeoutError as exc:  # pragma: no cover - defensive branch
             return self._error(code="provider_timeout", message=str(exc))
         except Exception as exc:  # pragma: no cover - defensive branch
             return self._error(code="tts_error", message=str(exc))
-
-        usage = self._build_usage(stt_result, tts_result)
+        finally:
+            self._observe_stage("tts", started, api_key_id, stage_ms)
+
+        usage = self._build_usage(stt_result, llm_result, tts_result, audio_bytes)
+        if usage["output_bytes"]:
+            tts_format = ctx.get("tts_format")
+            METRICS.observe_tts_output_bytes(
+                usage["provider_tts"], tts_format.name if tts_format else "default", usage["output_bytes"]
+            )
         session_id = str(uuid.uuid4())
 
         tts_url = getattr(tts_result, "audio_url", None)
@@ -190,6 +272,8 @@ class AudioPipeline:
             "usage": {
                 "input_seconds": usage["input_seconds"],
                 "output_seconds": usage["output_seconds"],
+                "output_bytes": usage["output_bytes"],
+                "llm_cache_hit": usage["llm_cache_hit"],
                 "stt_ms": usage["stt_ms"],
                 "llm_ms": usage["llm_ms"],
                 "tts_ms": usage["tts_ms"],
@@ -204,16 +288,21 @@ class AudioPipeline:
             "client_meta": client_metadata,
         }
 
-        self._repository.create(session)
+        started = time.perf_counter()
+        with TRACER.span("pipeline.storage"):
+            self._repository.create(session)
+        self._observe_stage("storage", started, api_key_id, stage_ms)
 
         return AudioResponseContext(
             transcript=session["transcript"],
             reply_text=session["reply_text"],
             tts_url=session["tts_storage_ref"],
+            tts_mime_type=tts_result.audio_mime_type if tts_result.audio_bytes else None,
             usage=usage,
             session_id=session_id,
             corr_id=session["corr_id"],
             meta=session.get("meta_tags"),
+            stage_ms=stage_ms,
         )
 
 
@@ -0,0 +1,197 @@
+"""Admission to the `/audio` pipeline: per-tenant caps and fair share by tier.
+
+Todo `/audio` comparte el thread pool, así que sin control un tenant que sube
+50 archivos en paralelo deja esperando al resto. `FairScheduler` limita los
+requests en curso (`capacity` global y `max_in_flight` por `api_key_id`, del
+plan del principal) y, cuando hay cola, reparte los slots libres entre tiers
+por stride scheduling (WFQ): cada tier avanza su "pass" en `1 / weight` por
+slot otorgado y siempre se atiende al tier con menor pass. Un tier que estaba
+vacío entra con el tiempo virtual actual, sin acumular crédito.
+
+Corre en el event loop (sin locks): `acquire` y `release` no se llaman desde
+threads.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Deque, Dict, Optional, Tuple
+
+from .llm_tiers import TIER_FREEMIUM, TIER_PREMIUM
+from .metrics_runtime import METRICS
+
+DEFAULT_WEIGHTS = {TIER_PREMIUM: 4.0, TIER_FREEMIUM: 1.0}
+
+
+class SchedulerTimeout(Exception):
+    """No slot became available within the queue timeout."""
+
+
+class _Waiter:
+    __slots__ = ("api_key_id", "max_in_flight", "future")
+
+    def __init__(self, api_key_id: str, max_in_flight: int, future: asyncio.Future) -> None:
+        self.api_key_id = api_key_id
+        self.max_in_flight = max_in_flight
+        self.future = future
+
+
+class FairScheduler:
+    def __init__(
+        self,
+        capacity: int = 32,
+        weights: Optional[Dict[str, float]] = None,
+        queue_timeout: float = 30.0,
+    ) -> None:
+        self.capacity = max(1, capacity)
+        self.weights = dict(weights or DEFAULT_WEIGHTS)
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self._per_key: Dict[str, int] = {}
+        self._queues: Dict[str, Deque[_Waiter]] = {}
+        self._pass: Dict[str, float] = {}
+        self._virtual_time = 0.0
+        self.settings: Optional[SchedulerSettings] = None
+
+    def apply(self, settings: SchedulerSettings) -> None:
+        """Adopt reloaded settings (no-op if it's the snapshot already applied)."""
+
+        if settings is self.settings:
+            return
+        self.settings = settings
+        self.capacity = settings.capacity
+        self.weights = dict(settings.weights)
+        self.queue_timeout = settings.queue_timeout
+        self._dispatch()
+
+    def in_flight_for(self, api_key_id: str) -> int:
+        return self._per_key.get(api_key_id, 0)
+
+    def queued(self, tier: str) -> int:
+        return len(self._queues.get(tier, ()))
+
+    async def acquire(self, api_key_id: str, tier: str, max_in_flight: int = 0) -> float:
+        """Wait for a slot; returns seconds waited. Raises `SchedulerTimeout`."""
+
+        started = time.perf_counter()
+        waiter = _Waiter(api_key_id, max_in_flight, asyncio.get_running_loop().create_future())
+        queue = self._queues.setdefault(tier, deque())
+        if not queue:
+            self._pass[tier] = max(self._pass.get(tier, 0.0), self._virtual_time)
+        queue.append(waiter)
+        self._dispatch()
+        try:
+            if not waiter.future.done():
+                METRICS.set_audio_queue_depth(tier, len(queue))
+                timeout = self.queue_timeout if self.queue_timeout > 0 else None
+                await asyncio.wait_for(waiter.future, timeout)
+        except BaseException as exc:
+            if waiter.future.done() and not waiter.future.cancelled():
+                self.release(api_key_id)
+            elif waiter in queue:
+                queue.remove(waiter)
+            METRICS.set_audio_queue_depth(tier, len(queue))
+            if isinstance(exc, asyncio.TimeoutError):
+                METRICS.inc_audio_queue_timeout(tier)
+                raise SchedulerTimeout(tier) from exc
+            raise
+        waited = time.perf_counter() - started
+        METRICS.observe_queue_wait(tier, waited)
+        return waited
+
+    def release(self, api_key_id: str) -> None:
+        self.in_flight -= 1
+        remaining = self._per_key.get(api_key_id, 1) - 1
+        if remaining > 0:
+            self._per_key[api_key_id] = remaining
+        else:
+            self._per_key.pop(api_key_id, None)
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, api_key_id: str, tier: str, max_in_flight: int = 0) -> AsyncIterator[float]:
+        waited = await self.acquire(api_key_id, tier, max_in_flight)
+        try:
+            yield waited
+        finally:
+            self.release(api_key_id)
+
+    def _eligible(self, waiter: _Waiter) -> bool:
+        return waiter.max_in_flight <= 0 or self._per_key.get(waiter.api_key_id, 0) < waiter.max_in_flight
+
+    def _dispatch(self) -> None:
+        while self.in_flight < self.capacity:
+            chosen: Optional[_Waiter] = None
+            chosen_tier = ""
+            for tier, queue in self._queues.items():
+                if chosen is not None and self._pass[tier] >= self._pass[chosen_tier]:
+                    continue
+                for waiter in queue:
+                    if not waiter.future.done() and self._eligible(waiter):
+                        chosen, chosen_tier = waiter, tier
+                        break
+            if chosen is None:
+                return
+            queue = self._queues[chosen_tier]
+            queue.remove(chosen)
+            self._virtual_time = self._pass[chosen_tier]
+            self._pass[chosen_tier] += 1.0 / self.weights.get(chosen_tier, 1.0)
+            self.in_flight += 1
+            self._per_key[chosen.api_key_id] = self._per_key.get(chosen.api_key_id, 0) + 1
+            chosen.future.set_result(None)
+            METRICS.set_audio_queue_depth(chosen_tier, len(queue))
+
+
+def _parse_weights(raw: str) -> Dict[str, float]:
+    weights = dict(DEFAULT_WEIGHTS)
+    for item in raw.split(","):
+        tier, _, value = item.partition("=")
+        try:
+            weight = float(value)
+        except ValueError:
+            continue
+        if tier.strip() and weight > 0:
+            weights[tier.strip()] = weight
+    return weights
+
+
+@dataclass(frozen=True)
+class SchedulerSettings:
+    capacity: int = 32
+    weights: Tuple[Tuple[str, float], ...] = tuple(DEFAULT_WEIGHTS.items())
+    queue_timeout: float = 30.0
+
+    @classmethod
+    def from_env(cls) -> "SchedulerSettings":
+        try:
+            capacity = int(os.getenv("AUDIO_MAX_CONCURRENCY", "32"))
+        except ValueError:
+            capacity = 32
+        try:
+            queue_timeout = float(os.getenv("AUDIO_QUEUE_TIMEOUT_SECONDS", "30"))
+        except ValueError:
+            queue_timeout = 30.0
+        weights = _parse_weights(os.getenv("AUDIO_SCHEDULER_WEIGHTS", ""))
+        return cls(capacity=max(1, capacity), weights=tuple(sorted(weights.items())), queue_timeout=queue_timeout)
+
+
+def scheduler_from_settings(settings: SchedulerSettings) -> FairScheduler:
+    scheduler = FairScheduler(
+        capacity=settings.capacity, weights=dict(settings.weights), queue_timeout=settings.queue_timeout
+    )
+    scheduler.settings = settings
+    return scheduler
+
+
+__all__ = [
+    "DEFAULT_WEIGHTS",
+    "FairScheduler",
+    "SchedulerSettings",
+    "SchedulerTimeout",
+    "scheduler_from_settings",
+]
@@ -1,10 +1,12 @@
 import json
 import os
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Dict, List, Optional, TypedDict
 
 from .metrics_runtime import METRICS
+from .tracing import TRACER
 
 
 class AccessDeniedError(Exception):
@@ -14,6 +16,8 @@ class AccessDeniedError(Exception):
 class UsagePayload(TypedDict):
     input_seconds: float
     output_seconds: float
+    output_bytes: int
+    llm_cache_hit: bool
     stt_ms: int
     llm_ms: int
     tts_ms: int
@@ -65,6 +69,25 @@ def _parse_flag(name: str, default: str) -> bool:
     return os.getenv(name, default) != "0"
 
 
+@dataclass(frozen=True)
+class StorageSettings:
+    retention_days: int = 30
+    purge_enabled: bool = True
+    persist_transcript: bool = False
+    persist_reply_text: bool = False
+    storage_path: str = "/tmp/bot_neutro_audio_sessions.json"
+
+    @classmethod
+    def from_env(cls) -> "StorageSettings":
+        return cls(
+            retention_days=_parse_retention_days(),
+            purge_enabled=_parse_flag("AUDIO_SESSION_PURGE_ENABLED", "1"),
+            persist_transcript=_parse_flag("AUDIO_SESSION_PERSIST_TRANSCRIPT", "0"),
+            persist_reply_text=_parse_flag("AUDIO_SESSION_PERSIST_REPLY_TEXT", "0"),
+            storage_path=os.getenv("AUDIO_SESSION_STORAGE_PATH", "/tmp/bot_neutro_audio_sessions.json"),
+        )
+
+
 def _sanitize_client_meta(meta: Optional[Dict[str, str]]) -> Optional[Dict[str, str]]:
     if not meta:
         return None
@@ -88,6 +111,8 @@ def _build_usage_payload(session: AudioSession) -> UsagePayload:
     return UsagePayload(
         input_seconds=float(session.get("request_duration_seconds") or 0.0),
         output_seconds=0.0,
+        output_bytes=0,
+        llm_cache_hit=False,
         stt_ms=session.get("usage_stt_ms", 0),
         llm_ms=session.get("usage_llm_ms", 0),
         tts_ms=session.get("usage_tts_ms", 0),
@@ -101,21 +126,16 @@ class FileAudioSessionRepository:
         self,
         track_session_metrics: bool = False,
         storage_path: Optional[str] = None,
+        settings: Optional[StorageSettings] = None,
     ) -> None:
+        settings = settings or StorageSettings.from_env()
         self._items: List[AudioSession] = []
-        self._retention_days = _parse_retention_days()
-        self._purge_enabled = _parse_flag("AUDIO_SESSION_PURGE_ENABLED", "1")
-        self._persist_transcript = _parse_flag(
-            "AUDIO_SESSION_PERSIST_TRANSCRIPT", "0"
-        )
-        self._persist_reply_text = _parse_flag(
-            "AUDIO_SESSION_PERSIST_REPLY_TEXT", "0"
-        )
+        self._retention_days = settings.retention_days
+        self._purge_enabled = settings.purge_enabled
+        self._persist_transcript = settings.persist_transcript
+        self._persist_reply_text = settings.persist_reply_text
         self._track_session_metrics = track_session_metrics
-        self._storage_path = Path(
-            storage_path
-            or os.getenv("AUDIO_SESSION_STORAGE_PATH", "/tmp/bot_neutro_audio_sessions.json")
-        )
+        self._storage_path = Path(storage_path or settings.storage_path)
         self._load_from_disk()
         if self._purge_enabled:
             self.purge_expired(now=datetime.utcnow())
@@ -133,6 +153,10 @@ class FileAudioSessionRepository:
     def create(self, session: AudioSession) -> AudioSession:
         """Inserta la sesión; si ya existe `id`, puede sobrescribir o ignorar."""
 
+        with TRACER.span("repository.create"):
+            return self._create(session)
+
+    def _create(self, session: AudioSession) -> AudioSession:
         now = datetime.utcnow()
         created_at = session.get("created_at", now)
         retention_delta = timedelta(days=self._retention_days)
@@ -205,6 +229,16 @@ class FileAudioSessionRepository:
     ) -> List[AudioSession]:
         """Filtra por `api_key_id`, ordena por `created_at DESC`, aplica offset/limit."""
 
+        with TRACER.span("repository.list_by_api_key"):
+            return self._list_by_api_key(api_key_id, limit, offset, api_key_id_autenticada)
+
+    def _list_by_api_key(
+        self,
+        api_key_id: str,
+        limit: int,
+        offset: int,
+        api_key_id_autenticada: Optional[str],
+    ) -> List[AudioSession]:
         if api_key_id_autenticada is None:
             raise AccessDeniedError("api_key_id_autenticada is required")
         if api_key_id != api_key_id_autenticada:
@@ -278,6 +312,10 @@ class FileAudioSessionRepository:
         return payload
 
     def _persist(self) -> None:
+        with TRACER.span("repository.persist", sessions=len(self._items)):
+            self._persist_to_disk()
+
+    def _persist_to_disk(self) -> None:
         try:
             if len(self._items) == 0:
                 return
@@ -295,12 +333,15 @@ class FileAudioSessionRepository:
 
 
 class InMemoryAudioSessionRepository(FileAudioSessionRepository):
-    def __init__(self, track_session_metrics: bool = False) -> None:
+    def __init__(
+        self, track_session_metrics: bool = False, settings: Optional[StorageSettings] = None
+    ) -> None:
+        settings = settings or StorageSettings.from_env()
         self._items = []
-        self._retention_days = _parse_retention_days()
-        self._purge_enabled = _parse_flag("AUDIO_SESSION_PURGE_ENABLED", "1")
-        self._persist_transcript = _parse_flag("AUDIO_SESSION_PERSIST_TRANSCRIPT", "0")
-        self._persist_reply_text = _parse_flag("AUDIO_SESSION_PERSIST_REPLY_TEXT", "0")
+        self._retention_days = settings.retention_days
+        self._purge_enabled = settings.purge_enabled
+        self._persist_transcript = settings.persist_transcript
+        self._persist_reply_text = settings.persist_reply_text
         self._track_session_metrics = track_session_metrics
         self._storage_path: Optional[Path] = None
         if self._track_session_metrics:
@@ -323,11 +364,15 @@ class InMemoryAudioSessionRepository(FileAudioSessionRepository):
 _DEFAULT_AUDIO_SESSION_REPOSITORY: Optional[FileAudioSessionRepository] = None
 
 
-def get_default_audio_session_repository() -> FileAudioSessionRepository:
+def get_default_audio_session_repository(
+    settings: Optional[StorageSettings] = None,
+) -> FileAudioSessionRepository:
+    """Process-wide repository; `settings` solo se usa al crearlo la primera vez."""
+
     global _DEFAULT_AUDIO_SESSION_REPOSITORY
     if _DEFAULT_AUDIO_SESSION_REPOSITORY is None:
         _DEFAULT_AUDIO_SESSION_REPOSITORY = FileAudioSessionRepository(
-            track_session_metrics=True
+            track_session_metrics=True, settings=settings
         )
     return _DEFAULT_AUDIO_SESSION_REPOSITORY
 
@@ -336,5 +381,6 @@ __all__ = [
     "AccessDeniedError",
     "FileAudioSessionRepository",
     "InMemoryAudioSessionRepository",
+    "StorageSettings",
     "get_default_audio_session_repository",
 ]
@@ -0,0 +1,204 @@
+"""API key → principal resolution, computed once per request.
+
+`AuthMiddleware` resuelve `X-API-Key` en un `Principal` (api_key_id, tier,
+límites del plan) y lo deja en `request.state.principal`; rate limit, el
+endpoint `/audio` y `llm_tiers` lo reutilizan en vez de volver a hashear la
+key. Los principals se cachean en un LRU acotado y se invalidan cuando cambia
+el set de ids premium (al recargar `Settings` o, con
+`MUNAY_LLM_PREMIUM_API_KEY_IDS_FILE`, cuando cambia el mtime del archivo).
+"""
+
+from __future__ import annotations
+
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import Callable, Dict, FrozenSet, Optional, Tuple
+
+from .llm_tiers import TIER_FREEMIUM, TIER_PREMIUM
+from .security_ids import derive_api_key_id
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+@dataclass(frozen=True)
+class PlanLimits:
+    """Per-tier limits (0 = sin límite), from `PLAN_<TIER>_*` env vars."""
+
+    max_in_flight: int = 0
+    monthly_requests: int = 0
+    # Segundos de audio de entrada + salida por mes (UTC).
+    monthly_audio_seconds: float = 0.0
+    max_audio_bytes: int = 0
+
+    @classmethod
+    def from_env(cls, tier: str) -> "PlanLimits":
+        prefix = f"PLAN_{tier.upper()}_"
+        return cls(
+            max_in_flight=max(0, _env_int(prefix + "MAX_IN_FLIGHT", 0)),
+            monthly_requests=max(0, _env_int(prefix + "MONTHLY_REQUESTS", 0)),
+            monthly_audio_seconds=max(0.0, _env_float(prefix + "MONTHLY_AUDIO_SECONDS", 0.0)),
+            max_audio_bytes=max(0, _env_int(prefix + "MAX_AUDIO_BYTES", 0)),
+        )
+
+
+@dataclass(frozen=True)
+class Principal:
+    api_key_id: str
+    tier: str
+    limits: PlanLimits
+
+
+def _parse_ids(raw: str) -> FrozenSet[str]:
+    return frozenset(item.strip() for item in raw.replace("\n", ",").split(",") if item.strip())
+
+
+def _default_plans() -> Dict[str, PlanLimits]:
+    return {TIER_FREEMIUM: PlanLimits(), TIER_PREMIUM: PlanLimits()}
+
+
+@dataclass(frozen=True)
+class AuthSettings:
+    premium_api_key_ids: FrozenSet[str] = frozenset()
+    # Si está definido reemplaza a `premium_api_key_ids` y se recarga por mtime.
+    premium_ids_file: str = ""
+    premium_ids_check_seconds: float = 5.0
+    principal_cache_size: int = 10_000
+    plans: Dict[str, PlanLimits] = field(default_factory=_default_plans)
+
+    @classmethod
+    def from_env(cls) -> "AuthSettings":
+        return cls(
+            premium_api_key_ids=_parse_ids(os.getenv("MUNAY_LLM_PREMIUM_API_KEY_IDS", "")),
+            premium_ids_file=os.getenv("MUNAY_LLM_PREMIUM_API_KEY_IDS_FILE", ""),
+            premium_ids_check_seconds=_env_float("AUTH_PREMIUM_IDS_CHECK_SECONDS", 5.0),
+            principal_cache_size=max(1, _env_int("AUTH_PRINCIPAL_CACHE_SIZE", 10_000)),
+            plans={tier: PlanLimits.from_env(tier) for tier in (TIER_FREEMIUM, TIER_PREMIUM)},
+        )
+
+
+class PremiumKeyIds:
+    """Premium api_key_id set; with a file source it is re-read only on change.
+
+    El `stat` del archivo se hace como máximo cada `check_interval` segundos.
+    """
+
+    def __init__(
+        self, settings: Optional[AuthSettings] = None, clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        self._clock = clock
+        self._lock = Lock()
+        self.generation = 0
+        self.configure(settings or AuthSettings())
+
+    def configure(self, settings: AuthSettings) -> None:
+        with self._lock:
+            self.path = settings.premium_ids_file
+            self.check_interval = settings.premium_ids_check_seconds
+            self._source: Optional[Tuple[object, ...]] = None
+            self._ids: FrozenSet[str] = settings.premium_api_key_ids
+            self._next_check = 0.0
+            self.generation += 1
+
+    def current(self) -> Tuple[int, FrozenSet[str]]:
+        if not self.path:
+            return self.generation, self._ids
+        now = self._clock()
+        if now < self._next_check and self._source is not None:
+            return self.generation, self._ids
+        self._next_check = now + self.check_interval
+        try:
+            stat = os.stat(self.path)
+            source: Tuple[object, ...] = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            source = (None, None)
+
+        if source == self._source:
+            return self.generation, self._ids
+        with self._lock:
+            if source != self._source:
+                self._ids = self._load(self.path) if source[0] is not None else frozenset()
+                self._source = source
+                self.generation += 1
+            return self.generation, self._ids
+
+    @staticmethod
+    def _load(path: str) -> FrozenSet[str]:
+        try:
+            with open(path, encoding="utf-8") as handle:
+                return _parse_ids(handle.read())
+        except OSError:
+            return frozenset()
+
+
+class Authenticator:
+    """Bounded LRU of raw API key → `Principal`."""
+
+    def __init__(self, settings: Optional[AuthSettings] = None, premium_ids: Optional[PremiumKeyIds] = None) -> None:
+        settings = settings or AuthSettings()
+        self.premium_ids = premium_ids or PremiumKeyIds(settings)
+        self._lock = Lock()
+        self._cache: "OrderedDict[str, Tuple[int, Principal]]" = OrderedDict()
+        self.max_entries = settings.principal_cache_size
+        self.plans = dict(settings.plans)
+
+    def configure(self, settings: AuthSettings) -> None:
+        self.premium_ids.configure(settings)
+        with self._lock:
+            self.max_entries = max(1, settings.principal_cache_size)
+            self.plans = dict(settings.plans)
+            self._cache.clear()
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def resolve(self, api_key: str) -> Principal:
+        generation, premium_ids = self.premium_ids.current()
+        with self._lock:
+            cached = self._cache.get(api_key)
+            if cached is not None and cached[0] == generation:
+                self._cache.move_to_end(api_key)
+                return cached[1]
+
+        api_key_id = derive_api_key_id(api_key)
+        tier = TIER_PREMIUM if api_key and api_key_id in premium_ids else TIER_FREEMIUM
+        principal = Principal(api_key_id=api_key_id, tier=tier, limits=self.plans.get(tier, PlanLimits()))
+        with self._lock:
+            self._cache[api_key] = (generation, principal)
+            self._cache.move_to_end(api_key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return principal
+
+
+AUTHENTICATOR = Authenticator()
+
+
+def configure_auth(settings: Optional[AuthSettings] = None) -> Authenticator:
+    AUTHENTICATOR.configure(settings or AuthSettings.from_env())
+    return AUTHENTICATOR
+
+
+__all__ = [
+    "AUTHENTICATOR",
+    "AuthSettings",
+    "Authenticator",
+    "PlanLimits",
+    "PremiumKeyIds",
+    "Principal",
+    "configure_auth",
+]
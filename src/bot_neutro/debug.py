@@ -0,0 +1,230 @@
+"""Admin-only diagnostics for live workers (`/debug/*`).
+
+Deshabilitado por defecto: las rutas solo se registran con
+`DEBUG_ENDPOINTS_ENABLED=1` y un `DEBUG_ADMIN_TOKEN` no vacío; cada request
+debe enviar el token en `X-Admin-Token`. `RateLimitMiddleware` excluye
+`/debug/*`.
+
+Token y límites se leen de `Settings.debug` del snapshot actual, así que un
+reload rota el token o apaga las rutas (404); encenderlas requiere reiniciar
+porque se registran al crear la app.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import gc
+import hmac
+import logging
+import os
+import resource
+import threading
+import time
+from dataclasses import dataclass
+from typing import List, Optional
+
+import anyio.to_thread
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+
+from .middleware.outcome import with_outcome as _with_outcome
+from .profiling import SamplingProfiler
+from .slow_requests import SLOW_REQUESTS
+
+logger = logging.getLogger("bot_neutro")
+
+ADMIN_TOKEN_HEADER = "X-Admin-Token"
+PROFILE_DEFAULT_SECONDS = 10.0
+PROFILE_MIN_INTERVAL_MS = 1.0
+
+
+def _profile_max_seconds() -> float:
+    try:
+        return max(1.0, float(os.getenv("DEBUG_PROFILE_MAX_SECONDS", "60")))
+    except ValueError:
+        return 60.0
+
+
+@dataclass(frozen=True)
+class DebugSettings:
+    enabled: bool = False
+    admin_token: str = ""
+    profile_max_seconds: float = 60.0
+
+    @classmethod
+    def from_env(cls) -> "DebugSettings":
+        return cls(
+            enabled=os.getenv("DEBUG_ENDPOINTS_ENABLED", "0") == "1",
+            admin_token=os.getenv("DEBUG_ADMIN_TOKEN", ""),
+            profile_max_seconds=_profile_max_seconds(),
+        )
+
+    @property
+    def routes_enabled(self) -> bool:
+        return self.enabled and bool(self.admin_token)
+
+
+def _current(request: Request) -> DebugSettings:
+    return request.app.state.settings.current.debug
+
+
+def _error(status_code: int, detail: str) -> JSONResponse:
+    return _with_outcome(JSONResponse({"detail": detail}, status_code=status_code), "error", detail)
+
+
+def _authorize(request: Request, admin_token: str) -> Optional[JSONResponse]:
+    supplied = request.headers.get(ADMIN_TOKEN_HEADER, "")
+    if not admin_token or not hmac.compare_digest(supplied.encode("utf-8"), admin_token.encode("utf-8")):
+        return _error(401, "auth.unauthorized")
+    return None
+
+
+def require_admin(request: Request) -> Optional[JSONResponse]:
+    """401 unless `X-Admin-Token` matches `DEBUG_ADMIN_TOKEN` (sin token configurado nadie pasa).
+
+    Para rutas de diagnóstico fuera de `/debug/*` que exponen datos por tenant.
+    """
+
+    return _authorize(request, _current(request).admin_token)
+
+
+def _authorize_debug(request: Request) -> Optional[JSONResponse]:
+    settings = _current(request)
+    if not settings.routes_enabled:
+        # Apagado por reload: igual que si la ruta no existiera.
+        return JSONResponse({"detail": "Not Found"}, status_code=404)
+    return _authorize(request, settings.admin_token)
+
+
+async def _loop_lag_ms(probes: int = 5) -> List[float]:
+    """Delay between yielding to the loop and being scheduled again."""
+
+    lags = []
+    for _ in range(probes):
+        started = time.perf_counter()
+        await asyncio.sleep(0)
+        lags.append(round((time.perf_counter() - started) * 1000, 3))
+    return lags
+
+
+def register_debug_routes(app: FastAPI, settings: DebugSettings) -> bool:
+    """Register `/debug/*` if enabled; returns whether routes were added."""
+
+    if not settings.enabled:
+        return False
+    if not settings.admin_token:
+        logger.warning(
+            "debug_endpoints_disabled",
+            extra={"event": "debug_endpoints_disabled", "reason": "DEBUG_ADMIN_TOKEN not set"},
+        )
+        return False
+
+    profile_lock = asyncio.Lock()
+
+    @app.post("/debug/profile")
+    async def debug_profile(
+        request: Request,
+        seconds: float = PROFILE_DEFAULT_SECONDS,
+        format: str = "collapsed",
+        interval_ms: float = 5.0,
+    ):
+        """Sampling profile of every thread for `seconds` (collapsed o pstats)."""
+
+        denied = _authorize_debug(request)
+        if denied is not None:
+            return denied
+        if format not in {"collapsed", "pstats"}:
+            return _error(400, "debug.invalid_format")
+        if not 0 < seconds <= _current(request).profile_max_seconds:
+            return _error(400, "debug.invalid_seconds")
+        if profile_lock.locked():
+            return _error(409, "debug.profile_in_progress")
+
+        async with profile_lock:
+            profiler = SamplingProfiler(interval=max(interval_ms, PROFILE_MIN_INTERVAL_MS) / 1000)
+            profiler.start()
+            try:
+                await asyncio.sleep(seconds)
+            finally:
+                profiler.stop()
+
+        headers = {
+            "X-Profile-Samples": str(profiler.samples),
+            "X-Profile-Duration-Seconds": f"{profiler.duration:.3f}",
+        }
+        if format == "pstats":
+            response: Response = Response(
+                profiler.pstats_dump(),
+                media_type="application/octet-stream",
+                headers={**headers, "Content-Disposition": 'attachment; filename="profile.pstats"'},
+            )
+        else:
+            response = Response(profiler.collapsed(), media_type="text/plain", headers=headers)
+        return _with_outcome(response)
+
+    @app.get("/debug/runtime")
+    async def debug_runtime(request: Request):
+        """asyncio tasks, saturación del thread pool de anyio y lag del loop."""
+
+        denied = _authorize_debug(request)
+        if denied is not None:
+            return denied
+
+        limiter = anyio.to_thread.current_default_thread_limiter()
+        limiter_stats = limiter.statistics()
+        lags = await _loop_lag_ms()
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        payload = {
+            "pid": os.getpid(),
+            "asyncio": {
+                "tasks": len(asyncio.all_tasks()),
+                "loop_lag_ms": {"max": max(lags), "samples": lags},
+            },
+            "thread_pool": {
+                "total_tokens": limiter.total_tokens,
+                "borrowed_tokens": limiter.borrowed_tokens,
+                "tasks_waiting": limiter_stats.tasks_waiting,
+                "saturation": round(limiter.borrowed_tokens / limiter.total_tokens, 3)
+                if limiter.total_tokens
+                else None,
+            },
+            "threads": {
+                "active": threading.active_count(),
+                "names": sorted(thread.name for thread in threading.enumerate()),
+            },
+            "process": {
+                "max_rss_kb": usage.ru_maxrss,
+                "cpu_user_seconds": round(usage.ru_utime, 3),
+                "cpu_system_seconds": round(usage.ru_stime, 3),
+                "gc_counts": list(gc.get_count()),
+            },
+        }
+        return _with_outcome(JSONResponse(payload))
+
+    @app.get("/debug/slow-requests")
+    async def debug_slow_requests(request: Request, limit: int = 50):
+        """Últimos requests lentos (más reciente primero), con etapas y proveedores."""
+
+        denied = _authorize_debug(request)
+        if denied is not None:
+            return denied
+        payload = {
+            "threshold_ms": SLOW_REQUESTS.threshold_ms,
+            "capacity": SLOW_REQUESTS.capacity,
+            "requests": SLOW_REQUESTS.entries(max(0, limit)),
+        }
+        return _with_outcome(JSONResponse(payload))
+
+    @app.post("/debug/settings/reload")
+    async def debug_settings_reload(request: Request):
+        """Re-apply `SETTINGS_FILE` and build a new `Settings` snapshot (igual que `SIGHUP`)."""
+
+        denied = _authorize_debug(request)
+        if denied is not None:
+            return denied
+        return _with_outcome(JSONResponse(request.app.state.settings.reload()))
+
+    return True
+
+
+__all__ = ["ADMIN_TOKEN_HEADER", "DebugSettings", "register_debug_routes", "require_admin"]
@@ -0,0 +1,403 @@
+"""Mergeable latency quantile sketches per route, stage and tenant.
+
+`DDSketch` garantiza error relativo acotado (`relative_accuracy`) con memoria
+acotada (`max_bins`). `LatencySketches` mantiene un sketch agregado por
+`(route, stage)` y uno por tenant (`api_key_id`) limitado a los top-K tenants
+por volumen; el resto se acumula en `__other__`. Las ventanas rotan cada
+`window_seconds` y las consultas combinan la ventana actual y la anterior.
+"""
+
+from __future__ import annotations
+
+import heapq
+import json
+import math
+import os
+import time
+from pathlib import Path
+from threading import Event, Lock, Thread
+from typing import Dict, Iterable, List, Optional, Tuple
+
+OTHER_TENANT = "__other__"
+DEFAULT_QUANTILES: Tuple[float, ...] = (0.5, 0.95, 0.99)
+_MIN_INDEXABLE = 1e-6
+
+
+class DDSketch:
+    def __init__(self, relative_accuracy: float = 0.01, max_bins: int = 2048) -> None:
+        self.relative_accuracy = relative_accuracy
+        self.max_bins = max_bins
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self._bins: Dict[int, int] = {}
+        # Min-heap de los índices presentes en `_bins`: el colapso no ordena todo.
+        self._indexes: List[int] = []
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float) -> None:
+        if value <= _MIN_INDEXABLE:
+            self.zero_count += 1
+        else:
+            index = math.ceil(math.log(value) / self._log_gamma)
+            self._add_to_bin(index, 1)
+            if len(self._bins) > self.max_bins:
+                self._collapse_lowest()
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def _add_to_bin(self, index: int, count: int) -> None:
+        if index in self._bins:
+            self._bins[index] += count
+        else:
+            self._bins[index] = count
+            heapq.heappush(self._indexes, index)
+
+    def _collapse_lowest(self) -> None:
+        lowest = heapq.heappop(self._indexes)
+        self._bins[self._indexes[0]] += self._bins.pop(lowest)
+
+    def merge(self, other: "DDSketch") -> None:
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("cannot merge sketches with different relative accuracy")
+        for index, value in other._bins.items():
+            self._add_to_bin(index, value)
+        while len(self._bins) > self.max_bins:
+            self._collapse_lowest()
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for index in sorted(self._bins):
+            seen += self._bins[index]
+            if seen > rank:
+                value = 2 * self._gamma**index / (self._gamma + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "bins": {str(index): value for index, value in self._bins.items()},
+            "zero_count": self.zero_count,
+            "count": self.count,
+            "sum": self.sum,
+            "min": self.min if self.count else None,
+            "max": self.max if self.count else None,
+        }
+
+    @classmethod
+    def from_dict(cls, payload: Dict[str, object], max_bins: int = 2048) -> "DDSketch":
+        sketch = cls(float(payload["relative_accuracy"]), max_bins=max_bins)
+        sketch._bins = {int(index): int(value) for index, value in dict(payload["bins"]).items()}
+        sketch._indexes = sorted(sketch._bins)
+        sketch.zero_count = int(payload["zero_count"])
+        sketch.count = int(payload["count"])
+        sketch.sum = float(payload["sum"])
+        if sketch.count:
+            sketch.min = float(payload["min"])
+            sketch.max = float(payload["max"])
+        return sketch
+
+
+SketchKey = Tuple[str, str, str]
+Sample = Tuple[str, str, Tuple[Tuple[str, str], ...], float]
+
+_SKETCH_PREFIX = "sketch_"
+
+
+class LatencySketches:
+    """Registry of windowed sketches keyed by `(route, stage, api_key_id)`.
+
+    `api_key_id == ""` es el agregado de la ruta/etapa.
+    """
+
+    def __init__(
+        self,
+        top_k_tenants: int = 100,
+        window_seconds: float = 300.0,
+        relative_accuracy: float = 0.01,
+        max_bins: int = 2048,
+    ) -> None:
+        self.top_k_tenants = top_k_tenants
+        self.window_seconds = window_seconds
+        self.relative_accuracy = relative_accuracy
+        self.max_bins = max_bins
+        self._lock = Lock()
+        self._current: Dict[SketchKey, DDSketch] = {}
+        self._previous: Dict[SketchKey, DDSketch] = {}
+        self._window_started = time.monotonic()
+        # Heavy hitters: conteo de tenants trackeados y candidatos (Space-Saving).
+        self._tracked: Dict[str, int] = {}
+        self._candidates: Dict[str, int] = {}
+        self._tracked_floor = 0
+        self._dump_thread: Optional[Thread] = None
+        self._dump_stop: Optional[Event] = None
+        self._dump_path: Optional[Path] = None
+
+    def configure(self, top_k_tenants: int, window_seconds: float) -> None:
+        with self._lock:
+            self.top_k_tenants = top_k_tenants
+            self.window_seconds = window_seconds
+
+    def _new_sketch(self) -> DDSketch:
+        return DDSketch(self.relative_accuracy, self.max_bins)
+
+    def _rotate_if_needed(self, now: float) -> None:
+        elapsed = now - self._window_started
+        if elapsed < self.window_seconds:
+            return
+        self._previous = self._current if elapsed < 2 * self.window_seconds else {}
+        self._current = {}
+        self._window_started = now
+
+    def _evict_tenant(self, tenant: str) -> None:
+        self._tracked.pop(tenant, None)
+        for generation in (self._current, self._previous):
+            for key in [key for key in generation if key[2] == tenant]:
+                sketch = generation.pop(key)
+                other_key = (key[0], key[1], OTHER_TENANT)
+                generation.setdefault(other_key, self._new_sketch()).merge(sketch)
+
+    def _tenant_bucket(self, api_key_id: str) -> str:
+        if api_key_id in self._tracked:
+            self._tracked[api_key_id] += 1
+            return api_key_id
+        if len(self._tracked) < self.top_k_tenants:
+            self._tracked[api_key_id] = 1
+            return api_key_id
+        if self.top_k_tenants <= 0:
+            return OTHER_TENANT
+
+        if api_key_id not in self._candidates and len(self._candidates) >= self.top_k_tenants:
+            weakest = min(self._candidates, key=self._candidates.__getitem__)
+            floor = self._candidates.pop(weakest)
+            self._candidates[api_key_id] = floor
+        count = self._candidates.get(api_key_id, 0) + 1
+        self._candidates[api_key_id] = count
+
+        if count > self._tracked_floor:
+            weakest_tracked = min(self._tracked, key=self._tracked.__getitem__)
+            self._tracked_floor = self._tracked[weakest_tracked]
+            if count > self._tracked_floor:
+                self._evict_tenant(weakest_tracked)
+                self._candidates.pop(api_key_id, None)
+                self._candidates[weakest_tracked] = self._tracked_floor
+                self._tracked[api_key_id] = count
+                return api_key_id
+        return OTHER_TENANT
+
+    def observe(self, route: str, stage: str, seconds: float, api_key_id: Optional[str] = None) -> None:
+        if math.isnan(seconds) or seconds < 0:
+            return
+        with self._lock:
+            self._rotate_if_needed(time.monotonic())
+            keys = [(route, stage, "")]
+            if api_key_id:
+                keys.append((route, stage, self._tenant_bucket(api_key_id)))
+            for key in keys:
+                sketch = self._current.get(key)
+                if sketch is None:
+                    sketch = self._new_sketch()
+                    self._current[key] = sketch
+                sketch.add(seconds)
+
+    def merged(self) -> Dict[SketchKey, DDSketch]:
+        """Current + previous window, merged into fresh sketches."""
+
+        with self._lock:
+            self._rotate_if_needed(time.monotonic())
+            result: Dict[SketchKey, DDSketch] = {}
+            for generation in (self._previous, self._current):
+                for key, sketch in generation.items():
+                    result.setdefault(key, self._new_sketch()).merge(sketch)
+            return result
+
+    def reset(self) -> None:
+        with self._lock:
+            self._current = {}
+            self._previous = {}
+            self._tracked = {}
+            self._candidates = {}
+            self._tracked_floor = 0
+            self._window_started = time.monotonic()
+
+    def dump(self, path: Path) -> None:
+        """Persist the merged window so another worker can merge it on read."""
+
+        payload = [
+            {"key": list(key), "sketch": sketch.to_dict()} for key, sketch in self.merged().items()
+        ]
+        tmp_path = Path(path).with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(payload), encoding="utf-8")
+        tmp_path.replace(path)
+
+    def enable_multiprocess(self, directory: str, interval_seconds: float = 5.0) -> None:
+        """Dump this worker's sketches to `<directory>/sketch_<pid>.json` periodically."""
+
+        if self._dump_thread is not None:
+            return
+        path = Path(directory) / f"{_SKETCH_PREFIX}{os.getpid()}.json"
+        Path(directory).mkdir(parents=True, exist_ok=True)
+        stop = Event()
+
+        def _loop() -> None:
+            while not stop.wait(interval_seconds):
+                try:
+                    self.dump(path)
+                except OSError:
+                    continue
+
+        self._dump_stop = stop
+        self._dump_path = path
+        self._dump_thread = Thread(target=_loop, name="latency-sketch-dump", daemon=True)
+        self._dump_thread.start()
+
+    def disable_multiprocess(self, timeout: float = 1.0) -> None:
+        """Stop the dump thread and remove this worker's file (no-op si no estaba activo)."""
+
+        if self._dump_thread is None:
+            return
+        self._dump_stop.set()
+        self._dump_thread.join(timeout)
+        # Un worker que terminó limpio no deja datos para que otros los mezclen.
+        self._dump_path.unlink(missing_ok=True)
+        self._dump_thread = self._dump_stop = self._dump_path = None
+
+
+def load_sketches(path: Path, max_bins: int = 2048) -> Dict[SketchKey, DDSketch]:
+    try:
+        payload = json.loads(Path(path).read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError):
+        return {}
+    result: Dict[SketchKey, DDSketch] = {}
+    for item in payload if isinstance(payload, list) else []:
+        route, stage, tenant = item["key"]
+        result[(route, stage, tenant)] = DDSketch.from_dict(item["sketch"], max_bins=max_bins)
+    return result
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def load_multiprocess(directory: str, local: "LatencySketches") -> Dict[SketchKey, DDSketch]:
+    """Merge the live sketches of this worker with the dumps of the others."""
+
+    maps = [local.merged()]
+    for path in sorted(Path(directory).glob(f"{_SKETCH_PREFIX}*.json")):
+        try:
+            pid = int(path.stem[len(_SKETCH_PREFIX) :])
+        except ValueError:
+            continue
+        if pid == os.getpid():
+            continue
+        if not _pid_alive(pid):
+            path.unlink(missing_ok=True)
+            continue
+        maps.append(load_sketches(path, max_bins=local.max_bins))
+    return merge_sketch_maps(maps)
+
+
+def merge_sketch_maps(maps: Iterable[Dict[SketchKey, DDSketch]]) -> Dict[SketchKey, DDSketch]:
+    result: Dict[SketchKey, DDSketch] = {}
+    for sketch_map in maps:
+        for key, sketch in sketch_map.items():
+            if key in result:
+                result[key].merge(sketch)
+            else:
+                result[key] = sketch
+    return result
+
+
+def summarize(
+    sketches: Dict[SketchKey, DDSketch],
+    quantiles: Iterable[float] = DEFAULT_QUANTILES,
+    route: Optional[str] = None,
+    stage: Optional[str] = None,
+    api_key_id: Optional[str] = None,
+) -> Dict[str, List[Dict[str, object]]]:
+    """JSON-friendly view: aggregates per route/stage plus per-tenant rows."""
+
+    quantiles = tuple(quantiles)
+    routes: List[Dict[str, object]] = []
+    tenants: List[Dict[str, object]] = []
+    for (key_route, key_stage, tenant), sketch in sorted(sketches.items()):
+        if route and key_route != route:
+            continue
+        if stage and key_stage != stage:
+            continue
+        if api_key_id and tenant != api_key_id:
+            continue
+        row: Dict[str, object] = {
+            "route": key_route,
+            "stage": key_stage,
+            "count": sketch.count,
+            "sum_ms": round(sketch.sum * 1000, 3),
+            "max_ms": round(sketch.max * 1000, 3) if sketch.count else None,
+        }
+        for q in quantiles:
+            value = sketch.quantile(q)
+            row[f"p{q * 100:g}_ms"] = round(value * 1000, 3) if value is not None else None
+        if tenant:
+            row["api_key_id"] = tenant
+            tenants.append(row)
+        else:
+            routes.append(row)
+    return {"routes": routes, "tenants": tenants}
+
+
+def summary_samples(
+    sketches: Dict[SketchKey, DDSketch], quantiles: Iterable[float] = DEFAULT_QUANTILES
+) -> List[Sample]:
+    """Prometheus summary samples (`sensei_stage_latency_seconds`, `sensei_tenant_latency_seconds`)."""
+
+    samples: List[Sample] = []
+    for (route, stage, tenant), sketch in sorted(sketches.items()):
+        family = "sensei_tenant_latency_seconds" if tenant else "sensei_stage_latency_seconds"
+        labels: Tuple[Tuple[str, str], ...] = (("route", route), ("stage", stage))
+        if tenant:
+            labels = labels + (("api_key_id", tenant),)
+        for q in quantiles:
+            value = sketch.quantile(q)
+            if value is not None:
+                samples.append((family, family, labels + (("quantile", str(q)),), value))
+        samples.append((family, f"{family}_count", labels, sketch.count))
+        samples.append((family, f"{family}_sum", labels, sketch.sum))
+    return samples
+
+
+LATENCY_SKETCHES = LatencySketches()
+
+
+__all__ = [
+    "DDSketch",
+    "LATENCY_SKETCHES",
+    "LatencySketches",
+    "OTHER_TENANT",
+    "load_multiprocess",
+    "load_sketches",
+    "merge_sketch_maps",
+    "summarize",
+    "summary_samples",
+]
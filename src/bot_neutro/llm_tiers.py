@@ -1,9 +1,6 @@
 from __future__ import annotations
 
-import os
-from typing import Optional, Set
-
-from .security_ids import derive_api_key_id
+from typing import Optional
 
 TIER_FREEMIUM = "freemium"
 TIER_PREMIUM = "premium"
@@ -15,11 +12,6 @@ class TierInvalidError(ValueError):
     """Raised when a requested LLM tier is invalid."""
 
 
-def _load_premium_api_key_ids() -> Set[str]:
-    raw = os.getenv("MUNAY_LLM_PREMIUM_API_KEY_IDS", "")
-    return {item.strip() for item in raw.split(",") if item.strip()}
-
-
 def normalize_requested_tier(value: str | None) -> Optional[str]:
     if value is None:
         return None
@@ -30,12 +22,13 @@ def normalize_requested_tier(value: str | None) -> Optional[str]:
 
 
 def resolve_authorized_tier(api_key: str) -> str:
+    """Tier of a raw key; en requests HTTP usar `request.state.principal.tier`."""
+
     if not api_key:
         return TIER_FREEMIUM
-    premium_ids = _load_premium_api_key_ids()
-    if derive_api_key_id(api_key) in premium_ids:
-        return TIER_PREMIUM
-    return TIER_FREEMIUM
+    from .auth import AUTHENTICATOR
+
+    return AUTHENTICATOR.resolve(api_key).tier
 
 
 def is_forbidden(requested: Optional[str], authorized: str) -> bool:
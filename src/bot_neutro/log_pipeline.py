@@ -0,0 +1,206 @@
+"""Non-blocking structured logging for the `bot_neutro` logger.
+
+Los handlers del hot path solo encolan el record (`put_nowait`); un
+`QueueListener` en un thread de fondo lo serializa a JSON y lo escribe a
+stderr. Si la cola está llena el record se descarta y se cuenta en
+`log_records_dropped_total{reason="backpressure"}`, de modo que el I/O de logs
+nunca agrega latencia de cola a `/audio`. `EventSampler` aplica muestreo y
+topes por segundo por evento (`record.event`).
+"""
+
+from __future__ import annotations
+
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from threading import Lock
+from typing import Dict, Optional, Tuple
+
+from .metrics_runtime import METRICS
+
+LOGGER_NAME = "bot_neutro"
+
+# Atributos estándar de LogRecord; todo lo demás viene de `extra=`.
+_RESERVED_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+def _parse_event_map(raw: str, cast) -> Dict[str, float]:
+    parsed: Dict[str, float] = {}
+    for item in raw.split(","):
+        name, _, value = item.partition("=")
+        if not name.strip() or not value.strip():
+            continue
+        try:
+            parsed[name.strip()] = cast(value.strip())
+        except ValueError:
+            continue
+    return parsed
+
+
+def _event_name(record: logging.LogRecord) -> str:
+    event = getattr(record, "event", None)
+    if event:
+        return str(event)
+    return record.msg if isinstance(record.msg, str) else ""
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line with `extra=` fields at the top level."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload: Dict[str, object] = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS and not key.startswith("_"):
+                payload[key] = value
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class EventSampler(logging.Filter):
+    """Per-event sampling rate and per-second cap.
+
+    `sample_rates={"http_request": 0.1}` deja pasar ~10% de esos eventos;
+    `rate_caps={"http_request": 50}` nunca deja pasar más de 50 por segundo.
+    Los records WARNING o superiores no se muestrean.
+    """
+
+    def __init__(
+        self,
+        sample_rates: Optional[Dict[str, float]] = None,
+        rate_caps: Optional[Dict[str, float]] = None,
+    ) -> None:
+        super().__init__()
+        self._sample_rates = dict(sample_rates or {})
+        self._rate_caps = dict(rate_caps or {})
+        self._windows: Dict[str, list] = {}
+        self._lock = Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        event = _event_name(record)
+        rate = self._sample_rates.get(event)
+        if rate is not None and rate < 1.0 and random.random() >= rate:
+            METRICS.inc_log_records_dropped("sampled")
+            return False
+
+        cap = self._rate_caps.get(event)
+        if cap is None:
+            return True
+        now_second = int(time.monotonic())
+        with self._lock:
+            window = self._windows.get(event)
+            if window is None or window[0] != now_second:
+                window = [now_second, 0]
+                self._windows[event] = window
+            if window[1] >= cap:
+                METRICS.inc_log_records_dropped("rate_capped")
+                return False
+            window[1] += 1
+        return True
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that never blocks: drops the record when the queue is full."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # El formateo JSON (y del traceback) ocurre en el thread del listener.
+        prepared = copy.copy(record)
+        prepared.msg = record.getMessage()
+        prepared.args = None
+        return prepared
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            METRICS.inc_log_records_dropped("backpressure")
+
+
+@dataclass(frozen=True)
+class LoggingSettings:
+    queue_max_records: int = 10000
+    # Pares (event, valor); ver `EventSampler`.
+    sample_rates: Tuple[Tuple[str, float], ...] = ()
+    rate_caps: Tuple[Tuple[str, float], ...] = ()
+    level: str = "INFO"
+
+    @classmethod
+    def from_env(cls) -> "LoggingSettings":
+        try:
+            queue_max_records = max(1, int(os.getenv("LOG_QUEUE_MAX_RECORDS", "10000")))
+        except ValueError:
+            queue_max_records = 10000
+        return cls(
+            queue_max_records=queue_max_records,
+            sample_rates=tuple(_parse_event_map(os.getenv("LOG_SAMPLE_RATES", ""), float).items()),
+            rate_caps=tuple(_parse_event_map(os.getenv("LOG_RATE_CAPS", ""), float).items()),
+            level=os.getenv("LOG_LEVEL", "INFO").upper(),
+        )
+
+
+_LISTENER: Optional[QueueListener] = None
+_HANDLER: Optional[DroppingQueueHandler] = None
+
+
+def configure_logging(settings: Optional[LoggingSettings] = None) -> None:
+    """Install the queue-based pipeline on the `bot_neutro` logger (idempotent).
+
+    Solo la primera llamada aplica `settings`: el listener vive lo que el proceso.
+    """
+
+    global _LISTENER, _HANDLER
+    if _HANDLER is not None:
+        return
+
+    settings = settings or LoggingSettings.from_env()
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=settings.queue_max_records)
+    handler = DroppingQueueHandler(log_queue)
+    handler.addFilter(
+        EventSampler(
+            sample_rates=dict(settings.sample_rates),
+            rate_caps=dict(settings.rate_caps),
+        )
+    )
+
+    stream_handler = logging.StreamHandler(sys.stderr)
+    stream_handler.setFormatter(JSONFormatter())
+    listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+    logger = logging.getLogger(LOGGER_NAME)
+    logger.addHandler(handler)
+    # Sin esto cada record también llega a los handlers de root (uvicorn, basicConfig)
+    # de forma sincrónica y sale duplicado.
+    logger.propagate = False
+    if logger.level == logging.NOTSET:
+        level = settings.level
+        logger.setLevel(level if isinstance(logging.getLevelName(level), int) else logging.INFO)
+
+    _LISTENER = listener
+    _HANDLER = handler
+
+
+__all__ = [
+    "DroppingQueueHandler",
+    "EventSampler",
+    "JSONFormatter",
+    "LoggingSettings",
+    "configure_logging",
+]
@@ -0,0 +1,224 @@
+"""Prometheus / OpenMetrics exposition for `InMemoryMetrics`.
+
+El renderer cachea el bloque estático HELP/TYPE de cada familia y el prefijo
+de cada serie (`nombre{labels} `); en cada scrape solo se re-formatean los
+valores que cambiaron desde el scrape anterior.
+"""
+
+from __future__ import annotations
+
+import gzip
+from dataclasses import dataclass
+from threading import Lock
+from typing import Dict, Iterable, List, Optional, Tuple
+
+Labels = Tuple[Tuple[str, str], ...]
+Sample = Tuple[str, str, Labels, float]
+Exemplar = Tuple[Labels, float, float]
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+OPENMETRICS_CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+
+@dataclass(frozen=True)
+class MetricFamily:
+    name: str
+    kind: str
+    help: str
+    # Cómo se combinan valores de varios workers (`sum` o `max`).
+    multiprocess_mode: str = "sum"
+
+    @property
+    def openmetrics_name(self) -> str:
+        if self.kind == "counter" and self.name.endswith("_total"):
+            return self.name[: -len("_total")]
+        return self.name
+
+
+METRIC_FAMILIES: List[MetricFamily] = [
+    MetricFamily("sensei_request_latency_seconds", "histogram", "Request latency"),
+    MetricFamily("sensei_rate_limit_hits_total", "counter", "Total requests rejected by rate limit"),
+    MetricFamily("errors_total", "counter", "Total errors seen by route"),
+    MetricFamily("llm_tier_denied_total", "counter", "Total denied LLM tier requests"),
+    MetricFamily("mem_reads_total", "counter", "Memory reads"),
+    MetricFamily("mem_writes_total", "counter", "Memory writes"),
+    MetricFamily("audio_sessions_purged_total", "counter", "Audio sessions purged from storage"),
+    MetricFamily("audio_sessions_current", "gauge", "Current audio sessions stored", "max"),
+    MetricFamily("sensei_requests_total", "counter", "Total requests by route"),
+    MetricFamily("sensei_requests_in_flight", "gauge", "Requests currently being handled by route"),
+    MetricFamily("audio_bytes_in_memory", "gauge", "Bytes of uploaded audio currently held in memory"),
+    MetricFamily("event_loop_lag_seconds", "gauge", "Event-loop scheduling lag from the last monitor tick", "max"),
+    MetricFamily("executor_threads_busy", "gauge", "Worker threads busy in the default thread pool"),
+    MetricFamily("executor_tasks_pending", "gauge", "Tasks waiting for a thread in the default thread pool"),
+    MetricFamily("audio_queue_wait_seconds", "histogram", "Time /audio requests waited for a scheduler slot by tier"),
+    MetricFamily("audio_queue_depth", "gauge", "/audio requests waiting for a scheduler slot by tier"),
+    MetricFamily("audio_queue_timeouts_total", "counter", "/audio requests rejected after waiting too long for a slot"),
+    MetricFamily("audio_quota_rejections_total", "counter", "/audio requests rejected by plan quota before STT"),
+    MetricFamily("log_records_dropped_total", "counter", "Log records dropped by sampling, rate caps or backpressure"),
+    MetricFamily("tracing_spans_dropped_total", "counter", "Tracing spans dropped by span limit, backpressure or I/O errors"),
+    MetricFamily("rate_limit_backend_errors_total", "counter", "Shared rate limit store failures (request admitted fail-open)"),
+    MetricFamily("speech_pool_checkouts_total", "counter", "Speech SDK objects taken from the warm pool (hit) or built on demand (miss)"),
+    MetricFamily("speech_connection_setup_seconds", "histogram", "Time to build a speech recognizer/synthesizer and open its connection"),
+    MetricFamily("tts_output_bytes", "histogram", "Size of synthesized reply audio per provider and output format"),
+    MetricFamily("tts_cache_lookups_total", "counter", "TTS cache lookups by result (memory/disk hit or miss)"),
+    MetricFamily("tts_cache_bytes_saved_total", "counter", "Audio bytes served from the TTS cache instead of synthesized"),
+    MetricFamily("tts_cache_evictions_total", "counter", "TTS cache entries evicted by tier and reason (size/age)"),
+    MetricFamily("llm_cache_lookups_total", "counter", "LLM reply cache lookups by tier and result (hit/miss)"),
+    MetricFamily("llm_cache_evictions_total", "counter", "LLM reply cache entries evicted by reason (size/ttl)"),
+    MetricFamily("llm_time_to_first_token_seconds", "histogram", "Time from LLM request to the first streamed token (queueing + prefill)"),
+    MetricFamily("llm_tokens_per_second", "histogram", "LLM generation speed after the first token"),
+    MetricFamily(
+        "provider_circuit_state",
+        "gauge",
+        "Provider circuit breaker state (0 closed, 1 half-open, 2 open)",
+        multiprocess_mode="max",
+    ),
+    MetricFamily(
+        "provider_hedges_total",
+        "counter",
+        "Hedged provider calls by outcome (primary/hedge won, budget or pool exhausted)",
+    ),
+    MetricFamily(
+        "provider_hedge_wasted_seconds_total",
+        "counter",
+        "Seconds spent by losing hedged attempts before they finished",
+    ),
+    MetricFamily("provider_fallbacks_total", "counter", "Requests served by the fallback provider, by reason (error/open)"),
+    MetricFamily("llm_stream_failures_total", "counter", "LLM streams that failed before the first token (fallback) or mid-stream"),
+    MetricFamily("sensei_stage_latency_seconds", "summary", "Latency quantiles by route and stage"),
+    MetricFamily(
+        "sensei_tenant_latency_seconds", "summary", "Latency quantiles by route, stage and top-K tenant"
+    ),
+]
+
+
+def wants_openmetrics(accept: Optional[str]) -> bool:
+    return bool(accept) and "application/openmetrics-text" in accept
+
+
+def accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    if not accept_encoding:
+        return False
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        if coding.strip().lower() != "gzip":
+            continue
+        return params.replace(" ", "") not in {"q=0", "q=0.0"}
+    return False
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if isinstance(value, float):
+        if value == float("inf"):
+            return "+Inf"
+        if value == float("-inf"):
+            return "-Inf"
+    return str(value)
+
+
+def _format_exemplar(exemplar: Exemplar) -> str:
+    labels, value, timestamp = exemplar
+    rendered = ",".join(f'{name}="{_escape_label_value(val)}"' for name, val in labels)
+    return f" # {{{rendered}}} {_format_value(value)} {timestamp:.3f}"
+
+
+class ExpositionRenderer:
+    """Render metric samples, reusing cached prefixes and formatted lines."""
+
+    def __init__(self, families: Iterable[MetricFamily] | None = None) -> None:
+        self._families = list(families or METRIC_FAMILIES)
+        self._lock = Lock()
+        self._headers: Dict[Tuple[str, bool], str] = {}
+        self._prefixes: Dict[Tuple[str, Labels], str] = {}
+        self._lines: Dict[Tuple[str, Labels], Tuple[float, str]] = {}
+
+    def _header(self, family: MetricFamily, openmetrics: bool) -> str:
+        key = (family.name, openmetrics)
+        header = self._headers.get(key)
+        if header is None:
+            name = family.openmetrics_name if openmetrics else family.name
+            header = f"# HELP {name} {family.help}\n# TYPE {name} {family.kind}\n"
+            self._headers[key] = header
+        return header
+
+    def _line(self, sample_name: str, labels: Labels, value: float) -> str:
+        key = (sample_name, labels)
+        cached = self._lines.get(key)
+        if cached is not None and cached[0] == value and type(cached[0]) is type(value):
+            return cached[1]
+
+        prefix = self._prefixes.get(key)
+        if prefix is None:
+            if labels:
+                rendered = ",".join(f'{name}="{_escape_label_value(val)}"' for name, val in labels)
+                prefix = f"{sample_name}{{{rendered}}} "
+            else:
+                prefix = f"{sample_name} "
+            self._prefixes[key] = prefix
+
+        line = prefix + _format_value(value)
+        self._lines[key] = (value, line)
+        return line
+
+    def render(
+        self,
+        samples: Iterable[Sample],
+        openmetrics: bool = False,
+        exemplars: Optional[Dict[Tuple[str, Labels], Exemplar]] = None,
+    ) -> str:
+        """Exemplars (`# {corr_id="..."} value ts`) solo existen en OpenMetrics."""
+
+        exemplars = exemplars if openmetrics else None
+        with self._lock:
+            by_family: Dict[str, List[str]] = {family.name: [] for family in self._families}
+            seen = 0
+            for family_name, sample_name, labels, value in samples:
+                lines = by_family.get(family_name)
+                if lines is None:
+                    continue
+                line = self._line(sample_name, labels, value)
+                if exemplars:
+                    exemplar = exemplars.get((sample_name, labels))
+                    if exemplar is not None:
+                        line += _format_exemplar(exemplar)
+                lines.append(line)
+                seen += 1
+
+            # Series that disappeared (e.g. a dead worker) should not pin the caches.
+            if len(self._lines) > 2 * seen + 64:
+                self._lines.clear()
+                self._prefixes.clear()
+
+            chunks: List[str] = []
+            for family in self._families:
+                chunks.append(self._header(family, openmetrics))
+                lines = by_family[family.name]
+                if lines:
+                    chunks.append("\n".join(lines))
+                    chunks.append("\n")
+            if openmetrics:
+                chunks.append("# EOF\n")
+            return "".join(chunks)
+
+
+def encode_payload(payload: str, use_gzip: bool) -> bytes:
+    data = payload.encode("utf-8")
+    if use_gzip:
+        return gzip.compress(data, compresslevel=6)
+    return data
+
+
+__all__ = [
+    "ExpositionRenderer",
+    "MetricFamily",
+    "METRIC_FAMILIES",
+    "OPENMETRICS_CONTENT_TYPE",
+    "PROMETHEUS_CONTENT_TYPE",
+    "accepts_gzip",
+    "encode_payload",
+    "wants_openmetrics",
+]
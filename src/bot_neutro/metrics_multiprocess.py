@@ -0,0 +1,275 @@
+"""Multiprocess mode for `InMemoryMetrics`.
+
+Cada worker de uvicorn escribe sus series en un archivo memory-mapped propio
+(`worker_<pid>.db`) dentro de `METRICS_MULTIPROC_DIR`; `/metrics` agrega todos
+los archivos en lectura. Cuando un worker muere, sus counters/histogramas se
+acumulan en `archive.db` antes de borrar su archivo, de modo que los counters
+siguen siendo monótonos entre reinicios. Los gauges de workers muertos se
+descartan.
+"""
+
+from __future__ import annotations
+
+import json
+import mmap
+import os
+import struct
+from contextlib import contextmanager
+from pathlib import Path
+from threading import Lock
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .metrics_exposition import METRIC_FAMILIES, MetricFamily
+
+Labels = Tuple[Tuple[str, str], ...]
+Sample = Tuple[str, str, Labels, float]
+
+_HEADER_SIZE = 8
+_INITIAL_SIZE = 1 << 16
+_WORKER_PREFIX = "worker_"
+_ARCHIVE_NAME = "archive.db"
+_LOCK_NAME = ".lock"
+
+
+def encode_key(family: str, sample_name: str, labels: Labels) -> bytes:
+    return json.dumps([family, sample_name, [list(item) for item in labels]]).encode("utf-8")
+
+
+def decode_key(key: bytes) -> Tuple[str, str, Labels]:
+    family, sample_name, labels = json.loads(key.decode("utf-8"))
+    return family, sample_name, tuple((name, value) for name, value in labels)
+
+
+def _padding(key_length: int) -> int:
+    return (8 - (4 + key_length) % 8) % 8
+
+
+def _iter_entries(data: bytes | mmap.mmap) -> Iterator[Tuple[bytes, float, int]]:
+    used = struct.unpack_from("I", data, 0)[0] or _HEADER_SIZE
+    pos = _HEADER_SIZE
+    while pos < used:
+        key_length = struct.unpack_from("I", data, pos)[0]
+        key_start = pos + 4
+        value_offset = key_start + key_length + _padding(key_length)
+        if value_offset + 8 > used:
+            break
+        key = bytes(data[key_start : key_start + key_length])
+        value = struct.unpack_from("d", data, value_offset)[0]
+        yield key, value, value_offset
+        pos = value_offset + 8
+
+
+class MmapValueFile:
+    """Append-only `key -> double` store backed by a memory-mapped file.
+
+    Layout: `[uint32 used][pad]` seguido de entradas
+    `[uint32 key_len][key][pad hasta 8][float64 value]`. El header `used` se
+    actualiza después de escribir la entrada, así un lector concurrente nunca
+    ve entradas a medio escribir.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self._path = Path(path)
+        self._file = open(self._path, "a+b")
+        size = os.fstat(self._file.fileno()).st_size
+        if size < _INITIAL_SIZE:
+            self._file.truncate(_INITIAL_SIZE)
+            size = _INITIAL_SIZE
+        self._capacity = size
+        self._map = mmap.mmap(self._file.fileno(), self._capacity)
+        self._positions: Dict[bytes, int] = {}
+        self._used = struct.unpack_from("I", self._map, 0)[0] or _HEADER_SIZE
+        for key, _value, value_offset in _iter_entries(self._map):
+            self._positions[key] = value_offset
+
+    def _grow(self, required: int) -> None:
+        capacity = self._capacity
+        while capacity < required:
+            capacity *= 2
+        self._map.close()
+        self._file.truncate(capacity)
+        self._capacity = capacity
+        self._map = mmap.mmap(self._file.fileno(), self._capacity)
+
+    def _append(self, key: bytes, value: float) -> int:
+        padding = _padding(len(key))
+        entry = struct.pack(f"I{len(key)}s{padding}xd", len(key), key, value)
+        if self._used + len(entry) > self._capacity:
+            self._grow(self._used + len(entry))
+        self._map[self._used : self._used + len(entry)] = entry
+        value_offset = self._used + 4 + len(key) + padding
+        self._used += len(entry)
+        struct.pack_into("I", self._map, 0, self._used)
+        return value_offset
+
+    def get(self, key: bytes) -> float:
+        offset = self._positions.get(key)
+        if offset is None:
+            return 0.0
+        return struct.unpack_from("d", self._map, offset)[0]
+
+    def write(self, key: bytes, value: float) -> None:
+        offset = self._positions.get(key)
+        if offset is None:
+            self._positions[key] = self._append(key, value)
+            return
+        struct.pack_into("d", self._map, offset, value)
+
+    def items(self) -> List[Tuple[bytes, float]]:
+        return [(key, value) for key, value, _offset in _iter_entries(self._map)]
+
+    def close(self) -> None:
+        self._map.close()
+        self._file.close()
+
+
+def read_value_file(path: Path) -> List[Tuple[bytes, float]]:
+    try:
+        data = Path(path).read_bytes()
+    except OSError:
+        return []
+    if len(data) < _HEADER_SIZE:
+        return []
+    return [(key, value) for key, value, _offset in _iter_entries(data)]
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _worker_pid(path: Path) -> Optional[int]:
+    stem = path.stem
+    if not stem.startswith(_WORKER_PREFIX):
+        return None
+    try:
+        return int(stem[len(_WORKER_PREFIX) :])
+    except ValueError:
+        return None
+
+
+@contextmanager
+def _directory_lock(directory: Path):
+    import fcntl
+
+    with open(directory / _LOCK_NAME, "a+b") as handle:
+        fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+
+
+def _archivable(families: Dict[str, MetricFamily], family_name: str) -> bool:
+    family = families.get(family_name)
+    return family is None or family.kind != "gauge"
+
+
+def _archive_worker_file(directory: Path, path: Path, families: Dict[str, MetricFamily]) -> None:
+    entries = read_value_file(path)
+    archive = MmapValueFile(directory / _ARCHIVE_NAME)
+    try:
+        for key, value in entries:
+            family_name, _sample_name, _labels = decode_key(key)
+            if _archivable(families, family_name):
+                archive.write(key, archive.get(key) + value)
+    finally:
+        archive.close()
+    path.unlink(missing_ok=True)
+
+
+def cleanup_dead_workers(directory: Path, families: Iterable[MetricFamily] | None = None) -> int:
+    """Move counters of dead workers into the archive and delete their files."""
+
+    directory = Path(directory)
+    family_index = {family.name: family for family in (families or METRIC_FAMILIES)}
+    with _directory_lock(directory):
+        return _archive_dead_workers(directory, family_index)
+
+
+def _archive_dead_workers(directory: Path, family_index: Dict[str, MetricFamily]) -> int:
+    # Con `_directory_lock` tomado (flock no es reentrante entre descriptores).
+    removed = 0
+    for path in sorted(directory.glob(f"{_WORKER_PREFIX}*.db")):
+        pid = _worker_pid(path)
+        if pid is None or pid == os.getpid() or _pid_alive(pid):
+            continue
+        _archive_worker_file(directory, path, family_index)
+        removed += 1
+    return removed
+
+
+class MultiprocessWriter:
+    """Per-process writer used by `InMemoryMetrics` for write-through."""
+
+    def __init__(self, directory: str | Path) -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.pid = os.getpid()
+        self._lock = Lock()
+        path = self.directory / f"{_WORKER_PREFIX}{self.pid}.db"
+        if path.exists():
+            # PID reutilizado: los valores previos pertenecen a un worker muerto.
+            family_index = {family.name: family for family in METRIC_FAMILIES}
+            with _directory_lock(self.directory):
+                _archive_worker_file(self.directory, path, family_index)
+        self._file = MmapValueFile(path)
+
+    def write(self, family: str, sample_name: str, labels: Labels, value: float) -> None:
+        key = encode_key(family, sample_name, labels)
+        with self._lock:
+            self._file.write(key, float(value))
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+def aggregate(directory: str | Path, families: Iterable[MetricFamily] | None = None) -> List[Sample]:
+    """Merge every worker file plus the archive into one sample list."""
+
+    directory = Path(directory)
+    family_list = list(families or METRIC_FAMILIES)
+    family_index = {family.name: family for family in family_list}
+
+    # Mismo lock que el archivado: un worker muerto no se cuenta dos veces (archivo + archive)
+    # ni se pierde a mitad de `unlink`.
+    with _directory_lock(directory):
+        _archive_dead_workers(directory, family_index)
+        paths = [directory / _ARCHIVE_NAME] + sorted(directory.glob(f"{_WORKER_PREFIX}*.db"))
+        entries = [read_value_file(path) for path in paths]
+
+    totals: Dict[bytes, float] = {}
+    for file_entries in entries:
+        for key, value in file_entries:
+            if key not in totals:
+                totals[key] = value
+                continue
+            family_name = decode_key(key)[0]
+            family = family_index.get(family_name)
+            if family is not None and family.multiprocess_mode == "max":
+                totals[key] = max(totals[key], value)
+            else:
+                totals[key] += value
+
+    samples: List[Sample] = []
+    for key, value in totals.items():
+        family_name, sample_name, labels = decode_key(key)
+        if float(value).is_integer() and not sample_name.endswith("_sum"):
+            value = int(value)
+        samples.append((family_name, sample_name, labels, value))
+    return samples
+
+
+__all__ = [
+    "MmapValueFile",
+    "MultiprocessWriter",
+    "aggregate",
+    "cleanup_dead_workers",
+    "read_value_file",
+]
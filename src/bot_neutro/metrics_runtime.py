@@ -1,10 +1,37 @@
+import os
+import time
 from threading import Lock
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
+
+from .metrics_multiprocess import MultiprocessWriter
+
+Labels = Tuple[Tuple[str, str], ...]
+Sample = Tuple[str, str, Labels, float]
+# (labels del exemplar, valor observado, timestamp unix)
+Exemplar = Tuple[Labels, float, float]
+
+# Buckets de los histogramas de proveedores (segundos).
+PROVIDER_SECONDS_BOUNDS: Tuple[float, ...] = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, float("inf"))
+# Buckets del tamaño del audio de TTS (bytes): 16 KiB … 4 MiB.
+TTS_BYTES_BOUNDS: Tuple[float, ...] = (16384.0, 65536.0, 262144.0, 1048576.0, 4194304.0, float("inf"))
+# Buckets de velocidad de generación del LLM (tokens/s).
+TOKENS_PER_SECOND_BOUNDS: Tuple[float, ...] = (5.0, 10.0, 20.0, 40.0, 80.0, 160.0, float("inf"))
+# Buckets de espera por un slot del scheduler de `/audio` (segundos).
+QUEUE_WAIT_BOUNDS: Tuple[float, ...] = (0.01, 0.05, 0.1, 0.5, 1.0, 5.0, float("inf"))
+
+
+def _bound_label(bound: float) -> str:
+    return "+Inf" if bound == float("inf") else str(bound)
 
 
 class InMemoryMetrics:
     def __init__(self) -> None:
         self._lock = Lock()
+        self._writer: Optional[MultiprocessWriter] = None
+        self._fork_hook_registered = False
+        self._reset()
+
+    def _reset(self) -> None:
         self._requests_total: Dict[str, int] = {}
         self._errors_total: Dict[str, int] = {"/audio": 0, "/metrics": 0}
         self._llm_tier_denied_total: Dict[tuple[str, str, str], int] = {}
@@ -13,11 +40,22 @@ class InMemoryMetrics:
         self._mem_writes_total: int = 0
         self._audio_sessions_purged_total: int = 0
         self._audio_sessions_current: int = 0
+        # Series con labels arbitrarios: familia → labels → valor / histograma.
+        # Los gauges de runtime arrancan en 0 para figurar en `/metrics` desde el inicio.
+        self._labeled_counters: Dict[str, Dict[Labels, float]] = {
+            "sensei_requests_in_flight": {(("route", "/audio"),): 0},
+            "audio_bytes_in_memory": {(): 0},
+            "event_loop_lag_seconds": {(): 0.0},
+            "executor_threads_busy": {(): 0},
+            "executor_tasks_pending": {(): 0},
+        }
+        self._labeled_histograms: Dict[str, Dict[Labels, Dict[str, object]]] = {}
 
         self._latency_bucket_bounds: List[float] = [0.1, 0.5, 1.0, float("inf")]
         self._latency_buckets: Dict[str, Dict[float, int]] = {}
         self._latency_count: Dict[str, int] = {}
         self._latency_sum: Dict[str, float] = {}
+        self._latency_exemplars: Dict[Tuple[str, float], Exemplar] = {}
         self._ensure_latency_route("/healthz")
         self._ensure_latency_route("/audio")
 
@@ -27,48 +65,367 @@ class InMemoryMetrics:
             self._latency_count[route] = 0
             self._latency_sum[route] = 0.0
 
+    @property
+    def multiprocess_dir(self) -> Optional[str]:
+        return str(self._writer.directory) if self._writer is not None else None
+
+    def enable_multiprocess(self, directory: str) -> None:
+        """Write every series through to `<directory>/worker_<pid>.db`.
+
+        Idempotente por proceso. Un hijo creado con `fork` arranca con
+        contadores en cero y su propio archivo, para no duplicar los valores
+        heredados del padre.
+        """
+
+        with self._lock:
+            if self._writer is not None and str(self._writer.directory) == str(directory):
+                return
+            self._writer = MultiprocessWriter(directory)
+        for family, sample_name, labels, value in self.collect():
+            self._writer.write(family, sample_name, labels, value)
+        if not self._fork_hook_registered:
+            os.register_at_fork(after_in_child=self._after_fork_in_child)
+            self._fork_hook_registered = True
+
+    def _after_fork_in_child(self) -> None:
+        if self._writer is None or self._writer.pid == os.getpid():
+            return
+        directory = self._writer.directory
+        self._lock = Lock()
+        self._writer = None
+        self._reset()
+        self.enable_multiprocess(str(directory))
+
+    def _publish(self, family: str, sample_name: str, labels: Labels, value: float) -> None:
+        if self._writer is not None:
+            self._writer.write(family, sample_name, labels, value)
+
     def inc_request(self, route: str) -> None:
         with self._lock:
-            self._requests_total[route] = self._requests_total.get(route, 0) + 1
+            value = self._requests_total.get(route, 0) + 1
+            self._requests_total[route] = value
+            self._publish("sensei_requests_total", "sensei_requests_total", (("route", route),), value)
 
     def inc_error(self, route: str) -> None:
         with self._lock:
-            self._errors_total[route] = self._errors_total.get(route, 0) + 1
+            value = self._errors_total.get(route, 0) + 1
+            self._errors_total[route] = value
+            self._publish("errors_total", "errors_total", (("route", route),), value)
 
     def inc_llm_tier_denied_total(self, route: str, requested_tier: str, authorized_tier: str) -> None:
         with self._lock:
             key = (route, requested_tier, authorized_tier)
-            self._llm_tier_denied_total[key] = self._llm_tier_denied_total.get(key, 0) + 1
+            value = self._llm_tier_denied_total.get(key, 0) + 1
+            self._llm_tier_denied_total[key] = value
+            self._publish(
+                "llm_tier_denied_total",
+                "llm_tier_denied_total",
+                (
+                    ("route", route),
+                    ("requested_tier", requested_tier),
+                    ("authorized_tier", authorized_tier),
+                ),
+                value,
+            )
 
     def inc_rate_limit_hit(self) -> None:
         with self._lock:
             self._rate_limit_hits_total += 1
+            self._publish(
+                "sensei_rate_limit_hits_total",
+                "sensei_rate_limit_hits_total",
+                (),
+                self._rate_limit_hits_total,
+            )
+
+    def inc_rate_limit_backend_error(self, backend: str) -> None:
+        with self._lock:
+            self._inc_labeled("rate_limit_backend_errors_total", (("backend", backend),))
+
+    def inc_audio_quota_rejection(self, reason: str) -> None:
+        with self._lock:
+            self._inc_labeled("audio_quota_rejections_total", (("reason", reason),))
 
     def inc_mem_read(self) -> None:
         with self._lock:
             self._mem_reads_total += 1
+            self._publish("mem_reads_total", "mem_reads_total", (), self._mem_reads_total)
 
     def inc_mem_write(self) -> None:
         with self._lock:
             self._mem_writes_total += 1
+            self._publish("mem_writes_total", "mem_writes_total", (), self._mem_writes_total)
 
     def inc_audio_sessions_purged(self, count: int) -> None:
         with self._lock:
             self._audio_sessions_purged_total += count
+            self._publish(
+                "audio_sessions_purged_total",
+                "audio_sessions_purged_total",
+                (),
+                self._audio_sessions_purged_total,
+            )
 
     def set_audio_sessions_current(self, count: int) -> None:
         with self._lock:
             self._audio_sessions_current = count
+            self._publish("audio_sessions_current", "audio_sessions_current", (), count)
+
+    def inc_log_records_dropped(self, reason: str) -> None:
+        with self._lock:
+            self._inc_labeled("log_records_dropped_total", (("reason", reason),))
+
+    def inc_tracing_spans_dropped(self, reason: str) -> None:
+        with self._lock:
+            self._inc_labeled("tracing_spans_dropped_total", (("reason", reason),))
+
+    def add_request_in_flight(self, route: str, delta: int) -> None:
+        with self._lock:
+            self._inc_labeled("sensei_requests_in_flight", (("route", route),), delta)
+
+    def requests_in_flight(self, route: str) -> int:
+        with self._lock:
+            return self._labeled_counters["sensei_requests_in_flight"].get((("route", route),), 0)
+
+    def add_audio_bytes_in_memory(self, delta: int) -> None:
+        with self._lock:
+            self._inc_labeled("audio_bytes_in_memory", (), delta)
+
+    def set_event_loop_lag(self, seconds: float) -> None:
+        with self._lock:
+            self._set_labeled("event_loop_lag_seconds", (), seconds)
+
+    def set_executor_stats(self, threads_busy: int, tasks_pending: int) -> None:
+        with self._lock:
+            self._set_labeled("executor_threads_busy", (), threads_busy)
+            self._set_labeled("executor_tasks_pending", (), tasks_pending)
+
+    def set_audio_queue_depth(self, tier: str, depth: int) -> None:
+        with self._lock:
+            self._set_labeled("audio_queue_depth", (("tier", tier),), depth)
+
+    def inc_audio_queue_timeout(self, tier: str) -> None:
+        with self._lock:
+            self._inc_labeled("audio_queue_timeouts_total", (("tier", tier),))
+
+    def observe_queue_wait(self, tier: str, wait_seconds: float) -> None:
+        with self._lock:
+            self._observe_labeled("audio_queue_wait_seconds", (("tier", tier),), wait_seconds, QUEUE_WAIT_BOUNDS)
+
+    def _inc_labeled(self, family: str, labels: Labels, amount: float = 1) -> None:
+        series = self._labeled_counters.setdefault(family, {})
+        value = series.get(labels, 0) + amount
+        series[labels] = value
+        self._publish(family, family, labels, value)
+
+    def _set_labeled(self, family: str, labels: Labels, value: float) -> None:
+        # Gauges con labels: mismo almacenamiento que los counters; el tipo lo da `METRIC_FAMILIES`.
+        self._labeled_counters.setdefault(family, {})[labels] = value
+        self._publish(family, family, labels, value)
+
+    def _observe_labeled(
+        self, histogram: str, labels: Labels, value: float, bounds: Tuple[float, ...] = PROVIDER_SECONDS_BOUNDS
+    ) -> None:
+        series = self._labeled_histograms.setdefault(histogram, {})
+        entry = series.get(labels)
+        new_series = entry is None
+        if entry is None:
+            entry = series[labels] = {"buckets": {bound: 0 for bound in bounds}, "count": 0, "sum": 0.0}
+        buckets = entry["buckets"]
+        entry["count"] += 1
+        entry["sum"] += value
+        for bound in buckets:
+            observed = value <= bound
+            if observed:
+                buckets[bound] += 1
+            if self._writer is not None and (observed or new_series):
+                self._publish(histogram, f"{histogram}_bucket", labels + (("le", _bound_label(bound)),), buckets[bound])
+        self._publish(histogram, f"{histogram}_count", labels, entry["count"])
+        self._publish(histogram, f"{histogram}_sum", labels, entry["sum"])
+
+    def inc_speech_pool_checkout(self, provider: str, result: str) -> None:
+        with self._lock:
+            self._inc_labeled("speech_pool_checkouts_total", (("provider", provider), ("result", result)))
+
+    def observe_speech_connection_setup(self, provider: str, seconds: float) -> None:
+        with self._lock:
+            self._observe_labeled("speech_connection_setup_seconds", (("provider", provider),), seconds)
+
+    def observe_tts_output_bytes(self, provider: str, output_format: str, size: int) -> None:
+        with self._lock:
+            self._observe_labeled(
+                "tts_output_bytes", (("provider", provider), ("format", output_format)), size, TTS_BYTES_BOUNDS
+            )
+
+    def inc_tts_cache_lookup(self, result: str) -> None:
+        with self._lock:
+            self._inc_labeled("tts_cache_lookups_total", (("result", result),))
+
+    def inc_tts_cache_bytes_saved(self, tier: str, size: int) -> None:
+        with self._lock:
+            self._inc_labeled("tts_cache_bytes_saved_total", (("tier", tier),), size)
+
+    def inc_tts_cache_eviction(self, tier: str, reason: str, count: int = 1) -> None:
+        with self._lock:
+            self._inc_labeled("tts_cache_evictions_total", (("tier", tier), ("reason", reason)), count)
+
+    def inc_llm_cache_lookup(self, tier: str, result: str) -> None:
+        with self._lock:
+            self._inc_labeled("llm_cache_lookups_total", (("tier", tier), ("result", result)))
+
+    def inc_llm_cache_eviction(self, reason: str) -> None:
+        with self._lock:
+            self._inc_labeled("llm_cache_evictions_total", (("reason", reason),))
+
+    def observe_llm_time_to_first_token(self, provider: str, model: str, seconds: float) -> None:
+        with self._lock:
+            self._observe_labeled("llm_time_to_first_token_seconds", (("provider", provider), ("model", model)), seconds)
+
+    def observe_llm_tokens_per_second(self, provider: str, model: str, rate: float) -> None:
+        with self._lock:
+            self._observe_labeled(
+                "llm_tokens_per_second", (("provider", provider), ("model", model)), rate, TOKENS_PER_SECOND_BOUNDS
+            )
+
+    def inc_llm_stream_failure(self, provider: str, phase: str) -> None:
+        with self._lock:
+            self._inc_labeled("llm_stream_failures_total", (("provider", provider), ("phase", phase)))
+
+    def set_provider_circuit_state(self, provider: str, state: int) -> None:
+        with self._lock:
+            self._set_labeled("provider_circuit_state", (("provider", provider),), state)
+
+    def inc_provider_fallback(self, provider: str, reason: str) -> None:
+        with self._lock:
+            self._inc_labeled("provider_fallbacks_total", (("provider", provider), ("reason", reason)))
+
+    def inc_provider_hedge(self, provider: str, outcome: str) -> None:
+        with self._lock:
+            self._inc_labeled("provider_hedges_total", (("provider", provider), ("outcome", outcome)))
 
-    def observe_latency(self, route: str, duration_seconds: float) -> None:
+    def add_provider_hedge_wasted_seconds(self, provider: str, seconds: float) -> None:
         with self._lock:
+            self._inc_labeled("provider_hedge_wasted_seconds_total", (("provider", provider),), seconds)
+
+    def observe_latency(
+        self, route: str, duration_seconds: float, exemplar: Optional[Labels] = None
+    ) -> None:
+        histogram = "sensei_request_latency_seconds"
+        with self._lock:
+            new_route = route not in self._latency_buckets
             self._ensure_latency_route(route)
             self._latency_count[route] += 1
             self._latency_sum[route] += duration_seconds
+            if exemplar is not None:
+                bound = next(b for b in self._latency_bucket_bounds if duration_seconds <= b)
+                self._latency_exemplars[(route, bound)] = (exemplar, duration_seconds, time.time())
 
             for bound in self._latency_bucket_bounds:
-                if duration_seconds <= bound:
+                observed = duration_seconds <= bound
+                if observed:
                     self._latency_buckets[route][bound] += 1
+                if self._writer is not None and (observed or new_route):
+                    bound_label = "+Inf" if bound == float("inf") else str(bound)
+                    self._publish(
+                        histogram,
+                        f"{histogram}_bucket",
+                        (("route", route), ("le", bound_label)),
+                        self._latency_buckets[route][bound],
+                    )
+
+            labels = (("route", route),)
+            self._publish(histogram, f"{histogram}_count", labels, self._latency_count[route])
+            self._publish(histogram, f"{histogram}_sum", labels, self._latency_sum[route])
+
+    def exemplars(self) -> Dict[Tuple[str, Labels], Exemplar]:
+        """Latest exemplar per histogram bucket, keyed like `collect()` samples.
+
+        Solo del proceso actual (no se agregan entre workers).
+        """
+
+        histogram = "sensei_request_latency_seconds"
+        with self._lock:
+            return {
+                (
+                    f"{histogram}_bucket",
+                    (("route", route), ("le", "+Inf" if bound == float("inf") else str(bound))),
+                ): exemplar
+                for (route, bound), exemplar in self._latency_exemplars.items()
+            }
+
+    def collect(self) -> List[Sample]:
+        """Flat `(family, sample_name, labels, value)` list for exposition.
+
+        Only scalars are copied while holding the lock; formatting happens
+        outside of it in `metrics_exposition.ExpositionRenderer`.
+        """
+
+        with self._lock:
+            samples: List[Sample] = []
+            histogram = "sensei_request_latency_seconds"
+            for route, buckets in self._latency_buckets.items():
+                for bound in self._latency_bucket_bounds:
+                    bound_label = "+Inf" if bound == float("inf") else str(bound)
+                    samples.append(
+                        (
+                            histogram,
+                            f"{histogram}_bucket",
+                            (("route", route), ("le", bound_label)),
+                            buckets.get(bound, 0),
+                        )
+                    )
+                samples.append(
+                    (histogram, f"{histogram}_count", (("route", route),), self._latency_count.get(route, 0))
+                )
+                samples.append(
+                    (histogram, f"{histogram}_sum", (("route", route),), self._latency_sum.get(route, 0.0))
+                )
+
+            for name, value in (
+                ("sensei_rate_limit_hits_total", self._rate_limit_hits_total),
+                ("mem_reads_total", self._mem_reads_total),
+                ("mem_writes_total", self._mem_writes_total),
+                ("audio_sessions_purged_total", self._audio_sessions_purged_total),
+                ("audio_sessions_current", self._audio_sessions_current),
+            ):
+                samples.append((name, name, (), value))
+
+            for route, value in self._requests_total.items():
+                samples.append(("sensei_requests_total", "sensei_requests_total", (("route", route),), value))
+
+            errors_total = dict(self._errors_total)
+            for route in ("/audio", "/metrics"):
+                errors_total.setdefault(route, 0)
+            for route, value in errors_total.items():
+                samples.append(("errors_total", "errors_total", (("route", route),), value))
+
+            for family, series in self._labeled_counters.items():
+                for labels, value in series.items():
+                    samples.append((family, family, labels, value))
+
+            for histogram, series in self._labeled_histograms.items():
+                for labels, entry in series.items():
+                    for bound, value in entry["buckets"].items():
+                        samples.append(
+                            (histogram, f"{histogram}_bucket", labels + (("le", _bound_label(bound)),), value)
+                        )
+                    samples.append((histogram, f"{histogram}_count", labels, entry["count"]))
+                    samples.append((histogram, f"{histogram}_sum", labels, entry["sum"]))
+
+            for (route, requested_tier, authorized_tier), value in self._llm_tier_denied_total.items():
+                samples.append(
+                    (
+                        "llm_tier_denied_total",
+                        "llm_tier_denied_total",
+                        (
+                            ("route", route),
+                            ("requested_tier", requested_tier),
+                            ("authorized_tier", authorized_tier),
+                        ),
+                        value,
+                    )
+                )
+            return samples
 
     def snapshot(self) -> Dict[str, object]:
         with self._lock:
@@ -104,6 +461,24 @@ class InMemoryMetrics:
                 "mem_writes_total": self._mem_writes_total,
                 "audio_sessions_purged_total": self._audio_sessions_purged_total,
                 "audio_sessions_current": self._audio_sessions_current,
+                # Series con labels: claves = tupla de valores de labels; sin labels, el valor.
+                **{
+                    family: series[()]
+                    if () in series
+                    else {tuple(value for _, value in labels): value for labels, value in series.items()}
+                    for family, series in self._labeled_counters.items()
+                },
+                **{
+                    histogram: {
+                        tuple(value for _, value in labels): {
+                            "buckets": dict(entry["buckets"]),
+                            "count": entry["count"],
+                            "sum": entry["sum"],
+                        }
+                        for labels, entry in series.items()
+                    }
+                    for histogram, series in self._labeled_histograms.items()
+                },
                 "latency": latency_snapshot,
                 "latency_bucket_bounds": list(self._latency_bucket_bounds),
             }
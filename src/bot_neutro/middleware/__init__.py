@@ -1,11 +1,18 @@
+from .auth import AuthMiddleware
 from .correlation import CorrelationIdMiddleware
 from .logging import JSONLoggingMiddleware
+from .outcome import DefaultOutcomeMiddleware
 from .rate_limit import RateLimitMiddleware
 from .request_latency import RequestLatencyMiddleware
+from .tracing import TracedMiddleware, TracingMiddleware
 
 __all__ = [
+    "AuthMiddleware",
     "CorrelationIdMiddleware",
+    "DefaultOutcomeMiddleware",
     "JSONLoggingMiddleware",
     "RateLimitMiddleware",
     "RequestLatencyMiddleware",
+    "TracedMiddleware",
+    "TracingMiddleware",
 ]
@@ -0,0 +1,24 @@
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from bot_neutro.auth import AUTHENTICATOR
+
+
+class AuthMiddleware:
+    """Resolve `X-API-Key` once into `state["principal"]` and `state["api_key_id"]`.
+
+    No rechaza requests: cada endpoint decide si la key es obligatoria.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http":
+            api_key = Headers(scope=scope).get("X-API-Key")
+            if api_key:
+                principal = AUTHENTICATOR.resolve(api_key)
+                state = scope.setdefault("state", {})
+                state["principal"] = principal
+                state["api_key_id"] = principal.api_key_id
+        await self.app(scope, receive, send)
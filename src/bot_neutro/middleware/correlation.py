@@ -1,20 +1,33 @@
 import uuid
-from typing import Callable
 
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
-from starlette.responses import Response
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 
-class CorrelationIdMiddleware(BaseHTTPMiddleware):
+class CorrelationIdMiddleware:
     """Ensure every request carries an X-Correlation-Id header."""
 
     header_name = "X-Correlation-Id"
 
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        correlation_id = request.headers.get(self.header_name) or str(uuid.uuid4())
-        request.state.correlation_id = correlation_id
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
 
-        response = await call_next(request)
-        response.headers[self.header_name] = correlation_id
-        return response
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        state = scope.setdefault("state", {})
+        correlation_id = (
+            Headers(scope=scope).get(self.header_name)
+            or state.get("correlation_id")
+            or str(uuid.uuid4())
+        )
+        state["correlation_id"] = correlation_id
+
+        async def send_with_correlation_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)[self.header_name] = correlation_id
+            await send(message)
+
+        await self.app(scope, receive, send_with_correlation_id)
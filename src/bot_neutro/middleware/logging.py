@@ -1,26 +1,59 @@
-import json
 import logging
-from typing import Callable
+import time
 
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
-from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 logger = logging.getLogger("bot_neutro")
-logging.basicConfig(level=logging.INFO)
 
 
-class JSONLoggingMiddleware(BaseHTTPMiddleware):
-    """Emit structured JSON logs for inbound requests."""
+class JSONLoggingMiddleware:
+    """Emit one structured `http_request` record per inbound request.
 
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        response = await call_next(request)
+    El record solo se encola (ver `log_pipeline`); la serialización JSON y la
+    escritura a stderr ocurren fuera del event loop.
+    """
 
-        payload = {
-            "method": request.method,
-            "path": request.url.path,
-            "status": response.status_code,
-            "corr_id": getattr(request.state, "correlation_id", ""),
-        }
-        logger.info(json.dumps(payload))
-        return response
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status_code = 500
+        outcome = ""
+        outcome_detail = ""
+
+        async def send_capturing_status(message: Message) -> None:
+            nonlocal status_code, outcome, outcome_detail
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                for name, value in message.get("headers", ()):
+                    if name == b"x-outcome":
+                        outcome = value.decode("latin-1")
+                    elif name == b"x-outcome-detail":
+                        outcome_detail = value.decode("latin-1")
+            await send(message)
+
+        await self.app(scope, receive, send_capturing_status)
+
+        if not logger.isEnabledFor(logging.INFO):
+            return
+        state = scope.get("state", {})
+        logger.info(
+            "http_request",
+            extra={
+                "event": "http_request",
+                "method": scope["method"],
+                "path": scope["path"],
+                "status": status_code,
+                # DefaultOutcomeMiddleware (más externo) completa "ok" después.
+                "outcome": outcome or "ok",
+                "outcome_detail": outcome_detail,
+                "corr_id": state.get("correlation_id", ""),
+                "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+                "stage_ms": state.get("stage_ms"),
+            },
+        )
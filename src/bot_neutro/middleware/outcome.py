@@ -0,0 +1,33 @@
+from typing import Optional
+
+from starlette.datastructures import MutableHeaders
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+def with_outcome(response: Response, outcome: str = "ok", detail: Optional[str] = None) -> Response:
+    """Set `X-Outcome` (si falta) y `X-Outcome-Detail` en una respuesta de handler."""
+
+    response.headers.setdefault("X-Outcome", outcome)
+    if detail:
+        response.headers["X-Outcome-Detail"] = detail
+    return response
+
+
+class DefaultOutcomeMiddleware:
+    """Default `X-Outcome: ok` on responses that did not set an outcome."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_outcome(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).setdefault("X-Outcome", "ok")
+            await send(message)
+
+        await self.app(scope, receive, send_with_outcome)
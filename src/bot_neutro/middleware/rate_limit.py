@@ -1,69 +1,109 @@
-import os
-import time
-from threading import Lock
-from typing import Callable, Dict, Iterable, Tuple
+from typing import Iterable, Tuple
 
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
-from starlette.responses import JSONResponse, Response
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 from bot_neutro.metrics_runtime import METRICS
+from bot_neutro.rate_limiter import RateLimitBackend, RateLimitConfig, build_rate_limit_backend
 from bot_neutro.security_ids import derive_api_key_id
-
-ALLOWLIST: Iterable[str] = {"/metrics", "/healthz", "/readyz", "/version"}
-
-
-def _is_enabled() -> bool:
-    return os.getenv("RATE_LIMIT_ENABLED", "0") == "1"
-
-
-class RateLimitMiddleware(BaseHTTPMiddleware):
-    """Stub middleware to hook rate limiting behavior."""
-
-    def __init__(self, app, allowlist: Iterable[str] | None = None) -> None:
-        super().__init__(app)
+from bot_neutro.settings import SettingsHolder
+
+ALLOWLIST: Iterable[str] = {"/metrics", "/metrics/latency", "/healthz", "/readyz", "/version"}
+ALLOWLIST_PREFIXES: Tuple[str, ...] = ("/debug/",)
+
+
+class RateLimitMiddleware:
+    """GCRA rate limit per API key on /audio, with RateLimit-* headers.
+
+    La configuración viene del snapshot de `Settings` de la app (o de
+    `config`, fija); solo se reconstruye el limiter cuando un reload cambia
+    la sección `rate_limit`. Con un backend compartido las decisiones se
+    sirven del lease local; solo cuando se agota se consulta el store, fuera
+    del event loop.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        allowlist: Iterable[str] | None = None,
+        config: RateLimitConfig | None = None,
+        settings: SettingsHolder | None = None,
+    ) -> None:
+        self.app = app
         self.allowlist = set(allowlist or ALLOWLIST)
-        self._state: Dict[Tuple[str, str], Dict[str, float | int]] = {}
-        self._lock = Lock()
-
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        path = request.url.path
-
-        if not _is_enabled() or path in self.allowlist:
-            return await call_next(request)
-
-        if path != "/audio":
-            return await call_next(request)
-
-        api_key = request.headers.get("X-API-Key")
+        self.settings = settings if config is None else None
+        self.config = RateLimitConfig()
+        self.limiter: RateLimitBackend | None = None
+        if config is None and settings is None:
+            config = RateLimitConfig.from_env()
+        self._apply(config if config is not None else settings.current.rate_limit)
+
+    def _apply(self, config: RateLimitConfig) -> None:
+        limiter = None
+        if config.enabled and config.max_requests > 0 and config.window_seconds > 0:
+            limiter = build_rate_limit_backend(config)
+        self.config, self.limiter = config, limiter
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        if self.settings is not None:
+            config = self.settings.current.rate_limit
+            if config is not self.config and config != self.config:
+                self._apply(config)
+            self.config = config
+
+        path = scope["path"]
+        if (
+            not self.config.enabled
+            or path in self.allowlist
+            or path.startswith(ALLOWLIST_PREFIXES)
+            or path != "/audio"
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        api_key = Headers(scope=scope).get("X-API-Key")
         if not api_key:
-            return await call_next(request)
-
-        window_seconds = int(os.getenv("RATE_LIMIT_AUDIO_WINDOW_SECONDS", "60"))
-        max_requests = int(os.getenv("RATE_LIMIT_AUDIO_MAX_REQUESTS", "60"))
-        now = time.time()
-        key = (path, derive_api_key_id(api_key))
-
-        with self._lock:
-            entry = self._state.get(key)
-            if entry is None or now - entry["window_start"] >= window_seconds:
-                entry = {"window_start": now, "count": 0}
-                self._state[key] = entry
-
-            if entry["count"] >= max_requests:
-                retry_after = max(0, int(window_seconds - (now - entry["window_start"])))
-                response = JSONResponse(
-                    {"detail": "rate limit exceeded"}, status_code=429
-                )
-                response.headers["X-Outcome"] = "error"
-                response.headers["X-Outcome-Detail"] = "rate_limit"
-                correlation_id = getattr(request.state, "correlation_id", None)
-                if correlation_id:
-                    response.headers["X-Correlation-Id"] = correlation_id
-                response.headers["Retry-After"] = str(retry_after)
-                METRICS.inc_rate_limit_hit()
-                return response
-
-            entry["count"] += 1
-
-        return await call_next(request)
+            await self.app(scope, receive, send)
+            return
+
+        limiter = self.limiter
+        if limiter is None:
+            # Límite en 0 (o ventana inválida): todo request con key se rechaza.
+            await self._reject(scope, receive, send, {"Retry-After": str(max(1, self.config.window_seconds))})
+            return
+
+        principal = scope.get("state", {}).get("principal")
+        api_key_id = principal.api_key_id if principal is not None else derive_api_key_id(api_key)
+        key = f"{path}:{api_key_id}"
+        decision = limiter.hit_local(key)
+        if decision is None:
+            decision = await run_in_threadpool(limiter.hit, key)
+        headers = decision.headers(limiter.policy)
+        if not decision.allowed:
+            await self._reject(scope, receive, send, headers)
+            return
+
+        async def send_with_rate_limit_headers(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                response_headers = MutableHeaders(scope=message)
+                for name, value in headers.items():
+                    response_headers[name] = value
+            await send(message)
+
+        await self.app(scope, receive, send_with_rate_limit_headers)
+
+    async def _reject(self, scope: Scope, receive: Receive, send: Send, headers: dict) -> None:
+        response = JSONResponse({"detail": "rate limit exceeded"}, status_code=429, headers=headers)
+        response.headers["X-Outcome"] = "error"
+        response.headers["X-Outcome-Detail"] = "rate_limit"
+        correlation_id = scope.get("state", {}).get("correlation_id")
+        if correlation_id:
+            response.headers["X-Correlation-Id"] = correlation_id
+        METRICS.inc_rate_limit_hit()
+        await response(scope, receive, send)
@@ -1,24 +1,86 @@
 import math
 import time
-from typing import Callable
 
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
-from starlette.responses import Response
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
+from bot_neutro.latency_sketch import LATENCY_SKETCHES
 from bot_neutro.metrics_runtime import METRICS
+from bot_neutro.slow_requests import SLOW_REQUESTS
 
+# Límite de OpenMetrics para el label set de un exemplar (128 chars en total).
+MAX_EXEMPLAR_CORR_ID = 64
 
-class RequestLatencyMiddleware(BaseHTTPMiddleware):
-    """Capture latency per request and feed the runtime histogram."""
 
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
+class RequestLatencyMiddleware:
+    """Capture latency per request and feed the runtime histogram.
+
+    Los requests por encima de `SLOW_REQUEST_THRESHOLD_MS` se guardan en
+    `SLOW_REQUESTS` y dejan su `corr_id` como exemplar del bucket.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        response = {"status": 500, "outcome": "", "outcome_detail": "", "bytes": 0}
+
+        async def send_capturing_response(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                for name, value in message.get("headers", ()):
+                    if name == b"x-outcome":
+                        response["outcome"] = value.decode("latin-1")
+                    elif name == b"x-outcome-detail":
+                        response["outcome_detail"] = value.decode("latin-1")
+            elif message["type"] == "http.response.body":
+                response["bytes"] += len(message.get("body", b""))
+            await send(message)
+
         start = time.perf_counter()
         try:
-            response = await call_next(request)
-            return response
+            await self.app(scope, receive, send_capturing_response)
         finally:
             duration_seconds = time.perf_counter() - start
-            route = request.url.path or "unknown"
+            route = scope.get("path") or "unknown"
             if not math.isnan(duration_seconds):
-                METRICS.observe_latency(route, duration_seconds)
+                state = scope.get("state", {})
+                exemplar = None
+                if SLOW_REQUESTS.is_slow(duration_seconds):
+                    self._record_slow(scope, state, response, duration_seconds)
+                    corr_id = state.get("correlation_id")
+                    if corr_id:
+                        exemplar = (("corr_id", corr_id[:MAX_EXEMPLAR_CORR_ID]),)
+                METRICS.observe_latency(route, duration_seconds, exemplar=exemplar)
+                LATENCY_SKETCHES.observe(
+                    route,
+                    "total",
+                    duration_seconds,
+                    state.get("api_key_id"),
+                )
+
+    @staticmethod
+    def _record_slow(scope: Scope, state: dict, response: dict, duration_seconds: float) -> None:
+        request_bytes = Headers(scope=scope).get("content-length")
+        SLOW_REQUESTS.record(
+            {
+                "corr_id": state.get("correlation_id"),
+                "api_key_id": state.get("api_key_id"),
+                "method": scope.get("method"),
+                "path": scope.get("path"),
+                "status": response["status"],
+                # DefaultOutcomeMiddleware (más externo) completa "ok" después.
+                "outcome": response["outcome"] or "ok",
+                "outcome_detail": response["outcome_detail"] or None,
+                "duration_ms": round(duration_seconds * 1000, 3),
+                "stage_ms": state.get("stage_ms"),
+                "providers": state.get("providers"),
+                "request_bytes": int(request_bytes) if request_bytes and request_bytes.isdigit() else None,
+                "audio_bytes": state.get("audio_bytes"),
+                "response_bytes": response["bytes"],
+            }
+        )
@@ -0,0 +1,61 @@
+import uuid
+from typing import Any
+
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from bot_neutro.tracing import TRACER
+
+
+class TracingMiddleware:
+    """Open the root span of a sampled request, keyed by X-Correlation-Id."""
+
+    header_name = "X-Correlation-Id"
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not TRACER.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        state = scope.setdefault("state", {})
+        correlation_id = (
+            Headers(scope=scope).get(self.header_name)
+            or state.get("correlation_id")
+            or str(uuid.uuid4())
+        )
+        # CorrelationIdMiddleware reutiliza este id para que trace y respuesta coincidan.
+        state["correlation_id"] = correlation_id
+
+        with TRACER.start_trace(
+            "http.request",
+            correlation_id,
+            **{"http.method": scope["method"], "http.path": scope["path"]},
+        ) as root:
+            if root is None:
+                await self.app(scope, receive, send)
+                return
+
+            async def send_capturing_status(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    root.set_attribute("http.status_code", message["status"])
+                await send(message)
+
+            await self.app(scope, receive, send_capturing_status)
+
+
+class TracedMiddleware:
+    """Wrap another ASGI middleware in a child span named after its class."""
+
+    def __init__(self, app: ASGIApp, wrapped: type, **options: Any) -> None:
+        self.app = wrapped(app, **options)
+        self.span_name = f"middleware.{wrapped.__name__}"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not TRACER.enabled:
+            await self.app(scope, receive, send)
+            return
+        with TRACER.span(self.span_name):
+            await self.app(scope, receive, send)
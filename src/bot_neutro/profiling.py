@@ -0,0 +1,118 @@
+"""Sampling profiler over every thread of the process (incluye el event loop).
+
+Un thread de fondo lee `sys._current_frames()` cada `interval` segundos y
+acumula los stacks; no instrumenta llamadas, así que el overhead depende solo
+del intervalo. El resultado se exporta como stacks colapsados (formato de
+flamegraph.pl / speedscope) o como dump `pstats` (marshal) con tiempos
+estimados por muestreo (cada muestra pesa el tiempo real transcurrido desde la
+anterior, así el GIL retrasando al profiler no subestima los tiempos).
+"""
+
+from __future__ import annotations
+
+import marshal
+import sys
+import threading
+import time
+from collections import Counter
+from types import FrameType
+from typing import Dict, List, Optional, Tuple
+
+FunctionKey = Tuple[str, int, str]
+
+MAX_STACK_DEPTH = 128
+
+
+def _function_key(frame: FrameType) -> FunctionKey:
+    code = frame.f_code
+    return (code.co_filename, code.co_firstlineno, code.co_name)
+
+
+class SamplingProfiler:
+    """Collect stack samples from all threads for a bounded window."""
+
+    def __init__(self, interval: float = 0.005) -> None:
+        self.interval = interval
+        self.samples = 0
+        self.duration = 0.0
+        self._stacks: Counter[Tuple[str, Tuple[FunctionKey, ...]]] = Counter()
+        self._seconds: Dict[Tuple[str, Tuple[FunctionKey, ...]], float] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="bot-neutro-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        started = last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            weight, last = now - last, now
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack: List[FunctionKey] = []
+                current: Optional[FrameType] = frame
+                while current is not None and len(stack) < MAX_STACK_DEPTH:
+                    stack.append(_function_key(current))
+                    current = current.f_back
+                stack.reverse()
+                key = (names.get(thread_id, str(thread_id)), tuple(stack))
+                self._stacks[key] += 1
+                self._seconds[key] = self._seconds.get(key, 0.0) + weight
+            self.samples += 1
+        self.duration = time.perf_counter() - started
+
+    def collapsed(self) -> str:
+        """`thread;root;...;leaf count` por línea."""
+
+        lines = []
+        for (thread_name, stack), count in self._stacks.most_common():
+            frames = ";".join(f"{name} ({filename}:{line})" for filename, line, name in stack)
+            lines.append(f"{thread_name};{frames} {count}")
+        return "\n".join(lines) + ("\n" if lines else "")
+
+    def pstats_dump(self) -> bytes:
+        """Marshal dump loadable with `pstats.Stats(path)`; `ncalls` = muestras."""
+
+        stats: Dict[FunctionKey, list] = {}
+
+        def entry(key: FunctionKey) -> list:
+            if key not in stats:
+                stats[key] = [0, 0, 0.0, 0.0, {}]
+            return stats[key]
+
+        for sample_key, count in self._stacks.items():
+            stack = sample_key[1]
+            if not stack:
+                continue
+            elapsed = self._seconds[sample_key]
+            leaf = entry(stack[-1])
+            leaf[2] += elapsed
+            seen = set()
+            for depth, key in enumerate(stack):
+                if key in seen:
+                    continue  # recursión: el tiempo acumulado se cuenta una vez
+                seen.add(key)
+                current = entry(key)
+                current[0] += count
+                current[1] += count
+                current[3] += elapsed
+                if depth > 0:
+                    caller = stack[depth - 1]
+                    cc, nc, tt, ct = current[4].get(caller, (0, 0, 0.0, 0.0))
+                    tt += elapsed if depth == len(stack) - 1 else 0.0
+                    current[4][caller] = (cc + count, nc + count, tt, ct + elapsed)
+
+        return marshal.dumps({key: tuple(value) for key, value in stats.items()})
+
+
+__all__ = ["SamplingProfiler"]
@@ -1,7 +1,12 @@
-from .interfaces import LLMProvider, STTProvider, STTResult, TTSProvider, TTSResult
+from .interfaces import LLMProvider, LLMResult, STTProvider, STTResult, TTSProvider, TTSResult
 from .stub import StubLLMProvider, StubSTTProvider, StubTTSProvider
-from .factory import build_llm_provider, build_stt_provider, build_tts_provider, get_llm_provider
+from .factory import ProviderSettings, build_llm_provider, build_stt_provider, build_tts_provider, get_llm_provider
 from .openai_llm import OpenAILLMProvider
+from .segmented import SegmentationSettings, SegmentedSTTProvider
+from .tts_cache import CachingTTSProvider, TTSCacheSettings
+from .llm_cache import CachingLLMProvider, LLMCacheSettings
+from .circuit_breaker import CircuitBreaker, CircuitBreakerSettings, CircuitOpenError
+from .hedging import HedgedSTTProvider, HedgedTTSProvider, HedgingSettings
 
 __all__ = [
     "LLMProvider",
@@ -9,6 +14,7 @@ __all__ = [
     "TTSProvider",
     "STTResult",
     "TTSResult",
+    "LLMResult",
     "StubLLMProvider",
     "StubSTTProvider",
     "StubTTSProvider",
@@ -17,4 +23,17 @@ __all__ = [
     "build_tts_provider",
     "get_llm_provider",
     "OpenAILLMProvider",
+    "ProviderSettings",
+    "SegmentationSettings",
+    "SegmentedSTTProvider",
+    "CachingTTSProvider",
+    "TTSCacheSettings",
+    "CachingLLMProvider",
+    "LLMCacheSettings",
+    "CircuitBreaker",
+    "CircuitBreakerSettings",
+    "CircuitOpenError",
+    "HedgedSTTProvider",
+    "HedgedTTSProvider",
+    "HedgingSettings",
 ]
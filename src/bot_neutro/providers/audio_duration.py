@@ -0,0 +1,44 @@
+"""Audio duration from a WAV header, without decoding or copying the audio.
+
+Alcanza con el header (primer chunk del upload): `byte_rate` del chunk
+`fmt ` y el tamaño del chunk `data`, acotado por lo que realmente llegó
+(`total_bytes`, por defecto `len(header)`). Los WAV grabados en streaming
+suelen declarar 0 o 0xFFFFFFFF: ahí cuenta todo lo recibido.
+"""
+
+from __future__ import annotations
+
+import struct
+from typing import Optional, Union
+
+BytesLike = Union[bytes, bytearray, memoryview]
+
+_STREAMING_SIZES = (0, 0xFFFFFFFF)
+
+
+def wav_duration_seconds(header: BytesLike, total_bytes: Optional[int] = None) -> Optional[float]:
+    """Seconds of audio in a RIFF/WAVE payload; None if `header` is not WAV."""
+
+    data = bytes(header[:4096])
+    if len(data) < 12 or data[:4] != b"RIFF" or data[8:12] != b"WAVE":
+        return None
+    byte_rate = 0
+    offset = 12
+    while offset + 8 <= len(data):
+        chunk_id = data[offset : offset + 4]
+        (chunk_size,) = struct.unpack_from("<I", data, offset + 4)
+        body = offset + 8
+        if chunk_id == b"fmt " and body + 12 <= len(data):
+            (byte_rate,) = struct.unpack_from("<I", data, body + 8)
+        elif chunk_id == b"data":
+            if not byte_rate:
+                return None
+            available = max(0, (len(header) if total_bytes is None else total_bytes) - body)
+            size = available if chunk_size in _STREAMING_SIZES else min(chunk_size, available)
+            return size / byte_rate
+        # Los chunks RIFF se alinean a 2 bytes.
+        offset = body + chunk_size + (chunk_size & 1)
+    return None
+
+
+__all__ = ["wav_duration_seconds"]
@@ -5,16 +5,35 @@ variables de entorno `AUDIO_STT_PROVIDER`/`AUDIO_TTS_PROVIDER` se fijan a
 `azure` y existen las credenciales necesarias. Las importaciones del SDK de
 Azure son perezosas para no impactar entornos sin la dependencia instalada
 cuando se usa el modo stub.
+
+Los `SpeechConfig` se crean una vez por locale (STT) o (locale, voz, formato) (TTS).
+Synthesizers y recognizers salen de un `_WarmPool` acotado con la conexión
+ya abierta (`Connection.open`), así el handshake y la auth no caen en cada
+request. Un synthesizer vuelve al pool tras un request exitoso; un
+recognizer queda atado a su stream de entrada, así que es de un solo uso y
+el pool repone otro en background. `warm_up()` llena al arrancar el pool del
+locale por defecto de `/audio` (`DEFAULT_LOCALE`).
+
+El formato de salida del TTS (WAV, Ogg/Opus, MP3) se fija en el
+`SpeechConfig`; el `bytes` de `audio_data` se devuelve tal cual, sin otra copia.
 """
 
 from __future__ import annotations
 
 import os
 import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import Optional
+from threading import Lock
+from typing import Callable, Deque, Dict, Generic, Hashable, Iterable, Iterator, List, Optional, Tuple, TypeVar, Union
 
-from .interfaces import LLMProvider, STTProvider, STTResult, TTSProvider, TTSResult
+from ..metrics_runtime import METRICS
+from .audio_duration import wav_duration_seconds
+from .interfaces import DEFAULT_LOCALE, LLMProvider, STTProvider, STTResult, TTSProvider, TTSResult
+from .tts_formats import DEFAULT_TTS_FORMAT, TTSOutputFormat, get_tts_format
 
 
 logger = logging.getLogger("bot_neutro")
@@ -26,20 +45,240 @@ class AzureSpeechConfig:
     region: str
     stt_language_default: str
     tts_voice_default: str
+    # Objetos calientes por locale/voz (0 = sin pool, como antes).
+    pool_size: int = 4
+    warmup: bool = True
+    # `continuous` devuelve todas las frases; `once` corta en la primera.
+    stt_mode: str = "continuous"
+    stt_timeout_seconds: float = 60.0
+    tts_output_format: str = DEFAULT_TTS_FORMAT
 
 
 class AzureProviderError(RuntimeError):
     """Errores específicos de Azure que permiten diferenciar fallbacks."""
 
 
+def _pool_settings_from_env() -> Tuple[int, bool]:
+    try:
+        pool_size = max(0, int(os.getenv("AZURE_SPEECH_POOL_SIZE", "4")))
+    except ValueError:
+        pool_size = 4
+    return pool_size, os.getenv("AZURE_SPEECH_WARMUP", "1") != "0"
+
+
+def _stt_settings_from_env() -> Tuple[str, float]:
+    mode = os.getenv("AZURE_SPEECH_STT_MODE", "continuous").strip().lower()
+    try:
+        timeout = float(os.getenv("AZURE_SPEECH_STT_TIMEOUT_SECONDS", "60"))
+    except ValueError:
+        timeout = 60.0
+    return ("once" if mode == "once" else "continuous"), max(1.0, timeout)
+
+
+T = TypeVar("T")
+
+_REFILL_EXECUTOR: Optional[ThreadPoolExecutor] = None
+_REFILL_EXECUTOR_LOCK = Lock()
+
+
+def _refill_executor() -> ThreadPoolExecutor:
+    global _REFILL_EXECUTOR
+    with _REFILL_EXECUTOR_LOCK:
+        if _REFILL_EXECUTOR is None:
+            _REFILL_EXECUTOR = ThreadPoolExecutor(max_workers=2, thread_name_prefix="azure-speech-warm")
+        return _REFILL_EXECUTOR
+
+
+def _elapsed_ms(started: float) -> int:
+    return int((time.perf_counter() - started) * 1000)
+
+
+def _close_quietly(items: Iterable[object]) -> None:
+    """Close warm objects dropped from a pool (su conexión no espera al GC)."""
+
+    for item in items:
+        close = getattr(item, "close", None)
+        if close is None:
+            continue
+        try:
+            close()
+        except Exception as exc:  # pragma: no cover - depende del SDK/red
+            logger.warning("azure_speech_close_failed", extra={"exc_type": type(exc).__name__})
+
+
+class _WarmPool(Generic[T]):
+    """Bounded idle objects per key; misses are built on the caller's thread.
+
+    Guarda hasta `size` objetos por key y hasta `max_keys` keys (LRU): locale
+    y voz llegan del request, así que la cardinalidad no es confiable. Lo que
+    no entra (o sale por LRU) se cierra en el momento.
+    """
+
+    def __init__(self, provider_id: str, size: int, factory: Callable[[Hashable], T], max_keys: int = 8) -> None:
+        self.provider_id = provider_id
+        self.size = size
+        self.max_keys = max_keys
+        self._factory = factory
+        self._lock = Lock()
+        self._idle: "OrderedDict[Hashable, Deque[T]]" = OrderedDict()
+        self._refilling: Dict[Hashable, int] = {}
+
+    def idle(self, key: Hashable) -> int:
+        with self._lock:
+            return len(self._idle.get(key, ()))
+
+    def build(self, key: Hashable) -> T:
+        started = time.perf_counter()
+        item = self._factory(key)
+        METRICS.observe_speech_connection_setup(self.provider_id, time.perf_counter() - started)
+        return item
+
+    def acquire(self, key: Hashable) -> T:
+        item: Optional[T] = None
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                item = idle.popleft()
+                self._idle.move_to_end(key)
+        METRICS.inc_speech_pool_checkout(self.provider_id, "miss" if item is None else "hit")
+        return self.build(key) if item is None else item
+
+    def release(self, key: Hashable, item: T) -> bool:
+        dropped: List[T] = []
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle is None:
+                idle = self._idle[key] = deque()
+                while len(self._idle) > self.max_keys:
+                    dropped.extend(self._idle.popitem(last=False)[1])
+            self._idle.move_to_end(key)
+            kept = len(idle) < self.size
+            if kept:
+                idle.append(item)
+            else:
+                dropped.append(item)
+        # Cerrar puede bloquear en red: fuera del lock.
+        _close_quietly(dropped)
+        return kept
+
+    def fill(self, key: Hashable) -> int:
+        """Build objects until `size` are idle for `key` (bloqueante)."""
+
+        built = 0
+        while self.idle(key) < self.size:
+            if not self.release(key, self.build(key)):
+                break
+            built += 1
+        return built
+
+    def refill_async(self, key: Hashable) -> None:
+        """Replace a consumed single-use object off the request path."""
+
+        with self._lock:
+            pending = self._refilling.get(key, 0)
+            if self.size <= 0 or len(self._idle.get(key, ())) + pending >= self.size:
+                return
+            self._refilling[key] = pending + 1
+        _refill_executor().submit(self._refill_one, key)
+
+    def _refill_one(self, key: Hashable) -> None:
+        try:
+            self.release(key, self.build(key))
+        except Exception as exc:  # pragma: no cover - depende del SDK/red
+            logger.warning(
+                "azure_speech_refill_failed",
+                extra={"provider_id": self.provider_id, "exc_type": type(exc).__name__},
+            )
+        finally:
+            with self._lock:
+                remaining = self._refilling.get(key, 1) - 1
+                if remaining > 0:
+                    self._refilling[key] = remaining
+                else:
+                    self._refilling.pop(key, None)
+
+
+class _SpeechConfigCache:
+    """One `SpeechConfig` per key, LRU-bounded by `max_keys` like `_WarmPool`.
+
+    Se configuran al crearse y no se mutan después; un config desalojado
+    sigue vivo mientras algún objeto del pool lo use.
+    """
+
+    def __init__(self, build: Callable[[Hashable], object], max_keys: int = 8) -> None:
+        self._build = build
+        self.max_keys = max_keys
+        self._lock = Lock()
+        self._configs: "OrderedDict[Hashable, object]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._configs)
+
+    def get(self, key: Hashable) -> object:
+        with self._lock:
+            config = self._configs.get(key)
+            if config is not None:
+                self._configs.move_to_end(key)
+                return config
+        # Construir fuera del lock: dos misses simultáneos de la misma key arman dos, gana el primero.
+        built = self._build(key)
+        with self._lock:
+            config = self._configs.setdefault(key, built)
+            self._configs.move_to_end(key)
+            while len(self._configs) > self.max_keys:
+                self._configs.popitem(last=False)
+        return config
+
+
+class _WarmRecognizer:
+    __slots__ = ("stream", "recognizer", "connection")
+
+    def __init__(self, stream, recognizer, connection) -> None:
+        self.stream = stream
+        self.recognizer = recognizer
+        self.connection = connection
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+class _WarmSynthesizer:
+    __slots__ = ("synthesizer", "connection")
+
+    def __init__(self, synthesizer, connection) -> None:
+        self.synthesizer = synthesizer
+        self.connection = connection
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+def _warm_up(provider_id: str, pool: _WarmPool, key: Hashable) -> None:
+    started = time.perf_counter()
+    try:
+        built = pool.fill(key)
+    except Exception as exc:  # pragma: no cover - depende del SDK/red
+        logger.warning("azure_speech_warmup_failed", extra={"provider_id": provider_id, "exc_type": type(exc).__name__})
+        return
+    logger.info(
+        "azure_speech_warmup",
+        extra={
+            "provider_id": provider_id,
+            "built": built,
+            "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+        },
+    )
+
+
 class AzureSTTProvider(STTProvider):
     provider_id = "azure-stt"
     latency_ms = 0
-    input_seconds = 0.0
 
     def __init__(self, config: AzureSpeechConfig, fallback: Optional[STTProvider] = None) -> None:
         self._config = config
         self._fallback = fallback
+        self._speech_configs = _SpeechConfigCache(self._build_speech_config)
+        self._pool: _WarmPool[_WarmRecognizer] = _WarmPool(self.provider_id, config.pool_size, self._build_recognizer)
 
     @staticmethod
     def _require_sdk():
@@ -61,6 +300,9 @@ class AzureSTTProvider(STTProvider):
         language_default = os.getenv("AZURE_SPEECH_STT_LANGUAGE_DEFAULT", "es-ES")
         voice_default = os.getenv("AZURE_SPEECH_TTS_VOICE_DEFAULT", "")
 
+        pool_size, warmup = _pool_settings_from_env()
+        stt_mode, stt_timeout = _stt_settings_from_env()
+
         if not key or not region:
             raise ValueError("Missing Azure Speech credentials: AZURE_SPEECH_KEY/AZURE_SPEECH_REGION")
 
@@ -75,30 +317,175 @@ class AzureSTTProvider(STTProvider):
                 region=region,
                 stt_language_default=language_default,
                 tts_voice_default=voice_default,
+                pool_size=pool_size,
+                warmup=warmup,
+                stt_mode=stt_mode,
+                stt_timeout_seconds=stt_timeout,
             ),
             fallback=fallback,
         )
 
-    def _transcribe_with_sdk(self, audio_bytes: bytes, locale: str) -> STTResult:
+    def _build_speech_config(self, locale: str):
         speechsdk = self._require_sdk()
-
         speech_config = speechsdk.SpeechConfig(subscription=self._config.key, region=self._config.region)
-        speech_config.speech_recognition_language = locale or self._config.stt_language_default
+        speech_config.speech_recognition_language = locale
+        return speech_config
 
+    def _build_recognizer(self, key: Tuple[str, bool]) -> _WarmRecognizer:
+        speechsdk = self._require_sdk()
+        locale, continuous = key
         stream = speechsdk.audio.PushAudioInputStream()
-        stream.write(audio_bytes)
-        stream.close()
-
         audio_config = speechsdk.audio.AudioConfig(stream=stream)
-        recognizer = speechsdk.SpeechRecognizer(speech_config=speech_config, audio_config=audio_config)
-        result = recognizer.recognize_once()
+        recognizer = speechsdk.SpeechRecognizer(
+            speech_config=self._speech_configs.get(locale), audio_config=audio_config
+        )
+        connection = speechsdk.Connection.from_recognizer(recognizer)
+        connection.open(continuous)
+        return _WarmRecognizer(stream, recognizer, connection)
+
+    def _pool_key(self, locale: str) -> Tuple[str, bool]:
+        return (locale or self._config.stt_language_default, self._config.stt_mode == "continuous")
+
+    def warm_up(self) -> None:
+        if self._config.warmup and self._config.pool_size > 0:
+            _warm_up(self.provider_id, self._pool, self._pool_key(DEFAULT_LOCALE))
+
+    def _transcribe_with_sdk(self, audio: Union[bytes, Iterable[bytes]], locale: str) -> STTResult:
+        chunks: Iterable[bytes] = (audio,) if isinstance(audio, (bytes, bytearray, memoryview)) else audio
+        key = self._pool_key(locale)
+        warm = self._pool.acquire(key)
+        # El recognizer queda atado a este stream: se repone uno nuevo fuera del request.
+        self._pool.refill_async(key)
+        try:
+            if key[1]:
+                return self._recognize_continuous(warm, chunks, key[0])
+            return self._recognize_once(warm, chunks, key[0])
+        finally:
+            _close_quietly((warm,))
+
+    @staticmethod
+    def _push(warm: _WarmRecognizer, chunks: Iterable[bytes]) -> Optional[float]:
+        """Write every chunk to the push stream; returns the WAV duration of what was sent.
+
+        `PushAudioInputStream.write` pasa el buffer por ctypes y solo acepta
+        `bytes`: una slice `memoryview` se copia, pero de a un chunk
+        (`STT_CHUNK_BYTES`), nunca el upload entero. Un chunk que ya es
+        `bytes` se pasa tal cual.
+        """
+
+        header: Optional[bytes] = None
+        total = 0
+        for chunk in chunks:
+            data = chunk if isinstance(chunk, bytes) else bytes(chunk)
+            if header is None:
+                header = data[:4096]
+            total += len(data)
+            warm.stream.write(data)
+        warm.stream.close()
+        return wav_duration_seconds(header, total) if header is not None else None
+
+    def _recognize_continuous(self, warm: _WarmRecognizer, chunks: Iterable[bytes], locale: str) -> STTResult:
+        """Push chunks while the service recognizes; collect every final phrase.
+
+        Cada frase final se guarda con su offset/duración en el audio y el
+        momento en que llegó (`final_ms`, desde el inicio del request a STT).
+        """
+
+        speechsdk = self._require_sdk()
+        started = time.perf_counter()
+        segments: List[Dict[str, object]] = []
+        partials: Dict[str, Optional[float]] = {"count": 0, "first_ms": None}
+        errors: List[str] = []
+        done = threading.Event()
+
+        def elapsed_ms() -> float:
+            return round((time.perf_counter() - started) * 1000, 3)
+
+        def on_recognizing(evt) -> None:
+            partials["count"] += 1
+            if partials["first_ms"] is None:
+                partials["first_ms"] = elapsed_ms()
+
+        def on_recognized(evt) -> None:
+            result = evt.result
+            if result.reason == speechsdk.ResultReason.RecognizedSpeech and result.text:
+                segments.append(
+                    {
+                        "text": result.text,
+                        # El SDK reporta offset/duración en ticks de 100 ns.
+                        "offset_ms": result.offset / 10_000,
+                        "duration_ms": result.duration / 10_000,
+                        "final_ms": elapsed_ms(),
+                    }
+                )
+
+        def on_canceled(evt) -> None:
+            if evt.reason == speechsdk.CancellationReason.Error:
+                errors.append(f"{evt.reason}; {getattr(evt, 'error_details', None)}")
+            done.set()
+
+        recognizer = warm.recognizer
+        recognizer.recognizing.connect(on_recognizing)
+        recognizer.recognized.connect(on_recognized)
+        recognizer.canceled.connect(on_canceled)
+        recognizer.session_stopped.connect(lambda evt: done.set())
+        recognizer.start_continuous_recognition()
+        try:
+            input_seconds = self._push(warm, chunks)
+            finished = done.wait(self._config.stt_timeout_seconds)
+        finally:
+            recognizer.stop_continuous_recognition()
+
+        if errors:
+            logger.warning(
+                "azure_stt_canceled",
+                extra={"provider_id": self.provider_id, "locale": locale, "error_details": errors[0]},
+            )
+            raise AzureProviderError(f"Azure STT canceled: {errors[0]}")
+        if not finished:
+            raise TimeoutError(f"Azure STT continuous recognition exceeded {self._config.stt_timeout_seconds}s")
+        if not segments:
+            logger.warning(
+                "azure_stt_no_match",
+                extra={"provider_id": self.provider_id, "locale": locale, "reason": "NoMatch"},
+            )
+            raise AzureProviderError("Azure STT returned NoMatch")
+
+        text = " ".join(str(segment["text"]) for segment in segments)
+        raw_transcript = {
+            "text": text,
+            "reason": "RecognizedSpeech",
+            "mode": "continuous",
+            "segments": segments,
+            "partials": partials["count"],
+            "first_partial_ms": partials["first_ms"],
+        }
+        if input_seconds is None:
+            # Audio no WAV: el final de la última frase reconocida es la mejor cota.
+            input_seconds = max(float(seg["offset_ms"]) + float(seg["duration_ms"]) for seg in segments) / 1000
+        return STTResult(
+            text=text, provider_id=self.provider_id, raw_transcript=raw_transcript, input_seconds=input_seconds
+        )
+
+    def _recognize_once(self, warm: _WarmRecognizer, chunks: Iterable[bytes], locale: str) -> STTResult:
+        speechsdk = self._require_sdk()
+        input_seconds = self._push(warm, chunks)
+        result = warm.recognizer.recognize_once()
 
         if result.reason == speechsdk.ResultReason.RecognizedSpeech:
             raw_transcript = {
                 "text": result.text,
                 "reason": getattr(result.reason, "name", str(result.reason)),
             }
-            return STTResult(text=result.text, provider_id=self.provider_id, raw_transcript=raw_transcript)
+            if input_seconds is None:
+                # offset/duración del SDK vienen en ticks de 100 ns.
+                input_seconds = (getattr(result, "offset", 0) + getattr(result, "duration", 0)) / 10_000_000
+            return STTResult(
+                text=result.text,
+                provider_id=self.provider_id,
+                raw_transcript=raw_transcript,
+                input_seconds=input_seconds,
+            )
 
         if result.reason == speechsdk.ResultReason.NoMatch:
             logger.warning(
@@ -129,8 +516,22 @@ class AzureSTTProvider(STTProvider):
         raise AzureProviderError("Azure STT returned unknown result")
 
     def transcribe(self, audio_bytes: bytes, locale: str) -> STTResult:
+        return self.transcribe_stream((audio_bytes,), locale)
+
+    def transcribe_stream(self, chunks: Iterable[bytes], locale: str) -> STTResult:
+        remaining = iter(chunks)
+        consumed: List[bytes] = []
+
+        def tee() -> Iterator[bytes]:
+            for chunk in remaining:
+                consumed.append(chunk)
+                yield chunk
+
+        started = time.perf_counter()
         try:
-            return self._transcribe_with_sdk(audio_bytes, locale)
+            result = self._transcribe_with_sdk(tee(), locale)
+            result.latency_ms = _elapsed_ms(started)
+            return result
         except Exception as exc:  # pragma: no cover - exercised via fallback tests
             logger.warning(
                 "azure_stt_error",
@@ -144,9 +545,10 @@ class AzureSTTProvider(STTProvider):
             if not self._fallback:
                 raise
 
+            audio_bytes = b"".join(consumed) + b"".join(remaining)
             fallback_result = self._fallback.transcribe(audio_bytes, locale)
-            self.latency_ms = getattr(self._fallback, "latency_ms", self.latency_ms)
-            self.input_seconds = getattr(self._fallback, "input_seconds", self.input_seconds)
+            # Incluye el intento fallido: es lo que esperó el request.
+            fallback_result.latency_ms = _elapsed_ms(started)
             fallback_result.provider_id = f"{self.provider_id}|{fallback_result.provider_id}"
             return fallback_result
 
@@ -154,11 +556,14 @@ class AzureSTTProvider(STTProvider):
 class AzureTTSProvider(TTSProvider):
     provider_id = "azure-tts"
     latency_ms = 0
-    output_seconds = 0.0
 
     def __init__(self, config: AzureSpeechConfig, fallback: Optional[TTSProvider] = None) -> None:
         self._config = config
         self._fallback = fallback
+        self._speech_configs = _SpeechConfigCache(self._build_speech_config)
+        self._pool: _WarmPool[_WarmSynthesizer] = _WarmPool(
+            self.provider_id, config.pool_size, self._build_synthesizer
+        )
 
     @staticmethod
     def _require_sdk():
@@ -173,6 +578,8 @@ class AzureTTSProvider(TTSProvider):
         language_default = os.getenv("AZURE_SPEECH_STT_LANGUAGE_DEFAULT", "es-ES")
         voice_default = os.getenv("AZURE_SPEECH_TTS_VOICE_DEFAULT", "es-ES-AlonsoNeural")
 
+        pool_size, warmup = _pool_settings_from_env()
+
         if not key or not region:
             raise ValueError("Missing Azure Speech credentials: AZURE_SPEECH_KEY/AZURE_SPEECH_REGION")
 
@@ -187,29 +594,80 @@ class AzureTTSProvider(TTSProvider):
                 region=region,
                 stt_language_default=language_default,
                 tts_voice_default=voice_default,
+                pool_size=pool_size,
+                warmup=warmup,
+                tts_output_format=get_tts_format(os.getenv("TTS_OUTPUT_FORMAT_DEFAULT")).name,
             ),
             fallback=fallback,
         )
 
-    def _synthesize_with_sdk(self, text: str, locale: str, voice: str | None = None) -> TTSResult:
+    def _build_speech_config(self, key: Tuple[str, str, str]):
         speechsdk = self._require_sdk()
-
+        locale, voice, format_name = key
         speech_config = speechsdk.SpeechConfig(subscription=self._config.key, region=self._config.region)
-        speech_config.speech_synthesis_language = locale or self._config.stt_language_default
-        speech_config.speech_synthesis_voice_name = voice or self._config.tts_voice_default
+        speech_config.speech_synthesis_language = locale
+        speech_config.speech_synthesis_voice_name = voice
+        speech_config.set_speech_synthesis_output_format(
+            getattr(speechsdk.SpeechSynthesisOutputFormat, get_tts_format(format_name).azure_format)
+        )
+        return speech_config
 
-        synthesizer = speechsdk.SpeechSynthesizer(speech_config=speech_config, audio_config=None)
-        result = synthesizer.speak_text_async(text).get()
+    def _build_synthesizer(self, key: Tuple[str, str, str]) -> _WarmSynthesizer:
+        speechsdk = self._require_sdk()
+        synthesizer = speechsdk.SpeechSynthesizer(speech_config=self._speech_configs.get(key), audio_config=None)
+        connection = speechsdk.Connection.from_speech_synthesizer(synthesizer)
+        connection.open(True)
+        return _WarmSynthesizer(synthesizer, connection)
+
+    @property
+    def cache_namespace(self) -> str:
+        """Defaults applied when a request omits locale/voz/formato (parte de la key del cache de TTS)."""
+
+        return ":".join(self._pool_key("", None))
+
+    def _pool_key(
+        self, locale: str, voice: str | None, output_format: Optional[TTSOutputFormat] = None
+    ) -> Tuple[str, str, str]:
+        return (
+            locale or self._config.stt_language_default,
+            voice or self._config.tts_voice_default,
+            (output_format or get_tts_format(self._config.tts_output_format)).name,
+        )
+
+    def warm_up(self) -> None:
+        if self._config.warmup and self._config.pool_size > 0:
+            _warm_up(self.provider_id, self._pool, self._pool_key(DEFAULT_LOCALE, None))
+
+    def _synthesize_with_sdk(
+        self, text: str, locale: str, voice: str | None = None, output_format: Optional[TTSOutputFormat] = None
+    ) -> TTSResult:
+        speechsdk = self._require_sdk()
+
+        key = self._pool_key(locale, voice, output_format)
+        warm = self._pool.acquire(key)
+        try:
+            result = warm.synthesizer.speak_text_async(text).get()
+        except Exception:
+            _close_quietly((warm,))
+            raise
 
         if result.reason == speechsdk.ResultReason.SynthesizingAudioCompleted:
-            audio_bytes = bytes(result.audio_data)
+            # Solo un synthesizer sano vuelve al pool; tras un error se descarta.
+            self._pool.release(key, warm)
+            # `audio_data` se lee una sola vez: el SDK arma un `bytes` nuevo en cada acceso.
+            audio_data = result.audio_data
+            audio_duration = getattr(result, "audio_duration", None)
             return TTSResult(
-                audio_bytes=audio_bytes,
-                audio_mime_type="audio/wav",
+                audio_bytes=audio_data,
+                audio_mime_type=get_tts_format(key[2]).mime_type,
                 provider_id=self.provider_id,
                 audio_url=None,
+                output_seconds=(
+                    audio_duration.total_seconds() if audio_duration is not None else wav_duration_seconds(audio_data)
+                ),
             )
 
+        _close_quietly((warm,))
         if result.reason == speechsdk.ResultReason.Canceled:
             details = speechsdk.SpeechSynthesisCancellationDetails.from_result(result)
             logger.warning(
@@ -228,9 +686,14 @@ class AzureTTSProvider(TTSProvider):
 
         raise AzureProviderError("Azure TTS returned unknown result")
 
-    def synthesize(self, text: str, locale: str, voice: str | None = None) -> TTSResult:
+    def synthesize(
+        self, text: str, locale: str, voice: str | None = None, output_format: Optional[TTSOutputFormat] = None
+    ) -> TTSResult:
+        started = time.perf_counter()
         try:
-            return self._synthesize_with_sdk(text, locale, voice)
+            result = self._synthesize_with_sdk(text, locale, voice, output_format)
+            result.latency_ms = _elapsed_ms(started)
+            return result
         except Exception as exc:  # pragma: no cover - exercised via fallback tests
             logger.warning(
                 "azure_tts_error",
@@ -245,9 +708,8 @@ class AzureTTSProvider(TTSProvider):
             if not self._fallback:
                 raise
 
-            fallback_result = self._fallback.synthesize(text, locale, voice)
-            self.latency_ms = getattr(self._fallback, "latency_ms", self.latency_ms)
-            self.output_seconds = getattr(self._fallback, "output_seconds", self.output_seconds)
+            fallback_result = self._fallback.synthesize(text, locale, voice, output_format)
+            fallback_result.latency_ms = _elapsed_ms(started)
             fallback_result.provider_id = f"{self.provider_id}|{fallback_result.provider_id}"
             return fallback_result
 
@@ -0,0 +1,286 @@
+"""Circuit breaker with fast fallback for STT, LLM and TTS providers.
+
+Cada provider primario (Azure, OpenAI) queda envuelto junto con su fallback
+(stub). Un `CircuitBreaker` cuenta fallas consecutivas: errores y, si
+`slow_seconds > 0`, llamadas exitosas pero más lentas que ese umbral. Al
+llegar a `failures` el circuito se abre y durante `open_seconds` los requests
+van directo al fallback, sin esperar el error o el timeout del primario.
+Después pasa a half-open: hasta `half_open_probes` requests prueban el
+primario; un éxito lo cierra y una falla lo vuelve a abrir.
+
+El `provider_id` de cada resultado dice quién respondió ese request
+(`azure-stt|stub-stt` tras fallback) y su `latency_ms` lo que esperó (tras
+un fallback incluye el intento fallido); nada se escribe en la instancia.
+"""
+
+from __future__ import annotations
+
+import itertools
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import Callable, Iterable, Iterator, Optional, Tuple, TypeVar
+
+from ..metrics_runtime import METRICS
+from .interfaces import LLMProvider, LLMResult, STTProvider, STTResult, TTSProvider, TTSResult
+from .tts_formats import TTSOutputFormat
+
+logger = logging.getLogger("bot_neutro")
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+T = TypeVar("T")
+
+
+class CircuitOpenError(RuntimeError):
+    """Circuito abierto y sin provider de fallback."""
+
+
+def _env_number(name: str, default: float) -> float:
+    try:
+        return max(0.0, float(os.getenv(name, str(default))))
+    except ValueError:
+        return default
+
+
+@dataclass(frozen=True)
+class BreakerSettings:
+    failures: int = 5
+    # 0 = la latencia no cuenta como falla.
+    slow_seconds: float = 0.0
+    open_seconds: float = 30.0
+    half_open_probes: int = 1
+
+    @classmethod
+    def from_env(cls, kind: str, default: "BreakerSettings") -> "BreakerSettings":
+        """`CIRCUIT_BREAKER_<KIND>_*` pisa el valor general `CIRCUIT_BREAKER_*`."""
+
+        def value(name: str, fallback: float) -> float:
+            general = _env_number(f"CIRCUIT_BREAKER_{name}", fallback)
+            return _env_number(f"CIRCUIT_BREAKER_{kind.upper()}_{name}", general)
+
+        return cls(
+            failures=max(1, int(value("FAILURES", default.failures))),
+            slow_seconds=value("SLOW_SECONDS", default.slow_seconds),
+            open_seconds=value("OPEN_SECONDS", default.open_seconds),
+            half_open_probes=max(1, int(value("HALF_OPEN_PROBES", default.half_open_probes))),
+        )
+
+
+@dataclass(frozen=True)
+class CircuitBreakerSettings:
+    enabled: bool = False
+    stt: BreakerSettings = field(default_factory=BreakerSettings)
+    llm: BreakerSettings = field(default_factory=BreakerSettings)
+    tts: BreakerSettings = field(default_factory=BreakerSettings)
+
+    @classmethod
+    def from_env(cls) -> "CircuitBreakerSettings":
+        default = BreakerSettings()
+        return cls(
+            enabled=os.getenv("CIRCUIT_BREAKER_ENABLED", "0") == "1",
+            stt=BreakerSettings.from_env("stt", default),
+            llm=BreakerSettings.from_env("llm", default),
+            tts=BreakerSettings.from_env("tts", default),
+        )
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, settings: BreakerSettings, clock: Callable[[], float] = time.monotonic) -> None:
+        self.name = name
+        self.settings = settings
+        self._clock = clock
+        self._lock = Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        METRICS.set_provider_circuit_state(name, _STATE_VALUES[CLOSED])
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and self._clock() - self._opened_at >= self.settings.open_seconds:
+                return HALF_OPEN
+            return self._state
+
+    def _set_state(self, state: str) -> None:
+        if state != self._state:
+            logger.warning(
+                "circuit_breaker_state",
+                extra={"provider_id": self.name, "from_state": self._state, "to_state": state},
+            )
+            self._state = state
+            METRICS.set_provider_circuit_state(self.name, _STATE_VALUES[state])
+
+    def allow(self) -> bool:
+        """True si este request puede ir al primario (en half-open cuenta como probe)."""
+
+        with self._lock:
+            if self._state == OPEN:
+                if self._clock() - self._opened_at < self.settings.open_seconds:
+                    return False
+                self._set_state(HALF_OPEN)
+                self._probes = 0
+            if self._state == HALF_OPEN:
+                if self._probes >= self.settings.half_open_probes:
+                    return False
+                self._probes += 1
+            return True
+
+    def record(self, ok: bool, elapsed: float) -> bool:
+        """Register a primary call; returns False when it counts as a failure."""
+
+        slow = self.settings.slow_seconds > 0 and elapsed > self.settings.slow_seconds
+        success = ok and not slow
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probes = max(0, self._probes - 1)
+            if success:
+                self._failures = 0
+                self._set_state(CLOSED)
+                return True
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.settings.failures:
+                self._opened_at = self._clock()
+                self._set_state(OPEN)
+        return False
+
+
+class _Guarded:
+    """Shared call path: primario si el circuito lo permite, fallback si no o si falla."""
+
+    def __init__(self, primary, fallback, breaker: CircuitBreaker) -> None:
+        self.primary = primary
+        self.fallback = fallback
+        self.breaker = breaker
+
+    @property
+    def provider_id(self) -> str:
+        return self.primary.provider_id
+
+    def warm_up(self) -> None:
+        self.primary.warm_up()
+        if self.fallback is not None:
+            self.fallback.warm_up()
+
+    def _run(self, primary_call: Callable[[], T], fallback_call: Callable[[], T]) -> Tuple[T, bool]:
+        """Returns (result, served_by_fallback)."""
+
+        started = time.perf_counter()
+        if not self.breaker.allow():
+            return self._timed(self._fall_back(fallback_call, "open", None), started, True), True
+        try:
+            result = primary_call()
+        except Exception as exc:
+            # El primario ya loguea su error; acá solo cuenta para el breaker.
+            self.breaker.record(False, time.perf_counter() - started)
+            return self._timed(self._fall_back(fallback_call, "error", exc), started, True), True
+        self.breaker.record(True, time.perf_counter() - started)
+        return self._timed(result, started, False), False
+
+    @staticmethod
+    def _timed(result: T, started: float, fell_back: bool) -> T:
+        """Set `latency_ms` on a result unless the primary already reported its own."""
+
+        if hasattr(result, "latency_ms") and (fell_back or result.latency_ms is None):
+            result.latency_ms = int((time.perf_counter() - started) * 1000)
+        return result
+
+    def _fall_back(self, fallback_call: Callable[[], T], reason: str, exc: Optional[Exception]) -> T:
+        if self.fallback is None:
+            if exc is not None:
+                raise exc
+            raise CircuitOpenError(f"{self.primary.provider_id} circuit open")
+        METRICS.inc_provider_fallback(self.primary.provider_id, reason)
+        return fallback_call()
+
+    def _fallback_id(self, fallback_id: str) -> str:
+        return f"{self.primary.provider_id}|{fallback_id}"
+
+
+class GuardedSTTProvider(_Guarded, STTProvider):
+    def transcribe(self, audio_bytes: bytes, locale: str) -> STTResult:
+        return self.transcribe_stream((audio_bytes,), locale)
+
+    def transcribe_stream(self, chunks: Iterable[bytes], locale: str) -> STTResult:
+        # Slices del mismo upload: listarlas no copia audio y permite reintentar en el fallback.
+        chunks = list(chunks)
+        result, fell_back = self._run(
+            lambda: self.primary.transcribe_stream(chunks, locale),
+            lambda: self.fallback.transcribe_stream(chunks, locale),
+        )
+        if fell_back:
+            result.provider_id = self._fallback_id(result.provider_id)
+        return result
+
+
+class GuardedTTSProvider(_Guarded, TTSProvider):
+    @property
+    def cache_namespace(self) -> str:
+        return getattr(self.primary, "cache_namespace", self.primary.provider_id)
+
+    def synthesize(
+        self, text: str, locale: str, voice: str | None = None, output_format: Optional[TTSOutputFormat] = None
+    ) -> TTSResult:
+        result, fell_back = self._run(
+            lambda: self.primary.synthesize(text, locale, voice, output_format),
+            lambda: self.fallback.synthesize(text, locale, voice, output_format),
+        )
+        if fell_back:
+            result.provider_id = self._fallback_id(result.provider_id)
+        return result
+
+
+class GuardedLLMProvider(_Guarded, LLMProvider):
+    def model_for(self, tier: str) -> str:
+        model_for = getattr(self.primary, "model_for", None)
+        return model_for(tier) if model_for is not None else self.primary.provider_id
+
+    def generate_reply(self, transcript: str, context: dict) -> str:
+        return self.generate(transcript, context).text
+
+    def generate(self, transcript: str, context: dict) -> LLMResult:
+        result, fell_back = self._run(
+            lambda: self.primary.generate(transcript, context),
+            lambda: self.fallback.generate(transcript, context),
+        )
+        if fell_back:
+            return LLMResult(
+                text=result.text, provider_id=self._fallback_id(result.provider_id), latency_ms=result.latency_ms
+            )
+        return result
+
+    def generate_stream(self, transcript: str, context: dict) -> Iterator[str]:
+        # El breaker mide hasta el primer delta; después no hay fallback posible.
+        stream = iter(self.primary.generate_stream(transcript, context))
+
+        def first_delta() -> Iterator[str]:
+            first = next(stream, None)
+            return stream if first is None else itertools.chain((first,), stream)
+
+        deltas, _ = self._run(first_delta, lambda: self.fallback.generate_stream(transcript, context))
+        yield from deltas
+
+
+def guard(kind: str, primary, fallback, settings: CircuitBreakerSettings):
+    """Wrap `primary` (`kind`: stt/llm/tts) with its own breaker and fallback."""
+
+    wrapper = {"stt": GuardedSTTProvider, "llm": GuardedLLMProvider, "tts": GuardedTTSProvider}[kind]
+    breaker = CircuitBreaker(primary.provider_id, getattr(settings, kind))
+    return wrapper(primary, fallback, breaker)
+
+
+__all__ = [
+    "BreakerSettings",
+    "CircuitBreaker",
+    "CircuitBreakerSettings",
+    "CircuitOpenError",
+    "GuardedLLMProvider",
+    "GuardedSTTProvider",
+    "GuardedTTSProvider",
+    "guard",
+]
@@ -1,34 +1,92 @@
 import logging
 import os
+from dataclasses import dataclass, field
+from typing import Optional
 
 from .azure import AzureSTTProvider, AzureTTSProvider
+from .circuit_breaker import CircuitBreakerSettings, guard
+from .hedging import HedgedSTTProvider, HedgedTTSProvider, HedgingSettings
 from .interfaces import LLMProvider, STTProvider, TTSProvider
+from .llm_cache import CachingLLMProvider, LLMCacheSettings
 from .openai_llm import OpenAILLMProvider
+from .segmented import SegmentationSettings, SegmentedSTTProvider
 from .stub import StubLLMProvider, StubSTTProvider, StubTTSProvider
+from .tts_cache import CachingTTSProvider, TTSCacheSettings
 
 logger = logging.getLogger(__name__)
 
 
-def build_stt_provider() -> STTProvider:
-    provider_name = os.getenv("AUDIO_STT_PROVIDER", "stub").lower()
-    if provider_name == "azure":
+@dataclass(frozen=True)
+class ProviderSettings:
+    """Provider selection; las credenciales las lee cada `from_env` al construir."""
+
+    stt: str = "stub"
+    tts: str = "stub"
+    llm: str = "stub"
+    stt_segmentation: SegmentationSettings = field(default_factory=SegmentationSettings)
+    tts_cache: TTSCacheSettings = field(default_factory=TTSCacheSettings)
+    llm_cache: LLMCacheSettings = field(default_factory=LLMCacheSettings)
+    circuit_breaker: CircuitBreakerSettings = field(default_factory=CircuitBreakerSettings)
+    hedging: HedgingSettings = field(default_factory=HedgingSettings)
+
+    @classmethod
+    def from_env(cls) -> "ProviderSettings":
+        return cls(
+            stt=os.getenv("AUDIO_STT_PROVIDER", "stub").lower(),
+            tts=os.getenv("AUDIO_TTS_PROVIDER", "stub").lower(),
+            llm=os.getenv("LLM_PROVIDER", "stub").lower(),
+            stt_segmentation=SegmentationSettings.from_env(),
+            tts_cache=TTSCacheSettings.from_env(),
+            llm_cache=LLMCacheSettings.from_env(),
+            circuit_breaker=CircuitBreakerSettings.from_env(),
+            hedging=HedgingSettings.from_env(),
+        )
+
+
+def build_stt_provider(settings: Optional[ProviderSettings] = None) -> STTProvider:
+    settings = settings or ProviderSettings.from_env()
+    provider: STTProvider
+    if settings.stt == "azure" and settings.circuit_breaker.enabled:
+        # Con breaker el fallback lo decide el wrapper, no el provider.
+        provider = guard("stt", AzureSTTProvider.from_env(), StubSTTProvider(), settings.circuit_breaker)
+    elif settings.stt == "azure":
         fallback = StubSTTProvider()
-        return AzureSTTProvider.from_env(fallback=fallback)
-    return StubSTTProvider()
+        provider = AzureSTTProvider.from_env(fallback=fallback)
+    else:
+        provider = StubSTTProvider()
+    if settings.hedging.enabled_for("stt"):
+        # Por dentro del segmentado: cada segmento se hedgea por separado.
+        fan_out = settings.stt_segmentation.parallelism if settings.stt_segmentation.min_seconds > 0 else 1
+        provider = HedgedSTTProvider(provider, settings.hedging, fan_out=fan_out)
+    if settings.stt_segmentation.min_seconds > 0:
+        return SegmentedSTTProvider(provider, settings.stt_segmentation)
+    return provider
 
 
-def build_tts_provider() -> TTSProvider:
-    provider_name = os.getenv("AUDIO_TTS_PROVIDER", "stub").lower()
-    if provider_name == "azure":
+def build_tts_provider(settings: Optional[ProviderSettings] = None) -> TTSProvider:
+    settings = settings or ProviderSettings.from_env()
+    provider: TTSProvider
+    if settings.tts == "azure" and settings.circuit_breaker.enabled:
+        provider = guard("tts", AzureTTSProvider.from_env(), StubTTSProvider(), settings.circuit_breaker)
+    elif settings.tts == "azure":
         fallback = StubTTSProvider()
-        return AzureTTSProvider.from_env(fallback=fallback)
-    return StubTTSProvider()
+        provider = AzureTTSProvider.from_env(fallback=fallback)
+    else:
+        provider = StubTTSProvider()
+    if settings.hedging.enabled_for("tts"):
+        provider = HedgedTTSProvider(provider, settings.hedging)
+    if settings.tts_cache.enabled:
+        return CachingTTSProvider(provider, settings.tts_cache)
+    return provider
 
 
-def get_llm_provider() -> LLMProvider:
-    name = os.getenv("LLM_PROVIDER", "stub").lower()
+def get_llm_provider(settings: Optional[ProviderSettings] = None) -> LLMProvider:
+    settings = settings or ProviderSettings.from_env()
+    name = settings.llm
     if name in {"", "stub"}:
         return StubLLMProvider()
+    if name == "openai" and settings.circuit_breaker.enabled:
+        return guard("llm", OpenAILLMProvider.from_env(), StubLLMProvider(), settings.circuit_breaker)
     if name == "openai":
         fallback = StubLLMProvider()
         return OpenAILLMProvider.from_env(fallback=fallback)
@@ -37,8 +95,18 @@ def get_llm_provider() -> LLMProvider:
     return StubLLMProvider()
 
 
-def build_llm_provider() -> LLMProvider:
-    return get_llm_provider()
+def build_llm_provider(settings: Optional[ProviderSettings] = None) -> LLMProvider:
+    settings = settings or ProviderSettings.from_env()
+    provider = get_llm_provider(settings)
+    if settings.llm_cache.enabled:
+        return CachingLLMProvider(provider, settings.llm_cache)
+    return provider
 
 
-__all__ = ["build_stt_provider", "build_tts_provider", "build_llm_provider", "get_llm_provider"]
+__all__ = [
+    "ProviderSettings",
+    "build_stt_provider",
+    "build_tts_provider",
+    "build_llm_provider",
+    "get_llm_provider",
+]
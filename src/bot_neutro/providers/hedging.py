@@ -0,0 +1,314 @@
+"""Hedged STT/TTS calls to cut provider tail latency.
+
+`HedgedSTTProvider` / `HedgedTTSProvider` lanzan la llamada al provider y, si
+no respondió dentro de su propio p90 (`quantile`, medido con un `DDSketch`
+por ventana), lanzan un segundo intento idéntico. Gana el primer resultado
+exitoso; el perdedor se cancela si todavía no arrancó y, si ya estaba
+corriendo, su resultado se descarta y su tiempo se cuenta como trabajo
+desperdiciado.
+
+La tasa de hedges está acotada por un presupuesto tipo token bucket: cada
+request deposita `budget_ratio` tokens y cada hedge consume uno. Solo STT y
+TTS: son idempotentes y baratos de repetir; un LLM duplicaría tokens.
+
+El primario tiene que correr en el pool para que el caller pueda volver con
+el hedge si gana. El pool se dimensiona para un primario y un hedge por
+llamada en vuelo (`AUDIO_MAX_CONCURRENCY`, por el fan-out del STT
+segmentado) y nunca encola: sin thread libre el primario corre en el thread
+del caller, sin hedge, y un hedge sin thread no se lanza
+(`outcome="pool_exhausted"`). Encolar inflaría la latencia medida y
+dispararía más hedges.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from threading import Lock
+from typing import Callable, Dict, Generic, Iterable, Optional, Tuple, TypeVar
+
+from ..audio_scheduler import SchedulerSettings
+from ..latency_sketch import DDSketch
+from ..metrics_runtime import METRICS
+from .interfaces import STTProvider, STTResult, TTSProvider, TTSResult
+from .tts_formats import TTSOutputFormat
+
+HEDGEABLE_KINDS = ("stt", "tts")
+# Tope del bucket: cuántos hedges seguidos se permiten tras un período tranquilo.
+MAX_BUDGET_TOKENS = 10.0
+
+P = TypeVar("P")
+T = TypeVar("T")
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return max(0.0, float(os.getenv(name, str(default))))
+    except ValueError:
+        return default
+
+
+@dataclass(frozen=True)
+class HedgingSettings:
+    # Vacío (default) desactiva el hedging; valores válidos: stt, tts.
+    kinds: Tuple[str, ...] = ()
+    quantile: float = 0.9
+    # Fracción máxima de requests que pueden lanzar un hedge.
+    budget_ratio: float = 0.05
+    # Sin suficientes muestras el p90 no es confiable: no se hedgea.
+    min_samples: int = 20
+    window_seconds: float = 300.0
+    # 0 = derivar del tope de llamadas en vuelo (`workers_for`).
+    max_workers: int = 0
+    # Requests de /audio en paralelo por worker (`AUDIO_MAX_CONCURRENCY`).
+    concurrency: int = 32
+
+    def enabled_for(self, kind: str) -> bool:
+        return kind in self.kinds and self.budget_ratio > 0
+
+    def workers_for(self, fan_out: int = 1) -> int:
+        """Pool size: a primary and a hedge for each call that can be in flight."""
+
+        return self.max_workers or 2 * self.concurrency * max(1, fan_out)
+
+    @classmethod
+    def from_env(cls) -> "HedgingSettings":
+        kinds = tuple(
+            item.strip().lower()
+            for item in os.getenv("HEDGE_PROVIDERS", "").split(",")
+            if item.strip().lower() in HEDGEABLE_KINDS
+        )
+        return cls(
+            kinds=kinds,
+            quantile=min(0.999, _env_float("HEDGE_QUANTILE", 0.9)),
+            budget_ratio=min(1.0, _env_float("HEDGE_BUDGET_RATIO", 0.05)),
+            min_samples=max(1, int(_env_float("HEDGE_MIN_SAMPLES", 20))),
+            window_seconds=max(1.0, _env_float("HEDGE_WINDOW_SECONDS", 300.0)),
+            max_workers=int(_env_float("HEDGE_MAX_WORKERS", 0)),
+            concurrency=SchedulerSettings.from_env().capacity,
+        )
+
+
+class LatencyWindow:
+    """Latencias del provider en la ventana actual y la anterior."""
+
+    def __init__(self, window_seconds: float, clock: Callable[[], float] = time.monotonic) -> None:
+        self.window_seconds = window_seconds
+        self._clock = clock
+        self._lock = Lock()
+        self._current = DDSketch()
+        self._previous = DDSketch()
+        self._started_at = clock()
+
+    def _rotate(self) -> None:
+        now = self._clock()
+        elapsed = now - self._started_at
+        if elapsed < self.window_seconds:
+            return
+        self._previous = self._current if elapsed < 2 * self.window_seconds else DDSketch()
+        self._current = DDSketch()
+        self._started_at = now
+
+    def add(self, seconds: float) -> None:
+        with self._lock:
+            self._rotate()
+            self._current.add(seconds)
+
+    def quantile(self, q: float, min_samples: int) -> Optional[float]:
+        with self._lock:
+            self._rotate()
+            merged = DDSketch()
+            merged.merge(self._previous)
+            merged.merge(self._current)
+        if merged.count < min_samples:
+            return None
+        return merged.quantile(q)
+
+
+class HedgeBudget:
+    def __init__(self, ratio: float, max_tokens: float = MAX_BUDGET_TOKENS) -> None:
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self._tokens = 0.0
+        self._lock = Lock()
+
+    def deposit(self) -> None:
+        with self._lock:
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def spend(self) -> bool:
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+class _Attempt:
+    __slots__ = ("provider", "is_hedge", "started", "elapsed")
+
+    def __init__(self, provider, is_hedge: bool = False) -> None:
+        self.provider = provider
+        self.is_hedge = is_hedge
+        self.started = 0.0
+        self.elapsed = 0.0
+
+
+class _Hedged(Generic[P]):
+    def __init__(
+        self,
+        primary: P,
+        settings: HedgingSettings,
+        clock: Callable[[], float] = time.monotonic,
+        fan_out: int = 1,
+    ) -> None:
+        self.primary = primary
+        self.settings = settings
+        self.latencies = LatencyWindow(settings.window_seconds, clock)
+        self.budget = HedgeBudget(settings.budget_ratio)
+        self.workers = settings.workers_for(fan_out)
+        self._busy = 0
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = Lock()
+
+    @property
+    def provider_id(self) -> str:
+        return self.primary.provider_id
+
+    def warm_up(self) -> None:
+        self.primary.warm_up()
+
+    def _pool(self) -> ThreadPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="provider-hedge")
+            return self._executor
+
+    def _reserve(self) -> bool:
+        """Claim a free pool thread; False if every thread is busy (nunca se encola)."""
+
+        with self._executor_lock:
+            if self._busy >= self.workers:
+                return False
+            self._busy += 1
+            return True
+
+    def _submit(self, attempt: _Attempt, call: Callable[[P], T]) -> "Future[T]":
+        """Run `attempt` on the thread claimed with `_reserve`."""
+
+        try:
+            return self._pool().submit(self._run_pooled, attempt, call)
+        except BaseException:
+            self._release()
+            raise
+
+    def _release(self) -> None:
+        with self._executor_lock:
+            self._busy -= 1
+
+    def _run_pooled(self, attempt: _Attempt, call: Callable[[P], T]) -> T:
+        try:
+            return self._run_attempt(attempt, call)
+        finally:
+            self._release()
+
+    def _run_attempt(self, attempt: _Attempt, call: Callable[[P], T]) -> T:
+        attempt.started = time.perf_counter()
+        try:
+            return call(attempt.provider)
+        finally:
+            attempt.elapsed = time.perf_counter() - attempt.started
+            # Solo el primario: los hedges salen de los requests lentos y sesgarían el p90.
+            if not attempt.is_hedge:
+                self.latencies.add(attempt.elapsed)
+
+    def _call(self, call: Callable[[P], T]) -> T:
+        started = time.perf_counter()
+        result = self._hedged(call)
+        # Lo que esperó este request, gane el primario o el hedge.
+        result.latency_ms = int((time.perf_counter() - started) * 1000)
+        return result
+
+    def _hedged(self, call: Callable[[P], T]) -> T:
+        self.budget.deposit()
+        delay = self.latencies.quantile(self.settings.quantile, self.settings.min_samples)
+        primary_attempt = _Attempt(self.primary)
+        if delay is None or not self._reserve():
+            # Sin p90 confiable o sin thread libre: llamada directa en el thread del caller.
+            return self._run_attempt(primary_attempt, call)
+
+        primary = self._submit(primary_attempt, call)
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+        # Thread antes que presupuesto: un hedge que no puede correr no gasta token.
+        if not self._reserve():
+            METRICS.inc_provider_hedge(self.provider_id, "pool_exhausted")
+            return primary.result()
+        if not self.budget.spend():
+            self._release()
+            METRICS.inc_provider_hedge(self.provider_id, "budget_exhausted")
+            return primary.result()
+
+        hedge_attempt = _Attempt(self.primary, is_hedge=True)
+        hedge = self._submit(hedge_attempt, call)
+        return self._first_success({primary: ("primary", primary_attempt), hedge: ("hedge", hedge_attempt)})
+
+    def _first_success(self, attempts: Dict["Future[T]", Tuple[str, _Attempt]]) -> T:
+        pending = set(attempts)
+        winner: Optional["Future[T]"] = None
+        while pending and winner is None:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            # Si ambos terminan juntos gana el primario (orden de `attempts`).
+            winner = next((f for f in attempts if f in done and f.exception() is None), None)
+        if winner is None:
+            # Los dos fallaron: se propaga el error del primario.
+            return next(iter(attempts)).result()
+
+        METRICS.inc_provider_hedge(self.provider_id, attempts[winner][0])
+        for loser, (_, attempt) in attempts.items():
+            if loser is winner:
+                continue
+            if loser.cancel():
+                # No llegó a correr: `_run_pooled` no va a liberar su thread.
+                self._release()
+            else:
+                # Una llamada al SDK en curso no se puede interrumpir: se descarta su resultado.
+                loser.add_done_callback(lambda _future, attempt=attempt: self._record_waste(attempt))
+        return winner.result()
+
+    def _record_waste(self, attempt: _Attempt) -> None:
+        METRICS.add_provider_hedge_wasted_seconds(self.provider_id, attempt.elapsed)
+
+
+class HedgedSTTProvider(_Hedged[STTProvider], STTProvider):
+    def transcribe(self, audio_bytes: bytes, locale: str) -> STTResult:
+        return self.transcribe_stream((audio_bytes,), locale)
+
+    def transcribe_stream(self, chunks: Iterable[bytes], locale: str) -> STTResult:
+        # Ambos intentos leen las mismas slices del upload.
+        chunks = list(chunks)
+        return self._call(lambda provider: provider.transcribe_stream(chunks, locale))
+
+
+class HedgedTTSProvider(_Hedged[TTSProvider], TTSProvider):
+    @property
+    def cache_namespace(self) -> str:
+        return getattr(self.primary, "cache_namespace", self.primary.provider_id)
+
+    def synthesize(
+        self, text: str, locale: str, voice: str | None = None, output_format: Optional[TTSOutputFormat] = None
+    ) -> TTSResult:
+        return self._call(lambda provider: provider.synthesize(text, locale, voice, output_format))
+
+
+__all__ = [
+    "HEDGEABLE_KINDS",
+    "HedgeBudget",
+    "HedgedSTTProvider",
+    "HedgedTTSProvider",
+    "HedgingSettings",
+    "LatencyWindow",
+]
@@ -1,5 +1,10 @@
 from dataclasses import dataclass
-from typing import Optional
+from typing import Iterable, Iterator, Optional
+
+from .tts_formats import TTSOutputFormat
+
+# Locale de `/audio` cuando el cliente no lo envía; los providers con pool lo precalientan.
+DEFAULT_LOCALE = "es-CO"
 
 
 @dataclass
@@ -7,6 +12,10 @@ class STTResult:
     text: str
     provider_id: str
     raw_transcript: Optional[dict] = None
+    # Segundos de audio de entrada de *este* request (None = el provider no lo sabe).
+    input_seconds: Optional[float] = None
+    # Latencia de *este* request; None = usar `provider.latency_ms`.
+    latency_ms: Optional[int] = None
 
 
 @dataclass
@@ -15,21 +24,54 @@ class TTSResult:
     audio_mime_type: str
     provider_id: str
     audio_url: Optional[str] = None
+    # Segundos del audio sintetizado (None = el provider no lo sabe).
+    output_seconds: Optional[float] = None
+    latency_ms: Optional[int] = None
+    # True si el audio salió del cache de TTS.
+    cache_hit: bool = False
+
+
+@dataclass
+class LLMResult:
+    text: str
+    provider_id: str
+    # True si la respuesta salió del cache (no se llamó al modelo).
+    cache_hit: bool = False
+    latency_ms: Optional[int] = None
 
 
 class STTProvider:
     provider_id: str = "stt"
     latency_ms: int = 0
 
+    def warm_up(self) -> None:
+        """Open connections ahead of the first request (no-op por defecto)."""
+
     def transcribe(self, audio_bytes: bytes, locale: str) -> STTResult:
         raise NotImplementedError
 
+    def transcribe_stream(self, chunks: Iterable[bytes], locale: str) -> STTResult:
+        """Transcribe audio delivered in chunks (por defecto: junta y llama a `transcribe`)."""
+
+        return self.transcribe(b"".join(chunks), locale)
+
 
 class TTSProvider:
     provider_id: str = "tts"
     latency_ms: int = 0
 
-    def synthesize(self, text: str, locale: str, voice: Optional[str] = None) -> TTSResult:
+    def warm_up(self) -> None:
+        """Open connections ahead of the first request (no-op por defecto)."""
+
+    def synthesize(
+        self,
+        text: str,
+        locale: str,
+        voice: Optional[str] = None,
+        output_format: Optional[TTSOutputFormat] = None,
+    ) -> TTSResult:
+        """Synthesize `text`; `output_format=None` usa el formato por defecto del provider."""
+
         raise NotImplementedError
 
 
@@ -37,5 +79,19 @@ class LLMProvider:
     provider_id: str = "llm"
     latency_ms: int = 0
 
+    def warm_up(self) -> None:
+        """Open connections ahead of the first request (no-op por defecto)."""
+
     def generate_reply(self, transcript: str, context: dict) -> str:
         raise NotImplementedError
+
+    def generate(self, transcript: str, context: dict) -> LLMResult:
+        """Reply plus the provider that produced it (por defecto envuelve `generate_reply`)."""
+
+        reply = self.generate_reply(transcript, context)
+        return LLMResult(text=reply, provider_id=self.provider_id)
+
+    def generate_stream(self, transcript: str, context: dict) -> Iterator[str]:
+        """Yield the reply as text deltas (por defecto: la respuesta completa de una vez)."""
+
+        yield self.generate_reply(transcript, context)
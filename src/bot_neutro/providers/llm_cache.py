@@ -0,0 +1,159 @@
+"""Opt-in LLM reply cache for short, repeated transcripts.
+
+`CachingLLMProvider` envuelve al `LLMProvider` configurado y guarda la
+respuesta por (modelo, tier, transcript normalizado, munay_context) con TTL
+y un máximo de entradas (LRU). Se habilita por tier y por contexto.
+
+Privacidad: el cache vive solo en memoria y la key es un HMAC-SHA256 con un
+secreto aleatorio por proceso; el transcript no se guarda ni en claro ni
+con un hash reversible por diccionario (p. ej. "gracias"). Un hit se
+informa en `usage.llm_cache_hit` para que la facturación no cuente tokens
+que no se gastaron.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import hmac
+import os
+import time
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass
+from threading import Lock
+from typing import Optional, Tuple
+
+from ..metrics_runtime import METRICS
+from .interfaces import LLMProvider, LLMResult
+
+# Contexto de requests sin `x-munay-context` en `LLM_CACHE_CONTEXTS`.
+NO_CONTEXT = "none"
+# Puntuación que el STT agrega o no según la entonación ("Gracias." / "gracias").
+_EDGE_PUNCTUATION = " .,;:!¡?¿…\"'"
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return max(0, int(os.getenv(name, str(default))))
+    except ValueError:
+        return default
+
+
+def _env_list(name: str, default: str) -> Tuple[str, ...]:
+    return tuple(item.strip().lower() for item in os.getenv(name, default).split(",") if item.strip())
+
+
+@dataclass(frozen=True)
+class LLMCacheSettings:
+    # TTL 0 (default) desactiva el cache.
+    ttl_seconds: int = 0
+    max_entries: int = 1000
+    # Transcripts más largos casi nunca se repiten: no ocupan lugar.
+    max_transcript_chars: int = 120
+    tiers: Tuple[str, ...] = ("freemium",)
+    # `*` = todos los contextos; `none` = requests sin contexto.
+    contexts: Tuple[str, ...] = ("*",)
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0 and self.max_entries > 0
+
+    def applies_to(self, tier: str, munay_context: str) -> bool:
+        return tier in self.tiers and ("*" in self.contexts or munay_context in self.contexts)
+
+    @classmethod
+    def from_env(cls) -> "LLMCacheSettings":
+        return cls(
+            ttl_seconds=_env_int("LLM_CACHE_TTL_SECONDS", 0),
+            max_entries=_env_int("LLM_CACHE_MAX_ENTRIES", 1000),
+            max_transcript_chars=_env_int("LLM_CACHE_MAX_TRANSCRIPT_CHARS", 120),
+            tiers=_env_list("LLM_CACHE_TIERS", "freemium"),
+            contexts=_env_list("LLM_CACHE_CONTEXTS", "*"),
+        )
+
+
+def normalize_transcript(transcript: str) -> str:
+    """NFC, casefold, espacios colapsados y sin puntuación en los bordes."""
+
+    text = " ".join(unicodedata.normalize("NFC", transcript).casefold().split())
+    return text.strip(_EDGE_PUNCTUATION)
+
+
+class CachingLLMProvider(LLMProvider):
+    def __init__(self, inner: LLMProvider, settings: LLMCacheSettings, clock=time.monotonic) -> None:
+        self.inner = inner
+        self.settings = settings
+        self._clock = clock
+        self._secret = os.urandom(32)
+        self._lock = Lock()
+        self._entries: "OrderedDict[bytes, Tuple[float, str]]" = OrderedDict()
+
+    @property
+    def provider_id(self) -> str:  # type: ignore[override]
+        return self.inner.provider_id
+
+    @property
+    def latency_ms(self) -> int:  # type: ignore[override]
+        # Solo para misses sin `latency_ms` en el resultado; un hit lo trae en 0.
+        return getattr(self.inner, "latency_ms", 0)
+
+    def warm_up(self) -> None:
+        self.inner.warm_up()
+
+    def _key(self, model: str, tier: str, transcript: str, munay_context: str) -> bytes:
+        material = "\x1f".join((model, tier, transcript, munay_context)).encode("utf-8")
+        return hmac.new(self._secret, material, hashlib.sha256).digest()
+
+    def _get(self, key: bytes) -> Optional[str]:
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, reply = entry
+            if expires_at <= now:
+                del self._entries[key]
+                METRICS.inc_llm_cache_eviction("ttl")
+                return None
+            self._entries.move_to_end(key)
+            return reply
+
+    def _put(self, key: bytes, reply: str) -> None:
+        with self._lock:
+            self._entries[key] = (self._clock() + self.settings.ttl_seconds, reply)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.settings.max_entries:
+                self._entries.popitem(last=False)
+                METRICS.inc_llm_cache_eviction("size")
+
+    def generate_reply(self, transcript: str, context: dict) -> str:
+        return self.generate(transcript, context).text
+
+    def generate(self, transcript: str, context: dict) -> LLMResult:
+        context = context or {}
+        tier = context.get("llm_tier", "freemium")
+        munay_context = (context.get("metadata") or {}).get("munay_context") or NO_CONTEXT
+        normalized = normalize_transcript(transcript)
+        if (
+            not normalized
+            or len(normalized) > self.settings.max_transcript_chars
+            or not self.settings.applies_to(tier, munay_context)
+        ):
+            return self.inner.generate(transcript, context)
+
+        model_for = getattr(self.inner, "model_for", None)
+        model = model_for(tier) if model_for is not None else self.inner.provider_id
+        key = self._key(model, tier, normalized, munay_context)
+        reply = self._get(key)
+        METRICS.inc_llm_cache_lookup(tier, "miss" if reply is None else "hit")
+        if reply is not None:
+            return LLMResult(text=reply, provider_id=self.inner.provider_id, cache_hit=True, latency_ms=0)
+
+        result = self.inner.generate(transcript, context)
+        # Una respuesta de fallback (`openai-llm|stub-llm`) no se cachea.
+        if "|" not in result.provider_id:
+            self._put(key, result.text)
+        return result
+
+
+__all__ = ["CachingLLMProvider", "LLMCacheSettings", "NO_CONTEXT", "normalize_transcript"]
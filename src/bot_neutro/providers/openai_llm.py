@@ -1,14 +1,24 @@
-"""OpenAI LLM provider implementation."""
+"""OpenAI LLM provider implementation.
+
+Por defecto la respuesta se pide en streaming (`stream=True`): se registra el
+time-to-first-token (cola + prefill del proveedor) y los tokens/s de la
+generación, y `generate_reply` junta los deltas. Si el stream falla antes del
+primer token se usa el fallback; después ya no hay vuelta atrás y el error se
+propaga. `OPENAI_STREAM=0` vuelve a la llamada bloqueante.
+"""
 
 import logging
 import os
 import time
-from typing import Optional
+from typing import Dict, Iterator, Optional
 
-from .interfaces import LLMProvider
+from ..metrics_runtime import METRICS
+from .interfaces import LLMProvider, LLMResult
 
 logger = logging.getLogger(__name__)
 
+SYSTEM_PROMPT = "Eres el núcleo neutral de Bot Neutro. Responde claro y breve."
+
 
 class OpenAILLMProvider(LLMProvider):
     provider_id = "openai-llm"
@@ -22,6 +32,7 @@ class OpenAILLMProvider(LLMProvider):
         base_url: Optional[str] = None,
         fallback: Optional[LLMProvider] = None,
         timeout_seconds: Optional[float] = None,
+        stream: bool = True,
     ) -> None:
         self._api_key = api_key
         self._base_url = base_url
@@ -29,6 +40,7 @@ class OpenAILLMProvider(LLMProvider):
         self._model_premium = model_premium or model_freemium
         self._fallback = fallback
         self._timeout_seconds = timeout_seconds
+        self._stream = stream
         self._client = None
         self._client_factory = self._require_client()
 
@@ -62,6 +74,7 @@ class OpenAILLMProvider(LLMProvider):
             base_url=base_url,
             fallback=fallback,
             timeout_seconds=timeout_seconds,
+            stream=os.getenv("OPENAI_STREAM", "1") != "0",
         )
 
     def _get_client(self):
@@ -69,37 +82,111 @@ class OpenAILLMProvider(LLMProvider):
             self._client = self._client_factory(api_key=self._api_key, base_url=self._base_url)
         return self._client
 
+    def model_for(self, tier: str) -> str:
+        return self._model_premium if tier == "premium" else self._model_freemium
+
+    @staticmethod
+    def _messages(transcript: str):
+        return [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": transcript},
+        ]
+
+    def _use_fallback(self, exc: Exception, tier: str, model: str) -> Optional[LLMProvider]:
+        logger.warning(
+            "openai_llm_error",
+            exc_info=exc,
+            extra={"provider_id": self.provider_id, "tier": tier, "model": model},
+        )
+        return self._fallback
+
     def generate_reply(self, transcript: str, context: dict) -> str:
-        tier = context.get("llm_tier", "freemium") if context else "freemium"
-        model = self._model_premium if tier == "premium" else self._model_freemium
+        return self.generate(transcript, context).text
+
+    def generate(self, transcript: str, context: dict) -> LLMResult:
+        """Reply and the provider that answered it in *this* request (`openai-llm|stub-llm` tras fallback)."""
 
         start = time.perf_counter()
-        client = self._get_client()
+        if self._stream:
+            outcome = {"provider_id": self.provider_id}
+            text = "".join(self._stream_deltas(transcript, context, outcome)).strip()
+            latency_ms = int((time.perf_counter() - start) * 1000)
+            return LLMResult(text=text, provider_id=outcome["provider_id"], latency_ms=latency_ms)
 
-        messages = [
-            {"role": "system", "content": "Eres el núcleo neutral de Bot Neutro. Responde claro y breve."},
-            {"role": "user", "content": transcript},
-        ]
+        tier = context.get("llm_tier", "freemium") if context else "freemium"
+        model = self.model_for(tier)
+
+        client = self._get_client()
 
         try:
             response = client.chat.completions.create(
                 model=model,
-                messages=messages,
+                messages=self._messages(transcript),
                 timeout=self._timeout_seconds,
             )
             reply = response.choices[0].message.content.strip()
-            self.latency_ms = int((time.perf_counter() - start) * 1000)
-            return reply
+            latency_ms = int((time.perf_counter() - start) * 1000)
+            return LLMResult(text=reply, provider_id=self.provider_id, latency_ms=latency_ms)
         except Exception as exc:  # pragma: no cover - requires network
-            logger.warning(
-                "openai_llm_error",
-                exc_info=exc,
-                extra={"provider_id": self.provider_id, "tier": tier, "model": model},
-            )
-            fallback = self._fallback
+            fallback = self._use_fallback(exc, tier, model)
             if fallback:
                 reply = fallback.generate_reply(transcript, context)
-                self.latency_ms = getattr(fallback, "latency_ms", self.latency_ms)
-                self.provider_id = f"{self.provider_id}|{fallback.provider_id}"
-                return reply
+                # Incluye el intento fallido: es lo que esperó el request.
+                latency_ms = int((time.perf_counter() - start) * 1000)
+                return LLMResult(
+                    text=reply, provider_id=f"{self.provider_id}|{fallback.provider_id}", latency_ms=latency_ms
+                )
             raise
+
+    def generate_stream(self, transcript: str, context: dict) -> Iterator[str]:
+        return self._stream_deltas(transcript, context, {})
+
+    def _stream_deltas(self, transcript: str, context: dict, outcome: Dict[str, str]) -> Iterator[str]:
+        tier = context.get("llm_tier", "freemium") if context else "freemium"
+        model = self.model_for(tier)
+
+        start = time.perf_counter()
+        first_token_at: Optional[float] = None
+        deltas = 0
+        completion_tokens: Optional[int] = None
+
+        try:
+            stream = self._get_client().chat.completions.create(
+                model=model,
+                messages=self._messages(transcript),
+                timeout=self._timeout_seconds,
+                stream=True,
+                stream_options={"include_usage": True},
+            )
+            for chunk in stream:
+                # Con `include_usage` el último chunk trae el conteo y no trae choices.
+                usage = getattr(chunk, "usage", None)
+                if usage is not None:
+                    completion_tokens = getattr(usage, "completion_tokens", None)
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if not delta:
+                    continue
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                    METRICS.observe_llm_time_to_first_token(self.provider_id, model, first_token_at - start)
+                deltas += 1
+                yield delta
+        except Exception as exc:
+            if first_token_at is not None:
+                METRICS.inc_llm_stream_failure(self.provider_id, "mid_stream")
+                raise
+            METRICS.inc_llm_stream_failure(self.provider_id, "before_first_token")
+            fallback = self._use_fallback(exc, tier, model)
+            if not fallback:
+                raise
+            yield from fallback.generate_stream(transcript, context)
+            outcome["provider_id"] = f"{self.provider_id}|{fallback.provider_id}"
+            return
+
+        finished = time.perf_counter()
+        if first_token_at is not None and finished > first_token_at:
+            # Sin `usage` (gateways que no lo soportan) cada delta cuenta como un token.
+            tokens = completion_tokens if completion_tokens is not None else deltas
+            METRICS.observe_llm_tokens_per_second(self.provider_id, model, tokens / (finished - first_token_at))
@@ -0,0 +1,251 @@
+"""Parallel STT for long uploads, split at silence boundaries.
+
+`SegmentedSTTProvider` envuelve al `STTProvider` configurado. Si el upload es
+WAV PCM de 16 bits y dura al menos `min_seconds`, calcula la energía (RMS)
+por frame de 20 ms, corta cerca de cada `segment_seconds` en el frame más
+silencioso de una ventana de búsqueda y transcribe los segmentos en paralelo
+(`parallelism` threads). Los textos se unen en orden y `raw_transcript`
+conserva, por segmento, el rango, el texto y el provider que respondió.
+
+Cualquier otro formato, o audio más corto, pasa directo al provider interno.
+"""
+
+from __future__ import annotations
+
+import io
+import math
+import operator
+import os
+import sys
+import time
+import wave
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from threading import Lock
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .audio_duration import wav_duration_seconds
+from .interfaces import STTProvider, STTResult
+
+FRAME_SECONDS = 0.02
+# Un frame es "silencio" si su RMS está por debajo de esta fracción del p90.
+SILENCE_RATIO = 0.1
+SILENCE_FLOOR_RMS = 100.0
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+@dataclass(frozen=True)
+class SegmentationSettings:
+    # Duración mínima para segmentar; 0 (default) lo desactiva.
+    min_seconds: float = 0.0
+    segment_seconds: float = 30.0
+    parallelism: int = 4
+    # Cuánto puede moverse un corte (±) para caer en silencio.
+    search_seconds: float = 5.0
+
+    @classmethod
+    def from_env(cls) -> "SegmentationSettings":
+        return cls(
+            min_seconds=max(0.0, _env_float("STT_SEGMENT_MIN_SECONDS", 0.0)),
+            segment_seconds=max(1.0, _env_float("STT_SEGMENT_SECONDS", 30.0)),
+            parallelism=max(1, int(_env_float("STT_SEGMENT_PARALLELISM", 4))),
+            search_seconds=max(0.0, _env_float("STT_SEGMENT_SEARCH_SECONDS", 5.0)),
+        )
+
+
+@dataclass(frozen=True)
+class PcmAudio:
+    channels: int
+    sample_width: int
+    frame_rate: int
+    frames: bytes
+
+    @property
+    def frame_bytes(self) -> int:
+        return self.channels * self.sample_width
+
+    @property
+    def duration(self) -> float:
+        return len(self.frames) / (self.frame_bytes * self.frame_rate)
+
+    @classmethod
+    def from_wav(cls, data: bytes) -> Optional["PcmAudio"]:
+        """Parse a 16-bit PCM WAV; None for anything else."""
+
+        try:
+            with wave.open(io.BytesIO(data), "rb") as reader:
+                if reader.getcomptype() != "NONE" or reader.getsampwidth() != 2:
+                    return None
+                return cls(
+                    channels=reader.getnchannels(),
+                    sample_width=reader.getsampwidth(),
+                    frame_rate=reader.getframerate(),
+                    frames=reader.readframes(reader.getnframes()),
+                )
+        except (wave.Error, EOFError):
+            return None
+
+    def to_wav(self, start: int, end: int) -> bytes:
+        """WAV bytes for audio frames [start, end)."""
+
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as writer:
+            writer.setnchannels(self.channels)
+            writer.setsampwidth(self.sample_width)
+            writer.setframerate(self.frame_rate)
+            writer.writeframes(self.frames[start * self.frame_bytes : end * self.frame_bytes])
+        return buffer.getvalue()
+
+
+def frame_energies(audio: PcmAudio, frame_seconds: float = FRAME_SECONDS) -> List[float]:
+    """RMS per analysis frame (todas las channels mezcladas)."""
+
+    samples = array("h")
+    samples.frombytes(audio.frames[: len(audio.frames) - len(audio.frames) % 2])
+    if sys.byteorder == "big":
+        samples.byteswap()
+    step = max(1, int(audio.frame_rate * frame_seconds)) * audio.channels
+    energies = []
+    for start in range(0, len(samples), step):
+        # Una de cada dos muestras alcanza para distinguir voz de silencio.
+        window = samples[start : start + step : 2]
+        energies.append(math.sqrt(sum(map(operator.mul, window, window)) / len(window)))
+    return energies
+
+
+def split_points(
+    energies: List[float], frame_seconds: float, segment_seconds: float, search_seconds: float
+) -> List[int]:
+    """Frame indexes where segments end (el último es `len(energies)`)."""
+
+    total = len(energies)
+    target = max(1, round(segment_seconds / frame_seconds))
+    search = round(search_seconds / frame_seconds)
+    ranked = sorted(energies)
+    threshold = max(SILENCE_FLOOR_RMS, SILENCE_RATIO * ranked[int(0.9 * (len(ranked) - 1))]) if ranked else 0.0
+
+    points = []
+    start = 0
+    while total - start > target + search:
+        center = start + target
+        low, high = max(start + 1, center - search), min(total - 1, center + search)
+        # El frame más silencioso de la ventana; a igual energía, el más cercano al objetivo.
+        cut = min(range(low, high + 1), key=lambda index: (energies[index] > threshold, energies[index], abs(index - center)))
+        points.append(cut)
+        start = cut
+    points.append(total)
+    return points
+
+
+class SegmentedSTTProvider(STTProvider):
+    def __init__(self, inner: STTProvider, settings: Optional[SegmentationSettings] = None) -> None:
+        self.inner = inner
+        self.settings = settings or SegmentationSettings()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = Lock()
+
+    @property
+    def provider_id(self) -> str:  # type: ignore[override]
+        return self.inner.provider_id
+
+    @property
+    def latency_ms(self) -> int:  # type: ignore[override]
+        return getattr(self.inner, "latency_ms", 0)
+
+    def warm_up(self) -> None:
+        self.inner.warm_up()
+
+    def transcribe(self, audio_bytes: bytes, locale: str) -> STTResult:
+        return self.transcribe_stream((audio_bytes,), locale)
+
+    def transcribe_stream(self, chunks: Iterable[bytes], locale: str) -> STTResult:
+        chunks = list(chunks)
+        audio = None
+        if self.settings.min_seconds > 0 and chunks:
+            # El header alcanza para descartar audio corto sin unir ni decodificar el upload.
+            duration = wav_duration_seconds(chunks[0], sum(len(chunk) for chunk in chunks))
+            if duration is not None and duration >= self.settings.min_seconds:
+                audio = PcmAudio.from_wav(b"".join(chunks))
+        if audio is None or audio.duration < self.settings.min_seconds:
+            return self.inner.transcribe_stream(chunks, locale)
+        return self._transcribe_segments(audio, locale)
+
+    def _segments(self, audio: PcmAudio) -> List[Tuple[int, int]]:
+        energies = frame_energies(audio)
+        frames_per_step = max(1, int(audio.frame_rate * FRAME_SECONDS))
+        total_frames = len(audio.frames) // audio.frame_bytes
+        bounds = []
+        start = 0
+        for point in split_points(energies, FRAME_SECONDS, self.settings.segment_seconds, self.settings.search_seconds):
+            end = min(total_frames, point * frames_per_step)
+            if end > start:
+                bounds.append((start, end))
+            start = end
+        return bounds
+
+    def _pool(self) -> ThreadPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.settings.parallelism, thread_name_prefix="stt-segment"
+                )
+            return self._executor
+
+    def _transcribe_one(self, audio: PcmAudio, start: int, end: int, locale: str) -> Tuple[STTResult, float]:
+        started = time.perf_counter()
+        result = self.inner.transcribe(audio.to_wav(start, end), locale)
+        return result, round((time.perf_counter() - started) * 1000, 3)
+
+    def _transcribe_segments(self, audio: PcmAudio, locale: str) -> STTResult:
+        started = time.perf_counter()
+        bounds = self._segments(audio)
+        futures = [self._pool().submit(self._transcribe_one, audio, start, end, locale) for start, end in bounds]
+        try:
+            results = [future.result() for future in futures]
+        finally:
+            for future in futures:
+                future.cancel()
+
+        segments: List[Dict[str, object]] = []
+        provider_ids: List[str] = []
+        for index, ((start, end), (result, stt_ms)) in enumerate(zip(bounds, results)):
+            segments.append(
+                {
+                    "index": index,
+                    "start_ms": round(start * 1000 / audio.frame_rate, 3),
+                    "end_ms": round(end * 1000 / audio.frame_rate, 3),
+                    "text": result.text,
+                    "provider_id": result.provider_id,
+                    "stt_ms": stt_ms,
+                }
+            )
+            # Una cadena de fallback ("a|b") aporta cada provider una sola vez.
+            for provider_id in result.provider_id.split("|"):
+                if provider_id not in provider_ids:
+                    provider_ids.append(provider_id)
+
+        text = " ".join(result.text for result, _ in results if result.text)
+        raw_transcript = {
+            "text": text,
+            "mode": "segmented",
+            "duration_seconds": round(audio.duration, 3),
+            "segments": segments,
+        }
+        return STTResult(
+            text=text,
+            provider_id="|".join(provider_ids),
+            raw_transcript=raw_transcript,
+            input_seconds=audio.duration,
+            # Tiempo de pared del fan-out, no la suma de los segmentos.
+            latency_ms=int((time.perf_counter() - started) * 1000),
+        )
+
+
+__all__ = ["PcmAudio", "SegmentationSettings", "SegmentedSTTProvider", "frame_energies", "split_points"]
@@ -1,13 +1,21 @@
+from typing import Optional
+
+from .audio_duration import wav_duration_seconds
 from .interfaces import LLMProvider, STTProvider, STTResult, TTSProvider, TTSResult
+from .tts_formats import TTSOutputFormat
 
 
 class StubSTTProvider(STTProvider):
     provider_id = "stub-stt"
     latency_ms = 100
-    input_seconds = 1.0
 
     def transcribe(self, audio_bytes: bytes, locale: str) -> STTResult:  # pragma: no cover - simple stub
-        return STTResult(text="stub transcript", provider_id=self.provider_id, raw_transcript={"locale": locale})
+        return STTResult(
+            text="stub transcript",
+            provider_id=self.provider_id,
+            raw_transcript={"locale": locale},
+            input_seconds=wav_duration_seconds(audio_bytes),
+        )
 
 
 class StubLLMProvider(LLMProvider):
@@ -21,14 +29,15 @@ class StubLLMProvider(LLMProvider):
 class StubTTSProvider(TTSProvider):
     provider_id = "stub-tts"
     latency_ms = 150
-    output_seconds = 1.5
     audio_url = "https://example.com/audio/stub.wav"
     audio_mime_type = "audio/wav"
 
-    def synthesize(self, text: str, locale: str, voice: str | None = None) -> TTSResult:  # pragma: no cover - simple stub
+    def synthesize(
+        self, text: str, locale: str, voice: str | None = None, output_format: Optional[TTSOutputFormat] = None
+    ) -> TTSResult:  # pragma: no cover - simple stub
         return TTSResult(
             audio_bytes=b"stub-bytes",
-            audio_mime_type=self.audio_mime_type,
+            audio_mime_type=output_format.mime_type if output_format else self.audio_mime_type,
             provider_id=self.provider_id,
             audio_url=self.audio_url,
         )
@@ -0,0 +1,315 @@
+"""Content-addressed TTS cache with a memory and a disk tier.
+
+`CachingTTSProvider` envuelve al `TTSProvider` configurado. La key es un
+sha256 de (texto normalizado, locale, voz, formato, namespace del provider);
+un hit devuelve el audio sin llamar a `synthesize`. Tiers:
+
+- memoria: LRU acotado por bytes (`TTS_CACHE_MEMORY_BYTES`);
+- disco (`TTS_CACHE_DIR`): un archivo por key, acotado por tamaño total y
+  edad; sobrevive reinicios y se comparte entre workers del mismo host.
+
+Solo se guarda audio del provider primario: una respuesta de fallback
+(`provider_id` con `|`) no se cachea.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+
+from ..metrics_runtime import METRICS
+from .interfaces import TTSProvider, TTSResult
+from .tts_formats import TTSOutputFormat
+
+logger = logging.getLogger("bot_neutro")
+
+# Al pasarse del tope, el disco se vacía hasta esta fracción: el rescan se amortiza.
+DISK_EVICT_TO = 0.9
+# Cada cuánto se relee el uso real del directorio aunque el contador local no se pase.
+DISK_RESCAN_SECONDS = 60.0
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return max(0, int(os.getenv(name, str(default))))
+    except ValueError:
+        return default
+
+
+@dataclass(frozen=True)
+class TTSCacheSettings:
+    # 0 en ambos tiers (default) desactiva el cache.
+    memory_bytes: int = 0
+    disk_path: str = ""
+    disk_max_bytes: int = 256 * 1024 * 1024
+    disk_max_age_seconds: int = 7 * 24 * 3600
+
+    @property
+    def enabled(self) -> bool:
+        return self.memory_bytes > 0 or bool(self.disk_path)
+
+    @classmethod
+    def from_env(cls) -> "TTSCacheSettings":
+        return cls(
+            memory_bytes=_env_int("TTS_CACHE_MEMORY_BYTES", 0),
+            disk_path=os.getenv("TTS_CACHE_DIR", ""),
+            disk_max_bytes=_env_int("TTS_CACHE_DISK_MAX_BYTES", 256 * 1024 * 1024),
+            disk_max_age_seconds=_env_int("TTS_CACHE_DISK_MAX_AGE_SECONDS", 7 * 24 * 3600),
+        )
+
+
+def normalize_text(text: str) -> str:
+    """NFC + espacios colapsados: variantes triviales del mismo texto comparten key."""
+
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def tts_cache_key(text: str, locale: str, voice: Optional[str], output_format: str, namespace: str = "") -> str:
+    material = "\x1f".join((namespace, normalize_text(text), locale, voice or "", output_format))
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+@dataclass(frozen=True)
+class _Entry:
+    result: TTSResult
+
+    @property
+    def size(self) -> int:
+        return len(self.result.audio_bytes)
+
+
+class _MemoryTier:
+    """LRU bounded by the total size of the cached audio."""
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._lock = Lock()
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[_Entry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: str, entry: _Entry) -> int:
+        """Store `entry`; returns how many entries were evicted."""
+
+        if entry.size > self.max_bytes:
+            return 0
+        evicted = 0
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous.size
+            self._entries[key] = entry
+            self.bytes += entry.size
+            while self.bytes > self.max_bytes:
+                _, oldest = self._entries.popitem(last=False)
+                self.bytes -= oldest.size
+                evicted += 1
+        return evicted
+
+
+class _DiskTier:
+    """One file per key: a JSON header line followed by the raw audio.
+
+    Un índice en memoria (archivo → tamaño, en orden de acceso) da el orden
+    de desalojo sin recorrer el directorio. Como otros workers escriben y
+    borran en el mismo directorio, antes de desalojar (y cada
+    `DISK_RESCAN_SECONDS`) se relee el uso real: los archivos ajenos entran
+    al índice por mtime (que cada hit actualiza), delante de los propios.
+    Al pasarse de `max_bytes` se borra hasta `DISK_EVICT_TO` del tope. Los
+    archivos más viejos que `max_age_seconds` cuentan como miss y se borran.
+    """
+
+    def __init__(self, path: str, max_bytes: int, max_age_seconds: int) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self._lock = Lock()
+        self._index: "OrderedDict[str, int]" = OrderedDict()
+        self.bytes = 0
+        self._rescanned_at = 0.0
+        os.makedirs(path, exist_ok=True)
+        self._rescan()
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.path, f"{key}.tts")
+
+    def _scan(self) -> List[Tuple[str, int, float]]:
+        files = []
+        with os.scandir(self.path) as entries:
+            for item in entries:
+                if item.name.endswith(".tts"):
+                    try:
+                        stat = item.stat()
+                    except FileNotFoundError:
+                        continue
+                    files.append((item.path, stat.st_size, stat.st_mtime))
+        return files
+
+    def _rescan(self) -> None:
+        """Re-read real usage; keeps the access order of files already indexed."""
+
+        on_disk: Dict[str, Tuple[int, float]] = {path: (size, mtime) for path, size, mtime in self._scan()}
+        with self._lock:
+            known = [(path, on_disk[path][0]) for path in self._index if path in on_disk]
+            foreign = sorted((path for path in on_disk if path not in self._index), key=lambda p: on_disk[p][1])
+            self._index = OrderedDict((path, on_disk[path][0]) for path in foreign)
+            self._index.update(known)
+            self.bytes = sum(self._index.values())
+            self._rescanned_at = time.monotonic()
+
+    def _touch(self, path: str, size: int) -> None:
+        with self._lock:
+            self.bytes += size - self._index.pop(path, 0)
+            self._index[path] = size
+
+    def _remove(self, path: str) -> None:
+        with self._lock:
+            self.bytes -= self._index.pop(path, 0)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def get(self, key: str) -> Optional[_Entry]:
+        path = self._file(key)
+        try:
+            stat = os.stat(path)
+            if self.max_age_seconds and time.time() - stat.st_mtime > self.max_age_seconds:
+                self._remove(path)
+                METRICS.inc_tts_cache_eviction("disk", "age")
+                return None
+            with open(path, "rb") as handle:
+                header = json.loads(handle.readline())
+                audio = handle.read()
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        self._touch(path, stat.st_size)
+        result = TTSResult(
+            audio_bytes=audio,
+            audio_mime_type=header["mime_type"],
+            provider_id=header["provider_id"],
+            audio_url=header.get("audio_url"),
+            output_seconds=header.get("output_seconds"),
+        )
+        return _Entry(result)
+
+    def put(self, key: str, entry: _Entry) -> None:
+        header = {
+            "mime_type": entry.result.audio_mime_type,
+            "provider_id": entry.result.provider_id,
+            "audio_url": entry.result.audio_url,
+            "output_seconds": entry.result.output_seconds,
+        }
+        path = self._file(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as handle:
+                handle.write(json.dumps(header).encode("utf-8") + b"\n")
+                handle.write(entry.result.audio_bytes)
+                size = handle.tell()
+            os.replace(tmp_path, path)
+        except OSError as exc:
+            logger.warning("tts_cache_write_failed", extra={"exc_type": type(exc).__name__})
+            return
+        self._touch(path, size)
+        with self._lock:
+            check = self.bytes > self.max_bytes or time.monotonic() - self._rescanned_at >= DISK_RESCAN_SECONDS
+        if check:
+            self._evict()
+
+    def _evict(self) -> None:
+        self._rescan()
+        with self._lock:
+            if self.bytes <= self.max_bytes:
+                return
+        target = self.max_bytes * DISK_EVICT_TO
+        while True:
+            with self._lock:
+                if self.bytes <= target or not self._index:
+                    return
+                # El índice está en orden de acceso: el primero es el menos usado.
+                path = next(iter(self._index))
+            self._remove(path)
+            METRICS.inc_tts_cache_eviction("disk", "size")
+
+
+class CachingTTSProvider(TTSProvider):
+    def __init__(self, inner: TTSProvider, settings: TTSCacheSettings, namespace: Optional[str] = None) -> None:
+        self.inner = inner
+        self.settings = settings
+        # Identifica defaults del provider (voz, formato) que no vienen en el request.
+        self.namespace = namespace if namespace is not None else getattr(inner, "cache_namespace", inner.provider_id)
+        self._memory = _MemoryTier(settings.memory_bytes) if settings.memory_bytes > 0 else None
+        self._disk = (
+            _DiskTier(settings.disk_path, settings.disk_max_bytes, settings.disk_max_age_seconds)
+            if settings.disk_path
+            else None
+        )
+
+    @property
+    def provider_id(self) -> str:  # type: ignore[override]
+        return self.inner.provider_id
+
+    @property
+    def latency_ms(self) -> int:  # type: ignore[override]
+        # Solo para misses sin `latency_ms` en el resultado; un hit lo trae en 0.
+        return getattr(self.inner, "latency_ms", 0)
+
+    def warm_up(self) -> None:
+        self.inner.warm_up()
+
+    def _lookup(self, key: str) -> Tuple[Optional[_Entry], str]:
+        if self._memory is not None:
+            entry = self._memory.get(key)
+            if entry is not None:
+                return entry, "memory"
+        if self._disk is not None:
+            entry = self._disk.get(key)
+            if entry is not None:
+                self._store_memory(key, entry)
+                return entry, "disk"
+        return None, "miss"
+
+    def _store_memory(self, key: str, entry: _Entry) -> None:
+        if self._memory is not None:
+            evicted = self._memory.put(key, entry)
+            if evicted:
+                METRICS.inc_tts_cache_eviction("memory", "size", evicted)
+
+    def synthesize(
+        self, text: str, locale: str, voice: str | None = None, output_format: Optional[TTSOutputFormat] = None
+    ) -> TTSResult:
+        key = tts_cache_key(text, locale, voice, output_format.name if output_format else "", self.namespace)
+        entry, tier = self._lookup(key)
+        METRICS.inc_tts_cache_lookup(tier)
+        if entry is not None:
+            METRICS.inc_tts_cache_bytes_saved(tier, entry.size)
+            # Copia superficial: quien llama puede reescribir `provider_id`.
+            return replace(entry.result, cache_hit=True, latency_ms=0)
+
+        result = self.inner.synthesize(text, locale, voice, output_format)
+        if result.audio_bytes and result.provider_id == self.inner.provider_id:
+            entry = _Entry(replace(result))
+            self._store_memory(key, entry)
+            if self._disk is not None:
+                self._disk.put(key, entry)
+        return result
+
+
+__all__ = ["CachingTTSProvider", "TTSCacheSettings", "normalize_text", "tts_cache_key"]
@@ -0,0 +1,126 @@
+"""TTS output formats and their negotiation per request.
+
+El cliente elige el formato del audio de respuesta con el campo de
+formulario `tts_format` (nombre o MIME) o, si no lo manda, con los tipos
+`audio/*` de su header `Accept` (con q-values). Solo se ofrecen los formatos
+habilitados en `TTS_OUTPUT_FORMATS`; sin preferencia válida se usa
+`TTS_OUTPUT_FORMAT_DEFAULT`.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+@dataclass(frozen=True)
+class TTSOutputFormat:
+    name: str
+    mime_type: str
+    # Miembro de `speechsdk.SpeechSynthesisOutputFormat`.
+    azure_format: str
+
+
+TTS_OUTPUT_FORMATS: Dict[str, TTSOutputFormat] = {
+    fmt.name: fmt
+    for fmt in (
+        TTSOutputFormat("wav", "audio/wav", "Riff24Khz16BitMonoPcm"),
+        TTSOutputFormat("ogg-opus", "audio/ogg", "Ogg24Khz16BitMonoOpus"),
+        TTSOutputFormat("webm-opus", "audio/webm", "Webm24Khz16BitMonoOpus"),
+        TTSOutputFormat("mp3-48k", "audio/mpeg", "Audio24Khz48KBitRateMonoMp3"),
+        TTSOutputFormat("mp3-96k", "audio/mpeg", "Audio24Khz96KBitRateMonoMp3"),
+        TTSOutputFormat("mp3-160k", "audio/mpeg", "Audio24Khz160KBitRateMonoMp3"),
+    )
+}
+
+DEFAULT_TTS_FORMAT = "wav"
+
+# Alias de MIME que mandan los clientes → MIME canónico de la tabla.
+_MIME_ALIASES = {
+    "audio/x-wav": "audio/wav",
+    "audio/wave": "audio/wav",
+    "audio/opus": "audio/ogg",
+    "audio/mp3": "audio/mpeg",
+}
+
+
+class UnsupportedTTSFormat(ValueError):
+    """`tts_format` pedido explícitamente que no existe o no está habilitado."""
+
+
+def parse_format_list(raw: str) -> Tuple[str, ...]:
+    """`ogg-opus,mp3-96k` → known names in order (desconocidos se ignoran)."""
+
+    names = [item.strip().lower() for item in raw.split(",")]
+    parsed = tuple(dict.fromkeys(name for name in names if name in TTS_OUTPUT_FORMATS))
+    return parsed or tuple(TTS_OUTPUT_FORMATS)
+
+
+def get_tts_format(name: Optional[str]) -> TTSOutputFormat:
+    return TTS_OUTPUT_FORMATS.get((name or "").lower(), TTS_OUTPUT_FORMATS[DEFAULT_TTS_FORMAT])
+
+
+def _by_mime(mime_type: str, allowed: Sequence[str]) -> Optional[TTSOutputFormat]:
+    """First allowed format for a MIME type (el orden de `allowed` define el bitrate de mp3)."""
+
+    mime_type = _MIME_ALIASES.get(mime_type, mime_type)
+    for name in allowed:
+        fmt = TTS_OUTPUT_FORMATS[name]
+        if fmt.mime_type == mime_type:
+            return fmt
+    return None
+
+
+def _accept_entries(accept: str) -> List[Tuple[str, float]]:
+    entries = []
+    for part in accept.split(","):
+        media, *params = [piece.strip() for piece in part.split(";")]
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if media:
+            entries.append((media.lower(), quality))
+    return entries
+
+
+def negotiate_tts_format(
+    requested: Optional[str],
+    accept: Optional[str],
+    default: str = DEFAULT_TTS_FORMAT,
+    allowed: Sequence[str] = tuple(TTS_OUTPUT_FORMATS),
+) -> TTSOutputFormat:
+    """Resolve the output format: `tts_format` > `Accept` (audio/*) > default."""
+
+    if requested:
+        key = requested.strip().lower()
+        fmt = TTS_OUTPUT_FORMATS.get(key) if key in allowed else _by_mime(key, allowed)
+        if fmt is None:
+            raise UnsupportedTTSFormat(requested)
+        return fmt
+
+    best: Optional[TTSOutputFormat] = None
+    best_quality = 0.0
+    for media, quality in _accept_entries(accept or ""):
+        # `*/*`, `audio/*` y los tipos no-audio (p. ej. application/json) no eligen formato.
+        if quality <= best_quality or not media.startswith("audio/") or media == "audio/*":
+            continue
+        fmt = _by_mime(media, allowed)
+        if fmt is not None:
+            best, best_quality = fmt, quality
+    return best or get_tts_format(default)
+
+
+__all__ = [
+    "DEFAULT_TTS_FORMAT",
+    "TTSOutputFormat",
+    "TTS_OUTPUT_FORMATS",
+    "UnsupportedTTSFormat",
+    "get_tts_format",
+    "negotiate_tts_format",
+    "parse_format_list",
+]
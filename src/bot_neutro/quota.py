@@ -0,0 +1,261 @@
+"""Monthly audio quotas per `api_key_id`.
+
+Cada worker lleva en memoria, por `api_key_id`, los segundos de audio de
+entrada/salida y los requests del mes (UTC) ya persistidos más los deltas aún
+no escritos; chequear y registrar es O(1). Un task del lifespan vuelca los
+deltas cada `QUOTA_FLUSH_SECONDS` al archivo JSON compartido: bajo `flock`
+relee el archivo, suma los deltas y lo reemplaza de forma atómica, así los
+workers convergen sin pisarse (con un retraso de hasta un intervalo).
+
+Los límites vienen del plan del principal (`PlanLimits`); 0 = sin límite.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import json
+import logging
+import os
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from threading import Lock
+from typing import Dict, Iterator, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from .auth import PlanLimits
+from .metrics_runtime import METRICS
+
+logger = logging.getLogger("bot_neutro")
+
+
+def current_period(now: Optional[datetime] = None) -> str:
+    return (now or datetime.now(timezone.utc)).strftime("%Y-%m")
+
+
+class _Usage:
+    __slots__ = ("period", "input_seconds", "output_seconds", "requests")
+
+    def __init__(self, period: str, input_seconds: float = 0.0, output_seconds: float = 0.0, requests: int = 0):
+        self.period = period
+        self.input_seconds = input_seconds
+        self.output_seconds = output_seconds
+        self.requests = requests
+
+    @property
+    def audio_seconds(self) -> float:
+        return self.input_seconds + self.output_seconds
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            "period": self.period,
+            "input_seconds": round(self.input_seconds, 3),
+            "output_seconds": round(self.output_seconds, 3),
+            "requests": self.requests,
+        }
+
+
+@contextmanager
+def _file_lock(path: Path) -> Iterator[None]:
+    import fcntl
+
+    with open(f"{path}.lock", "a+b") as handle:
+        fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+
+
+class QuotaStore:
+    def __init__(self, storage_path: Optional[str] = None, flush_interval: float = 10.0) -> None:
+        self._lock = Lock()
+        self._flush_lock = Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.configure(storage_path, flush_interval)
+
+    def configure(self, storage_path: Optional[str], flush_interval: float) -> None:
+        with self._lock:
+            self.storage_path = Path(storage_path) if storage_path else None
+            self.flush_interval = flush_interval
+            self._persisted: Dict[str, _Usage] = {}
+            self._pending: Dict[str, _Usage] = {}
+            # Deltas que se están escribiendo; siguen contando mientras tanto.
+            self._flushing: Dict[str, _Usage] = {}
+        if self.storage_path is not None:
+            self._persisted = self._current_only(self._read_file())
+
+    def check(self, api_key_id: str, limits: PlanLimits, audio_bytes: int = 0) -> Optional[str]:
+        """Reason the request must be rejected before STT, or None."""
+
+        reason = None
+        if limits.max_audio_bytes and audio_bytes > limits.max_audio_bytes:
+            reason = "max_audio_bytes"
+        elif limits.monthly_requests or limits.monthly_audio_seconds:
+            usage = self.usage(api_key_id)
+            if limits.monthly_requests and usage.requests >= limits.monthly_requests:
+                reason = "monthly_requests"
+            elif limits.monthly_audio_seconds and usage.audio_seconds >= limits.monthly_audio_seconds:
+                reason = "monthly_audio_seconds"
+        if reason is not None:
+            METRICS.inc_audio_quota_rejection(reason)
+        return reason
+
+    def record(self, api_key_id: str, input_seconds: float, output_seconds: float) -> None:
+        period = current_period()
+        with self._lock:
+            pending = self._pending.get(api_key_id)
+            if pending is None or pending.period != period:
+                pending = self._pending[api_key_id] = _Usage(period)
+            pending.input_seconds += input_seconds
+            pending.output_seconds += output_seconds
+            pending.requests += 1
+
+    def usage(self, api_key_id: str) -> _Usage:
+        period = current_period()
+        with self._lock:
+            total = _Usage(period)
+            for source in (self._persisted, self._flushing, self._pending):
+                item = source.get(api_key_id)
+                if item is not None and item.period == period:
+                    total.input_seconds += item.input_seconds
+                    total.output_seconds += item.output_seconds
+                    total.requests += item.requests
+            return total
+
+    def flush(self) -> None:
+        """Merge pending deltas into the shared file (bloqueante: correr en thread)."""
+
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                self._flushing = pending
+            if self.storage_path is None:
+                with self._lock:
+                    self._merge(self._persisted, pending)
+                    self._flushing = {}
+                return
+            try:
+                with _file_lock(self.storage_path):
+                    merged = self._current_only(self._read_file())
+                    self._merge(merged, pending)
+                    self._write_file(merged)
+            except OSError:
+                logger.warning("quota_flush_failed", extra={"event": "quota_flush_failed"}, exc_info=True)
+                with self._lock:
+                    # Se reintenta en el próximo flush.
+                    self._merge(self._pending, pending)
+                    self._flushing = {}
+                return
+            with self._lock:
+                self._persisted = merged
+                self._flushing = {}
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        await run_in_threadpool(self.flush)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await run_in_threadpool(self.flush)
+
+    @staticmethod
+    def _merge(target: Dict[str, _Usage], deltas: Dict[str, _Usage]) -> None:
+        for key, delta in deltas.items():
+            item = target.get(key)
+            if item is None or item.period != delta.period:
+                item = target[key] = _Usage(delta.period)
+            item.input_seconds += delta.input_seconds
+            item.output_seconds += delta.output_seconds
+            item.requests += delta.requests
+
+    @staticmethod
+    def _current_only(items: Dict[str, _Usage]) -> Dict[str, _Usage]:
+        period = current_period()
+        return {key: item for key, item in items.items() if item.period == period}
+
+    def _read_file(self) -> Dict[str, _Usage]:
+        assert self.storage_path is not None
+        try:
+            raw = json.loads(self.storage_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+        items: Dict[str, _Usage] = {}
+        for key, value in raw.get("usage", {}).items():
+            try:
+                items[key] = _Usage(
+                    str(value["period"]),
+                    float(value["input_seconds"]),
+                    float(value["output_seconds"]),
+                    int(value["requests"]),
+                )
+            except (KeyError, TypeError, ValueError):
+                continue
+        return items
+
+    def _write_file(self, items: Dict[str, _Usage]) -> None:
+        assert self.storage_path is not None
+        tmp_path = self.storage_path.with_name(f"{self.storage_path.name}.{os.getpid()}.tmp")
+        payload = {"usage": {key: item.to_dict() for key, item in items.items()}}
+        tmp_path.write_text(json.dumps(payload, separators=(",", ":")), encoding="utf-8")
+        os.replace(tmp_path, self.storage_path)
+
+
+QUOTAS = QuotaStore()
+
+
+@dataclass(frozen=True)
+class QuotaSettings:
+    storage_path: str = "/tmp/bot_neutro_quota.json"
+    flush_seconds: float = 10.0
+
+    @classmethod
+    def from_env(cls) -> "QuotaSettings":
+        try:
+            flush_seconds = max(0.1, float(os.getenv("QUOTA_FLUSH_SECONDS", "10")))
+        except ValueError:
+            flush_seconds = 10.0
+        return cls(
+            storage_path=os.getenv("QUOTA_STORAGE_PATH", "/tmp/bot_neutro_quota.json"),
+            flush_seconds=flush_seconds,
+        )
+
+
+def configure_quotas(settings: Optional[QuotaSettings] = None) -> QuotaStore:
+    settings = settings or QuotaSettings.from_env()
+    QUOTAS.configure(settings.storage_path, settings.flush_seconds)
+    return QUOTAS
+
+
+def quota_summary(api_key_id: str, limits: PlanLimits) -> Dict[str, object]:
+    usage = QUOTAS.usage(api_key_id)
+    remaining: Dict[str, Optional[float]] = {
+        "audio_seconds": max(0.0, round(limits.monthly_audio_seconds - usage.audio_seconds, 3))
+        if limits.monthly_audio_seconds
+        else None,
+        "requests": max(0, limits.monthly_requests - usage.requests) if limits.monthly_requests else None,
+    }
+    return {
+        **usage.to_dict(),
+        "limits": {
+            "monthly_audio_seconds": limits.monthly_audio_seconds or None,
+            "monthly_requests": limits.monthly_requests or None,
+            "max_audio_bytes": limits.max_audio_bytes or None,
+        },
+        "remaining": remaining,
+    }
+
+
+__all__ = ["QUOTAS", "QuotaSettings", "QuotaStore", "configure_quotas", "current_period", "quota_summary"]
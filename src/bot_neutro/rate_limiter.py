@@ -0,0 +1,538 @@
+"""GCRA (generic cell rate algorithm) rate limiting with pluggable backends.
+
+Cada key guarda un único float, el TAT (theoretical arrival time). Con un
+límite de `limit` requests cada `period` segundos el intervalo de emisión es
+`T = period / limit`; `burst` requests pueden llegar juntos (tolerancia
+`T * (burst - 1)`). A diferencia de la ventana fija, nunca se admiten 2× el
+límite en el borde de una ventana.
+
+Backends:
+
+- `GCRALimiter`: en memoria del proceso (default). Una key cuyo TAT ya pasó
+  equivale a una key nueva, así que se expira de forma perezosa; `max_keys`
+  acota la memoria.
+- `LeasedRateLimiter` + `TokenStore`: el estado vive en un store compartido
+  (`SQLiteTokenStore` para varios workers de un host, `RespTokenStore` para
+  varios nodos vía protocolo Redis). Cada worker toma tokens en lotes
+  (`lease_size`) y los consume localmente, así que solo 1 de cada
+  `lease_size` requests hace un round-trip. Un lease nunca admite de más:
+  los tokens ya fueron descontados del store; los que no se usan antes de
+  `lease_ttl` se pierden (sub-admisión acotada).
+"""
+
+from __future__ import annotations
+
+import math
+import os
+import socket
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+from threading import Lock
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .metrics_runtime import METRICS
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)) or default)
+    except ValueError:
+        return default
+
+
+@dataclass(frozen=True)
+class RateLimitConfig:
+    enabled: bool = False
+    window_seconds: int = 60
+    max_requests: int = 60
+    # Requests admitidos de golpe; por defecto igual a `max_requests`.
+    burst: int = 60
+    max_keys: int = 100_000
+    # memory (por proceso), sqlite (un host) o resp (varios nodos).
+    backend: str = "memory"
+    sqlite_path: str = "/tmp/bot_neutro_rate_limit.sqlite3"
+    resp_addr: str = "127.0.0.1:6379"
+    # Tokens reservados por lease (0 = automático) y su vigencia.
+    lease_size: int = 0
+    lease_ttl: float = 1.0
+
+    @classmethod
+    def from_env(cls) -> "RateLimitConfig":
+        max_requests = _env_int("RATE_LIMIT_AUDIO_MAX_REQUESTS", 60)
+        return cls(
+            enabled=os.getenv("RATE_LIMIT_ENABLED", "0") == "1",
+            window_seconds=_env_int("RATE_LIMIT_AUDIO_WINDOW_SECONDS", 60),
+            max_requests=max_requests,
+            burst=_env_int("RATE_LIMIT_AUDIO_BURST", max_requests),
+            max_keys=_env_int("RATE_LIMIT_MAX_KEYS", 100_000),
+            backend=os.getenv("RATE_LIMIT_BACKEND", "memory").strip().lower() or "memory",
+            sqlite_path=os.getenv("RATE_LIMIT_SQLITE_PATH", "/tmp/bot_neutro_rate_limit.sqlite3"),
+            resp_addr=os.getenv("RATE_LIMIT_RESP_ADDR", "127.0.0.1:6379"),
+            lease_size=max(0, _env_int("RATE_LIMIT_LEASE_SIZE", 0)),
+            lease_ttl=_env_float("RATE_LIMIT_LEASE_TTL_SECONDS", 1.0),
+        )
+
+
+@dataclass(frozen=True)
+class RateLimitDecision:
+    allowed: bool
+    # Cuota de la política (requests por `period`), no el burst.
+    limit: int
+    remaining: int
+    # Segundos hasta recuperar el burst completo.
+    reset_after: float
+    # Segundos hasta que el próximo request sería admitido (0 si allowed).
+    retry_after: float
+
+    def headers(self, policy: str) -> Dict[str, str]:
+        headers = {
+            "RateLimit-Limit": str(self.limit),
+            "RateLimit-Remaining": str(self.remaining),
+            "RateLimit-Reset": str(math.ceil(self.reset_after)),
+            "RateLimit-Policy": policy,
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(max(1, math.ceil(self.retry_after)))
+        return headers
+
+
+@dataclass(frozen=True)
+class GCRAParams:
+    limit: int
+    period: float
+    burst: int
+
+    @classmethod
+    def build(cls, limit: int, period: float, burst: int | None = None) -> "GCRAParams":
+        if limit <= 0 or period <= 0:
+            raise ValueError("limit and period must be positive")
+        return cls(limit=limit, period=period, burst=max(1, burst if burst is not None else limit))
+
+    @property
+    def emission_interval(self) -> float:
+        return self.period / self.limit
+
+    @property
+    def tolerance(self) -> float:
+        return self.emission_interval * (self.burst - 1)
+
+    @property
+    def policy(self) -> str:
+        """`<limit>;w=<period>`, más `;burst=<n>` si el burst difiere de la cuota."""
+
+        policy = f"{self.limit};w={self.period:g}"
+        return policy if self.burst == self.limit else f"{policy};burst={self.burst}"
+
+
+@dataclass(frozen=True)
+class TakeResult:
+    granted: int
+    tat: float
+    # TAT resultante (igual a `tat` si no se concedió nada).
+    new_tat: float
+    now: float
+
+
+def gcra_take(params: GCRAParams, tat: Optional[float], now: float, requested: int) -> TakeResult:
+    """Grant up to `requested` tokens given the stored TAT (None = key nueva)."""
+
+    interval = params.emission_interval
+    tat = now if tat is None else max(tat, now)
+    available = int((now + params.tolerance + interval - tat) / interval + 1e-9)
+    granted = max(0, min(requested, available))
+    return TakeResult(granted=granted, tat=tat, new_tat=tat + granted * interval, now=now)
+
+
+def _decision(params: GCRAParams, result: TakeResult, extra_remaining: int = 0) -> RateLimitDecision:
+    interval = params.emission_interval
+    now = result.now
+    if result.granted == 0:
+        return RateLimitDecision(
+            allowed=False,
+            limit=params.limit,
+            remaining=0,
+            reset_after=result.tat - now,
+            retry_after=result.tat - params.tolerance - now,
+        )
+    remaining = int((now + params.tolerance + interval - result.new_tat) / interval + 1e-9)
+    return RateLimitDecision(
+        allowed=True,
+        limit=params.limit,
+        remaining=max(0, remaining) + extra_remaining,
+        reset_after=result.new_tat - now,
+        retry_after=0.0,
+    )
+
+
+class RateLimitBackend(ABC):
+    params: GCRAParams
+
+    @property
+    def policy(self) -> str:
+        return self.params.policy
+
+    def hit_local(self, key: str) -> Optional[RateLimitDecision]:
+        """Non-blocking decision, or None when a round-trip (`hit`) is needed."""
+
+        return None
+
+    @abstractmethod
+    def hit(self, key: str) -> RateLimitDecision:
+        """Full decision; may block on I/O (el middleware lo corre en el thread pool)."""
+
+
+class GCRALimiter(RateLimitBackend):
+    """Per-process limiter; all state in memory, decisions never block."""
+
+    def __init__(
+        self,
+        limit: int,
+        period: float,
+        burst: int | None = None,
+        max_keys: int = 100_000,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.params = GCRAParams.build(limit, period, burst)
+        self.max_keys = max_keys
+        self._clock = clock
+        self._tat: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._tat)
+
+    def hit_local(self, key: str) -> Optional[RateLimitDecision]:
+        return self.hit(key)
+
+    def hit(self, key: str) -> RateLimitDecision:
+        now = self._clock()
+        with self._lock:
+            self._expire(now)
+            result = gcra_take(self.params, self._tat.get(key), now, 1)
+            if result.granted:
+                self._tat[key] = result.new_tat
+                self._tat.move_to_end(key)
+                if len(self._tat) > self.max_keys:
+                    self._tat.popitem(last=False)
+        return _decision(self.params, result)
+
+    def _expire(self, now: float) -> None:
+        # Las keys más antiguas en la cola suelen ser las inactivas.
+        while self._tat:
+            key, tat = next(iter(self._tat.items()))
+            if tat > now:
+                return
+            del self._tat[key]
+
+
+class TokenStore(ABC):
+    """Shared GCRA state: atomically take up to `tokens` for `key`."""
+
+    @abstractmethod
+    def take(self, key: str, tokens: int, params: GCRAParams) -> TakeResult:
+        ...
+
+    def close(self) -> None:
+        pass
+
+
+class SQLiteTokenStore(TokenStore):
+    """TAT per key in a SQLite file shared by every worker of the host."""
+
+    PURGE_EVERY = 1000
+
+    def __init__(self, path: str, clock: Callable[[], float] = time.time) -> None:
+        self.path = path
+        self._clock = clock
+        self._lock = Lock()
+        self._takes = 0
+        self._conn = sqlite3.connect(path, timeout=5.0, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS gcra (key TEXT PRIMARY KEY, tat REAL NOT NULL)")
+
+    def take(self, key: str, tokens: int, params: GCRAParams) -> TakeResult:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = self._clock()
+                row = self._conn.execute("SELECT tat FROM gcra WHERE key = ?", (key,)).fetchone()
+                result = gcra_take(params, row[0] if row else None, now, tokens)
+                if result.granted:
+                    self._conn.execute(
+                        "INSERT INTO gcra (key, tat) VALUES (?, ?) "
+                        "ON CONFLICT(key) DO UPDATE SET tat = excluded.tat",
+                        (key, result.new_tat),
+                    )
+                self._takes += 1
+                if self._takes % self.PURGE_EVERY == 0:
+                    self._conn.execute("DELETE FROM gcra WHERE tat <= ?", (now,))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return result
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class RespError(RuntimeError):
+    pass
+
+
+class RespTokenStore(TokenStore):
+    """TAT per key in a Redis-protocol server (varios nodos).
+
+    Usa transacciones optimistas (`WATCH`/`MULTI`/`EXEC`) en vez de scripts
+    Lua, así que funciona con cualquier servidor RESP que las soporte. Las keys
+    expiran solas (`PX`) cuando el TAT queda en el pasado.
+    """
+
+    MAX_ATTEMPTS = 5
+
+    def __init__(
+        self,
+        host: str,
+        port: int = 6379,
+        key_prefix: str = "bot_neutro:rl:",
+        timeout: float = 0.5,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.key_prefix = key_prefix
+        self.timeout = timeout
+        self._clock = clock
+        self._lock = Lock()
+        self._sock: Optional[socket.socket] = None
+        self._buffer = b""
+
+    def take(self, key: str, tokens: int, params: GCRAParams) -> TakeResult:
+        store_key = self.key_prefix + key
+        with self._lock:
+            try:
+                for _ in range(self.MAX_ATTEMPTS):
+                    self._command("WATCH", store_key)
+                    raw = self._command("GET", store_key)
+                    now = self._clock()
+                    result = gcra_take(params, float(raw) if raw is not None else None, now, tokens)
+                    if not result.granted:
+                        self._command("UNWATCH")
+                        return result
+                    ttl_ms = max(1, math.ceil((result.new_tat - now) * 1000))
+                    self._command("MULTI")
+                    self._command("SET", store_key, repr(result.new_tat), "PX", str(ttl_ms))
+                    if self._command("EXEC") is not None:
+                        return result
+                raise RespError("rate limit store contention")
+            except (OSError, RespError):
+                self._disconnect()
+                raise
+
+    def close(self) -> None:
+        with self._lock:
+            self._disconnect()
+
+    def _disconnect(self) -> None:
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+        self._sock = None
+        self._buffer = b""
+
+    def _command(self, *parts: str):
+        if self._sock is None:
+            self._sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        payload = [f"*{len(parts)}\r\n".encode()]
+        for part in parts:
+            data = part.encode("utf-8")
+            payload.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        self._sock.sendall(b"".join(payload))
+        return self._read_reply()
+
+    def _read_line(self) -> bytes:
+        while b"\r\n" not in self._buffer:
+            chunk = self._sock.recv(4096)  # type: ignore[union-attr]
+            if not chunk:
+                raise RespError("connection closed")
+            self._buffer += chunk
+        line, _, self._buffer = self._buffer.partition(b"\r\n")
+        return line
+
+    def _read_exact(self, size: int) -> bytes:
+        while len(self._buffer) < size + 2:
+            chunk = self._sock.recv(4096)  # type: ignore[union-attr]
+            if not chunk:
+                raise RespError("connection closed")
+            self._buffer += chunk
+        data, self._buffer = self._buffer[:size], self._buffer[size + 2 :]
+        return data
+
+    def _read_reply(self):
+        line = self._read_line()
+        kind, rest = line[:1], line[1:]
+        if kind == b"+":
+            return rest.decode()
+        if kind == b"-":
+            raise RespError(rest.decode())
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            size = int(rest)
+            return None if size < 0 else self._read_exact(size).decode("utf-8")
+        if kind == b"*":
+            size = int(rest)
+            return None if size < 0 else [self._read_reply() for _ in range(size)]
+        raise RespError(f"unexpected reply {line!r}")
+
+
+class LeasedRateLimiter(RateLimitBackend):
+    """Consume tokens leased in batches from a shared `TokenStore`.
+
+    Si el store falla, el request se admite (fail-open) y se cuenta en
+    `rate_limit_backend_errors_total`.
+    """
+
+    def __init__(
+        self,
+        store: TokenStore,
+        limit: int,
+        period: float,
+        burst: int | None = None,
+        lease_size: int = 0,
+        lease_ttl: float = 1.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.params = GCRAParams.build(limit, period, burst)
+        self.store = store
+        self.lease_size = lease_size if lease_size > 0 else max(1, self.params.burst // 10)
+        self.lease_ttl = lease_ttl
+        self._clock = clock
+        # key -> [tokens restantes, vence, remaining reportado por el store]
+        self._leases: Dict[str, List[float]] = {}
+        # key -> instante hasta el que se rechaza sin consultar el store
+        self._denied: Dict[str, Tuple[float, float]] = {}
+        self._lock = Lock()
+
+    def hit_local(self, key: str) -> Optional[RateLimitDecision]:
+        now = self._clock()
+        with self._lock:
+            denied = self._denied.get(key)
+            if denied is not None:
+                denied_until, reset_at = denied
+                if denied_until > now:
+                    # Rechazo cacheado: un cliente abusivo no genera un round-trip por request.
+                    return RateLimitDecision(
+                        allowed=False,
+                        limit=self.params.limit,
+                        remaining=0,
+                        reset_after=reset_at - now,
+                        retry_after=denied_until - now,
+                    )
+                del self._denied[key]
+            lease = self._leases.get(key)
+            if lease is None or lease[0] <= 0 or lease[1] <= now:
+                if lease is not None:
+                    del self._leases[key]
+                self._expire(now)
+                return None
+            lease[0] -= 1
+            tokens_left, store_remaining = int(lease[0]), int(lease[2])
+        return RateLimitDecision(
+            allowed=True,
+            limit=self.params.limit,
+            remaining=tokens_left + store_remaining,
+            reset_after=self.params.emission_interval * (self.params.burst - tokens_left - store_remaining),
+            retry_after=0.0,
+        )
+
+    def hit(self, key: str) -> RateLimitDecision:
+        local = self.hit_local(key)
+        if local is not None:
+            return local
+        try:
+            result = self.store.take(key, self.lease_size, self.params)
+        except Exception:
+            METRICS.inc_rate_limit_backend_error(type(self.store).__name__)
+            return RateLimitDecision(
+                allowed=True, limit=self.params.limit, remaining=0, reset_after=0.0, retry_after=0.0
+            )
+        if result.granted == 0:
+            decision = _decision(self.params, result)
+            with self._lock:
+                now = self._clock()
+                self._denied[key] = (now + min(decision.retry_after, self.lease_ttl), now + decision.reset_after)
+            return decision
+        tokens_left = result.granted - 1
+        store_decision = _decision(self.params, result)
+        with self._lock:
+            if tokens_left > 0:
+                self._leases[key] = [tokens_left, self._clock() + self.lease_ttl, store_decision.remaining]
+        return RateLimitDecision(
+            allowed=True,
+            limit=self.params.limit,
+            remaining=store_decision.remaining + tokens_left,
+            reset_after=store_decision.reset_after,
+            retry_after=0.0,
+        )
+
+    def _expire(self, now: float) -> None:
+        if len(self._leases) + len(self._denied) < 1024:
+            return
+        for key in [key for key, lease in self._leases.items() if lease[1] <= now]:
+            del self._leases[key]
+        for key in [key for key, (until, _) in self._denied.items() if until <= now]:
+            del self._denied[key]
+
+
+def _parse_addr(raw: str) -> Tuple[str, int]:
+    host, _, port = raw.rpartition(":")
+    if not host:
+        return raw, 6379
+    return host, int(port)
+
+
+def build_rate_limit_backend(config: RateLimitConfig) -> RateLimitBackend:
+    """Backend named by `config.backend` (`memory`, `sqlite` o `resp`)."""
+
+    limit, period, burst = config.max_requests, config.window_seconds, config.burst
+    if config.backend == "sqlite":
+        store: TokenStore = SQLiteTokenStore(config.sqlite_path)
+    elif config.backend == "resp":
+        host, port = _parse_addr(config.resp_addr)
+        store = RespTokenStore(host, port)
+    else:
+        return GCRALimiter(limit=limit, period=period, burst=burst, max_keys=config.max_keys)
+    return LeasedRateLimiter(
+        store, limit=limit, period=period, burst=burst, lease_size=config.lease_size, lease_ttl=config.lease_ttl
+    )
+
+
+__all__ = [
+    "GCRALimiter",
+    "GCRAParams",
+    "LeasedRateLimiter",
+    "RateLimitBackend",
+    "RateLimitConfig",
+    "RateLimitDecision",
+    "RespTokenStore",
+    "SQLiteTokenStore",
+    "TakeResult",
+    "TokenStore",
+    "build_rate_limit_backend",
+    "gcra_take",
+]
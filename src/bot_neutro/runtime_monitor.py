@@ -0,0 +1,104 @@
+"""Event-loop lag and executor saturation monitor.
+
+`LoopLagMonitor` corre como task del lifespan: duerme `interval` segundos y
+mide cuánto tarde lo despierta el loop (lag de scheduling). En cada tick
+publica en `InMemoryMetrics` el lag y el estado del thread pool de anyio
+(donde corre el pipeline de audio). `/readyz` usa `readiness_failures()` con
+los umbrales de `ReadinessSettings` (parte del snapshot de settings) para
+responder 503 antes de que el SLO se queme.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import os
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import anyio.to_thread
+
+from .metrics_runtime import METRICS
+
+
+def executor_stats() -> Tuple[int, int]:
+    """`(threads busy, tasks waiting for a thread)` of anyio's default limiter."""
+
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    return int(limiter.borrowed_tokens), limiter.statistics().tasks_waiting
+
+
+class LoopLagMonitor:
+    def __init__(self, interval: float = 0.25) -> None:
+        self.interval = interval
+        self.lag_seconds = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+
+    def sample(self, lag_seconds: float) -> None:
+        self.lag_seconds = lag_seconds
+        METRICS.set_event_loop_lag(lag_seconds)
+        busy, pending = executor_stats()
+        METRICS.set_executor_stats(busy, pending)
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            self.sample(max(0.0, loop.time() - started - self.interval))
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+@dataclass(frozen=True)
+class ReadinessSettings:
+    # Un umbral en 0 deshabilita ese chequeo.
+    max_loop_lag_seconds: float = 0.5
+    max_executor_pending: float = 0.0
+    max_audio_in_flight: float = 0.0
+
+    @classmethod
+    def from_env(cls) -> "ReadinessSettings":
+        return cls(
+            max_loop_lag_seconds=_env_float("READYZ_MAX_LOOP_LAG_SECONDS", 0.5),
+            max_executor_pending=_env_float("READYZ_MAX_EXECUTOR_PENDING", 0),
+            max_audio_in_flight=_env_float("READYZ_MAX_AUDIO_IN_FLIGHT", 0),
+        )
+
+
+def readiness_failures(monitor: Optional[LoopLagMonitor], settings: ReadinessSettings) -> List[str]:
+    """Reasons this worker should be taken out of rotation (vacío = ready)."""
+
+    failures: List[str] = []
+    max_lag = settings.max_loop_lag_seconds
+    if monitor is not None and max_lag > 0 and monitor.lag_seconds > max_lag:
+        failures.append("event_loop_lag")
+
+    max_pending = settings.max_executor_pending
+    if max_pending > 0 and executor_stats()[1] >= max_pending:
+        failures.append("executor_saturated")
+
+    max_in_flight = settings.max_audio_in_flight
+    if max_in_flight > 0 and METRICS.requests_in_flight("/audio") >= max_in_flight:
+        failures.append("audio_in_flight")
+    return failures
+
+
+__all__ = ["LoopLagMonitor", "ReadinessSettings", "executor_stats", "readiness_failures"]
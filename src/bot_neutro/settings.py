@@ -0,0 +1,231 @@
+"""Typed settings snapshot, parsed and validated once per app.
+
+`create_app` arma un `Settings` desde el entorno y lo pasa a middleware,
+pipeline, providers y repositorios; el código por request solo lee
+`SettingsHolder.current` (una referencia a un objeto inmutable), nunca
+`os.getenv`. `SettingsHolder.reload()` arma un snapshot nuevo y cambia la
+referencia de forma atómica; lo disparan `SIGHUP` o `POST
+/debug/settings/reload`.
+
+El entorno de un proceso no cambia desde afuera, así que lo que se recarga es
+`SETTINGS_FILE`: un archivo `KEY=VALUE` (formato `.env`) que se aplica sobre
+el entorno al arrancar y en cada reload. Una clave que desaparece del archivo
+vuelve a su valor original del entorno.
+
+Las secciones `storage`, `quota`, `providers`, `logging` y `metrics` se fijan
+al construir los objetos (repositorio, archivo de cuotas, clientes de
+proveedores, listener de logs, directorio multiproceso y ventanas de los
+sketches): un cambio ahí se informa en `restart_required` y no se aplica hasta
+reiniciar. `tracing` y `slow_requests` reconfiguran sus singletons en el
+reload.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+from dataclasses import dataclass, fields
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+
+from .audio_scheduler import SchedulerSettings
+from .audio_storage import StorageSettings
+from .auth import AUTHENTICATOR, AuthSettings
+from .debug import DebugSettings
+from .log_pipeline import LoggingSettings
+from .providers.factory import ProviderSettings
+from .providers.tts_formats import TTS_OUTPUT_FORMATS, get_tts_format, parse_format_list
+from .quota import QuotaSettings
+from .rate_limiter import RateLimitConfig
+from .runtime_monitor import ReadinessSettings
+from .slow_requests import SlowRequestSettings, configure_slow_requests
+from .tracing import TracingSettings, configure_tracing
+
+logger = logging.getLogger("bot_neutro")
+
+RESTART_REQUIRED_SECTIONS = ("storage", "quota", "providers", "logging", "metrics")
+
+
+def _parse_stats_max_sessions(raw: str) -> int:
+    try:
+        value = int(raw)
+    except ValueError:
+        return 20000
+    if value < 0:
+        return 0
+    return value
+
+
+@dataclass(frozen=True)
+class HttpSettings:
+    server_timing_enabled: bool = True
+    metrics_gzip_enabled: bool = True
+    metrics_latency_summaries: bool = False
+    stats_max_sessions: int = 20000
+    # Formatos de TTS ofrecidos a los clientes; el default debe estar entre ellos.
+    tts_formats: Tuple[str, ...] = tuple(TTS_OUTPUT_FORMATS)
+    tts_format_default: str = "wav"
+
+    @classmethod
+    def from_env(cls) -> "HttpSettings":
+        tts_formats = parse_format_list(os.getenv("TTS_OUTPUT_FORMATS", ""))
+        tts_format_default = get_tts_format(os.getenv("TTS_OUTPUT_FORMAT_DEFAULT")).name
+        return cls(
+            server_timing_enabled=os.getenv("AUDIO_SERVER_TIMING_ENABLED", "1") != "0",
+            metrics_gzip_enabled=os.getenv("METRICS_GZIP_ENABLED", "1") != "0",
+            metrics_latency_summaries=os.getenv("METRICS_LATENCY_SUMMARIES", "0") == "1",
+            stats_max_sessions=_parse_stats_max_sessions(os.getenv("AUDIO_STATS_MAX_SESSIONS", "20000")),
+            tts_formats=tts_formats,
+            tts_format_default=tts_format_default if tts_format_default in tts_formats else tts_formats[0],
+        )
+
+
+@dataclass(frozen=True)
+class MetricsSettings:
+    # Vacío = métricas solo de este worker.
+    multiprocess_dir: str = ""
+    latency_top_k_tenants: int = 100
+    latency_window_seconds: float = 300.0
+
+    @classmethod
+    def from_env(cls) -> "MetricsSettings":
+        try:
+            top_k = max(0, int(os.getenv("METRICS_LATENCY_TOP_K_TENANTS", "100")))
+        except ValueError:
+            top_k = 100
+        try:
+            window = float(os.getenv("METRICS_LATENCY_WINDOW_SECONDS", "300"))
+        except ValueError:
+            window = 300.0
+        return cls(
+            multiprocess_dir=os.getenv("METRICS_MULTIPROC_DIR", ""),
+            latency_top_k_tenants=top_k,
+            latency_window_seconds=window if window > 0 else 300.0,
+        )
+
+
+@dataclass(frozen=True)
+class Settings:
+    http: HttpSettings
+    storage: StorageSettings
+    auth: AuthSettings
+    rate_limit: RateLimitConfig
+    scheduler: SchedulerSettings
+    readiness: ReadinessSettings
+    quota: QuotaSettings
+    providers: ProviderSettings
+    debug: DebugSettings
+    logging: LoggingSettings
+    tracing: TracingSettings
+    slow_requests: SlowRequestSettings
+    metrics: MetricsSettings
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        return cls(
+            http=HttpSettings.from_env(),
+            storage=StorageSettings.from_env(),
+            auth=AuthSettings.from_env(),
+            rate_limit=RateLimitConfig.from_env(),
+            scheduler=SchedulerSettings.from_env(),
+            readiness=ReadinessSettings.from_env(),
+            quota=QuotaSettings.from_env(),
+            providers=ProviderSettings.from_env(),
+            debug=DebugSettings.from_env(),
+            logging=LoggingSettings.from_env(),
+            tracing=TracingSettings.from_env(),
+            slow_requests=SlowRequestSettings.from_env(),
+            metrics=MetricsSettings.from_env(),
+        )
+
+    def changed_sections(self, other: "Settings") -> List[str]:
+        return [item.name for item in fields(self) if getattr(self, item.name) != getattr(other, item.name)]
+
+
+def read_settings_file(path: str) -> Dict[str, str]:
+    """Parse `KEY=VALUE` lines (`#` comments, optional `export` and quotes)."""
+
+    values: Dict[str, str] = {}
+    with open(path, encoding="utf-8") as handle:
+        for line in handle:
+            line = line.strip()
+            if not line or line.startswith("#") or "=" not in line:
+                continue
+            key, _, value = line.removeprefix("export ").partition("=")
+            value = value.strip()
+            if len(value) >= 2 and value[0] == value[-1] and value[0] in "\"'":
+                value = value[1:-1]
+            values[key.strip()] = value
+    return values
+
+
+class _SettingsFile:
+    """Overlay of `SETTINGS_FILE` on `os.environ`, remembering what it replaced."""
+
+    def __init__(self) -> None:
+        self._original: Dict[str, Optional[str]] = {}
+
+    def apply(self) -> None:
+        path = os.getenv("SETTINGS_FILE", "")
+        try:
+            values = read_settings_file(path) if path else {}
+        except OSError as exc:
+            # Archivo ilegible: se mantiene lo aplicado la última vez.
+            logger.warning("settings_file_unreadable", extra={"path": path, "exc_type": type(exc).__name__})
+            return
+        for key in [key for key in self._original if key not in values]:
+            original = self._original.pop(key)
+            if original is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = original
+        for key, value in values.items():
+            if key not in self._original:
+                self._original[key] = os.environ.get(key)
+            os.environ[key] = value
+
+
+class SettingsHolder:
+    """Current `Settings` of an app; readers never lock, `reload` swaps the reference."""
+
+    def __init__(self, settings: Optional[Settings] = None) -> None:
+        self._lock = Lock()
+        self._file = _SettingsFile()
+        if settings is None:
+            self._file.apply()
+        self.current = settings or Settings.from_env()
+        self.version = 1
+
+    def reload(self, settings: Optional[Settings] = None) -> Dict[str, object]:
+        with self._lock:
+            if settings is None:
+                self._file.apply()
+            new = settings or Settings.from_env()
+            previous = self.current
+            changed = new.changed_sections(previous)
+            if changed:
+                # Los principals cacheados dependen de ids premium y planes.
+                if "auth" in changed:
+                    AUTHENTICATOR.configure(new.auth)
+                # Tracer y ring buffer de lentos son globales del proceso.
+                if "tracing" in changed:
+                    configure_tracing(new.tracing)
+                if "slow_requests" in changed:
+                    configure_slow_requests(new.slow_requests)
+                self.current = new
+                self.version += 1
+            version = self.version
+        restart_required = [name for name in changed if name in RESTART_REQUIRED_SECTIONS]
+        logger.info(
+            "settings_reloaded",
+            extra={
+                "event": "settings_reloaded",
+                "settings_version": version,
+                "changed": changed,
+                "restart_required": restart_required,
+            },
+        )
+        return {"version": version, "changed": changed, "restart_required": restart_required}
+
+
+__all__ = ["HttpSettings", "MetricsSettings", "RESTART_REQUIRED_SECTIONS", "Settings", "SettingsHolder", "read_settings_file"]
@@ -0,0 +1,78 @@
+"""Bounded ring buffer of slow requests with their full stage breakdown.
+
+`RequestLatencyMiddleware` registra aquí cada request cuya duración supere
+`SLOW_REQUEST_THRESHOLD_MS` y marca el bucket del histograma con un exemplar
+`corr_id`, de modo que desde un bucket de Grafana se llegue a la entrada
+concreta en `GET /debug/slow-requests`.
+"""
+
+from __future__ import annotations
+
+import os
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from threading import Lock
+from typing import Deque, Dict, List, Optional
+
+
+class SlowRequestLog:
+    def __init__(self, threshold_ms: float = 2000.0, capacity: int = 100) -> None:
+        self._lock = Lock()
+        self.configure(threshold_ms, capacity)
+
+    def configure(self, threshold_ms: float, capacity: int) -> None:
+        with self._lock:
+            self.threshold_ms = threshold_ms
+            self.capacity = max(1, capacity)
+            previous = list(getattr(self, "_entries", ()))
+            self._entries: Deque[Dict[str, object]] = deque(previous, maxlen=self.capacity)
+
+    def is_slow(self, duration_seconds: float) -> bool:
+        return self.threshold_ms > 0 and duration_seconds * 1000 >= self.threshold_ms
+
+    def record(self, entry: Dict[str, object]) -> None:
+        entry.setdefault("ts", datetime.now(timezone.utc).isoformat())
+        with self._lock:
+            self._entries.append(entry)
+
+    def entries(self, limit: Optional[int] = None) -> List[Dict[str, object]]:
+        """Newest first."""
+
+        with self._lock:
+            items = list(reversed(self._entries))
+        return items[:limit] if limit is not None else items
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+SLOW_REQUESTS = SlowRequestLog()
+
+
+@dataclass(frozen=True)
+class SlowRequestSettings:
+    threshold_ms: float = 2000.0
+    capacity: int = 100
+
+    @classmethod
+    def from_env(cls) -> "SlowRequestSettings":
+        try:
+            threshold_ms = float(os.getenv("SLOW_REQUEST_THRESHOLD_MS", "2000"))
+        except ValueError:
+            threshold_ms = 2000.0
+        try:
+            capacity = int(os.getenv("SLOW_REQUEST_BUFFER_SIZE", "100"))
+        except ValueError:
+            capacity = 100
+        return cls(threshold_ms=threshold_ms, capacity=capacity)
+
+
+def configure_slow_requests(settings: Optional[SlowRequestSettings] = None) -> SlowRequestLog:
+    settings = settings or SlowRequestSettings.from_env()
+    SLOW_REQUESTS.configure(settings.threshold_ms, settings.capacity)
+    return SLOW_REQUESTS
+
+
+__all__ = ["SLOW_REQUESTS", "SlowRequestLog", "SlowRequestSettings", "configure_slow_requests"]
@@ -0,0 +1,376 @@
+"""Lightweight in-process tracing ligado a `X-Correlation-Id`.
+
+Un request muestreado abre un span raíz cuyo `trace_id` se deriva del
+`corr_id`; middlewares, etapas del pipeline y llamadas al repositorio abren
+spans hijos vía `TRACER.span(...)` (contextvar, sin pasar objetos). Los spans
+terminados se encolan sin bloquear y un thread de fondo los escribe en lotes a
+un JSONL rotativo. Sin muestreo (`TRACING_SAMPLE_RATE=0`, default) cada
+`TRACER.span` es un `ContextVar.get()` y nada más.
+"""
+
+from __future__ import annotations
+
+import atexit
+import hashlib
+import json
+import os
+import queue
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from .metrics_runtime import METRICS
+
+DEFAULT_EXPORT_PATH = "/tmp/bot_neutro_traces.jsonl"
+
+
+def trace_id_from_correlation_id(correlation_id: str) -> str:
+    """32 hex chars: el UUID tal cual si el corr_id es un UUID, si no un hash."""
+
+    try:
+        return uuid.UUID(correlation_id).hex
+    except ValueError:
+        return hashlib.sha256(correlation_id.encode("utf-8")).hexdigest()[:32]
+
+
+def _new_span_id() -> str:
+    return f"{random.getrandbits(64):016x}"
+
+
+class _TraceBudget:
+    __slots__ = ("spans_left",)
+
+    def __init__(self, max_spans: int) -> None:
+        self.spans_left = max_spans
+
+
+class Span:
+    __slots__ = (
+        "trace_id",
+        "span_id",
+        "parent_id",
+        "name",
+        "start_ns",
+        "end_ns",
+        "attributes",
+        "status",
+        "_budget",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        trace_id: str,
+        parent_id: Optional[str],
+        budget: _TraceBudget,
+        attributes: Optional[Dict[str, object]] = None,
+        start_ns: Optional[int] = None,
+    ) -> None:
+        self.trace_id = trace_id
+        self.span_id = _new_span_id()
+        self.parent_id = parent_id
+        self.name = name
+        self.start_ns = start_ns if start_ns is not None else time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes: Dict[str, object] = dict(attributes or {})
+        self.status = "ok"
+        self._budget = budget
+
+    def set_attribute(self, key: str, value: object) -> None:
+        self.attributes[key] = value
+
+    def to_dict(self) -> Dict[str, object]:
+        end_ns = self.end_ns or self.start_ns
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "end_ns": end_ns,
+            "duration_ms": round((end_ns - self.start_ns) / 1e6, 3),
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+_CURRENT_SPAN: ContextVar[Optional[Span]] = ContextVar("bot_neutro_current_span", default=None)
+
+
+def current_span() -> Optional[Span]:
+    return _CURRENT_SPAN.get()
+
+
+class JSONLSpanExporter:
+    """Batched exporter to a size-rotated JSONL file.
+
+    `export` nunca bloquea: con la cola llena el span se descarta y se cuenta
+    en `tracing_spans_dropped_total{reason="backpressure"}`.
+    """
+
+    def __init__(
+        self,
+        path: str | Path = DEFAULT_EXPORT_PATH,
+        max_bytes: int = 10 * 1024 * 1024,
+        backup_count: int = 3,
+        batch_size: int = 256,
+        flush_interval: float = 1.0,
+        max_queue: int = 10000,
+    ) -> None:
+        self.path = Path(path)
+        self._max_bytes = max_bytes
+        self._backup_count = backup_count
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._queue: "queue.Queue[object]" = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+
+    def export(self, span: Span) -> None:
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            METRICS.inc_tracing_spans_dropped("backpressure")
+
+    def force_flush(self, timeout: float = 5.0) -> bool:
+        """Block until every span queued so far is on disk (para tests y shutdown)."""
+
+        if self._thread is None:
+            return True
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def _ensure_started(self) -> None:
+        pid = os.getpid()
+        if self._thread is not None and self._pid == pid:
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == pid:
+                return
+            # Tras un fork el thread del padre no existe en el hijo.
+            self._pid = pid
+            self._thread = threading.Thread(
+                target=self._run, name="bot-neutro-span-exporter", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            batch: List[Span] = []
+            waiters: List[threading.Event] = []
+            try:
+                item = self._queue.get(timeout=self._flush_interval)
+            except queue.Empty:
+                continue
+            while True:
+                if isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    batch.append(item)  # type: ignore[arg-type]
+                if len(batch) >= self._batch_size:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            if batch:
+                self._write(batch)
+            for waiter in waiters:
+                waiter.set()
+
+    def _write(self, batch: List[Span]) -> None:
+        payload = "".join(
+            json.dumps(span.to_dict(), ensure_ascii=False, default=str) + "\n" for span in batch
+        )
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            if self._max_bytes > 0 and self.path.exists():
+                if self.path.stat().st_size + len(payload) > self._max_bytes:
+                    self._rotate()
+            with self.path.open("a", encoding="utf-8") as handle:
+                handle.write(payload)
+        except OSError:
+            METRICS.inc_tracing_spans_dropped("io_error")
+
+    def _rotate(self) -> None:
+        if self._backup_count <= 0:
+            self.path.unlink(missing_ok=True)
+            return
+        for index in range(self._backup_count - 1, 0, -1):
+            source = self.path.with_name(f"{self.path.name}.{index}")
+            if source.exists():
+                source.replace(self.path.with_name(f"{self.path.name}.{index + 1}"))
+        self.path.replace(self.path.with_name(f"{self.path.name}.1"))
+
+
+class Tracer:
+    def __init__(
+        self,
+        sample_rate: float = 0.0,
+        exporter: Optional[JSONLSpanExporter] = None,
+        max_spans_per_trace: int = 128,
+    ) -> None:
+        self.configure(sample_rate, exporter, max_spans_per_trace)
+
+    def configure(
+        self,
+        sample_rate: float,
+        exporter: Optional[JSONLSpanExporter],
+        max_spans_per_trace: int = 128,
+    ) -> None:
+        self.sample_rate = min(max(sample_rate, 0.0), 1.0)
+        self.exporter = exporter
+        self.max_spans_per_trace = max(1, max_spans_per_trace)
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter is not None and self.sample_rate > 0.0
+
+    @contextmanager
+    def start_trace(self, name: str, correlation_id: str, **attributes: object) -> Iterator[Optional[Span]]:
+        """Root span for one request; yields None when the request is not sampled."""
+
+        if not self.enabled or _CURRENT_SPAN.get() is not None or random.random() >= self.sample_rate:
+            yield None
+            return
+        budget = _TraceBudget(self.max_spans_per_trace - 1)
+        attributes["correlation_id"] = correlation_id
+        span = Span(name, trace_id_from_correlation_id(correlation_id), None, budget, attributes)
+        with self._activate(span):
+            yield span
+
+    @contextmanager
+    def span(self, name: str, **attributes: object) -> Iterator[Optional[Span]]:
+        """Child of the current span; a no-op outside a sampled trace."""
+
+        parent = _CURRENT_SPAN.get()
+        if parent is None:
+            yield None
+            return
+        span = self._child(parent, name, attributes)
+        if span is None:
+            yield None
+            return
+        with self._activate(span):
+            yield span
+
+    def record_span(self, name: str, start_ns: int, end_ns: int, **attributes: object) -> None:
+        """Export an already-measured interval as a child of the current span."""
+
+        parent = _CURRENT_SPAN.get()
+        if parent is None:
+            return
+        span = self._child(parent, name, attributes, start_ns=start_ns)
+        if span is None:
+            return
+        span.end_ns = end_ns
+        self._export(span)
+
+    def _child(
+        self,
+        parent: Span,
+        name: str,
+        attributes: Dict[str, object],
+        start_ns: Optional[int] = None,
+    ) -> Optional[Span]:
+        budget = parent._budget
+        if budget.spans_left <= 0:
+            METRICS.inc_tracing_spans_dropped("span_limit")
+            return None
+        budget.spans_left -= 1
+        return Span(name, parent.trace_id, parent.span_id, budget, attributes, start_ns=start_ns)
+
+    @contextmanager
+    def _activate(self, span: Span) -> Iterator[Span]:
+        token = _CURRENT_SPAN.set(span)
+        try:
+            yield span
+        except BaseException as exc:
+            span.status = "error"
+            span.attributes["error.type"] = type(exc).__name__
+            raise
+        finally:
+            span.end_ns = time.time_ns()
+            _CURRENT_SPAN.reset(token)
+            self._export(span)
+
+    def _export(self, span: Span) -> None:
+        exporter = self.exporter
+        if exporter is not None:
+            exporter.export(span)
+
+
+TRACER = Tracer()
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+@dataclass(frozen=True)
+class TracingSettings:
+    sample_rate: float = 0.0
+    export_path: str = DEFAULT_EXPORT_PATH
+    export_max_bytes: int = 10 * 1024 * 1024
+    export_backup_count: int = 3
+    max_spans_per_trace: int = 128
+
+    @classmethod
+    def from_env(cls) -> "TracingSettings":
+        return cls(
+            sample_rate=_env_float("TRACING_SAMPLE_RATE", 0.0),
+            export_path=os.getenv("TRACING_EXPORT_PATH", DEFAULT_EXPORT_PATH),
+            export_max_bytes=int(_env_float("TRACING_EXPORT_MAX_BYTES", 10 * 1024 * 1024)),
+            export_backup_count=int(_env_float("TRACING_EXPORT_BACKUP_COUNT", 3)),
+            max_spans_per_trace=int(_env_float("TRACING_MAX_SPANS_PER_TRACE", 128)),
+        )
+
+
+def configure_tracing(settings: Optional[TracingSettings] = None) -> Tracer:
+    """(Re)configura `TRACER`; reusa el exporter si el path no cambió."""
+
+    settings = settings or TracingSettings.from_env()
+    path = Path(settings.export_path)
+    exporter = TRACER.exporter
+    if settings.sample_rate <= 0.0:
+        exporter = None
+    elif exporter is None or exporter.path != path:
+        exporter = JSONLSpanExporter(
+            path,
+            max_bytes=settings.export_max_bytes,
+            backup_count=settings.export_backup_count,
+        )
+        atexit.register(exporter.force_flush, 2.0)
+    TRACER.configure(
+        settings.sample_rate,
+        exporter,
+        max_spans_per_trace=settings.max_spans_per_trace,
+    )
+    return TRACER
+
+
+__all__ = [
+    "JSONLSpanExporter",
+    "Span",
+    "TRACER",
+    "Tracer",
+    "TracingSettings",
+    "configure_tracing",
+    "current_span",
+    "trace_id_from_correlation_id",
+]
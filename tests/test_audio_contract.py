@@ -44,19 +44,42 @@ def test_audio_happy_path_returns_contract_fields_and_headers():
     assert response.headers.get("X-Correlation-Id")
 
 
-def test_audio_allows_setting_premium_tier_via_header(monkeypatch):
-    monkeypatch.setenv("MUNAY_LLM_PREMIUM_API_KEY_IDS", derive_api_key_id("test-key"))
+def test_audio_success_carries_server_timing_breakdown():
     response = client.post(
         "/audio",
         files={"audio_file": ("test.wav", b"fake audio", "audio/wav")},
-        headers={
-            "X-API-Key": "test-key",
-            "X-Correlation-Id": "test-corr-id",
-            "x-munay-llm-tier": "Premium",
-        },
-        data={"user_external_id": "test-user"},
+        headers={"X-API-Key": "test-key", "Origin": "http://localhost:5173"},
     )
 
+    assert response.status_code == 200
+    entries = dict(
+        (part.split(";dur=")[0].strip(), float(part.split(";dur=")[1]))
+        for part in response.headers["Server-Timing"].split(",")
+    )
+    assert list(entries) == ["upload", "queue", "stt", "llm", "tts", "storage", "total"]
+    assert all(value >= 0 for value in entries.values())
+    assert entries["total"] >= entries["stt"] + entries["llm"] + entries["tts"]
+    assert "server-timing" in response.headers["Access-Control-Expose-Headers"].lower()
+
+
+def test_audio_allows_setting_premium_tier_via_header(monkeypatch):
+    monkeypatch.setenv("MUNAY_LLM_PREMIUM_API_KEY_IDS", derive_api_key_id("test-key"))
+    client.app.state.settings.reload()
+    try:
+        response = client.post(
+            "/audio",
+            files={"audio_file": ("test.wav", b"fake audio", "audio/wav")},
+            headers={
+                "X-API-Key": "test-key",
+                "X-Correlation-Id": "test-corr-id",
+                "x-munay-llm-tier": "Premium",
+            },
+            data={"user_external_id": "test-user"},
+        )
+    finally:
+        monkeypatch.undo()
+        client.app.state.settings.reload()
+
     assert response.status_code == 200
     data = response.json()
     assert data["reply_text"] == "stub reply text"
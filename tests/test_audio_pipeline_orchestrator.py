@@ -1,3 +1,6 @@
+import io
+import wave
+
 from bot_neutro.audio_pipeline import AudioPipeline
 from bot_neutro.audio_storage import InMemoryAudioSessionRepository
 from bot_neutro.providers.interfaces import LLMProvider
@@ -49,8 +52,9 @@ def test_audio_pipeline_with_stub_providers_matches_stub_contract():
     assert usage["provider_stt"] == "stub-stt"
     assert usage["provider_llm"] == "stub-llm"
     assert usage["provider_tts"] == "stub-tts"
-    assert usage["input_seconds"] == 1.0
-    assert usage["output_seconds"] == 1.5
+    # "fake audio" no es WAV y el stub de TTS no devuelve audio real.
+    assert usage["input_seconds"] == 0.0
+    assert usage["output_seconds"] == 0.0
 
     sessions = repo.list_by_api_key(
         "test-key", limit=10, offset=0, api_key_id_autenticada="test-key"
@@ -65,6 +69,50 @@ def test_audio_pipeline_with_stub_providers_matches_stub_contract():
     assert session["meta_tags"] == {"context": "diario_emocional"}
 
 
+def _wav(seconds: float, rate: int = 16000) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as writer:
+        writer.setnchannels(1)
+        writer.setsampwidth(2)
+        writer.setframerate(rate)
+        writer.writeframes(b"\x00\x00" * int(seconds * rate))
+    return buffer.getvalue()
+
+
+def test_audio_pipeline_reports_input_seconds_of_each_request():
+    pipeline = AudioPipeline(
+        session_repo=InMemoryAudioSessionRepository(),
+        stt_provider=StubSTTProvider(),
+        tts_provider=StubTTSProvider(),
+        llm_provider=StubLLMProvider(),
+    )
+
+    def usage(audio):
+        return pipeline.process({"api_key_id": "test-key", "audio_bytes": audio, "mime_type": "audio/wav"})["usage"]
+
+    assert usage(_wav(3.0))["input_seconds"] == 3.0
+    assert usage(_wav(0.5))["input_seconds"] == 0.5
+
+
+def test_audio_pipeline_prefers_latency_reported_on_the_result():
+    class TimedSTT(StubSTTProvider):
+        def transcribe(self, audio_bytes, locale):
+            result = super().transcribe(audio_bytes, locale)
+            result.latency_ms = 1234
+            return result
+
+    pipeline = AudioPipeline(
+        session_repo=InMemoryAudioSessionRepository(),
+        stt_provider=TimedSTT(),
+        tts_provider=StubTTSProvider(),
+        llm_provider=StubLLMProvider(),
+    )
+    result = pipeline.process({"api_key_id": "test-key", "audio_bytes": b"fake audio", "mime_type": "audio/wav"})
+
+    # STT del resultado; LLM y TTS del atributo del provider.
+    assert (result["usage"]["stt_ms"], result["usage"]["llm_ms"], result["usage"]["tts_ms"]) == (1234, 200, 150)
+
+
 def test_audio_pipeline_defaults_llm_tier_to_freemium():
     repo = InMemoryAudioSessionRepository()
     capturing_llm = CapturingLLMProvider()
@@ -0,0 +1,106 @@
+import asyncio
+from dataclasses import replace
+
+import pytest
+from fastapi.testclient import TestClient
+
+from bot_neutro.api import create_app
+from bot_neutro.audio_scheduler import FairScheduler, SchedulerSettings, SchedulerTimeout
+from bot_neutro.metrics_runtime import METRICS
+
+
+async def _settle() -> None:
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_per_key_cap_queues_only_that_tenant():
+    async def scenario():
+        scheduler = FairScheduler(capacity=4)
+        await scheduler.acquire("noisy", "freemium", max_in_flight=2)
+        await scheduler.acquire("noisy", "freemium", max_in_flight=2)
+        blocked = asyncio.ensure_future(scheduler.acquire("noisy", "freemium", max_in_flight=2))
+        await _settle()
+        assert not blocked.done()
+
+        await asyncio.wait_for(scheduler.acquire("quiet", "freemium", max_in_flight=2), 1)
+        assert scheduler.in_flight == 3
+
+        scheduler.release("noisy")
+        await asyncio.wait_for(blocked, 1)
+        assert scheduler.in_flight_for("noisy") == 2
+
+    asyncio.run(scenario())
+
+
+def test_free_slots_are_shared_by_tier_weight():
+    async def scenario():
+        scheduler = FairScheduler(capacity=1, weights={"premium": 4, "freemium": 1})
+        await scheduler.acquire("holder", "freemium")
+        order = []
+
+        async def request(key, tier):
+            await scheduler.acquire(key, tier)
+            order.append((tier, key))
+
+        tasks = [asyncio.ensure_future(request(f"free-{i}", "freemium")) for i in range(10)]
+        await _settle()
+        tasks += [asyncio.ensure_future(request(f"prem-{i}", "premium")) for i in range(4)]
+        await _settle()
+
+        scheduler.release("holder")
+        await _settle()
+        while len(order) < 10:
+            scheduler.release(order[-1][1])
+            await _settle()
+
+        assert [tier for tier, _ in order[:5]].count("premium") == 4
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    asyncio.run(scenario())
+
+
+def test_queue_timeout_raises_and_cleans_up():
+    async def scenario():
+        scheduler = FairScheduler(capacity=1, queue_timeout=0.01)
+        await scheduler.acquire("holder", "premium")
+        timeouts = METRICS.snapshot().get("audio_queue_timeouts_total", {}).get(("freemium",), 0)
+
+        with pytest.raises(SchedulerTimeout):
+            await scheduler.acquire("late", "freemium")
+
+        assert scheduler.queued("freemium") == 0
+        assert METRICS.snapshot()["audio_queue_timeouts_total"][("freemium",)] == timeouts + 1
+        scheduler.release("holder")
+        assert scheduler.in_flight == 0
+
+    asyncio.run(scenario())
+
+
+def test_audio_reports_queue_wait_and_overload():
+    app = create_app()
+    client = TestClient(app)
+
+    response = client.post(
+        "/audio",
+        files={"audio_file": ("test.wav", b"fake audio", "audio/wav")},
+        headers={"X-API-Key": "sched-user"},
+    )
+    assert response.status_code == 200
+    assert "queue;dur=" in response.headers["Server-Timing"]
+    assert 'audio_queue_wait_seconds_count{tier="freemium"}' in client.get("/metrics").text
+
+    app.state.settings.reload(
+        replace(app.state.settings.current, scheduler=SchedulerSettings(capacity=1, queue_timeout=0.01))
+    )
+    app.state.audio_scheduler.in_flight = 1
+    response = client.post(
+        "/audio",
+        files={"audio_file": ("test.wav", b"fake audio", "audio/wav")},
+        headers={"X-API-Key": "sched-user"},
+    )
+    assert response.status_code == 503
+    assert response.headers["X-Outcome-Detail"] == "audio.overloaded"
+    assert response.headers["Retry-After"] == "1"
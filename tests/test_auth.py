@@ -0,0 +1,77 @@
+import os
+
+from fastapi.testclient import TestClient
+
+from bot_neutro import auth
+from bot_neutro.api import create_app
+from bot_neutro.auth import AuthSettings, Authenticator, PremiumKeyIds
+from bot_neutro.security_ids import derive_api_key_id
+
+
+def test_principal_is_cached_and_lru_is_bounded(monkeypatch):
+    calls = []
+    original = auth.derive_api_key_id
+    monkeypatch.setattr(auth, "derive_api_key_id", lambda key: calls.append(key) or original(key))
+    authenticator = Authenticator(AuthSettings(principal_cache_size=2))
+
+    first = authenticator.resolve("key-a")
+    assert authenticator.resolve("key-a") is first
+    assert calls == ["key-a"]
+
+    authenticator.resolve("key-b")
+    authenticator.resolve("key-c")
+    assert len(authenticator) == 2
+    authenticator.resolve("key-a")
+    assert calls == ["key-a", "key-b", "key-c", "key-a"]
+
+
+def test_reconfigure_invalidates_cached_tier(monkeypatch):
+    monkeypatch.setenv("MUNAY_LLM_PREMIUM_API_KEY_IDS", derive_api_key_id("vip"))
+    authenticator = Authenticator()
+    assert authenticator.resolve("vip").tier == "freemium"
+
+    # El entorno solo se lee al (re)cargar settings, no por request.
+    authenticator.configure(AuthSettings.from_env())
+    assert authenticator.resolve("vip").tier == "premium"
+
+
+def test_premium_ids_reload_from_file_by_mtime(monkeypatch, tmp_path):
+    ids_file = tmp_path / "premium_ids.txt"
+    ids_file.write_text("")
+    settings = AuthSettings(premium_ids_file=str(ids_file), premium_ids_check_seconds=0)
+    authenticator = Authenticator(settings, premium_ids=PremiumKeyIds(settings))
+    assert authenticator.resolve("vip").tier == "freemium"
+    generation = authenticator.premium_ids.generation
+
+    authenticator.resolve("vip")
+    assert authenticator.premium_ids.generation == generation
+
+    ids_file.write_text(f"{derive_api_key_id('vip')}\nother-id\n")
+    os.utime(ids_file, ns=(1, 10**18))
+    assert authenticator.resolve("vip").tier == "premium"
+
+
+def test_plan_limits_come_from_env(monkeypatch):
+    monkeypatch.setenv("PLAN_FREEMIUM_MAX_IN_FLIGHT", "2")
+    monkeypatch.setenv("PLAN_PREMIUM_MONTHLY_REQUESTS", "5000")
+    authenticator = Authenticator(AuthSettings.from_env())
+
+    assert authenticator.plans["freemium"].max_in_flight == 2
+    assert authenticator.plans["premium"].monthly_requests == 5000
+
+
+def test_audio_request_resolves_the_key_once(monkeypatch):
+    calls = []
+    original = auth.derive_api_key_id
+    monkeypatch.setattr(auth, "derive_api_key_id", lambda key: calls.append(key) or original(key))
+    monkeypatch.setenv("RATE_LIMIT_ENABLED", "1")
+    client = TestClient(create_app())
+
+    response = client.post(
+        "/audio",
+        files={"audio_file": ("test.wav", b"fake audio", "audio/wav")},
+        headers={"X-API-Key": "auth-once"},
+    )
+
+    assert response.status_code == 200
+    assert calls == ["auth-once"]
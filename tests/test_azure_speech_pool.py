@@ -0,0 +1,284 @@
+import sys
+import time
+import types
+from enum import Enum
+
+import pytest
+from fastapi.testclient import TestClient
+
+from bot_neutro.api import create_app
+from bot_neutro.metrics_runtime import METRICS
+from bot_neutro.providers.azure import AzureSpeechConfig, AzureSTTProvider, AzureTTSProvider
+from bot_neutro.providers.interfaces import DEFAULT_LOCALE
+from bot_neutro.providers.tts_formats import TTS_OUTPUT_FORMATS
+
+
+class _Reason(Enum):
+    RecognizedSpeech = 1
+    NoMatch = 2
+    Canceled = 3
+    SynthesizingAudioCompleted = 4
+
+
+class _CancellationReason(Enum):
+    Error = 1
+    EndOfStream = 2
+
+
+class _OutputFormat(Enum):
+    Riff24Khz16BitMonoPcm = 1
+    Ogg24Khz16BitMonoOpus = 2
+    Audio24Khz96KBitRateMonoMp3 = 3
+
+
+class _Signal:
+    def __init__(self):
+        self.handlers = []
+
+    def connect(self, handler):
+        self.handlers.append(handler)
+
+    def fire(self, evt):
+        for handler in self.handlers:
+            handler(evt)
+
+
+def _fake_speech_sdk(monkeypatch):
+    calls = {"configs": 0, "recognizers": 0, "synthesizers": 0, "connections": 0}
+    speech = types.ModuleType("azure.cognitiveservices.speech")
+    speech.ResultReason = _Reason
+    speech.CancellationReason = _CancellationReason
+    speech.SpeechSynthesisOutputFormat = _OutputFormat
+
+    class SpeechConfig:
+        def __init__(self, subscription, region):
+            calls["configs"] += 1
+            self.output_format = None
+
+        def set_speech_synthesis_output_format(self, output_format):
+            self.output_format = output_format
+
+    class PushAudioInputStream:
+        def __init__(self):
+            self.data = b""
+            self.on_write = None
+            self.on_close = None
+
+        def write(self, data):
+            # Como el SDK real (ctypes): solo `bytes`.
+            if not isinstance(data, bytes):
+                raise TypeError("a bytes-like object is required")
+            self.data += data
+            if self.on_write:
+                self.on_write(data)
+
+        def close(self):
+            if self.on_close:
+                self.on_close()
+
+    class AudioConfig:
+        def __init__(self, stream):
+            self.stream = stream
+
+    class SpeechRecognizer:
+        def __init__(self, speech_config, audio_config):
+            calls["recognizers"] += 1
+            self.audio_config = audio_config
+
+            self.recognizing = _Signal()
+            self.recognized = _Signal()
+            self.canceled = _Signal()
+            self.session_stopped = _Signal()
+
+        def recognize_once(self):
+            text = self.audio_config.stream.data.decode()
+            return types.SimpleNamespace(reason=_Reason.RecognizedSpeech, text=text)
+
+        def start_continuous_recognition(self):
+            # Una frase por chunk escrito, reconocida mientras sigue la subida.
+            stream = self.audio_config.stream
+            offset = [0]
+
+            def on_write(data):
+                self.recognizing.fire(types.SimpleNamespace())
+                result = types.SimpleNamespace(
+                    reason=_Reason.RecognizedSpeech, text=data.decode(), offset=offset[0], duration=len(data) * 10_000
+                )
+                offset[0] += result.duration
+                self.recognized.fire(types.SimpleNamespace(result=result))
+
+            def on_close():
+                self.canceled.fire(types.SimpleNamespace(reason=_CancellationReason.EndOfStream))
+                self.session_stopped.fire(types.SimpleNamespace())
+
+            stream.on_write, stream.on_close = on_write, on_close
+
+        def stop_continuous_recognition(self):
+            calls["stopped"] = calls.get("stopped", 0) + 1
+
+    class SpeechSynthesizer:
+        def __init__(self, speech_config, audio_config):
+            calls["synthesizers"] += 1
+            self.speech_config = speech_config
+
+        def speak_text_async(self, text):
+            audio = text.encode()
+            if self.speech_config.output_format is not _OutputFormat.Riff24Khz16BitMonoPcm:
+                audio = f"{self.speech_config.output_format.name}:{text}".encode()
+            result = types.SimpleNamespace(reason=_Reason.SynthesizingAudioCompleted, audio_data=audio)
+            return types.SimpleNamespace(get=lambda: result)
+
+    class Connection:
+        @staticmethod
+        def _open(for_continuous_recognition):
+            calls["connections"] += 1
+
+        @staticmethod
+        def _close():
+            calls["closed"] = calls.get("closed", 0) + 1
+
+        @classmethod
+        def from_recognizer(cls, recognizer):
+            return types.SimpleNamespace(open=cls._open, close=cls._close)
+
+        @classmethod
+        def from_speech_synthesizer(cls, synthesizer):
+            return types.SimpleNamespace(open=cls._open, close=cls._close)
+
+    speech.SpeechConfig = SpeechConfig
+    speech.SpeechRecognizer = SpeechRecognizer
+    speech.SpeechSynthesizer = SpeechSynthesizer
+    speech.Connection = Connection
+    speech.audio = types.SimpleNamespace(PushAudioInputStream=PushAudioInputStream, AudioConfig=AudioConfig)
+
+    azure = types.ModuleType("azure")
+    cognitiveservices = types.ModuleType("azure.cognitiveservices")
+    monkeypatch.setattr(azure, "cognitiveservices", cognitiveservices, raising=False)
+    monkeypatch.setattr(cognitiveservices, "speech", speech, raising=False)
+    monkeypatch.setitem(sys.modules, "azure", azure)
+    monkeypatch.setitem(sys.modules, "azure.cognitiveservices", cognitiveservices)
+    monkeypatch.setitem(sys.modules, "azure.cognitiveservices.speech", speech)
+    return calls
+
+
+def _config(pool_size=2, stt_mode="continuous"):
+    return AzureSpeechConfig(
+        key="k",
+        region="eastus",
+        stt_language_default="es-ES",
+        tts_voice_default="es-ES-AlonsoNeural",
+        pool_size=pool_size,
+        stt_mode=stt_mode,
+    )
+
+
+def _checkouts(provider_id, result):
+    return METRICS.snapshot().get("speech_pool_checkouts_total", {}).get((provider_id, result), 0)
+
+
+def test_tts_reuses_warm_synthesizers_and_configs(monkeypatch):
+    calls = _fake_speech_sdk(monkeypatch)
+    provider = AzureTTSProvider(_config())
+    hits = _checkouts("azure-tts", "hit")
+
+    provider.warm_up()
+    assert calls == {"configs": 1, "recognizers": 0, "synthesizers": 2, "connections": 2}
+
+    for _ in range(5):
+        assert provider.synthesize("hola", DEFAULT_LOCALE).audio_bytes == b"hola"
+    assert calls["synthesizers"] == 2
+    assert _checkouts("azure-tts", "hit") == hits + 5
+
+    provider.synthesize("hola", "en-US", "en-US-JennyNeural")
+    assert calls["configs"] == 2
+    setup = METRICS.snapshot()["speech_connection_setup_seconds"][("azure-tts",)]
+    assert setup["count"] >= 3
+
+
+def test_tts_output_format_selects_config(monkeypatch):
+    calls = _fake_speech_sdk(monkeypatch)
+    provider = AzureTTSProvider(_config(pool_size=1))
+
+    wav = provider.synthesize("hola", "es-ES")
+    opus = provider.synthesize("hola", "es-ES", output_format=TTS_OUTPUT_FORMATS["ogg-opus"])
+
+    assert (wav.audio_mime_type, wav.audio_bytes) == ("audio/wav", b"hola")
+    assert opus.audio_mime_type == "audio/ogg"
+    assert opus.audio_bytes == b"Ogg24Khz16BitMonoOpus:hola"
+    assert calls["configs"] == 2
+
+
+def test_default_audio_request_uses_the_warmed_recognizer(monkeypatch):
+    _fake_speech_sdk(monkeypatch)
+    monkeypatch.setenv("AUDIO_STT_PROVIDER", "azure")
+    monkeypatch.setenv("AZURE_SPEECH_KEY", "k")
+    monkeypatch.setenv("AZURE_SPEECH_REGION", "eastus")
+    monkeypatch.setenv("AZURE_SPEECH_POOL_SIZE", "1")
+    hits, misses = _checkouts("azure-stt", "hit"), _checkouts("azure-stt", "miss")
+
+    # El `with` corre el lifespan, que hace el warm-up.
+    with TestClient(create_app()) as client:
+        response = client.post(
+            "/audio",
+            files={"audio_file": ("test.wav", b"fake audio", "audio/wav")},
+            headers={"X-API-Key": "azure-pool-user"},
+        )
+
+    assert response.status_code == 200
+    assert _checkouts("azure-stt", "hit") == hits + 1
+    assert _checkouts("azure-stt", "miss") == misses
+
+
+def test_stt_recognizers_are_single_use_and_replenished(monkeypatch):
+    calls = _fake_speech_sdk(monkeypatch)
+    provider = AzureSTTProvider(_config(pool_size=1, stt_mode="once"))
+    provider.warm_up()
+    assert calls["recognizers"] == 1
+
+    assert provider.transcribe(b"uno", DEFAULT_LOCALE).text == "uno"
+    deadline = time.monotonic() + 2
+    while provider._pool.idle((DEFAULT_LOCALE, False)) < 1 and time.monotonic() < deadline:  # noqa: SLF001
+        time.sleep(0.01)
+    assert calls["recognizers"] == 2
+    assert provider.transcribe(b"dos", DEFAULT_LOCALE).text == "dos"
+    assert calls["configs"] == 1
+
+
+def test_dropped_objects_are_closed_and_configs_are_bounded(monkeypatch):
+    calls = _fake_speech_sdk(monkeypatch)
+    provider = AzureTTSProvider(_config(pool_size=1))
+    provider._pool.max_keys = provider._speech_configs.max_keys = 2  # noqa: SLF001
+
+    for locale in ("es-ES", "es-MX", "es-AR"):
+        provider.synthesize("hola", locale)
+    # es-ES salió del LRU del pool: su synthesizer se cerró; el config también se desalojó.
+    assert calls["closed"] == 1
+    assert len(provider._speech_configs) == 2  # noqa: SLF001
+
+    stt = AzureSTTProvider(_config(pool_size=0, stt_mode="once"))
+    stt.transcribe(b"uno", "es-ES")
+    assert calls["closed"] == 2
+
+
+@pytest.mark.parametrize("provider_cls", [AzureSTTProvider, AzureTTSProvider])
+def test_pool_size_zero_builds_per_request_without_warm_up(monkeypatch, provider_cls):
+    calls = _fake_speech_sdk(monkeypatch)
+    provider = provider_cls(_config(pool_size=0))
+    provider.warm_up()
+    assert calls["connections"] == 0
+
+
+def test_continuous_mode_returns_every_phrase_with_segment_timings(monkeypatch):
+    calls = _fake_speech_sdk(monkeypatch)
+    provider = AzureSTTProvider(_config(pool_size=0))
+
+    result = provider.transcribe_stream(iter([b"hola", memoryview(b"mundo"), b"adios"]), "es-ES")
+
+    assert result.text == "hola mundo adios"
+    segments = result.raw_transcript["segments"]
+    assert [segment["text"] for segment in segments] == ["hola", "mundo", "adios"]
+    assert [segment["offset_ms"] for segment in segments] == [0, 4, 9]
+    assert result.raw_transcript["mode"] == "continuous"
+    assert result.raw_transcript["partials"] == 3
+    assert result.raw_transcript["first_partial_ms"] <= segments[-1]["final_ms"]
+    assert calls["stopped"] == 1
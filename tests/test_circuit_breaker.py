@@ -0,0 +1,171 @@
+import time
+import types
+
+import pytest
+
+from bot_neutro.metrics_runtime import METRICS
+from bot_neutro.providers import factory
+from bot_neutro.providers.circuit_breaker import (
+    BreakerSettings,
+    CircuitBreaker,
+    CircuitBreakerSettings,
+    CircuitOpenError,
+    GuardedLLMProvider,
+    GuardedTTSProvider,
+)
+from bot_neutro.providers.interfaces import LLMProvider, TTSProvider, TTSResult
+from bot_neutro.providers.openai_llm import OpenAILLMProvider
+from bot_neutro.providers.stub import StubLLMProvider, StubTTSProvider
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class _FlakyLLM(LLMProvider):
+    provider_id = "flaky-llm"
+
+    def __init__(self):
+        self.calls = 0
+        self.fail = True
+
+    def generate_reply(self, transcript, context):
+        self.calls += 1
+        if self.fail:
+            raise TimeoutError("upstream timeout")
+        return "primary reply"
+
+
+def _breaker(name, clock, **overrides):
+    return CircuitBreaker(name, BreakerSettings(**{"failures": 2, "open_seconds": 30.0, **overrides}), clock=clock)
+
+
+def _state(name):
+    return METRICS.snapshot()["provider_circuit_state"][(name,)]
+
+
+def test_open_circuit_skips_primary_and_falls_back_instantly():
+    clock, primary = _Clock(), _FlakyLLM()
+    provider = GuardedLLMProvider(primary, StubLLMProvider(), _breaker("flaky-llm", clock))
+    opened = METRICS.snapshot().get("provider_fallbacks_total", {}).get(("flaky-llm", "open"), 0)
+
+    for _ in range(2):
+        result = provider.generate("hola", {})
+        assert result.provider_id == "flaky-llm|stub-llm"
+    assert provider.breaker.state == "open" and _state("flaky-llm") == 2
+
+    assert provider.generate("hola", {}).text == "stub reply text"
+    assert primary.calls == 2
+    assert METRICS.snapshot()["provider_fallbacks_total"][("flaky-llm", "open")] == opened + 1
+    assert provider.provider_id == "flaky-llm"
+
+
+def test_half_open_probe_closes_on_success_and_reopens_on_failure():
+    clock, primary = _Clock(), _FlakyLLM()
+    provider = GuardedLLMProvider(primary, StubLLMProvider(), _breaker("probe-llm", clock))
+    provider.generate("hola", {})
+    provider.generate("hola", {})
+
+    clock.now = 31
+    assert provider.breaker.state == "half_open"
+    provider.generate("hola", {})
+    assert provider.breaker.state == "open" and primary.calls == 3
+
+    clock.now = 62
+    primary.fail = False
+    assert provider.generate("hola", {}).provider_id == "flaky-llm"
+    assert provider.breaker.state == "closed" and _state("probe-llm") == 0
+
+
+def test_half_open_limits_concurrent_probes():
+    clock = _Clock()
+    breaker = _breaker("probes", clock, failures=1)
+    breaker.record(False, 0.0)
+    clock.now = 31
+    assert breaker.allow() is True
+    # La probe sigue en vuelo: el resto va al fallback.
+    assert breaker.allow() is False
+
+
+def test_slow_successes_count_as_failures_but_are_returned():
+    class _SlowTTS(TTSProvider):
+        provider_id = "slow-tts"
+
+        def synthesize(self, text, locale, voice=None, output_format=None):
+            return TTSResult(audio_bytes=b"primary", audio_mime_type="audio/wav", provider_id=self.provider_id)
+
+    breaker = _breaker("slow-tts", _Clock(), failures=1, slow_seconds=0.5)
+    provider = GuardedTTSProvider(_SlowTTS(), StubTTSProvider(), breaker)
+    assert breaker.record(True, 0.1) is True
+
+    breaker.record(True, 0.9)
+    assert breaker.state == "open"
+    assert provider.synthesize("hola", "es-ES").provider_id == "slow-tts|stub-tts"
+
+
+def test_fallback_latency_is_reported_per_result():
+    class _SlowFailingTTS(TTSProvider):
+        provider_id = "slow-failing-tts"
+
+        def synthesize(self, text, locale, voice=None, output_format=None):
+            time.sleep(0.05)
+            raise TimeoutError("upstream timeout")
+
+    provider = GuardedTTSProvider(_SlowFailingTTS(), StubTTSProvider(), _breaker("slow-failing-tts", _Clock(), failures=1))
+
+    fell_back = provider.synthesize("hola", "es-ES")
+    short_circuited = provider.synthesize("hola", "es-ES")
+
+    # Tras el error cuenta el intento fallido; con el circuito abierto el fallback es inmediato.
+    assert fell_back.latency_ms >= 50
+    assert short_circuited.latency_ms < 50
+    assert provider.breaker.state == "open"
+
+
+def test_open_circuit_without_fallback_raises():
+    clock = _Clock()
+    provider = GuardedLLMProvider(_FlakyLLM(), None, _breaker("solo-llm", clock, failures=1))
+    with pytest.raises(TimeoutError):
+        provider.generate("hola", {})
+    with pytest.raises(CircuitOpenError):
+        provider.generate("hola", {})
+
+
+def test_settings_read_global_and_per_kind_overrides(monkeypatch):
+    monkeypatch.setenv("CIRCUIT_BREAKER_ENABLED", "1")
+    monkeypatch.setenv("CIRCUIT_BREAKER_FAILURES", "3")
+    monkeypatch.setenv("CIRCUIT_BREAKER_LLM_SLOW_SECONDS", "8")
+
+    settings = CircuitBreakerSettings.from_env()
+
+    assert settings.enabled is True
+    assert (settings.stt.failures, settings.llm.failures) == (3, 3)
+    assert (settings.stt.slow_seconds, settings.llm.slow_seconds) == (0.0, 8.0)
+
+
+def test_factory_wraps_openai_only_when_enabled(monkeypatch):
+    class FakeOpenAI:
+        def __init__(self, api_key, base_url):
+            self.chat = types.SimpleNamespace(completions=types.SimpleNamespace(create=self.create))
+
+        def create(self, **kwargs):
+            raise ConnectionError("down")
+
+    monkeypatch.setattr(OpenAILLMProvider, "_require_client", staticmethod(lambda: FakeOpenAI))
+    monkeypatch.setenv("LLM_PROVIDER", "openai")
+    monkeypatch.setenv("OPENAI_API_KEY", "k")
+    monkeypatch.setenv("OPENAI_MODEL_FREEMIUM", "mini")
+    monkeypatch.delenv("LLM_CACHE_TTL_SECONDS", raising=False)
+
+    assert isinstance(factory.build_llm_provider(), OpenAILLMProvider)
+
+    monkeypatch.setenv("CIRCUIT_BREAKER_ENABLED", "1")
+    provider = factory.build_llm_provider()
+    assert isinstance(provider, GuardedLLMProvider)
+    assert provider.primary._fallback is None  # noqa: SLF001
+    assert provider.generate("hola", {}).provider_id == "openai-llm|stub-llm"
+    assert list(provider.generate_stream("hola", {})) == ["stub reply text"]
@@ -0,0 +1,90 @@
+import marshal
+import pstats
+
+import pytest
+from fastapi.testclient import TestClient
+
+from bot_neutro.api import create_app
+
+ADMIN = {"X-Admin-Token": "debug-secret"}
+
+
+@pytest.fixture
+def debug_client(monkeypatch):
+    monkeypatch.setenv("DEBUG_ENDPOINTS_ENABLED", "1")
+    monkeypatch.setenv("DEBUG_ADMIN_TOKEN", "debug-secret")
+    return TestClient(create_app())
+
+
+def test_debug_routes_are_not_registered_by_default():
+    client = TestClient(create_app())
+    assert client.get("/debug/runtime", headers=ADMIN).status_code == 404
+    assert client.post("/debug/profile", headers=ADMIN).status_code == 404
+
+
+def test_debug_routes_stay_off_without_admin_token(monkeypatch):
+    monkeypatch.setenv("DEBUG_ENDPOINTS_ENABLED", "1")
+    monkeypatch.delenv("DEBUG_ADMIN_TOKEN", raising=False)
+    client = TestClient(create_app())
+    assert client.get("/debug/runtime").status_code == 404
+
+
+def test_debug_runtime_requires_admin_token(debug_client):
+    response = debug_client.get("/debug/runtime", headers={"X-Admin-Token": "wrong"})
+    assert response.status_code == 401
+    assert response.headers["X-Outcome-Detail"] == "auth.unauthorized"
+
+
+def test_debug_runtime_reports_tasks_thread_pool_and_loop_lag(debug_client):
+    response = debug_client.get("/debug/runtime", headers=ADMIN)
+    assert response.status_code == 200
+    payload = response.json()
+    assert payload["asyncio"]["tasks"] >= 1
+    assert payload["asyncio"]["loop_lag_ms"]["max"] >= 0
+    assert payload["thread_pool"]["total_tokens"] > 0
+    assert "tasks_waiting" in payload["thread_pool"]
+
+
+def test_debug_profile_returns_collapsed_stacks(debug_client):
+    response = debug_client.post("/debug/profile", params={"seconds": 0.2}, headers=ADMIN)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert int(response.headers["X-Profile-Samples"]) > 0
+    lines = response.text.strip().splitlines()
+    assert lines
+    stack, count = lines[0].rsplit(" ", 1)
+    assert int(count) > 0 and ";" in stack
+
+
+def test_debug_profile_pstats_dump_loads(debug_client, tmp_path):
+    response = debug_client.post(
+        "/debug/profile", params={"seconds": 0.2, "format": "pstats"}, headers=ADMIN
+    )
+    assert response.status_code == 200
+    dump = tmp_path / "profile.pstats"
+    dump.write_bytes(response.content)
+
+    stats = pstats.Stats(str(dump))
+    assert stats.total_calls > 0
+    assert isinstance(marshal.loads(response.content), dict)
+
+
+def test_debug_profile_rejects_out_of_bounds_window(debug_client):
+    response = debug_client.post("/debug/profile", params={"seconds": 3600}, headers=ADMIN)
+    assert response.status_code == 400
+    assert response.headers["X-Outcome-Detail"] == "debug.invalid_seconds"
+
+
+def test_debug_token_and_switch_follow_settings_reload(debug_client, monkeypatch):
+    monkeypatch.setenv("DEBUG_ADMIN_TOKEN", "rotated")
+    # El entorno ya no se lee por request: el token viejo sigue valiendo hasta el reload.
+    assert debug_client.get("/debug/runtime", headers=ADMIN).status_code == 200
+
+    response = debug_client.post("/debug/settings/reload", headers=ADMIN)
+    assert response.json()["changed"] == ["debug"]
+    assert debug_client.get("/debug/runtime", headers=ADMIN).status_code == 401
+    assert debug_client.get("/debug/runtime", headers={"X-Admin-Token": "rotated"}).status_code == 200
+
+    monkeypatch.setenv("DEBUG_ENDPOINTS_ENABLED", "0")
+    debug_client.post("/debug/settings/reload", headers={"X-Admin-Token": "rotated"})
+    assert debug_client.get("/debug/runtime", headers={"X-Admin-Token": "rotated"}).status_code == 404
@@ -0,0 +1,144 @@
+import threading
+import time
+
+from bot_neutro.metrics_runtime import METRICS
+from bot_neutro.providers import factory
+from bot_neutro.providers.hedging import HedgedSTTProvider, HedgedTTSProvider, HedgeBudget, HedgingSettings
+from bot_neutro.providers.interfaces import TTSProvider, TTSResult
+from bot_neutro.providers.stub import StubSTTProvider
+
+
+class _ScriptedTTS(TTSProvider):
+    """Cada llamada duerme lo que indique `delays` (en orden; una excepción se lanza) y devuelve su número."""
+
+    def __init__(self, provider_id, delays):
+        self.provider_id = provider_id
+        self.delays = list(delays)
+        self.calls = 0
+        self.threads = []
+        self._lock = threading.Lock()
+
+    def synthesize(self, text, locale, voice=None, output_format=None):
+        with self._lock:
+            self.calls += 1
+            call = self.calls
+            delay = self.delays.pop(0) if self.delays else 0.0
+            self.threads.append(threading.current_thread())
+        if isinstance(delay, Exception):
+            raise delay
+        time.sleep(delay)
+        return TTSResult(audio_bytes=f"call {call}".encode(), audio_mime_type="audio/wav", provider_id=self.provider_id)
+
+
+def _settings(**overrides):
+    return HedgingSettings(**{"kinds": ("tts",), "budget_ratio": 1.0, "min_samples": 5, **overrides})
+
+
+def _warm(provider, calls=5):
+    for _ in range(calls):
+        provider.synthesize("hola", "es-ES")
+
+
+def _hedges(provider_id, outcome):
+    return METRICS.snapshot().get("provider_hedges_total", {}).get((provider_id, outcome), 0)
+
+
+def test_no_hedge_until_enough_latency_samples():
+    inner = _ScriptedTTS("cold-tts", [0.05] * 3)
+    provider = HedgedTTSProvider(inner, _settings())
+    _warm(provider, 3)
+    assert inner.calls == 3
+    assert _hedges("cold-tts", "hedge") == 0
+
+
+def test_slow_primary_is_hedged_and_hedge_wins():
+    inner = _ScriptedTTS("tail-tts", [0.01] * 5 + [0.5, 0.0])
+    provider = HedgedTTSProvider(inner, _settings())
+    _warm(provider)
+    wins = _hedges("tail-tts", "hedge")
+
+    started = time.perf_counter()
+    result = provider.synthesize("hola", "es-ES")
+
+    assert result.audio_bytes == b"call 7"
+    assert time.perf_counter() - started < 0.3
+    assert result.latency_ms < 300
+    assert _hedges("tail-tts", "hedge") == wins + 1
+
+    # El perdedor sigue hasta terminar; su tiempo se cuenta como desperdicio.
+    time.sleep(0.6)
+    assert METRICS.snapshot()["provider_hedge_wasted_seconds_total"][("tail-tts",)] >= 0.4
+
+
+def test_budget_caps_hedge_rate():
+    inner = _ScriptedTTS("budget-tts", [0.01] * 5 + [0.1] * 3)
+    provider = HedgedTTSProvider(inner, _settings(budget_ratio=0.2))
+    _warm(provider)
+    exhausted = _hedges("budget-tts", "budget_exhausted")
+
+    # 5 requests de warm-up depositaron 1 token: solo el primer lento se hedgea.
+    provider.synthesize("hola", "es-ES")
+    assert inner.calls == 7
+    provider.synthesize("hola", "es-ES")
+    assert inner.calls == 8
+    assert _hedges("budget-tts", "budget_exhausted") == exhausted + 1
+
+
+def test_budget_tokens_are_capped():
+    budget = HedgeBudget(ratio=1.0, max_tokens=2)
+    for _ in range(10):
+        budget.deposit()
+    assert [budget.spend() for _ in range(3)] == [True, True, False]
+
+
+def test_failed_hedge_does_not_mask_primary_result():
+    inner = _ScriptedTTS("slow-ok-tts", [0.01] * 5 + [0.2, ConnectionError("down")])
+    provider = HedgedTTSProvider(inner, _settings())
+    _warm(provider)
+
+    assert provider.synthesize("hola", "es-ES").audio_bytes == b"call 6"
+    assert _hedges("slow-ok-tts", "primary") >= 1
+
+
+def test_saturated_pool_runs_primary_on_caller_thread_without_queueing():
+    inner = _ScriptedTTS("busy-tts", [0.01] * 5 + [0.3, 0.05])
+    provider = HedgedTTSProvider(inner, _settings(max_workers=1))
+    _warm(provider)
+    exhausted = _hedges("busy-tts", "pool_exhausted")
+
+    background = threading.Thread(target=provider.synthesize, args=("hola", "es-ES"))
+    background.start()
+    time.sleep(0.1)
+    # El único thread del pool lo ocupa el primario lento: este corre inline.
+    result = provider.synthesize("hola", "es-ES")
+    background.join()
+
+    assert result.audio_bytes == b"call 7"
+    assert inner.threads[-1] is threading.current_thread()
+    # El lento tampoco pudo hedgear: no había thread libre.
+    assert _hedges("busy-tts", "pool_exhausted") == exhausted + 1
+    assert inner.calls == 7
+
+
+def test_pool_is_sized_from_audio_concurrency(monkeypatch):
+    monkeypatch.setenv("AUDIO_MAX_CONCURRENCY", "8")
+    monkeypatch.delenv("HEDGE_MAX_WORKERS", raising=False)
+    settings = HedgingSettings.from_env()
+
+    assert HedgedTTSProvider(_ScriptedTTS("sized-tts", []), settings).workers == 16
+    assert HedgedSTTProvider(StubSTTProvider(), settings, fan_out=4).workers == 64
+    monkeypatch.setenv("HEDGE_MAX_WORKERS", "5")
+    assert HedgingSettings.from_env().workers_for(4) == 5
+
+
+def test_factory_wraps_only_configured_kinds(monkeypatch):
+    monkeypatch.setenv("HEDGE_PROVIDERS", "stt,llm")
+    monkeypatch.delenv("STT_SEGMENT_MIN_SECONDS", raising=False)
+    monkeypatch.delenv("TTS_CACHE_MEMORY_BYTES", raising=False)
+    monkeypatch.delenv("TTS_CACHE_DIR", raising=False)
+
+    stt = factory.build_stt_provider()
+    assert isinstance(stt, HedgedSTTProvider) and isinstance(stt.primary, StubSTTProvider)
+    assert stt.transcribe(b"audio", "es-ES").provider_id == "stub-stt"
+    assert not isinstance(factory.build_tts_provider(), HedgedTTSProvider)
+    assert factory.ProviderSettings.from_env().hedging.kinds == ("stt",)
@@ -0,0 +1,125 @@
+import os
+import random
+import time
+
+from fastapi.testclient import TestClient
+
+from bot_neutro.api import create_app
+from bot_neutro.latency_sketch import OTHER_TENANT, DDSketch, LatencySketches, summary_samples
+from bot_neutro.security_ids import derive_api_key_id
+
+
+def _exact_quantile(values, q):
+    ordered = sorted(values)
+    return ordered[int(q * (len(ordered) - 1))]
+
+
+def test_ddsketch_quantiles_within_relative_accuracy():
+    rng = random.Random(7)
+    values = [rng.lognormvariate(-1.5, 0.8) for _ in range(5000)]
+    sketch = DDSketch(relative_accuracy=0.01)
+    for value in values:
+        sketch.add(value)
+
+    for q in (0.5, 0.95, 0.99):
+        exact = _exact_quantile(values, q)
+        assert abs(sketch.quantile(q) - exact) <= 0.011 * exact
+
+
+def test_ddsketch_merge_matches_single_sketch():
+    left, right, combined = DDSketch(), DDSketch(), DDSketch()
+    for index in range(1, 1001):
+        value = index / 1000
+        (left if index % 2 else right).add(value)
+        combined.add(value)
+
+    left.merge(right)
+    assert left.count == combined.count
+    assert left.quantile(0.99) == combined.quantile(0.99)
+
+
+def _bounded_values():
+    return [step * 10.0**exponent for exponent in range(-5, 3) for step in range(1, 200)]
+
+
+def test_ddsketch_memory_is_bounded():
+    sketch = DDSketch(relative_accuracy=0.01, max_bins=64)
+    for value in _bounded_values():
+        sketch.add(value)
+    assert len(sketch._bins) <= 64
+    # Colapsar bins bajos preserva la precisión de las colas altas.
+    exact = _exact_quantile(_bounded_values(), 0.99)
+    assert abs(sketch.quantile(0.99) - exact) <= 0.011 * exact
+
+
+def test_latency_sketches_cap_tenants_and_promote_heavy_hitters():
+    sketches = LatencySketches(top_k_tenants=2)
+    sketches.observe("/audio", "total", 0.1, "tenant-a")
+    sketches.observe("/audio", "total", 0.1, "tenant-b")
+    for _ in range(5):
+        sketches.observe("/audio", "total", 0.3, "tenant-c")
+
+    tenants = {key[2] for key in sketches.merged() if key[2]}
+    assert "tenant-c" in tenants
+    assert OTHER_TENANT in tenants
+    assert len(tenants - {OTHER_TENANT}) <= 2
+    aggregate = sketches.merged()[("/audio", "total", "")]
+    assert aggregate.count == 7
+
+
+def test_summary_samples_expose_quantiles():
+    sketches = LatencySketches()
+    sketches.observe("/audio", "stt", 0.2, "tenant-a")
+    samples = summary_samples(sketches.merged())
+    names = {(sample[1], dict(sample[2]).get("quantile")) for sample in samples}
+    assert ("sensei_stage_latency_seconds", "0.99") in names
+    assert ("sensei_tenant_latency_seconds_count", None) in names
+
+
+def test_metrics_latency_endpoint_reports_tenant_stages(monkeypatch):
+    monkeypatch.setenv("DEBUG_ADMIN_TOKEN", "s3cret")
+    client = TestClient(create_app())
+    response = client.post(
+        "/audio",
+        files={"audio_file": ("test.wav", b"fake audio", "audio/wav")},
+        headers={"X-API-Key": "sketch-tenant"},
+    )
+    assert response.status_code == 200
+
+    api_key_id = derive_api_key_id("sketch-tenant")
+    assert client.get("/metrics/latency").status_code == 401
+    latency = client.get(
+        "/metrics/latency", params={"api_key_id": api_key_id}, headers={"X-Admin-Token": "s3cret"}
+    )
+    assert latency.status_code == 200
+    payload = latency.json()
+    stages = {row["stage"] for row in payload["tenants"]}
+    assert {"total", "stt", "llm", "tts", "storage"} <= stages
+    assert all(row["api_key_id"] == api_key_id for row in payload["tenants"])
+    assert payload["tenants"][0]["p99_ms"] is not None
+
+
+def test_metrics_latency_requires_configured_admin_token(monkeypatch):
+    monkeypatch.delenv("DEBUG_ADMIN_TOKEN", raising=False)
+    client = TestClient(create_app())
+    response = client.get("/metrics/latency", headers={"X-Admin-Token": ""})
+    assert response.status_code == 401
+    assert response.headers["X-Outcome-Detail"] == "auth.unauthorized"
+
+
+def test_disable_multiprocess_stops_dump_thread_and_removes_file(tmp_path):
+    sketches = LatencySketches()
+    sketches.observe("/audio", "stt", 0.1)
+    sketches.enable_multiprocess(str(tmp_path), interval_seconds=0.01)
+    path = tmp_path / f"sketch_{os.getpid()}.json"
+    deadline = time.monotonic() + 2
+    while not path.exists() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert path.exists()
+
+    thread = sketches._dump_thread  # noqa: SLF001
+    sketches.disable_multiprocess()
+
+    assert not thread.is_alive()
+    assert not path.exists()
+    sketches.disable_multiprocess()
@@ -0,0 +1,112 @@
+from bot_neutro.audio_pipeline import AudioPipeline
+from bot_neutro.audio_storage import InMemoryAudioSessionRepository
+from bot_neutro.metrics_runtime import METRICS
+from bot_neutro.providers import factory
+from bot_neutro.providers.interfaces import LLMProvider
+from bot_neutro.providers.llm_cache import CachingLLMProvider, LLMCacheSettings
+from bot_neutro.providers.stub import StubSTTProvider, StubTTSProvider
+
+
+class _CountingLLM(LLMProvider):
+    provider_id = "count-llm"
+    latency_ms = 300
+
+    def __init__(self):
+        self.calls = 0
+
+    def model_for(self, tier):
+        return f"model-{tier}"
+
+    def generate_reply(self, transcript, context):
+        self.calls += 1
+        return f"reply {self.calls}"
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _ctx(tier="freemium", munay_context=None):
+    return {"llm_tier": tier, "metadata": {"munay_context": munay_context} if munay_context else {}}
+
+
+def test_repeated_short_transcripts_hit_until_ttl_expires():
+    inner, clock = _CountingLLM(), _Clock()
+    provider = CachingLLMProvider(inner, LLMCacheSettings(ttl_seconds=60), clock=clock)
+    hits = METRICS.snapshot().get("llm_cache_lookups_total", {}).get(("freemium", "hit"), 0)
+
+    first = provider.generate("Gracias.", _ctx())
+    second = provider.generate("  gracias ", _ctx())
+    assert (first.cache_hit, second.cache_hit) == (False, True)
+    assert second.text == first.text == "reply 1"
+    # La latencia viaja en cada resultado: un hit no pisa la de otro request.
+    assert (first.latency_ms, second.latency_ms, provider.latency_ms) == (None, 0, 300)
+    assert METRICS.snapshot()["llm_cache_lookups_total"][("freemium", "hit")] == hits + 1
+
+    clock.now = 61
+    assert provider.generate("gracias", _ctx()).cache_hit is False
+    assert inner.calls == 2
+
+
+def test_cache_is_scoped_by_tier_context_and_length():
+    inner = _CountingLLM()
+    settings = LLMCacheSettings(ttl_seconds=60, tiers=("freemium", "premium"), contexts=("none", "coach_habitos"))
+    provider = CachingLLMProvider(inner, settings)
+
+    for _ in range(2):
+        provider.generate("hola", _ctx())
+        provider.generate("hola", _ctx("premium"))
+        provider.generate("hola", _ctx(munay_context="coach_habitos"))
+        provider.generate("hola", _ctx(munay_context="diario_emocional"))
+        provider.generate("hola " * 40, _ctx())
+    # 3 keys cacheadas (1 llamada cada una) + contexto y transcript largo no cacheables (2 cada uno).
+    assert inner.calls == 7
+
+
+def test_keys_are_keyed_hashes_and_fallback_replies_are_not_cached():
+    inner = _CountingLLM()
+    provider = CachingLLMProvider(inner, LLMCacheSettings(ttl_seconds=60))
+    provider.generate("gracias", _ctx())
+    (key,) = provider._entries  # noqa: SLF001
+    assert isinstance(key, bytes) and b"gracias" not in key
+    assert "gracias" not in repr(provider._entries)  # noqa: SLF001
+
+    inner.provider_id = "count-llm|stub-llm"
+    provider.generate("buen día", _ctx())
+    provider.generate("buen día", _ctx())
+    assert inner.calls == 3
+
+
+def test_pipeline_reports_cache_hits_in_usage():
+    repo = InMemoryAudioSessionRepository()
+    pipeline = AudioPipeline(
+        session_repo=repo,
+        stt_provider=StubSTTProvider(),
+        tts_provider=StubTTSProvider(),
+        llm_provider=CachingLLMProvider(_CountingLLM(), LLMCacheSettings(ttl_seconds=60)),
+    )
+    ctx = {"api_key_id": "test-key", "audio_bytes": b"fake audio", "mime_type": "audio/wav"}
+
+    first, second = pipeline.process(dict(ctx)), pipeline.process(dict(ctx))
+
+    assert (first["usage"]["llm_cache_hit"], second["usage"]["llm_cache_hit"]) == (False, True)
+    assert (first["usage"]["llm_ms"], second["usage"]["llm_ms"]) == (300, 0)
+    assert second["usage"]["provider_llm"] == "count-llm"
+    sessions = repo.list_by_api_key("test-key", limit=10, offset=0, api_key_id_autenticada="test-key")
+    assert sorted(session["usage"]["llm_cache_hit"] for session in sessions) == [False, True]
+
+
+def test_factory_wraps_llm_only_when_ttl_is_set(monkeypatch):
+    monkeypatch.delenv("LLM_PROVIDER", raising=False)
+    monkeypatch.setenv("LLM_CACHE_TTL_SECONDS", "300")
+    monkeypatch.setenv("LLM_CACHE_CONTEXTS", "none,reflexion_general")
+
+    provider = factory.build_llm_provider()
+
+    assert isinstance(provider, CachingLLMProvider)
+    assert provider.settings.contexts == ("none", "reflexion_general")
+    assert provider.provider_id == "stub-llm"
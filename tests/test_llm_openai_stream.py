@@ -0,0 +1,86 @@
+import time
+import types
+
+import pytest
+
+from bot_neutro.metrics_runtime import METRICS
+from bot_neutro.providers.openai_llm import OpenAILLMProvider
+from bot_neutro.providers.stub import StubLLMProvider
+
+
+def _chunk(content=None, usage=None):
+    choices = [] if content is None else [types.SimpleNamespace(delta=types.SimpleNamespace(content=content))]
+    return types.SimpleNamespace(choices=choices, usage=usage)
+
+
+def _provider(monkeypatch, stream_factory, fallback=None):
+    calls = []
+
+    class FakeOpenAI:
+        def __init__(self, api_key, base_url):
+            self.chat = types.SimpleNamespace(completions=types.SimpleNamespace(create=self.create))
+
+        def create(self, **kwargs):
+            calls.append(kwargs)
+            return stream_factory()
+
+    monkeypatch.setattr(OpenAILLMProvider, "_require_client", staticmethod(lambda: FakeOpenAI))
+    provider = OpenAILLMProvider(api_key="k", model_freemium="mini", model_premium="big", fallback=fallback)
+    return provider, calls
+
+
+def _histogram(family, model):
+    return METRICS.snapshot().get(family, {}).get(("openai-llm", model), {"count": 0, "sum": 0.0})
+
+
+def test_stream_yields_deltas_and_records_ttft_and_tokens_per_second(monkeypatch):
+    def stream():
+        time.sleep(0.02)
+        yield _chunk("Hola")
+        yield _chunk("")
+        time.sleep(0.01)
+        yield _chunk(", ¿qué tal?")
+        yield _chunk(usage=types.SimpleNamespace(completion_tokens=6))
+
+    provider, calls = _provider(monkeypatch, stream)
+    ttft = _histogram("llm_time_to_first_token_seconds", "big")["count"]
+    rate = _histogram("llm_tokens_per_second", "big")["count"]
+
+    deltas = list(provider.generate_stream("hola", {"llm_tier": "premium"}))
+
+    assert deltas == ["Hola", ", ¿qué tal?"]
+    assert calls[0]["stream"] is True and calls[0]["model"] == "big"
+    assert _histogram("llm_time_to_first_token_seconds", "big")["count"] == ttft + 1
+    assert _histogram("llm_tokens_per_second", "big")["count"] == rate + 1
+    # La latencia viaja en el resultado; el provider compartido no guarda estado por request.
+    assert provider.latency_ms == 0
+    result = provider.generate("hola", {"llm_tier": "premium"})
+    assert (result.text, result.latency_ms >= 30) == ("Hola, ¿qué tal?", True)
+
+
+def test_failure_before_first_token_falls_back_to_stub(monkeypatch):
+    def stream():
+        raise ConnectionError("upstream reset")
+        yield  # pragma: no cover
+
+    provider, _ = _provider(monkeypatch, stream, fallback=StubLLMProvider())
+    failures = METRICS.snapshot().get("llm_stream_failures_total", {}).get(("openai-llm", "before_first_token"), 0)
+
+    result = provider.generate("hola", {})
+    assert (result.text, result.provider_id) == ("stub reply text", "openai-llm|stub-llm")
+    # El id de la instancia no se reescribe: el siguiente request no hereda el fallback.
+    assert provider.provider_id == "openai-llm"
+    snapshot = METRICS.snapshot()["llm_stream_failures_total"]
+    assert snapshot[("openai-llm", "before_first_token")] == failures + 1
+
+
+def test_failure_after_first_token_is_not_masked_by_fallback(monkeypatch):
+    def stream():
+        yield _chunk("Hola")
+        raise ConnectionError("stream cut")
+
+    provider, _ = _provider(monkeypatch, stream, fallback=StubLLMProvider())
+
+    with pytest.raises(ConnectionError):
+        provider.generate_reply("hola", {})
+    assert provider.provider_id == "openai-llm"
@@ -1,3 +1,4 @@
+import pytest
 from fastapi.testclient import TestClient
 
 from bot_neutro.api import create_app
@@ -8,6 +9,18 @@ from bot_neutro.security_ids import derive_api_key_id
 client = TestClient(create_app())
 
 
+@pytest.fixture(autouse=True)
+def premium_key(monkeypatch):
+    monkeypatch.setenv(
+        "MUNAY_LLM_PREMIUM_API_KEY_IDS",
+        derive_api_key_id("premium-key"),
+    )
+    client.app.state.settings.reload()
+    yield
+    monkeypatch.undo()
+    client.app.state.settings.reload()
+
+
 def _get_llm_tier_denied_count(snapshot, requested_tier, authorized_tier):
     for item in snapshot.get("llm_tier_denied_total", []):
         if (
@@ -19,12 +32,7 @@ def _get_llm_tier_denied_count(snapshot, requested_tier, authorized_tier):
     return 0
 
 
-def test_audio_without_tier_header_uses_authorized_tier(monkeypatch):
-    monkeypatch.setenv(
-        "MUNAY_LLM_PREMIUM_API_KEY_IDS",
-        derive_api_key_id("premium-key"),
-    )
-
+def test_audio_without_tier_header_uses_authorized_tier():
     response = client.post(
         "/audio",
         files={"audio_file": ("test.wav", b"fake audio", "audio/wav")},
@@ -35,12 +43,7 @@ def test_audio_without_tier_header_uses_authorized_tier(monkeypatch):
     assert response.headers.get("X-Outcome") == "success"
 
 
-def test_audio_allows_requested_tier_below_authorized(monkeypatch):
-    monkeypatch.setenv(
-        "MUNAY_LLM_PREMIUM_API_KEY_IDS",
-        derive_api_key_id("premium-key"),
-    )
-
+def test_audio_allows_requested_tier_below_authorized():
     response = client.post(
         "/audio",
         files={"audio_file": ("test.wav", b"fake audio", "audio/wav")},
@@ -54,12 +57,7 @@ def test_audio_allows_requested_tier_below_authorized(monkeypatch):
     assert response.headers.get("X-Outcome") == "success"
 
 
-def test_audio_rejects_requested_tier_above_authorized(monkeypatch):
-    monkeypatch.setenv(
-        "MUNAY_LLM_PREMIUM_API_KEY_IDS",
-        derive_api_key_id("premium-key"),
-    )
-
+def test_audio_rejects_requested_tier_above_authorized():
     snapshot_before = METRICS.snapshot()
     denied_before = _get_llm_tier_denied_count(snapshot_before, "premium", "freemium")
     errors_before = snapshot_before["errors_total"].get("/audio", 0)
@@ -87,12 +85,7 @@ def test_audio_rejects_requested_tier_above_authorized(monkeypatch):
     assert errors_after == errors_before + 1
 
 
-def test_audio_rejects_invalid_tier_header(monkeypatch):
-    monkeypatch.setenv(
-        "MUNAY_LLM_PREMIUM_API_KEY_IDS",
-        derive_api_key_id("premium-key"),
-    )
-
+def test_audio_rejects_invalid_tier_header():
     snapshot_before = METRICS.snapshot()
     denied_before = _get_llm_tier_denied_count(snapshot_before, "gold", "freemium")
     errors_before = snapshot_before["errors_total"].get("/audio", 0)
@@ -0,0 +1,111 @@
+import json
+import logging
+import queue
+
+from fastapi.testclient import TestClient
+
+from bot_neutro.api import create_app
+from bot_neutro.log_pipeline import DroppingQueueHandler, EventSampler, JSONFormatter, configure_logging
+from bot_neutro.metrics_runtime import METRICS
+
+
+def _record(event: str, level: int = logging.INFO) -> logging.LogRecord:
+    record = logging.LogRecord("bot_neutro", level, __file__, 1, event, (), None)
+    record.event = event
+    return record
+
+
+def _dropped(reason: str) -> int:
+    return METRICS.snapshot().get("log_records_dropped_total", {}).get((reason,), 0)
+
+
+def test_event_sampler_applies_rate_cap_but_keeps_warnings():
+    sampler = EventSampler(rate_caps={"http_request": 2})
+    before = _dropped("rate_capped")
+
+    passed = [sampler.filter(_record("http_request")) for _ in range(5)]
+
+    assert passed.count(True) == 2
+    assert _dropped("rate_capped") == before + 3
+    assert sampler.filter(_record("http_request", logging.WARNING))
+    assert sampler.filter(_record("other_event"))
+
+
+def test_event_sampler_zero_rate_drops_everything():
+    sampler = EventSampler(sample_rates={"noisy": 0.0})
+    before = _dropped("sampled")
+
+    assert not any(sampler.filter(_record("noisy")) for _ in range(10))
+    assert _dropped("sampled") == before + 10
+
+
+def test_queue_handler_drops_under_backpressure_without_blocking():
+    handler = DroppingQueueHandler(queue.Queue(maxsize=1))
+    before = _dropped("backpressure")
+
+    handler.handle(_record("first"))
+    handler.handle(_record("second"))
+
+    assert handler.queue.qsize() == 1
+    assert _dropped("backpressure") == before + 1
+
+
+def test_json_formatter_emits_extra_fields():
+    record = _record("http_request")
+    record.status = 200
+    record.stage_ms = {"stt": 1.5}
+
+    payload = json.loads(JSONFormatter().format(record))
+
+    assert payload["message"] == "http_request"
+    assert payload["event"] == "http_request"
+    assert payload["status"] == 200
+    assert payload["stage_ms"] == {"stt": 1.5}
+    assert payload["level"] == "INFO"
+
+
+class _ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+def test_records_are_not_duplicated_through_root_handlers():
+    configure_logging()
+    logger = logging.getLogger("bot_neutro")
+    root_capture, local_capture = _ListHandler(), _ListHandler()
+    logging.getLogger().addHandler(root_capture)
+    logger.addHandler(local_capture)
+    try:
+        logger.warning("dup_check", extra={"event": "dup_check"})
+    finally:
+        logging.getLogger().removeHandler(root_capture)
+        logger.removeHandler(local_capture)
+
+    assert logger.propagate is False
+    assert [record.event for record in local_capture.records] == ["dup_check"]
+    assert root_capture.records == []
+
+
+def test_http_request_record_includes_stage_timings(caplog):
+    client = TestClient(create_app())
+    # `bot_neutro` no propaga a root: el handler de caplog se cuelga directo del logger.
+    logger = logging.getLogger("bot_neutro")
+    logger.addHandler(caplog.handler)
+    try:
+        with caplog.at_level("INFO", logger="bot_neutro"):
+            response = client.post(
+                "/audio",
+                files={"audio_file": ("test.wav", b"fake audio", "audio/wav")},
+                headers={"X-API-Key": "log-tenant"},
+            )
+    finally:
+        logger.removeHandler(caplog.handler)
+
+    assert response.status_code == 200
+    records = [record for record in caplog.records if getattr(record, "event", None) == "http_request"]
+    assert records[-1].outcome == "success"
+    assert {"stt", "llm", "tts", "storage"} <= set(records[-1].stage_ms)
@@ -0,0 +1,63 @@
+from fastapi.testclient import TestClient
+
+from bot_neutro.api import create_app
+from bot_neutro.metrics_exposition import ExpositionRenderer, accepts_gzip
+
+
+client = TestClient(create_app())
+
+
+def test_metrics_openmetrics_negotiated_from_accept_header():
+    response = client.get(
+        "/metrics", headers={"Accept": "application/openmetrics-text; version=1.0.0"}
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/openmetrics-text")
+    body = response.text
+    assert "# TYPE sensei_requests counter" in body
+    assert 'sensei_requests_total{route="/metrics"}' in body
+    assert body.endswith("# EOF\n")
+
+
+def test_metrics_gzip_encoded_when_requested():
+    response = client.get("/metrics", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers.get("content-encoding") == "gzip"
+    assert "sensei_requests_total" in response.text
+
+
+def test_metrics_help_and_type_grouped_per_family():
+    response = client.get("/metrics", headers={"Accept-Encoding": "identity"})
+    assert response.headers.get("content-encoding") is None
+    body = response.text
+    help_index = body.index("# HELP sensei_requests_total")
+    type_index = body.index("# TYPE sensei_requests_total counter")
+    sample_index = body.index('sensei_requests_total{route="/metrics"}')
+    assert help_index < type_index < sample_index
+
+
+def test_renderer_reuses_lines_for_unchanged_values():
+    renderer = ExpositionRenderer()
+    samples = [("errors_total", "errors_total", (("route", "/audio"),), 3)]
+
+    renderer.render(samples)
+    first_line = renderer._lines[("errors_total", (("route", "/audio"),))][1]
+    renderer.render(samples)
+    assert renderer._lines[("errors_total", (("route", "/audio"),))][1] is first_line
+
+    body = renderer.render([("errors_total", "errors_total", (("route", "/audio"),), 4)])
+    assert 'errors_total{route="/audio"} 4' in body
+
+
+def test_renderer_escapes_label_values():
+    renderer = ExpositionRenderer()
+    body = renderer.render(
+        [("sensei_requests_total", "sensei_requests_total", (("route", '/a"b'),), 1)]
+    )
+    assert 'sensei_requests_total{route="/a\\"b"} 1' in body
+
+
+def test_accepts_gzip_respects_q_zero():
+    assert accepts_gzip("gzip, deflate")
+    assert not accepts_gzip("gzip;q=0")
+    assert not accepts_gzip(None)
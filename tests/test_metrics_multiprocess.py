@@ -0,0 +1,70 @@
+import multiprocessing
+
+from bot_neutro.metrics_multiprocess import MmapValueFile, aggregate, encode_key
+from bot_neutro.metrics_runtime import InMemoryMetrics
+
+
+def _worker(directory: str, requests: int) -> None:
+    metrics = InMemoryMetrics()
+    metrics.enable_multiprocess(directory)
+    for _ in range(requests):
+        metrics.inc_request("/audio")
+    metrics.observe_latency("/audio", 0.2)
+    metrics.set_audio_sessions_current(7)
+
+
+def _run_worker(directory: str, requests: int) -> None:
+    ctx = multiprocessing.get_context("fork")
+    process = ctx.Process(target=_worker, args=(directory, requests))
+    process.start()
+    process.join()
+    assert process.exitcode == 0
+
+
+def _value(samples, sample_name, labels=()):
+    for _family, name, sample_labels, value in samples:
+        if name == sample_name and sample_labels == labels:
+            return value
+    return None
+
+
+def test_mmap_value_file_roundtrip_and_growth(tmp_path):
+    path = tmp_path / "values.db"
+    store = MmapValueFile(path)
+    keys = [encode_key("errors_total", "errors_total", (("route", f"/r{i}"),)) for i in range(3000)]
+    for index, key in enumerate(keys):
+        store.write(key, float(index))
+    store.write(keys[0], 42.0)
+    store.close()
+
+    reopened = MmapValueFile(path)
+    assert reopened.get(keys[0]) == 42.0
+    assert reopened.get(keys[-1]) == 2999.0
+    assert len(reopened.items()) == 3000
+    reopened.close()
+
+
+def test_aggregate_sums_workers_and_archives_dead_ones(tmp_path):
+    directory = str(tmp_path)
+    _run_worker(directory, 3)
+    _run_worker(directory, 2)
+
+    local = InMemoryMetrics()
+    local.enable_multiprocess(directory)
+    local.inc_request("/audio")
+
+    samples = aggregate(directory)
+    route = (("route", "/audio"),)
+    assert _value(samples, "sensei_requests_total", route) == 6
+    assert _value(samples, "sensei_request_latency_seconds_count", route) == 2
+    assert _value(samples, "sensei_request_latency_seconds_bucket", (("route", "/audio"), ("le", "0.5"))) == 2
+    # Gauges de workers muertos no sobreviven al archivado.
+    assert _value(samples, "audio_sessions_current") == 0
+
+    worker_files = sorted(p.name for p in tmp_path.glob("worker_*.db"))
+    assert len(worker_files) == 1
+    assert (tmp_path / "archive.db").exists()
+
+    # Un nuevo worker arranca en cero pero el total expuesto no retrocede.
+    _run_worker(directory, 1)
+    assert _value(aggregate(directory), "sensei_requests_total", route) == 7
@@ -0,0 +1,62 @@
+import logging
+
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from bot_neutro.middleware import (
+    CorrelationIdMiddleware,
+    DefaultOutcomeMiddleware,
+    JSONLoggingMiddleware,
+    RateLimitMiddleware,
+    RequestLatencyMiddleware,
+)
+from bot_neutro.metrics_runtime import METRICS
+
+
+def _streaming_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/stream")
+    async def stream():
+        async def chunks():
+            for index in range(3):
+                yield f"chunk-{index}\n".encode()
+
+        return StreamingResponse(chunks(), media_type="text/plain")
+
+    app.add_middleware(RequestLatencyMiddleware)
+    app.add_middleware(CorrelationIdMiddleware)
+    app.add_middleware(RateLimitMiddleware)
+    app.add_middleware(JSONLoggingMiddleware)
+    app.add_middleware(DefaultOutcomeMiddleware)
+    return app
+
+
+def test_pure_asgi_stack_passes_streaming_responses_through():
+    client = TestClient(_streaming_app())
+    count_before = METRICS.snapshot()["latency"].get("/stream", {}).get("count", 0)
+
+    with client.stream("GET", "/stream", headers={"X-Correlation-Id": "stream-corr"}) as response:
+        body = b"".join(response.iter_bytes())
+
+    assert response.status_code == 200
+    assert body == b"chunk-0\nchunk-1\nchunk-2\n"
+    assert response.headers["X-Correlation-Id"] == "stream-corr"
+    assert response.headers["X-Outcome"] == "ok"
+    assert METRICS.snapshot()["latency"]["/stream"]["count"] == count_before + 1
+
+
+def test_json_logging_reports_status_and_corr_id(caplog):
+    client = TestClient(_streaming_app())
+    logger = logging.getLogger("bot_neutro")
+    logger.addHandler(caplog.handler)
+    try:
+        with caplog.at_level("INFO", logger="bot_neutro"):
+            client.get("/missing", headers={"X-Correlation-Id": "log-corr"})
+    finally:
+        logger.removeHandler(caplog.handler)
+
+    records = [record for record in caplog.records if getattr(record, "event", None) == "http_request"]
+    assert any(record.status == 404 and record.corr_id == "log-corr" for record in records)
+    assert all(record.outcome and record.duration_ms >= 0 for record in records)
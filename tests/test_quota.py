@@ -0,0 +1,87 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from bot_neutro.api import create_app
+from bot_neutro.auth import PlanLimits, configure_auth
+from bot_neutro.quota import QuotaStore, configure_quotas, current_period
+
+
+@pytest.fixture
+def quota_env(monkeypatch, tmp_path):
+    monkeypatch.setenv("QUOTA_STORAGE_PATH", str(tmp_path / "quota.json"))
+    monkeypatch.setenv("PLAN_FREEMIUM_MONTHLY_REQUESTS", "1")
+    monkeypatch.setenv("PLAN_FREEMIUM_MAX_AUDIO_BYTES", "64")
+    yield
+    monkeypatch.undo()
+    configure_auth()
+    configure_quotas()
+
+
+def test_quota_checks_seconds_requests_and_file_size():
+    store = QuotaStore()
+    limits = PlanLimits(monthly_audio_seconds=10.0, max_audio_bytes=100)
+
+    assert store.check("tenant", limits, audio_bytes=50) is None
+    assert store.check("tenant", limits, audio_bytes=101) == "max_audio_bytes"
+
+    store.record("tenant", input_seconds=6.0, output_seconds=4.0)
+    assert store.check("tenant", limits) == "monthly_audio_seconds"
+    assert store.check("other", limits) is None
+    assert store.check("tenant", PlanLimits(monthly_requests=2)) is None
+    store.record("tenant", 0.0, 0.0)
+    assert store.check("tenant", PlanLimits(monthly_requests=2)) == "monthly_requests"
+
+
+def test_workers_merge_deltas_into_the_shared_file(tmp_path):
+    path = str(tmp_path / "quota.json")
+    worker_a, worker_b = QuotaStore(path), QuotaStore(path)
+
+    worker_a.record("tenant", 3.0, 1.0)
+    worker_b.record("tenant", 2.0, 0.5)
+    worker_a.flush()
+    worker_b.flush()
+    worker_a.flush()
+
+    for worker in (worker_a, worker_b):
+        usage = worker.usage("tenant")
+        assert (usage.input_seconds, usage.output_seconds, usage.requests) == (5.0, 1.5, 2)
+    restarted = QuotaStore(path)
+    assert restarted.usage("tenant").to_dict() == {
+        "period": current_period(),
+        "input_seconds": 5.0,
+        "output_seconds": 1.5,
+        "requests": 2,
+    }
+
+
+def _post_audio(client, payload=b"fake audio"):
+    return client.post(
+        "/audio",
+        files={"audio_file": ("test.wav", payload, "audio/wav")},
+        headers={"X-API-Key": "quota-user"},
+    )
+
+
+def test_audio_rejects_over_quota_before_running_the_pipeline(quota_env, monkeypatch):
+    app = create_app()
+    client = TestClient(app)
+
+    assert _post_audio(client).status_code == 200
+
+    calls = []
+    pipeline = app.state.audio_pipeline
+    monkeypatch.setattr(pipeline, "process", lambda ctx: calls.append(ctx))
+    response = _post_audio(client)
+    assert response.status_code == 429
+    assert response.headers["X-Outcome-Detail"] == "audio.quota_exceeded"
+    assert calls == []
+
+    response = _post_audio(client, payload=b"x" * 65)
+    assert response.status_code == 413
+    assert response.headers["X-Outcome-Detail"] == "audio.file_too_large"
+
+    quota = client.get("/audio/stats", headers={"X-API-Key": "quota-user"}).json()["quota"]
+    assert quota["requests"] == 1
+    assert quota["limits"]["monthly_requests"] == 1
+    assert quota["remaining"]["requests"] == 0
+    assert quota["remaining"]["audio_seconds"] is None
@@ -84,3 +84,43 @@ def test_rate_limit_does_not_apply_to_healthz_even_when_enabled():
             assert response.status_code != 429
     finally:
         _restore_env(previous_env)
+
+
+def test_audio_rate_limit_exposes_ratelimit_headers_and_burst():
+    previous_env = {
+        key: os.environ.get(key)
+        for key in (
+            "RATE_LIMIT_ENABLED",
+            "RATE_LIMIT_AUDIO_WINDOW_SECONDS",
+            "RATE_LIMIT_AUDIO_MAX_REQUESTS",
+            "RATE_LIMIT_AUDIO_BURST",
+        )
+    }
+
+    try:
+        os.environ["RATE_LIMIT_ENABLED"] = "1"
+        os.environ["RATE_LIMIT_AUDIO_WINDOW_SECONDS"] = "60"
+        os.environ["RATE_LIMIT_AUDIO_MAX_REQUESTS"] = "60"
+        os.environ["RATE_LIMIT_AUDIO_BURST"] = "1"
+
+        client = TestClient(create_app())
+
+        first = client.post(
+            "/audio",
+            files={"audio_file": ("test.wav", b"fake audio", "audio/wav")},
+            headers={"X-API-Key": "rl-headers"},
+        )
+        assert first.status_code == 200
+        assert first.headers["RateLimit-Limit"] == "60"
+        assert first.headers["RateLimit-Remaining"] == "0"
+
+        second = client.post(
+            "/audio",
+            files={"audio_file": ("test.wav", b"fake audio", "audio/wav")},
+            headers={"X-API-Key": "rl-headers"},
+        )
+        assert second.status_code == 429
+        assert second.headers["Retry-After"] == "1"
+        assert second.headers["RateLimit-Policy"] == "60;w=60;burst=1"
+    finally:
+        _restore_env(previous_env)
@@ -0,0 +1,200 @@
+import socket
+import socketserver
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from bot_neutro.api import create_app
+from bot_neutro.metrics_runtime import METRICS
+from bot_neutro.rate_limiter import (
+    GCRAParams,
+    LeasedRateLimiter,
+    RespTokenStore,
+    SQLiteTokenStore,
+    TokenStore,
+)
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class CountingStore(TokenStore):
+    def __init__(self, inner: TokenStore) -> None:
+        self.inner = inner
+        self.calls = 0
+
+    def take(self, key, tokens, params):
+        self.calls += 1
+        return self.inner.take(key, tokens, params)
+
+
+class _RespHandler(socketserver.StreamRequestHandler):
+    """Subset of RESP: GET, SET [PX], WATCH/UNWATCH, MULTI/EXEC, PING."""
+
+    def _read_command(self):
+        header = self.rfile.readline()
+        if not header:
+            return None
+        parts = []
+        for _ in range(int(header[1:])):
+            size = int(self.rfile.readline()[1:])
+            parts.append(self.rfile.read(size + 2)[:-2].decode())
+        return parts
+
+    def _bulk(self, value):
+        if value is None:
+            return b"$-1\r\n"
+        data = value.encode()
+        return b"$%d\r\n%s\r\n" % (len(data), data)
+
+    def handle(self):
+        server = self.server
+        watched = {}
+        queued = None
+        while True:
+            command = self._read_command()
+            if command is None:
+                return
+            name, args = command[0].upper(), command[1:]
+            with server.lock:
+                if queued is not None and name not in {"EXEC", "DISCARD"}:
+                    queued.append((name, args))
+                    reply = b"+QUEUED\r\n"
+                elif name == "PING":
+                    reply = b"+PONG\r\n"
+                elif name == "WATCH":
+                    watched.update({key: server.versions.get(key, 0) for key in args})
+                    reply = b"+OK\r\n"
+                elif name == "UNWATCH":
+                    watched.clear()
+                    reply = b"+OK\r\n"
+                elif name == "GET":
+                    reply = self._bulk(server.data.get(args[0]))
+                elif name == "MULTI":
+                    queued = []
+                    reply = b"+OK\r\n"
+                elif name == "EXEC":
+                    conflict = any(server.versions.get(key, 0) != version for key, version in watched.items())
+                    if conflict:
+                        reply = b"*-1\r\n"
+                    else:
+                        for _, queued_args in queued:
+                            server.data[queued_args[0]] = queued_args[1]
+                            server.versions[queued_args[0]] = server.versions.get(queued_args[0], 0) + 1
+                        reply = b"*%d\r\n" % len(queued) + b"+OK\r\n" * len(queued)
+                    queued = None
+                    watched.clear()
+                else:
+                    reply = b"-ERR unknown command\r\n"
+            self.wfile.write(reply)
+
+
+@pytest.fixture
+def resp_server():
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _RespHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.data = {}
+    server.versions = {}
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_sqlite_store_shares_the_limit_across_workers(tmp_path):
+    path = str(tmp_path / "rl.sqlite3")
+    clock = FakeClock()
+    workers = [
+        LeasedRateLimiter(SQLiteTokenStore(path, clock=clock), limit=10, period=60, lease_size=3, clock=clock)
+        for _ in range(4)
+    ]
+
+    admitted = sum(workers[index % 4].hit("/audio:k").allowed for index in range(40))
+
+    assert admitted == 10
+
+
+def test_leases_avoid_a_store_round_trip_per_request(tmp_path):
+    clock = FakeClock()
+    store = CountingStore(SQLiteTokenStore(str(tmp_path / "rl.sqlite3"), clock=clock))
+    limiter = LeasedRateLimiter(store, limit=100, period=60, lease_size=10, clock=clock)
+
+    for _ in range(30):
+        decision = limiter.hit_local("k") or limiter.hit("k")
+        assert decision.allowed
+
+    assert store.calls == 3
+
+
+def test_rejections_are_cached_until_retry_after(tmp_path):
+    clock = FakeClock()
+    store = CountingStore(SQLiteTokenStore(str(tmp_path / "rl.sqlite3"), clock=clock))
+    limiter = LeasedRateLimiter(store, limit=60, period=60, burst=1, lease_size=1, clock=clock)
+
+    assert limiter.hit("k").allowed
+    assert not limiter.hit("k").allowed
+    calls = store.calls
+    cached = limiter.hit_local("k")
+    assert cached is not None and not cached.allowed
+    assert store.calls == calls
+
+    clock.now += 1.0
+    assert limiter.hit_local("k") is None
+    assert limiter.hit("k").allowed
+
+
+def test_resp_store_applies_gcra_against_a_shared_server(resp_server):
+    host, port = resp_server.server_address
+    clock = FakeClock()
+    params = GCRAParams.build(limit=10, period=60, burst=5)
+    nodes = [RespTokenStore(host, port, clock=clock) for _ in range(2)]
+
+    granted = [nodes[0].take("k", 3, params).granted, nodes[1].take("k", 3, params).granted]
+    assert granted == [3, 2]
+    assert nodes[0].take("k", 1, params).granted == 0
+    assert float(resp_server.data["bot_neutro:rl:k"]) == pytest.approx(1000.0 + 5 * 6.0)
+
+    clock.now += 6.0
+    assert nodes[1].take("k", 3, params).granted == 1
+    for node in nodes:
+        node.close()
+
+
+def test_unreachable_store_fails_open_and_counts_errors():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    errors = METRICS.snapshot().get("rate_limit_backend_errors_total", {}).get(("RespTokenStore",), 0)
+    limiter = LeasedRateLimiter(RespTokenStore("127.0.0.1", port, timeout=0.2), limit=1, period=60)
+
+    assert limiter.hit("k").allowed
+    assert METRICS.snapshot()["rate_limit_backend_errors_total"][("RespTokenStore",)] == errors + 1
+
+
+def test_audio_rate_limit_with_sqlite_backend(monkeypatch, tmp_path):
+    monkeypatch.setenv("RATE_LIMIT_ENABLED", "1")
+    monkeypatch.setenv("RATE_LIMIT_AUDIO_MAX_REQUESTS", "2")
+    monkeypatch.setenv("RATE_LIMIT_BACKEND", "sqlite")
+    monkeypatch.setenv("RATE_LIMIT_SQLITE_PATH", str(tmp_path / "rl.sqlite3"))
+
+    clients = [TestClient(create_app()) for _ in range(2)]
+    statuses = [
+        clients[index % 2]
+        .post(
+            "/audio",
+            files={"audio_file": ("test.wav", b"fake audio", "audio/wav")},
+            headers={"X-API-Key": "rl-shared"},
+        )
+        .status_code
+        for index in range(4)
+    ]
+
+    assert statuses.count(429) == 2
@@ -0,0 +1,83 @@
+import pytest
+
+from bot_neutro.rate_limiter import GCRALimiter
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_gcra_allows_burst_then_emission_rate():
+    clock = FakeClock()
+    limiter = GCRALimiter(limit=60, period=60, burst=3, clock=clock)
+
+    remaining = [limiter.hit("k").remaining for _ in range(3)]
+    assert remaining == [2, 1, 0]
+
+    rejected = limiter.hit("k")
+    assert not rejected.allowed
+    assert rejected.retry_after == pytest.approx(1.0)
+    assert rejected.headers(limiter.policy)["Retry-After"] == "1"
+
+    clock.now += 1.0
+    assert limiter.hit("k").allowed
+    assert not limiter.hit("k").allowed
+
+
+def test_gcra_never_admits_twice_the_limit_across_a_window_boundary():
+    clock = FakeClock()
+    limiter = GCRALimiter(limit=10, period=60, clock=clock)
+
+    clock.now = 1059.0  # final de una ventana fija
+    admitted = sum(limiter.hit("k").allowed for _ in range(10))
+    clock.now = 1061.0  # inicio de la siguiente
+    admitted += sum(limiter.hit("k").allowed for _ in range(10))
+
+    assert admitted == 10
+
+
+def test_gcra_headers_report_limit_remaining_and_reset():
+    clock = FakeClock()
+    limiter = GCRALimiter(limit=2, period=60, clock=clock)
+
+    headers = limiter.hit("k").headers(limiter.policy)
+    assert headers["RateLimit-Limit"] == "2"
+    assert headers["RateLimit-Remaining"] == "1"
+    assert headers["RateLimit-Reset"] == "30"
+    assert headers["RateLimit-Policy"] == "2;w=60"
+    assert "Retry-After" not in headers
+
+    limiter.hit("k")
+    rejected = limiter.hit("k").headers(limiter.policy)
+    assert rejected["Retry-After"] == "30"
+    assert rejected["RateLimit-Remaining"] == "0"
+
+
+def test_headers_advertise_quota_and_burst_separately():
+    limiter = GCRALimiter(limit=60, period=60, burst=1, clock=FakeClock())
+
+    headers = limiter.hit("k").headers(limiter.policy)
+    assert headers["RateLimit-Limit"] == "60"
+    assert headers["RateLimit-Remaining"] == "0"
+    assert headers["RateLimit-Policy"] == "60;w=60;burst=1"
+
+
+def test_idle_keys_expire_lazily_and_memory_is_capped():
+    clock = FakeClock()
+    limiter = GCRALimiter(limit=10, period=10, burst=1, max_keys=50, clock=clock)
+
+    for index in range(20):
+        limiter.hit(f"key-{index}")
+    assert len(limiter) == 20
+
+    clock.now += 5
+    limiter.hit("fresh")
+    assert len(limiter) == 1
+
+    for index in range(200):
+        limiter.hit(f"burst-{index}")
+    assert len(limiter) == 50
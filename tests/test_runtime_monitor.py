@@ -0,0 +1,90 @@
+import asyncio
+import time
+
+from fastapi.testclient import TestClient
+
+from bot_neutro.api import create_app
+from bot_neutro.audio_pipeline import StubAudioPipeline
+from bot_neutro.audio_storage import InMemoryAudioSessionRepository
+from bot_neutro.metrics_runtime import METRICS
+from bot_neutro.runtime_monitor import LoopLagMonitor
+
+
+def test_loop_lag_monitor_detects_blocking_call():
+    lags = []
+
+    class RecordingMonitor(LoopLagMonitor):
+        def sample(self, lag_seconds):
+            lags.append(lag_seconds)
+            super().sample(lag_seconds)
+
+    async def scenario():
+        monitor = RecordingMonitor(interval=0.02)
+        monitor.start()
+        await asyncio.sleep(0.05)
+        time.sleep(0.2)
+        await asyncio.sleep(0.05)
+        await monitor.stop()
+
+    asyncio.run(scenario())
+    assert max(lags) >= 0.1
+
+
+def test_readyz_reports_not_ready_on_loop_lag(monkeypatch):
+    monkeypatch.setenv("READYZ_MAX_LOOP_LAG_SECONDS", "0.5")
+    app = create_app()
+    client = TestClient(app)
+    assert client.get("/readyz").status_code == 200
+
+    app.state.loop_monitor.lag_seconds = 2.0
+    response = client.get("/readyz")
+    assert response.status_code == 503
+    assert response.json() == {"status": "not_ready", "reasons": ["event_loop_lag"]}
+    assert response.headers["X-Outcome-Detail"] == "runtime.not_ready"
+
+
+def test_readyz_reports_not_ready_when_audio_in_flight_exceeds_threshold(monkeypatch):
+    monkeypatch.setenv("READYZ_MAX_AUDIO_IN_FLIGHT", "1")
+    client = TestClient(create_app())
+    METRICS.add_request_in_flight("/audio", 1)
+    try:
+        response = client.get("/readyz")
+    finally:
+        METRICS.add_request_in_flight("/audio", -1)
+    assert response.status_code == 503
+    assert "audio_in_flight" in response.json()["reasons"]
+
+
+def test_audio_gauges_track_in_flight_requests_and_buffered_bytes():
+    observed = {}
+
+    class ObservingPipeline(StubAudioPipeline):
+        def process(self, ctx):
+            snapshot = METRICS.snapshot()
+            observed["in_flight"] = snapshot["sensei_requests_in_flight"][("/audio",)]
+            observed["bytes"] = snapshot["audio_bytes_in_memory"]
+            return super().process(ctx)
+
+    app = create_app()
+    app.state.audio_pipeline = ObservingPipeline(InMemoryAudioSessionRepository())
+    before = METRICS.snapshot()
+    response = TestClient(app).post(
+        "/audio",
+        files={"audio_file": ("test.wav", b"0123456789", "audio/wav")},
+        headers={"X-API-Key": "gauge-key"},
+    )
+
+    assert response.status_code == 200
+    assert observed["in_flight"] == before["sensei_requests_in_flight"][("/audio",)] + 1
+    assert observed["bytes"] == before["audio_bytes_in_memory"] + 10
+    after = METRICS.snapshot()
+    assert after["sensei_requests_in_flight"][("/audio",)] == before["sensei_requests_in_flight"][("/audio",)]
+    assert after["audio_bytes_in_memory"] == before["audio_bytes_in_memory"]
+
+
+def test_lifespan_starts_and_stops_loop_monitor():
+    app = create_app()
+    with TestClient(app) as client:
+        assert client.get("/healthz").status_code == 200
+        assert app.state.loop_monitor._task is not None
+    assert app.state.loop_monitor._task is None
@@ -0,0 +1,136 @@
+import io
+import math
+import threading
+import time
+import wave
+from array import array
+
+from bot_neutro.providers import factory
+from bot_neutro.providers.interfaces import STTProvider, STTResult
+from bot_neutro.providers.segmented import PcmAudio, SegmentationSettings, SegmentedSTTProvider
+
+RATE = 8000
+
+
+def _wav(spans):
+    """`spans`: list of (seconds, amplitude); amplitude 0 = silencio."""
+
+    samples = array("h")
+    for seconds, amplitude in spans:
+        for index in range(int(seconds * RATE)):
+            samples.append(int(amplitude * math.sin(index / 3)))
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as writer:
+        writer.setnchannels(1)
+        writer.setsampwidth(2)
+        writer.setframerate(RATE)
+        writer.writeframes(samples.tobytes())
+    return buffer.getvalue()
+
+
+class _RecordingSTT(STTProvider):
+    provider_id = "rec-stt"
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def transcribe(self, audio_bytes, locale):
+        with self._lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(self.delay)
+        audio = PcmAudio.from_wav(audio_bytes)
+        duration = round(audio.duration, 2) if audio else None
+        with self._lock:
+            self.active -= 1
+            self.calls.append(duration)
+        return STTResult(text=f"seg{duration}", provider_id=self.provider_id)
+
+
+def test_long_audio_is_split_at_silence_and_stitched_in_order():
+    inner = _RecordingSTT(delay=0.05)
+    provider = SegmentedSTTProvider(
+        inner, SegmentationSettings(min_seconds=5, segment_seconds=4, parallelism=3, search_seconds=1.5)
+    )
+    # Voz 3.5 s, silencio 0.5 s, voz 3.5 s, silencio 0.5 s, voz 3 s.
+    audio = _wav([(3.5, 8000), (0.5, 0), (3.5, 8000), (0.5, 0), (3.0, 8000)])
+
+    result = provider.transcribe(audio, "es-ES")
+
+    segments = result.raw_transcript["segments"]
+    assert len(segments) == 3
+    # Cada corte cae dentro del silencio (3.5–4.0 s y 7.5–8.0 s).
+    assert 3500 <= segments[0]["end_ms"] <= 4000
+    assert 7500 <= segments[1]["end_ms"] <= 8000
+    assert segments[-1]["end_ms"] == 11000
+    assert [segment["start_ms"] for segment in segments[1:]] == [segment["end_ms"] for segment in segments[:-1]]
+    assert result.text == " ".join(segment["text"] for segment in segments)
+    assert {segment["provider_id"] for segment in segments} == {"rec-stt"}
+    assert result.provider_id == "rec-stt"
+    assert result.input_seconds == 11.0
+    # Latencia de pared del fan-out: menor que la suma de los segmentos en paralelo.
+    assert 0 < result.latency_ms < sum(segment["stt_ms"] for segment in segments)
+    assert inner.max_active > 1
+
+
+def test_short_or_non_wav_audio_goes_straight_to_the_inner_provider():
+    inner = _RecordingSTT()
+    provider = SegmentedSTTProvider(inner, SegmentationSettings(min_seconds=5))
+
+    assert provider.transcribe(_wav([(2.0, 8000)]), "es-ES").raw_transcript is None
+    assert provider.transcribe(b"fake audio", "es-ES").text == "segNone"
+    assert inner.calls == [2.0, None]
+
+
+def test_short_wav_is_not_decoded_before_the_threshold_check(monkeypatch):
+    inner = _RecordingSTT()
+    provider = SegmentedSTTProvider(inner, SegmentationSettings(min_seconds=5))
+    audio = _wav([(2.0, 8000)])
+    decoded = []
+    original = PcmAudio.from_wav
+    monkeypatch.setattr(PcmAudio, "from_wav", staticmethod(lambda data: decoded.append(len(data)) or original(data)))
+
+    result = provider.transcribe_stream(iter([audio[:1000], audio[1000:]]), "es-ES")
+
+    assert result.raw_transcript is None
+    # Solo la llamada del provider interno del test decodifica; el wrapper no.
+    assert decoded == [len(audio)]
+
+
+def test_fallback_segments_report_each_provider_once():
+    class _FlakySTT(_RecordingSTT):
+        def transcribe(self, audio_bytes, locale):
+            result = super().transcribe(audio_bytes, locale)
+            if len(self.calls) % 2 == 0:
+                result.provider_id = "rec-stt|stub-stt"
+            return result
+
+    provider = SegmentedSTTProvider(
+        _FlakySTT(), SegmentationSettings(min_seconds=5, segment_seconds=4, parallelism=1, search_seconds=1.5)
+    )
+    audio = _wav([(3.5, 8000), (0.5, 0), (3.5, 8000), (0.5, 0), (3.0, 8000)])
+
+    result = provider.transcribe(audio, "es-ES")
+
+    assert result.provider_id == "rec-stt|stub-stt"
+    assert [segment["provider_id"] for segment in result.raw_transcript["segments"]] == [
+        "rec-stt",
+        "rec-stt|stub-stt",
+        "rec-stt",
+    ]
+
+
+def test_factory_wraps_stt_only_when_threshold_is_set(monkeypatch):
+    monkeypatch.delenv("AUDIO_STT_PROVIDER", raising=False)
+    monkeypatch.setenv("STT_SEGMENT_MIN_SECONDS", "90")
+    monkeypatch.setenv("STT_SEGMENT_PARALLELISM", "2")
+
+    provider = factory.build_stt_provider()
+
+    assert isinstance(provider, SegmentedSTTProvider)
+    assert provider.settings.parallelism == 2
+    assert provider.provider_id == "stub-stt"
@@ -0,0 +1,97 @@
+from fastapi.testclient import TestClient
+
+from bot_neutro.api import create_app
+from bot_neutro.settings import Settings, SettingsHolder
+from bot_neutro.slow_requests import SLOW_REQUESTS, SlowRequestSettings, configure_slow_requests
+
+ADMIN = {"X-Admin-Token": "settings-secret"}
+
+
+def _post_audio(client, api_key="settings-user"):
+    return client.post(
+        "/audio",
+        files={"audio_file": ("test.wav", b"fake audio", "audio/wav")},
+        headers={"X-API-Key": api_key},
+    )
+
+
+def test_settings_are_parsed_once_and_validated(monkeypatch):
+    monkeypatch.setenv("AUDIO_STATS_MAX_SESSIONS", "-5")
+    monkeypatch.setenv("AUDIO_SCHEDULER_WEIGHTS", "premium=8,bogus")
+    settings = Settings.from_env()
+
+    assert settings.http.stats_max_sessions == 0
+    assert dict(settings.scheduler.weights)["premium"] == 8.0
+    monkeypatch.setenv("AUDIO_STATS_MAX_SESSIONS", "7")
+    assert settings.http.stats_max_sessions == 0
+
+
+def test_reload_swaps_snapshot_and_reports_changes(monkeypatch):
+    holder = SettingsHolder()
+    before = holder.current
+
+    assert holder.reload() == {"version": 1, "changed": [], "restart_required": []}
+    assert holder.current is before
+
+    monkeypatch.setenv("RATE_LIMIT_ENABLED", "1")
+    monkeypatch.setenv("AUDIO_SESSION_RETENTION_DAYS", "3")
+    result = holder.reload()
+
+    assert result == {"version": 2, "changed": ["storage", "rate_limit"], "restart_required": ["storage"]}
+    assert before.rate_limit.enabled is False
+    assert holder.current.rate_limit.enabled is True
+
+
+def test_reload_reconfigures_process_singletons_and_flags_restart_only_sections(monkeypatch):
+    monkeypatch.delenv("SLOW_REQUEST_THRESHOLD_MS", raising=False)
+    holder = SettingsHolder()
+
+    monkeypatch.setenv("SLOW_REQUEST_THRESHOLD_MS", "750")
+    monkeypatch.setenv("LOG_QUEUE_MAX_RECORDS", "5")
+    monkeypatch.setenv("METRICS_LATENCY_WINDOW_SECONDS", "60")
+    try:
+        result = holder.reload()
+        assert result["changed"] == ["logging", "slow_requests", "metrics"]
+        assert result["restart_required"] == ["logging", "metrics"]
+        assert SLOW_REQUESTS.threshold_ms == 750
+    finally:
+        configure_slow_requests(SlowRequestSettings())
+
+
+def test_rate_limit_follows_admin_reload(monkeypatch):
+    monkeypatch.setenv("DEBUG_ENDPOINTS_ENABLED", "1")
+    monkeypatch.setenv("DEBUG_ADMIN_TOKEN", "settings-secret")
+    monkeypatch.delenv("RATE_LIMIT_ENABLED", raising=False)
+    client = TestClient(create_app())
+    assert [_post_audio(client).status_code for _ in range(2)] == [200, 200]
+
+    monkeypatch.setenv("RATE_LIMIT_ENABLED", "1")
+    monkeypatch.setenv("RATE_LIMIT_AUDIO_MAX_REQUESTS", "1")
+    assert _post_audio(client).status_code == 200
+
+    assert client.post("/debug/settings/reload").status_code == 401
+    response = client.post("/debug/settings/reload", headers=ADMIN)
+    assert response.status_code == 200
+    assert response.json()["changed"] == ["rate_limit"]
+
+    assert [_post_audio(client).status_code for _ in range(2)] == [200, 429]
+
+
+def test_reload_applies_settings_file_over_environment(monkeypatch, tmp_path):
+    settings_file = tmp_path / "bot.env"
+    settings_file.write_text("# overrides\nRATE_LIMIT_ENABLED=1\nexport READYZ_MAX_AUDIO_IN_FLIGHT='4'\n")
+    monkeypatch.setenv("SETTINGS_FILE", str(settings_file))
+    monkeypatch.setenv("RATE_LIMIT_ENABLED", "0")
+    # setenv registra la clave para que monkeypatch deshaga lo que aplique el archivo.
+    monkeypatch.setenv("READYZ_MAX_AUDIO_IN_FLIGHT", "0")
+
+    holder = SettingsHolder()
+    assert holder.current.rate_limit.enabled is True
+    assert holder.current.readiness.max_audio_in_flight == 4
+
+    settings_file.write_text("READYZ_MAX_AUDIO_IN_FLIGHT=2\n")
+    result = holder.reload()
+
+    assert result["changed"] == ["rate_limit", "readiness"]
+    assert holder.current.rate_limit.enabled is False
+    assert holder.current.readiness.max_audio_in_flight == 2
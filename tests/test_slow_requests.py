@@ -0,0 +1,74 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from bot_neutro.api import create_app
+from bot_neutro.security_ids import derive_api_key_id
+from bot_neutro.slow_requests import SLOW_REQUESTS, SlowRequestLog, configure_slow_requests
+
+ADMIN = {"X-Admin-Token": "slow-secret"}
+
+
+@pytest.fixture
+def slow_client(monkeypatch):
+    monkeypatch.setenv("SLOW_REQUEST_THRESHOLD_MS", "0.001")
+    monkeypatch.setenv("DEBUG_ENDPOINTS_ENABLED", "1")
+    monkeypatch.setenv("DEBUG_ADMIN_TOKEN", "slow-secret")
+    SLOW_REQUESTS.clear()
+    yield TestClient(create_app())
+    monkeypatch.undo()
+    configure_slow_requests()
+    SLOW_REQUESTS.clear()
+
+
+def test_slow_request_log_is_bounded_and_newest_first():
+    log = SlowRequestLog(threshold_ms=100, capacity=3)
+    for index in range(5):
+        log.record({"corr_id": f"c{index}"})
+
+    assert [entry["corr_id"] for entry in log.entries()] == ["c4", "c3", "c2"]
+    assert log.is_slow(0.2) and not log.is_slow(0.05)
+    assert not SlowRequestLog(threshold_ms=0).is_slow(10)
+
+
+def test_slow_audio_request_is_captured_with_stage_breakdown(slow_client):
+    response = slow_client.post(
+        "/audio",
+        files={"audio_file": ("test.wav", b"0123456789", "audio/wav")},
+        headers={"X-API-Key": "slow-key", "X-Correlation-Id": "slow-corr-1"},
+    )
+    assert response.status_code == 200
+
+    listing = slow_client.get("/debug/slow-requests", headers=ADMIN)
+    assert listing.status_code == 200
+    entry = next(item for item in listing.json()["requests"] if item["corr_id"] == "slow-corr-1")
+    assert entry["api_key_id"] == derive_api_key_id("slow-key")
+    assert entry["path"] == "/audio"
+    assert entry["status"] == 200
+    assert entry["outcome"] == "success"
+    assert {"upload", "stt", "llm", "tts", "storage", "total"} <= set(entry["stage_ms"])
+    assert entry["providers"] == {"stt": "stub-stt", "llm": "stub-llm", "tts": "stub-tts"}
+    assert entry["audio_bytes"] == 10
+    assert entry["request_bytes"] > 10
+    assert entry["response_bytes"] == len(response.content)
+
+
+def test_histogram_buckets_carry_exemplars_only_in_openmetrics(slow_client):
+    slow_client.post(
+        "/audio",
+        files={"audio_file": ("test.wav", b"fake audio", "audio/wav")},
+        headers={"X-API-Key": "slow-key", "X-Correlation-Id": "slow-corr-2"},
+    )
+
+    openmetrics = slow_client.get(
+        "/metrics", headers={"Accept": "application/openmetrics-text; version=1.0.0"}
+    ).text
+    exemplar_lines = [
+        line
+        for line in openmetrics.splitlines()
+        if line.startswith('sensei_request_latency_seconds_bucket{route="/audio"')
+        and '# {corr_id="slow-corr-2"}' in line
+    ]
+    assert len(exemplar_lines) == 1
+
+    prometheus = slow_client.get("/metrics").text
+    assert "# {corr_id=" not in prometheus
@@ -0,0 +1,100 @@
+import json
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+
+from bot_neutro.api import create_app
+from bot_neutro.tracing import TRACER, JSONLSpanExporter, Tracer, configure_tracing
+
+
+@pytest.fixture
+def traced_app(monkeypatch, tmp_path):
+    export_path = tmp_path / "traces.jsonl"
+    monkeypatch.setenv("TRACING_SAMPLE_RATE", "1")
+    monkeypatch.setenv("TRACING_EXPORT_PATH", str(export_path))
+    app = create_app()
+    yield app, export_path
+    monkeypatch.undo()
+    configure_tracing()
+
+
+def _read_spans(path):
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+def test_audio_request_exports_span_tree_tied_to_correlation_id(traced_app):
+    app, export_path = traced_app
+    corr_id = str(uuid.uuid4())
+
+    response = TestClient(app).post(
+        "/audio",
+        files={"audio_file": ("test.wav", b"fake audio", "audio/wav")},
+        headers={"X-API-Key": "trace-key", "X-Correlation-Id": corr_id},
+    )
+    assert response.status_code == 200
+    assert TRACER.exporter.force_flush()
+
+    spans = _read_spans(export_path)
+    assert {span["trace_id"] for span in spans} == {uuid.UUID(corr_id).hex}
+    by_name = {span["name"]: span for span in spans}
+    assert {
+        "http.request",
+        "middleware.RateLimitMiddleware",
+        "route /audio",
+        "audio.parse_multipart",
+        "pipeline.stt",
+        "pipeline.llm",
+        "pipeline.tts",
+        "pipeline.storage",
+        "repository.create",
+    } <= set(by_name)
+
+    root = by_name["http.request"]
+    assert root["parent_id"] is None
+    assert root["attributes"]["http.status_code"] == 200
+    assert by_name["pipeline.stt"]["parent_id"] == by_name["route /audio"]["span_id"]
+    assert by_name["repository.create"]["parent_id"] == by_name["pipeline.storage"]["span_id"]
+    span_ids = {span["span_id"] for span in spans}
+    assert all(span["parent_id"] in span_ids for span in spans if span is not root)
+
+
+def test_unsampled_requests_export_nothing(tmp_path):
+    exporter = JSONLSpanExporter(tmp_path / "traces.jsonl")
+    tracer = Tracer(sample_rate=0.0, exporter=exporter)
+
+    with tracer.start_trace("http.request", "corr") as root:
+        with tracer.span("child") as child:
+            assert root is None and child is None
+
+    assert exporter.force_flush()
+    assert not (tmp_path / "traces.jsonl").exists()
+
+
+def test_span_budget_caps_spans_per_trace(tmp_path):
+    exporter = JSONLSpanExporter(tmp_path / "traces.jsonl")
+    tracer = Tracer(sample_rate=1.0, exporter=exporter, max_spans_per_trace=3)
+
+    with tracer.start_trace("http.request", "corr-budget"):
+        for _ in range(10):
+            with tracer.span("child"):
+                pass
+
+    assert exporter.force_flush()
+    assert len(_read_spans(tmp_path / "traces.jsonl")) == 3
+
+
+def test_exporter_rotates_by_size(tmp_path):
+    export_path = tmp_path / "traces.jsonl"
+    exporter = JSONLSpanExporter(export_path, max_bytes=2000, backup_count=2)
+    tracer = Tracer(sample_rate=1.0, exporter=exporter)
+
+    for index in range(30):
+        with tracer.start_trace("http.request", f"corr-{index}"):
+            pass
+        assert exporter.force_flush()
+
+    assert export_path.stat().st_size <= 2000
+    assert (tmp_path / "traces.jsonl.1").exists()
+    assert (tmp_path / "traces.jsonl.2").exists()
+    assert not (tmp_path / "traces.jsonl.3").exists()
@@ -0,0 +1,140 @@
+import os
+import time
+
+from bot_neutro.metrics_runtime import METRICS
+from bot_neutro.providers import factory
+from bot_neutro.providers.interfaces import TTSProvider, TTSResult
+from bot_neutro.providers.tts_cache import CachingTTSProvider, TTSCacheSettings
+from bot_neutro.providers.tts_formats import TTS_OUTPUT_FORMATS
+
+
+class _CountingTTS(TTSProvider):
+    provider_id = "count-tts"
+    latency_ms = 120
+
+    def __init__(self, size=100, fail=False):
+        self.size = size
+        self.fail = fail
+        self.calls = 0
+
+    def synthesize(self, text, locale, voice=None, output_format=None):
+        self.calls += 1
+        provider_id = f"{self.provider_id}|stub-tts" if self.fail else self.provider_id
+        mime_type = output_format.mime_type if output_format else "audio/wav"
+        return TTSResult(
+            audio_bytes=text.encode().ljust(self.size, b"."),
+            audio_mime_type=mime_type,
+            provider_id=provider_id,
+            output_seconds=2.0,
+        )
+
+
+def _metric(family, labels):
+    return METRICS.snapshot().get(family, {}).get(labels, 0)
+
+
+def test_memory_hits_skip_synthesize_and_key_covers_locale_voice_format():
+    inner = _CountingTTS()
+    provider = CachingTTSProvider(inner, TTSCacheSettings(memory_bytes=10_000))
+    saved = _metric("tts_cache_bytes_saved_total", ("memory",))
+
+    first = provider.synthesize("Hola,  ¿cómo estás?", "es-ES")
+    again = provider.synthesize(" Hola, ¿cómo estás? ", "es-ES")
+    assert inner.calls == 1
+    assert bytes(again.audio_bytes) == bytes(first.audio_bytes)
+    assert (first.cache_hit, first.latency_ms) == (False, None)
+    assert (again.cache_hit, again.latency_ms, again.output_seconds) == (True, 0, 2.0)
+    assert _metric("tts_cache_bytes_saved_total", ("memory",)) == saved + 100
+
+    provider.synthesize("Hola, ¿cómo estás?", "es-MX")
+    provider.synthesize("Hola, ¿cómo estás?", "es-ES", voice="es-ES-ElviraNeural")
+    provider.synthesize("Hola, ¿cómo estás?", "es-ES", output_format=TTS_OUTPUT_FORMATS["mp3-48k"])
+    assert inner.calls == 4
+    assert provider.latency_ms == 120
+
+
+def test_memory_tier_is_bounded_by_bytes_and_fallback_audio_is_not_cached():
+    inner = _CountingTTS(size=400)
+    provider = CachingTTSProvider(inner, TTSCacheSettings(memory_bytes=1000))
+    evictions = _metric("tts_cache_evictions_total", ("memory", "size"))
+
+    for text in ("uno", "dos", "tres"):
+        provider.synthesize(text, "es-ES")
+    assert _metric("tts_cache_evictions_total", ("memory", "size")) == evictions + 1
+    provider.synthesize("uno", "es-ES")
+    assert inner.calls == 4
+
+    inner.fail = True
+    provider.synthesize("degradado", "es-ES")
+    provider.synthesize("degradado", "es-ES")
+    assert inner.calls == 6
+
+
+def test_disk_tier_survives_restart_and_expires_old_entries(tmp_path):
+    settings = TTSCacheSettings(disk_path=str(tmp_path), disk_max_bytes=10_000, disk_max_age_seconds=60)
+    inner = _CountingTTS()
+    CachingTTSProvider(inner, settings).synthesize("frase común", "es-ES")
+    disk_hits = _metric("tts_cache_lookups_total", ("disk",))
+
+    restarted = CachingTTSProvider(inner, settings)
+    result = restarted.synthesize("frase común", "es-ES")
+    assert inner.calls == 1
+    assert (result.provider_id, result.audio_mime_type, result.output_seconds) == ("count-tts", "audio/wav", 2.0)
+    assert _metric("tts_cache_lookups_total", ("disk",)) == disk_hits + 1
+
+    (path,) = [entry.path for entry in os.scandir(tmp_path)]
+    old = time.time() - 120
+    os.utime(path, (old, old))
+    CachingTTSProvider(inner, settings).synthesize("frase común", "es-ES")
+    assert inner.calls == 2
+
+
+def test_disk_tier_evicts_least_recently_used_files_over_budget(tmp_path):
+    provider = CachingTTSProvider(_CountingTTS(size=1000), TTSCacheSettings(disk_path=str(tmp_path), disk_max_bytes=2500))
+    for index, text in enumerate(("a", "b", "c")):
+        provider.synthesize(text, "es-ES")
+        stamp = time.time() - 10 + index
+        for entry in os.scandir(tmp_path):
+            if entry.stat().st_mtime > stamp:
+                os.utime(entry.path, (stamp, stamp))
+
+    assert len(os.listdir(tmp_path)) == 2
+    assert provider._disk.bytes <= 2500  # noqa: SLF001
+
+
+def test_disk_tier_rechecks_usage_written_by_other_workers(tmp_path, monkeypatch):
+    settings = TTSCacheSettings(disk_path=str(tmp_path), disk_max_bytes=2500)
+    first, second = (CachingTTSProvider(_CountingTTS(size=1000), settings) for _ in range(2))
+    first.synthesize("a", "es-ES")
+    first.synthesize("b", "es-ES")
+    # `second` arrancó con el directorio vacío: su contador no ve lo que escribió `first`.
+    monkeypatch.setattr("bot_neutro.providers.tts_cache.DISK_RESCAN_SECONDS", 0.0)
+    second.synthesize("c", "es-ES")
+
+    assert len(os.listdir(tmp_path)) == 2
+    assert second._disk.bytes <= 2500  # noqa: SLF001
+    # Se fue el archivo ajeno más viejo; el propio recién escrito queda.
+    assert second.synthesize("c", "es-ES").cache_hit is True
+
+
+def test_hit_and_miss_results_carry_their_own_latency():
+    provider = CachingTTSProvider(_CountingTTS(), TTSCacheSettings(memory_bytes=10_000))
+    provider.synthesize("cacheada", "es-ES")
+
+    hit = provider.synthesize("cacheada", "es-ES")
+    miss = provider.synthesize("nueva", "es-ES")
+
+    assert (hit.cache_hit, hit.latency_ms) == (True, 0)
+    assert miss.cache_hit is False
+    assert provider.latency_ms == 120
+
+
+def test_factory_wraps_tts_only_when_cache_is_configured(monkeypatch, tmp_path):
+    monkeypatch.delenv("AUDIO_TTS_PROVIDER", raising=False)
+    monkeypatch.setenv("TTS_CACHE_DIR", str(tmp_path))
+
+    provider = factory.build_tts_provider()
+
+    assert isinstance(provider, CachingTTSProvider)
+    assert provider.provider_id == "stub-tts"
+    assert provider.settings.memory_bytes == 0
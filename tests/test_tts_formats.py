@@ -0,0 +1,57 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from bot_neutro.api import create_app
+from bot_neutro.metrics_runtime import METRICS
+from bot_neutro.providers.tts_formats import UnsupportedTTSFormat, negotiate_tts_format, parse_format_list
+
+
+client = TestClient(create_app())
+
+
+def test_form_field_wins_over_accept_and_accepts_names_or_mime():
+    assert negotiate_tts_format("mp3-160k", "audio/ogg").name == "mp3-160k"
+    assert negotiate_tts_format("audio/ogg", None).name == "ogg-opus"
+    with pytest.raises(UnsupportedTTSFormat):
+        negotiate_tts_format("flac", None)
+    with pytest.raises(UnsupportedTTSFormat):
+        negotiate_tts_format("mp3-160k", None, allowed=("wav", "ogg-opus"))
+
+
+def test_accept_header_picks_highest_quality_allowed_audio_type():
+    accept = "application/json, audio/wav;q=0.2, audio/opus;q=0.9, audio/mpeg;q=0.5"
+    assert negotiate_tts_format(None, accept).name == "ogg-opus"
+    # El orden de `allowed` decide el bitrate cuando el cliente pide audio/mpeg.
+    assert negotiate_tts_format(None, accept, allowed=parse_format_list("wav,mp3-48k,mp3-96k")).name == "mp3-48k"
+    assert negotiate_tts_format(None, "application/json, */*", default="mp3-96k").name == "mp3-96k"
+    assert negotiate_tts_format(None, "audio/ogg;q=0", default="wav").name == "wav"
+
+
+def test_audio_endpoint_negotiates_format_and_reports_output_bytes():
+    response = client.post(
+        "/audio",
+        files={"audio_file": ("test.wav", b"fake audio", "audio/wav")},
+        headers={"X-API-Key": "test-key", "Accept": "application/json, audio/ogg"},
+    )
+
+    assert response.status_code == 200
+    payload = response.json()
+    assert payload["tts_format"] == "ogg-opus"
+    assert payload["tts_mime_type"] == "audio/ogg"
+    assert payload["usage"]["output_bytes"] == len(b"stub-bytes")
+    assert "Accept" in response.headers["Vary"]
+    sizes = METRICS.snapshot()["tts_output_bytes"][("stub-tts", "ogg-opus")]
+    assert sizes["count"] >= 1
+
+
+def test_audio_endpoint_rejects_unsupported_tts_format():
+    response = client.post(
+        "/audio",
+        files={"audio_file": ("test.wav", b"fake audio", "audio/wav")},
+        data={"tts_format": "flac"},
+        headers={"X-API-Key": "test-key"},
+    )
+
+    assert response.status_code == 406
+    assert response.headers["X-Outcome-Detail"] == "audio.tts_format_unsupported"
+    assert "ogg-opus" in response.json()["supported"]
@@ -0,0 +1,115 @@
+"""Per-request overhead of the middleware stack on /healthz and /audio.
+
+Compara la app completa (`create_app()`) contra la misma app sin middlewares
+de usuario, llamando al ASGI app en proceso (sin red) con httpx.
+
+`--rev` corre la misma medición sobre el `src/` de otro commit (extraído con
+`git archive` a un directorio temporal), p.ej. el stack `BaseHTTPMiddleware`
+previo a la reescritura ASGI, para comparar antes/después en la misma máquina.
+
+Uso:
+    PYTHONPATH=src python tools/bench/middleware_overhead.py --requests 2000
+    PYTHONPATH=src python tools/bench/middleware_overhead.py --requests 2000 --rev 522ebc2~1
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import io
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import httpx
+
+from bot_neutro.api import create_app
+from bot_neutro.audio_pipeline import StubAudioPipeline
+from bot_neutro.audio_storage import InMemoryAudioSessionRepository
+
+
+def _build_app(with_middleware: bool):
+    app = create_app()
+    # El repositorio en disco reescribe el JSON completo por request y dominaría la medición.
+    app.state.audio_pipeline = StubAudioPipeline(InMemoryAudioSessionRepository())
+    if not with_middleware:
+        app.user_middleware = []
+        app.middleware_stack = None
+    return app
+
+
+async def _measure(app, path: str, requests: int) -> List[float]:
+    transport = httpx.ASGITransport(app=app)
+    samples: List[float] = []
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for index in range(requests + 50):
+            started = time.perf_counter()
+            if path == "/audio":
+                response = await client.post(
+                    "/audio",
+                    files={"audio_file": ("bench.wav", b"RIFFDATA", "audio/wav")},
+                    headers={"X-API-Key": "bench-key"},
+                )
+            else:
+                response = await client.get(path)
+            elapsed = time.perf_counter() - started
+            if response.status_code >= 500:
+                raise RuntimeError(f"{path} returned {response.status_code}")
+            if index >= 50:  # warm-up
+                samples.append(elapsed)
+    return samples
+
+
+def _summary(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+    return {
+        "mean_us": statistics.fmean(ordered) * 1e6,
+        "p50_us": ordered[len(ordered) // 2] * 1e6,
+        "p99_us": ordered[int(len(ordered) * 0.99)] * 1e6,
+    }
+
+
+async def main(requests: int) -> None:
+    # Se mide el stack, no el I/O del handler de logging a stderr.
+    logging.disable(logging.CRITICAL)
+    for path in ("/healthz", "/audio"):
+        bare = _summary(await _measure(_build_app(False), path, requests))
+        full = _summary(await _measure(_build_app(True), path, requests))
+        overhead = full["mean_us"] - bare["mean_us"]
+        print(
+            f"{path:9s} bare mean={bare['mean_us']:8.1f}us p99={bare['p99_us']:8.1f}us | "
+            f"full mean={full['mean_us']:8.1f}us p99={full['p99_us']:8.1f}us | "
+            f"middleware overhead={overhead:8.1f}us/request"
+        )
+
+
+def run_at_revision(rev: str, requests: int) -> int:
+    """Re-run this script against the `src/` tree of `rev`."""
+
+    repo = Path(__file__).resolve().parents[2]
+    archive = subprocess.run(
+        ["git", "archive", "--format=tar", rev, "src"], cwd=repo, check=True, capture_output=True
+    ).stdout
+    with tempfile.TemporaryDirectory(prefix="bench-") as tmp:
+        with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+            tar.extractall(tmp)
+        env = {**os.environ, "PYTHONPATH": os.path.join(tmp, "src")}
+        print(f"# src at {rev}")
+        return subprocess.call([sys.executable, __file__, "--requests", str(requests)], cwd=tmp, env=env)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--rev", help="git revision whose src/ is measured instead of the working tree")
+    args = parser.parse_args()
+    if args.rev:
+        sys.exit(run_at_revision(args.rev, args.requests))
+    asyncio.run(main(args.requests))
@@ -34,6 +34,31 @@ const audioFile = http.file(audioBytes, 'sample_silence.wav', 'audio/wav');
 const clientLatency = new Trend('audio_client_latency_ms');
 const clientErrors = new Rate('audio_client_errors');
 
+// Desglose por etapa desde el header `Server-Timing` de /audio.
+const SERVER_TIMING_STAGES = ['upload', 'queue', 'stt', 'llm', 'tts', 'storage', 'total'];
+const serverStageLatency = {};
+for (const stage of SERVER_TIMING_STAGES) {
+  serverStageLatency[stage] = new Trend(`audio_server_${stage}_ms`, true);
+}
+const networkOverhead = new Trend('audio_network_overhead_ms', true);
+
+function parseServerTiming(header) {
+  const durations = {};
+  if (!header) {
+    return durations;
+  }
+  for (const entry of header.split(',')) {
+    const [name, ...params] = entry.trim().split(';');
+    for (const param of params) {
+      const [key, value] = param.trim().split('=');
+      if (key === 'dur') {
+        durations[name] = Number(value);
+      }
+    }
+  }
+  return durations;
+}
+
 export default function () {
   const corrId = `k6-audio-${__VU}-${__ITER}-${Date.now()}`;
 
@@ -54,6 +79,16 @@ export default function () {
   clientLatency.add(res.timings.duration);
   clientErrors.add(res.status >= 400);
 
+  const serverTiming = parseServerTiming(res.headers['Server-Timing']);
+  for (const stage of SERVER_TIMING_STAGES) {
+    if (serverTiming[stage] !== undefined) {
+      serverStageLatency[stage].add(serverTiming[stage]);
+    }
+  }
+  if (serverTiming.total !== undefined) {
+    networkOverhead.add(Math.max(0, res.timings.duration - serverTiming.total));
+  }
+
   check(res, {
     'status is success or rate-limited': (r) => r.status === 200 || r.status === 429,
   });